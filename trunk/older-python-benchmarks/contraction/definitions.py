@@ -1,12 +1,12 @@
 import os
 import numpy as np
 
-from typing import Any, List, Mapping, Sequence, Tuple, Union
+from typing import Any, List, Mapping, Optional, Sequence, Tuple, Union
 
 from iree.compiler.ir import *
 from iree.compiler.dialects import arith, builtin, linalg, func
 
-from .einsum import EinsumSpecification, make_einsum
+from .einsum import EinsumSpecification, einsum_variants, make_einsum
 from mlir.sandbox.compilation import attach_inplaceable_attributes, attach_passthrough
 from mlir.sandbox.problem_definition import *
 from mlir.sandbox.utils import *
@@ -18,30 +18,40 @@ avx512 = True
 class EinsumProblem(ProblemDefinition):
   """Benchmarking problem definition for einsum.
 
-  Supports one-operand and two-operand einsum specifications. The textual
-  specification of the operation is similar to that of np.einsum.
+  Supports one-operand and two-operand einsum specifications, including batch
+  dimensions and several reduction dimensions, e.g. `bhqd,bhkd->bhqk`. The
+  textual specification of the operation is similar to that of np.einsum.
   """
 
-  def __init__(self, specification: str, domain: str, flop_count_per_iter: int):
+  def __init__(self,
+               specification: str,
+               domain: Optional[str] = None,
+               flop_count_per_iter: Optional[int] = None):
     """Creates a new EinsumProblem with the given specification.
 
     The specification is a string of the format:
     `<lhs> ',' (<rhs>)? ('->' <out>)?`
     where <lhs>, <rhs> and <out> are contiguous lists of lowercase letters
     indicating dimensions. One-operand specifications define only a lhs operand
-    and skip the rhs operand. Dimensions that appear in both lhs and rhs are
-    reduction dimensions and must not appear in the output. The remaining
-    dimensions must appear in the output. Two-operand specifications may omit
-    the output. In this case, the output dimensions are inferred by taking all
-    non-reduction lhs and rhs dimensions and sorting them alphabetically.
+    and skip the rhs operand. The operand dimensions missing from the output
+    are reduction dimensions. Two-operand specifications may omit the output.
+    In this case, the output dimensions are inferred by taking the lhs and rhs
+    dimensions that appear in a single operand and sorting them
+    alphabetically. An explicit output may also keep dimensions of both
+    operands, which are batch dimensions, and drop dimensions of a single
+    operand, which are reduced.
 
     Arguments:
     specification: textual specification of the einsum.
-    domain: textual specification of the einsum dimension in iteration order.
-    flop_count_per_iter: floating-point operations executed per iteration.
+    domain: textual specification of the einsum dimension in iteration order,
+      the output dimensions followed by the reduction dimensions by default.
+    flop_count_per_iter: floating-point operations executed per iteration,
+      derived from the specification by default.
     """
     self.specification = EinsumSpecification(specification, domain)
     self.flop_count_per_iter = flop_count_per_iter
+    if flop_count_per_iter is None:
+      self.flop_count_per_iter = self.specification.flop_count_per_iter
 
   @property
   def keys(self) -> List[str]:
@@ -1,98 +1,7 @@
 from iree.compiler.ir import *
 from iree.compiler.dialects.linalg.opdsl.lang import *
 
-import itertools
-
-class EinsumSpecification:
-  """Structured representation of a string einsum specification."""
-
-  def __init__(self, specification: str, domain: str):
-    """Creates a specification given its string format."""
-    # Split out the operands and the result part of the specification.
-    specification_split = specification.split("->")
-    assert len(specification_split
-              ) <= 2, "Expected at most one '->' in the specification."
-    operands = specification_split[0]
-    result = specification_split[1] if len(specification_split) > 1 else None
-
-    # Split the operands.
-    operands_split = operands.split(",")
-    assert len(
-        operands_split
-    ) <= 2, "Expected at most two comma-separated operands in the specification."
-
-    # Verify the operands contain no duplicates and are all lower case.
-    operand_dims = [None, None]
-    for idx, dims in enumerate(operands_split):
-      dims.strip()
-      assert len(set(dims)) == len(dims), str.format(
-        f"Unexpected duplicate symbol in operand {idx}.")
-      assert dims.islower(), str.format(
-        f"Expected only lowercase symbols in operand {idx}.")
-      operand_dims[idx] = dims
-    lhs_dims, rhs_dims = operand_dims[0], operand_dims[1]
-
-    # Infer the output dimensions for two-operand specifications. The output
-    # dimensions are the symbols unique to lhs and rhs, in alphabetical order.
-    inferred_output_dims = None
-    if rhs_dims is not None:
-      reduction_dims = set(lhs_dims).intersection(rhs_dims)
-      all_dims = set(lhs_dims).union(rhs_dims)
-      inferred_output_dims = sorted(all_dims.difference(reduction_dims))
-
-    # Use the inferred output specification if there is no user-specified one.
-    if result is not None:
-      result = result.strip()
-      output_dims = result
-      if len(set(output_dims)) != len(output_dims):
-        raise NotImplementedError("Repeated output dimensions.")
-      if inferred_output_dims is not None:
-        assert set(result) == set(inferred_output_dims), str.format(
-          f"Expected output to match inferred output {inferred_output_dims}.")
-    else:
-      assert inferred_output_dims is not None, "Expected output specification."
-      output_dims = "".join(inferred_output_dims)
-
-    # Use the specified iteration domain or order the dimensions alphabetically.
-    domain_dims = [dim for dim in domain]
-    spec_dims = set(lhs_dims + output_dims)
-    assert set(domain_dims) == spec_dims, str.format(
-      f"Expected domain dimensions to match specification {spec_dims}")
-
-    self.__lhs_dims = lhs_dims
-    self.__rhs_dims = rhs_dims
-    self.__output_dims = output_dims
-    self.__domain_dims = domain_dims
-
-  @property
-  def lhs_dims(self):
-    """Dimensions of the LHS operand, as string and in order."""
-    return self.__lhs_dims
-
-  @property
-  def rhs_dims(self):
-    """Dimensions of the RHS operand, as string and in order, or None."""
-    return self.__rhs_dims
-
-  @property
-  def output_dims(self):
-    """Dimensions of the output tensors, as string and in order."""
-    return self.__output_dims
-
-  @property
-  def domain_dims(self):
-    """Dimensions of the iteration domain, as string and in order."""
-    return self.__domain_dims
-
-  @property
-  def reduction_dims(self):
-    """Reduction dimensions, as string and in order of LHS operand."""
-    return "".join([d for d in self.lhs_dims if d not in self.output_dims])
-
-  def __str__(self):
-    """String representation of einsum."""
-    operand_dims = [d for d in [self.lhs_dims, self.rhs_dims] if d is not None]
-    return format(f"{','.join(operand_dims)}->{self.output_dims}")
+from .einsum_specification import EinsumSpecification, einsum_variants
 
 
 def make_einsum(specification: EinsumSpecification):
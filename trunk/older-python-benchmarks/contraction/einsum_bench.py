@@ -0,0 +1,129 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# This file benchmarks einsum specifications, e.g. the two contractions of
+# attention, and optionally searches their iteration domain orderings and
+# operand layouts.
+
+import argparse
+import sys
+
+from mlir.sandbox.experts import *
+from mlir.sandbox.harness import *
+from mlir.sandbox.transforms import *
+
+from .definitions import *
+
+import typing as tp
+
+fun_name = 'einsum'
+op_name = 'linalg.generic'
+
+################################################################################
+# Compilation strategies.
+################################################################################
+
+all_names = [ \
+  "Tile3DPeel",
+            ]
+
+
+def all_experts(fun_name: str, rank: int):
+  """Tile the three innermost dimensions of the iteration domain, the others
+  by 1, and vectorize."""
+  return [
+      Tile(fun_name,
+           op_name,
+           tile_sizes=[1] * (rank - 3) + [8, 16, 8][-rank:],
+           peel=list(range(rank)))
+      .then(Vectorize(fun_name, ''))
+      .then(LoweringOnlyExpert('', '', transpose_lowering='shuffle'))
+  ]
+
+
+################################################################################
+# Problem instantiation
+################################################################################
+
+
+def variant_function_name(spec: str, domain: str) -> str:
+  """Returns a function name unique to the variant, e.g.
+  `einsum_bhqd_bhkd_to_bhqk_bhqkd`."""
+  return '_'.join([
+      fun_name,
+      spec.replace(',', '_').replace('->', '_to_').rstrip('_'), domain
+  ])
+
+
+def print_best_variants(measurements: Measurements, spec: str):
+  """Prints the variants of `spec` by decreasing p50 GFlop/s, per problem
+  size."""
+  gflop_per_s = {}
+  for row in measurements.rows:
+    key = (row['runtime_problem_sizes_dict'], row['function_name'])
+    gflop_per_s.setdefault(key, []).append(row['gflop_per_s_per_iter'])
+  p50s = {key: float(np.median(values)) for key, values in gflop_per_s.items()}
+  for sizes in sorted(set(sizes for sizes, _ in p50s)):
+    print(f'\nVariants of {spec} on {sizes} by p50 GFlop/s:')
+    ranking = sorted(
+        [(p50, name) for (s, name), p50 in p50s.items() if s == sizes],
+        reverse=True)
+    for p50, name in ranking:
+      print(f'{name:>48s} {p50:12.2f}')
+    print(f'Best variant: {ranking[0][1]}')
+
+
+# CHECK-NOT: FAILURE
+def main():
+  # Specify default configuration and parse command line.
+  parser = argparse.ArgumentParser(description='einsum benchmark')
+  add_argparser_arguments(
+      parser,
+      benchmark_name='einsum benchmark',
+      default_n_iters=100,
+      # Sizes of the dimensions of the specifications in alphabetical order.
+      #  b  d  h    k    q
+      default_problem_sizes_list=[
+          [1, 64, 8, 128, 128],
+          [2, 64, 12, 384, 384],
+      ],
+      default_expert_list=all_names,
+      default_dynamic_at_compile_time_list=[],
+      default_spec_list=[
+          'bhqd,bhkd->bhqk',  # Attention scores Q.K^T.
+          'bhqk,bhkd->bhqd',  # Attention output S.V.
+      ])
+  parser.add_argument('--search',
+                      action='store_true',
+                      help='search the domain orderings and operand layouts')
+  parser.add_argument('--max_variants',
+                      type=int,
+                      default=32,
+                      help='number of variants searched per specification')
+  args = parser.parse_args(sys.argv[1:])
+
+  for spec in args.spec_list:
+    variants = einsum_variants(spec, args.max_variants) \
+        if args.search else [(spec, None)]
+    keys = sorted(EinsumProblem(spec).keys)
+    measurements = Measurements()
+    for variant_spec, domain in variants:
+      problem = EinsumProblem(variant_spec, domain)
+      function_name = variant_function_name(
+          variant_spec, ''.join(problem.specification.domain_dims))
+      variant_measurements = test_harness(
+          lambda s, t: EinsumProblem(variant_spec, domain), [[np.float32] * 3],
+          test_sizes(keys, args.problem_sizes_list),
+          test_experts(
+              all_experts(function_name,
+                          len(problem.specification.domain_dims)), all_names,
+              args.expert_list),
+          n_iters=args.n_iters,
+          function_name=function_name,
+          dump_data_to_file=args.dump_data,
+          zero_at_each_iteration=True)
+      measurements.rows += variant_measurements.rows
+    print_best_variants(measurements, spec)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,180 @@
+"""Einsum specifications and their variants, without MLIR."""
+
+import math
+import random
+
+from typing import List, Optional, Tuple
+
+
+class EinsumSpecification:
+  """Structured representation of a string einsum specification."""
+
+  def __init__(self, specification: str, domain: Optional[str] = None):
+    """Creates a specification given its string format.
+
+    Without `domain`, the iteration domain lists the output dimensions followed
+    by the reduction dimensions.
+    """
+    # Split out the operands and the result part of the specification.
+    specification_split = specification.split("->")
+    assert len(specification_split
+              ) <= 2, "Expected at most one '->' in the specification."
+    operands = specification_split[0]
+    result = specification_split[1] if len(specification_split) > 1 else None
+
+    # Split the operands.
+    operands_split = operands.split(",")
+    assert len(
+        operands_split
+    ) <= 2, "Expected at most two comma-separated operands in the specification."
+
+    # Verify the operands contain no duplicates and are all lower case.
+    operand_dims = [None, None]
+    for idx, dims in enumerate(operands_split):
+      dims.strip()
+      assert len(set(dims)) == len(dims), str.format(
+        f"Unexpected duplicate symbol in operand {idx}.")
+      assert dims.islower(), str.format(
+        f"Expected only lowercase symbols in operand {idx}.")
+      operand_dims[idx] = dims
+    lhs_dims, rhs_dims = operand_dims[0], operand_dims[1]
+
+    # Infer the output dimensions for two-operand specifications. The output
+    # dimensions are the symbols unique to lhs and rhs, in alphabetical order.
+    inferred_output_dims = None
+    if rhs_dims is not None:
+      reduction_dims = set(lhs_dims).intersection(rhs_dims)
+      all_dims = set(lhs_dims).union(rhs_dims)
+      inferred_output_dims = sorted(all_dims.difference(reduction_dims))
+
+    # Use the inferred output specification if there is no user-specified one.
+    # A user-specified output may keep dimensions of both operands, which are
+    # batch dimensions, e.g. `b` and `h` in `bhqd,bhkd->bhqk`, and drop
+    # dimensions of a single operand, which are reduced, e.g. `c` in
+    # `ab,bc->a`.
+    if result is not None:
+      result = result.strip()
+      output_dims = result
+      if len(set(output_dims)) != len(output_dims):
+        raise NotImplementedError("Repeated output dimensions.")
+      if inferred_output_dims is not None:
+        assert set(result).issubset(all_dims), str.format(
+            f"Expected output to contain operand dimensions {sorted(all_dims)} "
+            f"only.")
+    else:
+      assert inferred_output_dims is not None, "Expected output specification."
+      output_dims = "".join(inferred_output_dims)
+
+    # Use the specified iteration domain or the output dimensions followed by
+    # the reduction dimensions.
+    if domain is None:
+      domain = output_dims + "".join(
+          sorted(set(lhs_dims + (rhs_dims or "")).difference(output_dims),
+                 key=(lhs_dims + (rhs_dims or "")).index))
+    domain_dims = [dim for dim in domain]
+    spec_dims = set(lhs_dims + (rhs_dims or "") + output_dims)
+    assert set(domain_dims) == spec_dims, str.format(
+      f"Expected domain dimensions to match specification {spec_dims}")
+
+    self.__lhs_dims = lhs_dims
+    self.__rhs_dims = rhs_dims
+    self.__output_dims = output_dims
+    self.__domain_dims = domain_dims
+
+  @property
+  def lhs_dims(self):
+    """Dimensions of the LHS operand, as string and in order."""
+    return self.__lhs_dims
+
+  @property
+  def rhs_dims(self):
+    """Dimensions of the RHS operand, as string and in order, or None."""
+    return self.__rhs_dims
+
+  @property
+  def output_dims(self):
+    """Dimensions of the output tensors, as string and in order."""
+    return self.__output_dims
+
+  @property
+  def domain_dims(self):
+    """Dimensions of the iteration domain, as string and in order."""
+    return self.__domain_dims
+
+  @property
+  def reduction_dims(self):
+    """Reduction dimensions, the operand dimensions missing from the output, as
+    string and in order of LHS and RHS operands."""
+    operand_dims = self.lhs_dims + "".join(
+        d for d in self.rhs_dims or "" if d not in self.lhs_dims)
+    return "".join([d for d in operand_dims if d not in self.output_dims])
+
+  @property
+  def batch_dims(self):
+    """Dimensions of the LHS, RHS and output tensors, as string and in order of
+    the output."""
+    if self.rhs_dims is None:
+      return ""
+    return "".join([
+        d for d in self.output_dims if d in self.lhs_dims and d in self.rhs_dims
+    ])
+
+  @property
+  def flop_count_per_iter(self):
+    """Floating-point operations executed per point of the iteration domain:
+    a multiplication of the operands, if two, and an addition, if reducing."""
+    return int(self.rhs_dims is not None) + int(bool(self.reduction_dims))
+
+  def __str__(self):
+    """String representation of einsum."""
+    operand_dims = [d for d in [self.lhs_dims, self.rhs_dims] if d is not None]
+    return format(f"{','.join(operand_dims)}->{self.output_dims}")
+
+
+def _nth_permutation(dims: str, n: int) -> str:
+  """Return the `n`-th permutation of `dims` in lexicographic order of the
+  positions."""
+  dims, permutation = list(dims), ""
+  for i in range(len(dims), 0, -1):
+    index, n = divmod(n, math.factorial(i - 1))
+    permutation += dims.pop(index)
+  return permutation
+
+
+def einsum_variants(specification: str,
+                    max_variants: Optional[int] = None,
+                    permute_domain: bool = True,
+                    permute_layouts: bool = True) -> List[Tuple[str, str]]:
+  """Return `(specification, domain)` pairs computing `specification`.
+
+  The variants permute the iteration domain and transpose the operands, the
+  output keeps its layout. The first variant is `specification` with its
+  default domain, the others are sampled, with a fixed seed, when there are
+  more than `max_variants` variants.
+  """
+  einsum = EinsumSpecification(specification)
+  operands = [einsum.lhs_dims] + \
+      ([einsum.rhs_dims] if einsum.rhs_dims is not None else [])
+  permuted = [d for d, permute in zip(
+      operands + ["".join(einsum.domain_dims)],
+      [permute_layouts] * len(operands) + [permute_domain]) if permute]
+  counts = [math.factorial(len(d)) for d in permuted]
+  total = math.prod(counts)
+  if max_variants is None or total <= max_variants:
+    indices = range(total)
+  else:
+    indices = [0] + sorted(
+        random.Random(0).sample(range(1, total), max_variants - 1))
+
+  variants = []
+  for index in indices:
+    permutations = []
+    for dims, count in zip(reversed(permuted), reversed(counts)):
+      index, n = divmod(index, count)
+      permutations.insert(0, _nth_permutation(dims, n))
+    layouts = permutations[:len(operands)] if permute_layouts else operands
+    domain = permutations[-1] if permute_domain else "".join(
+        einsum.domain_dims)
+    variants.append(
+        (",".join(layouts) + "->" + einsum.output_dims, domain))
+  return variants
@@ -0,0 +1,59 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# Check the einsum specifications and their variants against np.einsum. This
+# only needs NumPy.
+
+from typing import Mapping
+
+import numpy as np
+
+from .einsum_specification import *
+
+
+def check_variants(specification: str, sizes: Mapping[str, int],
+                   max_variants: int):
+  """Check the variants of `specification` compute it with np.einsum, once
+  their operands are transposed, and keep its dimensions and flop count."""
+  einsum = EinsumSpecification(specification)
+  operands = [einsum.lhs_dims] + \
+      ([einsum.rhs_dims] if einsum.rhs_dims is not None else [])
+  rng = np.random.default_rng(0)
+  args = [rng.standard_normal([sizes[d] for d in dims]) for dims in operands]
+  expected = np.einsum(str(einsum), *args)
+  variants = einsum_variants(specification, max_variants=max_variants)
+  assert len(variants) == max_variants
+  assert variants[0] == (str(einsum), "".join(einsum.domain_dims))
+  for spec, domain in variants:
+    variant = EinsumSpecification(spec, domain)
+    assert variant.output_dims == einsum.output_dims
+    assert set(variant.reduction_dims) == set(einsum.reduction_dims)
+    assert variant.batch_dims == einsum.batch_dims
+    assert variant.flop_count_per_iter == einsum.flop_count_per_iter
+    layouts = [variant.lhs_dims, variant.rhs_dims]
+    transposed = [
+        np.einsum(f"{dims}->{layout}", arg)
+        for dims, layout, arg in zip(operands, layouts, args)
+    ]
+    np.testing.assert_allclose(np.einsum(spec, *transposed),
+                               expected,
+                               rtol=1e-12)
+
+
+def main():
+  attention = EinsumSpecification('bhqd,bhkd->bhqk')
+  assert attention.batch_dims == 'bh' and attention.reduction_dims == 'd'
+  assert attention.flop_count_per_iter == 2
+  # Dimensions of a single operand missing from the output are reduced too.
+  rhs_reduction = EinsumSpecification('ab,bc->a')
+  assert rhs_reduction.reduction_dims == 'bc'
+  assert rhs_reduction.domain_dims == ['a', 'b', 'c']
+  assert EinsumSpecification('nk->').flop_count_per_iter == 1
+  assert EinsumSpecification('nk->kn').flop_count_per_iter == 0
+  sizes = {"b": 2, "h": 3, "q": 4, "k": 5, "d": 6, "a": 3, "c": 4}
+  check_variants('bhqd,bhkd->bhqk', sizes, max_variants=32)
+  check_variants('bhqk,bhkd->bhqd', sizes, max_variants=32)
+  check_variants('ab,bc->a', sizes, max_variants=16)
+
+
+if __name__ == "__main__":
+  main()
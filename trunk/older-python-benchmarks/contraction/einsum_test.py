@@ -23,6 +23,31 @@ def main():
                n_iters=1,
                function_name='einsum')
 
+  # Test batched problem with the flop count derived from the specification.
+  test_harness(lambda sizes, types: EinsumProblem('bhqd,bhkd->bhqk'),
+               [[np.float32] * 3], [{
+                   "b": 2,
+                   "h": 3,
+                   "q": 10,
+                   "k": 12,
+                   "d": 8
+               }], [LoweringOnlyExpert('einsum', 'linalg.generic')],
+               n_iters=1,
+               function_name='einsum')
+
+  # Test the variants of a batched problem, transposing its operands.
+  for spec, domain in einsum_variants('bhqd,bhkd->bhqk', max_variants=4):
+    test_harness(lambda sizes, types: EinsumProblem(spec, domain),
+                 [[np.float32] * 3], [{
+                     "b": 2,
+                     "h": 3,
+                     "q": 10,
+                     "k": 12,
+                     "d": 8
+                 }], [LoweringOnlyExpert('einsum', 'linalg.generic')],
+                 n_iters=1,
+                 function_name='einsum')
+
   # Test one-operand problem with scalar output.
   test_harness(lambda sizes, types: EinsumProblem('nk->', 'nk', 1),
                [[np.float32] * 3], [{
@@ -0,0 +1,144 @@
+"""NumPy formulations of the convolution algorithms of `definitions`.
+
+Besides the direct linalg convolution, a convolution can be computed by:
+  - im2col: copy the input windows to a [N * OW, KW * C] matrix and multiply
+    it by the [KW * C, F] kernel matrix (any rank, channels-last formats);
+  - Winograd F(m, 3): transform 3x3 kernels and (m + 2)x(m + 2) input tiles,
+    multiply them channel-wise and transform back mxm output tiles (2-D, unit
+    strides and dilations).
+
+FFT convolutions are out of scope: linalg has no FFT op, and the DFT as
+contractions with dense matrices costs O(L) flops per point of length L,
+more than the direct convolution for any kernel size.
+
+Every function below mirrors, stage by stage, the linalg ops the problem
+definitions build, so that the transform matrices and the stages are checked
+without compiling. The `*_stages` functions describe the same ops: the
+iteration domain size of every op with its flops per point, n - 1
+multiplications and one accumulation for a product of n operands and none for
+a copy, and the shapes of the intermediate tensors, each one written and then
+read once. The problem definitions count the bytes of the intermediate
+tensors, but report the flops of the direct convolution.
+"""
+
+import itertools
+
+from typing import Any, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+# (domain size, flops per point) of an op.
+Stage = Tuple[int, int]
+
+# Winograd F(m, 3) matrices (A^T, G, B^T) of Lavin and Gray, "Fast Algorithms
+# for Convolutional Neural Networks", 2016.
+_winograd_matrices = {
+    2: ([[1, 1, 1, 0], [0, 1, -1, -1]], [[1, 0, 0], [1 / 2, 1 / 2, 1 / 2],
+                                          [1 / 2, -1 / 2, 1 / 2], [0, 0, 1]],
+        [[1, 0, -1, 0], [0, 1, 1, 0], [0, -1, 1, 0], [0, 1, 0, -1]]),
+    4: ([[1, 1, 1, 1, 1, 0], [0, 1, -1, 2, -2, 0], [0, 1, 1, 4, 4, 0],
+         [0, 1, -1, 8, -8, 1]], [[1 / 4, 0, 0], [-1 / 6, -1 / 6, -1 / 6],
+                                 [-1 / 6, 1 / 6, -1 / 6],
+                                 [1 / 24, 1 / 12, 1 / 6],
+                                 [1 / 24, -1 / 12, 1 / 6], [0, 0, 1]],
+        [[4, 0, -5, 0, 1, 0], [0, -4, -4, 1, 1, 0], [0, 4, -4, -1, 1, 0],
+         [0, -2, -1, 2, 1, 0], [0, 2, -1, -2, 1, 0], [0, 4, 0, -5, 0, 1]]),
+}
+
+
+def winograd_matrices(m: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """Return the A^T, G and B^T matrices of Winograd F(m, 3)."""
+  assert m in _winograd_matrices, \
+      f'unsupported Winograd F({m}, 3), expected m in {list(_winograd_matrices)}'
+  return tuple(np.array(matrix, dtype=np.float64)
+               for matrix in _winograd_matrices[m])
+
+
+def im2col_np(I: np.ndarray, kernel_sizes: Sequence[int],
+              strides: Sequence[int],
+              dilations: Sequence[int]) -> np.ndarray:
+  """Return the [N, O..., K..., C] windows of a channels-last input."""
+  rank = len(kernel_sizes)
+  output_sizes = [(i - (k - 1) * d - 1) // s + 1 for i, k, s, d in zip(
+      I.shape[1:1 + rank], kernel_sizes, strides, dilations)]
+  col = np.zeros([I.shape[0]] + output_sizes + list(kernel_sizes) +
+                 [I.shape[-1]],
+                 dtype=I.dtype)
+  for ks in itertools.product(*map(range, kernel_sizes)):
+    window = tuple(
+        slice(k * d, k * d + (o - 1) * s + 1, s)
+        for k, o, s, d in zip(ks, output_sizes, strides, dilations))
+    col[(slice(None),) + (slice(None),) * rank + ks] = \
+        I[(slice(None),) + window]
+  return col
+
+
+def conv_im2col_np(I: np.ndarray, K: np.ndarray, strides: Sequence[int],
+                   dilations: Sequence[int]) -> np.ndarray:
+  """Channels-last convolution, e.g. NHWC x HWCF -> NHWF, by im2col and
+  matmul."""
+  rank = K.ndim - 2
+  col = im2col_np(I, K.shape[:rank], strides, dilations)
+  output_shape = list(col.shape[:1 + rank]) + [K.shape[-1]]
+  matrix = col.reshape(np.prod(output_shape[:-1]), -1)
+  return (matrix @ K.reshape(-1, K.shape[-1])).reshape(output_shape)
+
+
+def im2col_stages(
+    sizes: Mapping[str, Any],
+    rank: int) -> Tuple[List[Stage], List[List[int]]]:
+  """Return the stages and the intermediate tensors of im2col and matmul on
+  the channels-last problem `sizes`, e.g. N, H, W, C, KH, KW, F."""
+  dims = 'DHW'[-rank:]
+  output_points = sizes['N'] * np.prod([sizes[d] for d in dims])
+  window = sizes['C'] * np.prod([sizes['K' + d] for d in dims])
+  stages = [(output_points * window, 0),
+            (output_points * window * sizes['F'], 2)]
+  return stages, [[int(output_points), int(window)]]
+
+
+def conv_winograd_np(I: np.ndarray, K: np.ndarray, m: int) -> np.ndarray:
+  """NHWC x HWCF -> NHWF convolution by Winograd F(m, 3)."""
+  AT, G, BT = winograd_matrices(m)
+  alpha = m + 2
+  N, IH, IW, C = I.shape
+  TH, TW = (IH - 2) // m, (IW - 2) // m
+  # Kernel transform: [alpha, alpha, C, F].
+  U = np.einsum('ak,klcf,bl->abcf', G, K, G)
+  # Input transform of the overlapping tiles: [alpha, alpha, N, TH, TW, C].
+  tiles = np.zeros([N, TH, TW, alpha, alpha, C])
+  for th, tw in itertools.product(range(TH), range(TW)):
+    tiles[:, th, tw] = I[:, th * m:th * m + alpha, tw * m:tw * m + alpha, :]
+  V = np.einsum('ai,nhwijc,bj->abnhwc', BT, tiles, BT)
+  # Channel-wise products: [alpha, alpha, N, TH, TW, F].
+  M = np.einsum('abnhwc,abcf->abnhwf', V, U)
+  # Output transform: [N, TH, m, TW, m, F] -> [N, H, W, F].
+  O = np.einsum('ia,abnhwf,jb->nhiwjf', AT, M, AT)
+  return O.reshape(N, TH * m, TW * m, -1)
+
+
+def winograd_stages(sizes: Mapping[str, Any],
+                    m: int) -> Tuple[List[Stage], List[List[int]]]:
+  """Return the stages and the intermediate tensors of Winograd F(m, 3) on
+  the NHWC x HWCF problem `sizes`."""
+  alpha = m + 2
+  N, C, F = sizes['N'], sizes['C'], sizes['F']
+  tiles = N * (sizes['H'] // m) * (sizes['W'] // m)
+  stages = [
+      (alpha * alpha * C * F * sizes['KH'] * sizes['KW'], 3),
+      (alpha * alpha * tiles * C * alpha * alpha, 3),
+      (alpha * alpha * tiles * F * C, 2),
+      (tiles * m * m * F * alpha * alpha, 3),
+  ]
+  intermediates = [[alpha, alpha, C, F], [alpha, alpha, tiles, C],
+                   [alpha, alpha, tiles, F]]
+  return stages, intermediates
+
+
+def stages_gflops(stages: Sequence[Stage]) -> float:
+  return sum(points * flops for points, flops in stages) / 1.e9
+
+
+def intermediates_gbytes(intermediates: Sequence[Sequence[int]],
+                         itemsize: int) -> float:
+  return sum(2 * np.prod(shape) * itemsize for shape in intermediates) / 1.e9
@@ -0,0 +1,60 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# Check the NumPy formulations of the convolution algorithms against the direct
+# convolution. This only needs NumPy.
+
+import itertools
+
+import numpy as np
+
+from .algorithms import *
+
+
+def conv_direct_np(I: np.ndarray, K: np.ndarray, strides, dilations):
+  """Channels-last 2-D convolution, NHWC x HWCF -> NHWF, one kernel point at a
+  time."""
+  KH, KW, _, F = K.shape
+  (SH, SW), (DH, DW) = strides, dilations
+  OH = (I.shape[1] - (KH - 1) * DH - 1) // SH + 1
+  OW = (I.shape[2] - (KW - 1) * DW - 1) // SW + 1
+  O = np.zeros([I.shape[0], OH, OW, F])
+  for kh, kw in itertools.product(range(KH), range(KW)):
+    window = I[:, kh * DH:kh * DH + (OH - 1) * SH + 1:SH,
+               kw * DW:kw * DW + (OW - 1) * SW + 1:SW, :]
+    O += np.einsum('nhwc,cf->nhwf', window, K[kh, kw])
+  return O
+
+
+def direct_gflops(sizes):
+  return 2 * np.prod([sizes[k] for k in 'N H W C KH KW F'.split()]) / 1.e9
+
+
+def main():
+  rng = np.random.default_rng(0)
+
+  # im2col, any strides and dilations.
+  for strides, dilations in [([1, 1], [1, 1]), ([2, 1], [1, 2])]:
+    I = rng.standard_normal([2, 11, 13, 3])
+    K = rng.standard_normal([3, 2, 3, 5])
+    np.testing.assert_allclose(conv_im2col_np(I, K, strides, dilations),
+                               conv_direct_np(I, K, strides, dilations),
+                               rtol=1e-10,
+                               atol=1e-10)
+
+  # Winograd F(m, 3), the input covers a whole number of output tiles.
+  for m in [2, 4]:
+    I = rng.standard_normal([2, 3 * m + 2, 2 * m + 2, 3])
+    K = rng.standard_normal([3, 3, 3, 5])
+    np.testing.assert_allclose(conv_winograd_np(I, K, m),
+                               conv_direct_np(I, K, [1, 1], [1, 1]),
+                               rtol=1e-10,
+                               atol=1e-10)
+
+  # im2col executes the multiply-adds of the direct convolution.
+  for KH in [3, 9]:
+    sizes = dict(N=1, H=16, W=16, C=16, KH=KH, KW=KH, F=16)
+    assert stages_gflops(im2col_stages(sizes, 2)[0]) == direct_gflops(sizes)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,103 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# This file compares the direct, im2col and Winograd convolutions. Every
+# algorithm reports the GFlop count of the direct convolution, their GFlop/s
+# are effective throughputs that compare across algorithms.
+
+from mlir.sandbox.experts import *
+from mlir.sandbox.harness import *
+from mlir.sandbox.transforms import *
+
+from .definitions import *
+
+import typing as tp
+
+fun_name = 'conv_2d_nhwc_hwcf_main'
+op_name = 'linalg.conv_2d_nhwc_hwcf'
+
+################################################################################
+# Compilation strategies.
+################################################################################
+
+
+def algorithm_experts(algorithm: str) -> tp.Dict[str, TransformationList]:
+  """Returns the experts of the convolution computed by `algorithm`.
+
+  The direct convolution uses the tiling of conv_2d_bench and im2col tiles and
+  vectorizes its matmul. The Winograd ops are only lowered to loops until they
+  get dedicated strategies.
+  """
+  function_name = f'{fun_name}_{algorithm}'
+  if algorithm == 'direct':
+    return {
+        'SingleTiling3DPeel':
+            Tile(fun_name=function_name,
+                 op_name=op_name,
+                 #           N  H  W  C  KH  KW  F
+                 tile_sizes=[1, 1, 8, 32, 1, 1, 8],
+                 peel=[0, 1, 2, 3, 4, 5, 6])
+            .then(DecomposeToLowerDimensionalNamedOp())
+            .then(Vectorize(function_name, ''))
+            .then(LoweringOnlyExpert('', '', transpose_lowering='shuffle'))
+    }
+  if algorithm == 'im2col':
+    return {
+        'MatmulTiling3DPeel':
+            Tile(function_name,
+                 'linalg.matmul',
+                 tile_sizes=[8, 32, 16],
+                 peel=[0, 1, 2])
+            .then(Vectorize(function_name, 'linalg.matmul'))
+            .then(LoweringOnlyExpert('', '', transpose_lowering='shuffle'))
+    }
+  return {'Loops': LoweringOnlyExpert('', '')}
+
+
+################################################################################
+# Problem instantiation
+################################################################################
+
+keys = ['N', 'H', 'W', 'C', 'KH', 'KW', 'F', 'strides', 'dilations']
+
+
+# CHECK-NOT: FAILURE
+def main():
+  # Specify default configuration and parse command line.
+  args = test_argparser(
+      "conv 2d algorithms benchmark",
+      default_n_iters=100,
+      #  N   H   W   C  KH  KW   F     st      dil
+      default_problem_sizes_list=[
+          [8, 16, 16, 32, 3, 3, 64, [1, 1], [1, 1]],
+          [8, 16, 16, 32, 3, 3, 64, [2, 2], [2, 2]],
+      ],
+      default_expert_list=[],
+      default_dynamic_at_compile_time_list=[ \
+        []  # case 1: static at compile time
+      ],
+      default_spec_list=[])
+
+  for algorithm in algorithms:
+    sizes = [
+        s for s in test_sizes(keys, args.problem_sizes_list)
+        if algorithm_supports(algorithm, s)
+    ]
+    if not sizes:
+      continue
+    experts = algorithm_experts(algorithm)
+    test_harness(lambda sizes, types: make_convolution_problem(
+        algorithm,
+        'NHWC',
+        'HWCF',
+        strides=sizes['strides'],
+        dilations=sizes['dilations']), [[np.float32] * 3],
+                 sizes,
+                 test_experts(list(experts.values()), list(experts.keys()),
+                              args.expert_list),
+                 n_iters=args.n_iters,
+                 function_name=f'{fun_name}_{algorithm}',
+                 dump_data_to_file=args.dump_data)
+
+
+if __name__ == '__main__':
+  main()
@@ -12,6 +12,8 @@ from mlir.sandbox.problem_definition import *
 from mlir.sandbox.utils import *
 
 from . import ops
+from .algorithms import (im2col_stages, intermediates_gbytes,
+                         winograd_matrices, winograd_stages)
 
 # TODO: Orthogonal configuration object.
 avx512 = True
@@ -120,6 +122,30 @@ class ConvolutionProblem(ProblemDefinition):
     self.__kernel_format = kernel_format
     self.__op_builder = ops.__dict__[name]
 
+  # Relative tolerance of `check_np`.
+  check_rtol = 1e-05
+
+  @classmethod
+  def supports(cls, sizes: Mapping[str, Any]) -> bool:
+    """Returns whether the algorithm computes the convolution of `sizes`."""
+    return True
+
+  @property
+  def input_format(self) -> str:
+    return self.__input_format
+
+  @property
+  def kernel_format(self) -> str:
+    return self.__kernel_format
+
+  @property
+  def strides(self) -> List[int]:
+    return self.__strides
+
+  @property
+  def dilations(self) -> List[int]:
+    return self.__dilations
+
   @property
   def keys(self) -> List[str]:
     """Returns the list of parameter keys for the current problem definition."""
@@ -362,7 +388,7 @@ class ConvolutionProblem(ProblemDefinition):
                                   axes=([input_parallel_dim],
                                         [kernel_parallel_dim]))
 
-    if not np.allclose(O, reference_O):
+    if not np.allclose(O, reference_O, rtol=self.check_rtol):
       delta = O - reference_O
       max_abs_delta = max(delta.max(), delta.min(), key=abs)
       raise ValueError(f"max_abs_delta: {max_abs_delta} -> FAILURE ")
@@ -400,11 +426,219 @@ class ConvolutionProblem(ProblemDefinition):
       if zero_at_each_iteration:
         zero = arith.ConstantOp(output_type.element_type, 0.0)
         tensor_zero = linalg.fill(zero, outs=[tensor_zero])
-      conv = self.__op_builder(bench.arguments[0],
-                               bench.arguments[1],
-                               outs=[tensor_zero],
-                               strides=self.__strides,
-                               dilations=self.__dilations)
+      conv = self._build_convolution(bench.arguments[0], bench.arguments[1],
+                                     tensor_zero)
       func.ReturnOp([conv])
 
     return bench
+
+  def _build_convolution(self, input: Value, kernel: Value,
+                         output: Value) -> Value:
+    """Constructs the ops accumulating the convolution of `input` and `kernel`
+    into `output` and returns the result."""
+    return self.__op_builder(input,
+                             kernel,
+                             outs=[output],
+                             strides=self.__strides,
+                             dilations=self.__dilations)
+
+
+################################################################################
+# Alternative convolution algorithms, see algorithms.py.
+################################################################################
+
+
+def _shape(value: Value) -> List[int]:
+  return ShapedType(value.type).shape
+
+
+def _element_type(value: Value) -> Type:
+  return ShapedType(value.type).element_type
+
+
+def _reassociation(groups: Sequence[Sequence[int]]) -> ArrayAttr:
+  i64_type = IntegerType.get_signless(64)
+  return ArrayAttr.get([
+      ArrayAttr.get([IntegerAttr.get(i64_type, d) for d in group])
+      for group in groups
+  ])
+
+
+def _collapse_shape(value: Value, groups: Sequence[Sequence[int]]) -> Value:
+  shape = _shape(value)
+  result_type = RankedTensorType.get(
+      [int(np.prod([shape[d] for d in group])) for group in groups],
+      _element_type(value))
+  return tensor.CollapseShapeOp(result_type, value,
+                                _reassociation(groups)).result
+
+
+def _expand_shape(value: Value, groups: Sequence[Sequence[int]],
+                  shape: Sequence[int]) -> Value:
+  result_type = RankedTensorType.get(shape, _element_type(value))
+  return tensor.ExpandShapeOp(result_type, value,
+                              _reassociation(groups)).result
+
+
+def _zeros(shape: Sequence[int], element_type: Type) -> Value:
+  init = linalg.InitTensorOp(shape, element_type)
+  zero = arith.ConstantOp(element_type, 0.0)
+  return linalg.fill(zero, outs=[init.result])
+
+
+def _constant(array: np.ndarray, element_type: Type) -> Value:
+  np_type = np.float64 if F64Type.isinstance(element_type) else np.float32
+  return arith.ConstantOp(
+      RankedTensorType.get(array.shape, element_type),
+      DenseElementsAttr.get(array.astype(np_type))).result
+
+
+# The algorithms inherit the GFlop count of the direct convolution: their
+# GFlop/s are effective throughputs, comparable across algorithms. Their GByte
+# counts add their intermediate tensors.
+
+
+class Im2colConvolutionProblem(ConvolutionProblem):
+  """Convolution computed by copying the input windows to a matrix (im2col)
+  and multiplying it by the kernel matrix with linalg.matmul.
+
+  Supports the channels-last formats NWC/WCF, NHWC/HWCF and NDHWC/DHWCF with
+  any strides and dilations.
+  """
+
+  def __init__(self, input_format: str, kernel_format: str,
+               strides: Optional[List[int]], dilations: Optional[List[int]]):
+    super().__init__(input_format, kernel_format, strides, dilations)
+    rank = len(input_format) - 2
+    assert input_format == "N" + RANK_RELATED_DIMS[-rank:] + "C" and \
+        kernel_format == RANK_RELATED_DIMS[-rank:] + "CF", \
+        "im2col expects channels-last formats."
+    self.__rank = rank
+    self.__im2col_builder = ops.__dict__[
+        f"im2col_{rank}d_{input_format.lower()}"]
+
+  def gbyte_count_builder(self, sizes: Mapping[str, Any],
+                          types: Sequence[np.dtype]) -> float:
+    """Returns the GByte count of the convolution and of the im2col matrix,
+    written and read once."""
+    return super().gbyte_count_builder(sizes, types) + intermediates_gbytes(
+        im2col_stages(sizes, self.__rank)[1],
+        np.dtype(types[-1]).itemsize)
+
+  def _build_convolution(self, input: Value, kernel: Value,
+                         output: Value) -> Value:
+    rank = self.__rank
+    # [N, O..., K..., C] windows.
+    col = self.__im2col_builder(input,
+                                outs=[
+                                    linalg.InitTensorOp(
+                                        _shape(output)[:-1] +
+                                        _shape(kernel)[:-1],
+                                        _element_type(output)).result
+                                ],
+                                strides=self.strides,
+                                dilations=self.dilations)
+    rows, columns = list(range(rank + 1)), [rank + 1]
+    matmul = linalg.matmul(
+        _collapse_shape(col, [rows, list(range(rank + 1, 2 * rank + 2))]),
+        _collapse_shape(kernel, [list(range(rank + 1)), columns]),
+        outs=[_collapse_shape(output, [rows, columns])])
+    return _expand_shape(matmul, [rows, columns], _shape(output))
+
+
+class WinogradConvolutionProblem(ConvolutionProblem):
+  """NHWC/HWCF convolution of 3x3 kernels computed by Winograd F(m, 3).
+
+  The kernels and the (m + 2)x(m + 2) input tiles are transformed, multiplied
+  channel-wise and mxm output tiles are transformed back. Requires unit
+  strides and dilations and output sizes multiple of m. The transforms lose
+  precision with m, the results are checked with a larger tolerance.
+  """
+
+  check_rtol = 1e-03
+
+  def __init__(self, input_format: str, kernel_format: str,
+               strides: Optional[List[int]], dilations: Optional[List[int]],
+               m: int):
+    super().__init__(input_format, kernel_format, strides, dilations)
+    assert input_format == "NHWC" and kernel_format == "HWCF", \
+        "Winograd expects NHWC/HWCF formats."
+    assert all(s == 1 for s in self.strides + self.dilations), \
+        "Winograd expects unit strides and dilations."
+    self.__m = m
+    self.__matrices = winograd_matrices(m)
+
+  @classmethod
+  def supports_tile_size(cls, sizes: Mapping[str, Any], m: int) -> bool:
+    return sizes["KH"] == 3 and sizes["KW"] == 3 and \
+        sizes["H"] % m == 0 and sizes["W"] % m == 0 and \
+        all(s == 1 for s in list(sizes["strides"]) + list(sizes["dilations"]))
+
+  def shapes_builder(self, sizes: Mapping[str, Any]) -> List[List[int]]:
+    assert self.supports_tile_size(sizes, self.__m), \
+        f"Winograd F({self.__m}, 3) does not support {sizes}."
+    return super().shapes_builder(sizes)
+
+  def gbyte_count_builder(self, sizes: Mapping[str, Any],
+                          types: Sequence[np.dtype]) -> float:
+    """Returns the GByte count of the convolution and of the transformed
+    kernels, input tiles and products, written and read once."""
+    return super().gbyte_count_builder(sizes, types) + intermediates_gbytes(
+        winograd_stages(sizes, self.__m)[1],
+        np.dtype(types[-1]).itemsize)
+
+  def _build_convolution(self, input: Value, kernel: Value,
+                         output: Value) -> Value:
+    m, alpha = self.__m, self.__m + 2
+    element_type = _element_type(output)
+    AT, G, BT = [_constant(a, element_type) for a in self.__matrices]
+    N, H, W, F = _shape(output)
+    C = _shape(input)[-1]
+    TH, TW = H // m, W // m
+
+    U = ops.winograd_kernel_transform_2d_hwcf(
+        G, kernel, G, outs=[_zeros([alpha, alpha, C, F], element_type)])
+    V = ops.winograd_input_transform_2d_nhwc(
+        BT,
+        input,
+        BT,
+        outs=[_zeros([alpha, alpha, N, TH, TW, C], element_type)],
+        tile_sizes=[m, m])
+    M = ops.winograd_batch_matmul_2d(
+        V, U, outs=[_zeros([alpha, alpha, N, TH, TW, F], element_type)])
+    # Accumulate the output tiles into the output.
+    tiles = [[0], [1, 2], [3, 4], [5]]
+    O = ops.winograd_output_transform_2d_nhwf(
+        AT, M, AT, outs=[_expand_shape(output, tiles, [N, TH, m, TW, m, F])])
+    return _collapse_shape(O, tiles)
+
+
+def make_convolution_problem(algorithm: str, input_format: str,
+                             kernel_format: str, strides: Optional[List[int]],
+                             dilations: Optional[List[int]]):
+  """Returns the problem definition computing the convolution by `algorithm`,
+  one of `algorithms`."""
+  if algorithm.startswith("winograd_"):
+    return WinogradConvolutionProblem(input_format, kernel_format, strides,
+                                      dilations,
+                                      _winograd_tile_sizes[algorithm])
+  return algorithms[algorithm](input_format, kernel_format, strides,
+                               dilations)
+
+
+def algorithm_supports(algorithm: str, sizes: Mapping[str, Any]) -> bool:
+  """Returns whether `algorithm` computes the convolution of `sizes`."""
+  if algorithm.startswith("winograd_"):
+    return WinogradConvolutionProblem.supports_tile_size(
+        sizes, _winograd_tile_sizes[algorithm])
+  return algorithms[algorithm].supports(sizes)
+
+
+_winograd_tile_sizes = {"winograd_2x3": 2, "winograd_4x3": 4}
+
+algorithms = {
+    "direct": ConvolutionProblem,
+    "im2col": Im2colConvolutionProblem,
+    "winograd_2x3": WinogradConvolutionProblem,
+    "winograd_4x3": WinogradConvolutionProblem,
+}
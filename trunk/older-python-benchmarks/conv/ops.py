@@ -1658,3 +1658,94 @@ def conv_3d_dhwcn_dhwfc(
           U, I[D.od * S.SD + D.kd * S.DD, D.oh * S.SH + D.kh * S.DH,
                D.ow * S.SW + D.kw * S.DW, D.c, D.n]) *
       TypeFn.cast_signed(U, K[D.kd, D.kh, D.kw, D.f, D.c]))
+
+
+################################################################################
+# Stages of the alternative convolution algorithms, see algorithms.py.
+################################################################################
+
+
+@linalg_structured_op
+def im2col_1d_nwc(
+    I=TensorDef(TV.T1, S.N, S.OW * S.SW + S.KW * S.DW, S.C),
+    O=TensorDef(U, S.N, S.OW, S.KW, S.C, output=True),
+    strides=IndexAttrDef(S.SW, default=[1]),
+    dilations=IndexAttrDef(S.DW, default=[1])):
+  domain(D.n, D.ow, D.kw, D.c)
+  O[D.n, D.ow, D.kw, D.c] = TypeFn.cast_signed(
+      U, I[D.n, D.ow * S.SW + D.kw * S.DW, D.c])
+
+
+@linalg_structured_op
+def im2col_2d_nhwc(
+    I=TensorDef(TV.T1, S.N, S.OH * S.SH + S.KH * S.DH,
+                S.OW * S.SW + S.KW * S.DW, S.C),
+    O=TensorDef(U, S.N, S.OH, S.OW, S.KH, S.KW, S.C, output=True),
+    strides=IndexAttrDef(S.SH, S.SW, default=[1, 1]),
+    dilations=IndexAttrDef(S.DH, S.DW, default=[1, 1])):
+  domain(D.n, D.oh, D.ow, D.kh, D.kw, D.c)
+  O[D.n, D.oh, D.ow, D.kh, D.kw, D.c] = TypeFn.cast_signed(
+      U, I[D.n, D.oh * S.SH + D.kh * S.DH, D.ow * S.SW + D.kw * S.DW, D.c])
+
+
+@linalg_structured_op
+def im2col_3d_ndhwc(
+    I=TensorDef(TV.T1, S.N, S.OD * S.SD + S.KD * S.DD,
+                S.OH * S.SH + S.KH * S.DH, S.OW * S.SW + S.KW * S.DW, S.C),
+    O=TensorDef(U, S.N, S.OD, S.OH, S.OW, S.KD, S.KH, S.KW, S.C, output=True),
+    strides=IndexAttrDef(S.SD, S.SH, S.SW, default=[1, 1, 1]),
+    dilations=IndexAttrDef(S.DD, S.DH, S.DW, default=[1, 1, 1])):
+  domain(D.n, D.od, D.oh, D.ow, D.kd, D.kh, D.kw, D.c)
+  O[D.n, D.od, D.oh, D.ow, D.kd, D.kh, D.kw, D.c] = TypeFn.cast_signed(
+      U, I[D.n, D.od * S.SD + D.kd * S.DD, D.oh * S.SH + D.kh * S.DH,
+           D.ow * S.SW + D.kw * S.DW, D.c])
+
+
+@linalg_structured_op
+def winograd_kernel_transform_2d_hwcf(
+    G0=TensorDef(TV.T1, S.A, S.KH),
+    K=TensorDef(TV.T2, S.KH, S.KW, S.C, S.F),
+    G1=TensorDef(TV.T1, S.B, S.KW),
+    O=TensorDef(U, S.A, S.B, S.C, S.F, output=True)):
+  domain(D.a, D.b, D.c, D.f, D.kh, D.kw)
+  O[D.a, D.b, D.c, D.f] += (TypeFn.cast_signed(U, G0[D.a, D.kh]) *
+                            TypeFn.cast_signed(U, K[D.kh, D.kw, D.c, D.f]) *
+                            TypeFn.cast_signed(U, G1[D.b, D.kw]))
+
+
+@linalg_structured_op
+def winograd_input_transform_2d_nhwc(
+    BT0=TensorDef(TV.T1, S.A, S.I),
+    I=TensorDef(TV.T2, S.N, S.IH, S.IW, S.C),
+    BT1=TensorDef(TV.T1, S.B, S.J),
+    O=TensorDef(U, S.A, S.B, S.N, S.TH, S.TW, S.C, output=True),
+    tile_sizes=IndexAttrDef(S.MH, S.MW, default=[2, 2])):
+  domain(D.a, D.b, D.n, D.th, D.tw, D.c, D.i, D.j)
+  O[D.a, D.b, D.n, D.th, D.tw, D.c] += (
+      TypeFn.cast_signed(U, BT0[D.a, D.i]) * TypeFn.cast_signed(
+          U, I[D.n, D.th * S.MH + D.i, D.tw * S.MW + D.j, D.c]) *
+      TypeFn.cast_signed(U, BT1[D.b, D.j]))
+
+
+@linalg_structured_op
+def winograd_batch_matmul_2d(
+    V=TensorDef(TV.T1, S.A, S.B, S.N, S.TH, S.TW, S.C),
+    UK=TensorDef(TV.T2, S.A, S.B, S.C, S.F),
+    O=TensorDef(U, S.A, S.B, S.N, S.TH, S.TW, S.F, output=True)):
+  domain(D.a, D.b, D.n, D.th, D.tw, D.f, D.c)
+  O[D.a, D.b, D.n, D.th, D.tw, D.f] += (
+      TypeFn.cast_signed(U, V[D.a, D.b, D.n, D.th, D.tw, D.c]) *
+      TypeFn.cast_signed(U, UK[D.a, D.b, D.c, D.f]))
+
+
+@linalg_structured_op
+def winograd_output_transform_2d_nhwf(
+    AT0=TensorDef(TV.T1, S.MH, S.A),
+    M=TensorDef(TV.T2, S.A, S.B, S.N, S.TH, S.TW, S.F),
+    AT1=TensorDef(TV.T1, S.MW, S.B),
+    O=TensorDef(U, S.N, S.TH, S.MH, S.TW, S.MW, S.F, output=True)):
+  domain(D.n, D.th, D.i, D.tw, D.j, D.f, D.a, D.b)
+  O[D.n, D.th, D.i, D.tw, D.j, D.f] += (
+      TypeFn.cast_signed(U, AT0[D.i, D.a]) *
+      TypeFn.cast_signed(U, M[D.a, D.b, D.n, D.th, D.tw, D.f]) *
+      TypeFn.cast_signed(U, AT1[D.j, D.b]))
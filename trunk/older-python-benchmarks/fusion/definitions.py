@@ -1,6 +1,6 @@
 import os, sys, time
 
-from typing import Any, List, Mapping, Optional, Sequence
+from typing import Any, List, Mapping, Optional, Sequence, Union
 
 import numpy as np
 
@@ -12,6 +12,11 @@ from mlir.sandbox.compilation import attach_inplaceable_attributes, attach_passt
 from mlir.sandbox.problem_definition import *
 from mlir.sandbox.utils import *
 
+from . import ops
+from .graphs import (Graph, evaluate, gbyte_count, gflop_count, graph_ops,
+                     graphs, infer_sizes, intermediates_gbyte_count,
+                     parse_graph, shapes, size_names)
+
 # TODO: Orthogonal configuration object.
 avx512 = True
 
@@ -257,3 +262,167 @@ class MatmulBiasAddProblem(ProblemDefinition):
       func.ReturnOp([bias_add])
 
     return bench
+
+
+################################################################################
+### Graphs of ops, see graphs.py.
+################################################################################
+
+
+class FusedGraphProblem(ProblemDefinition):
+  """ Problem definition for a graph of ops, e.g. `graphs["softmax"]`.
+
+  The function takes the inputs of the graph followed by its output, all of
+  the same element type. The GByte count credits fusion: the intermediate
+  tensors are not counted, see `intermediates_gbyte_count_builder`.
+  """
+
+  # Relative tolerance of `check_np`, the graphs chain several approximations.
+  check_rtol = 1e-04
+
+  def __init__(self, graph: Union[str, Graph]):
+    self.graph = parse_graph(graph) if isinstance(graph, str) else graph
+
+  @property
+  def keys(self) -> List[str]:
+    return size_names(self.graph)
+
+  def shapes_builder(self, sizes: Mapping[str, Any]) -> List[List[int]]:
+    """Shape builder function.
+
+    Given a mapping between dimension names / op attributes and their numeric
+    values, return the list of lists of shapes of the FuncOp operands. The
+    FuncOp is responsible for distinguishing between input operands and results.
+    """
+    value_shapes = shapes(self.graph, sizes)
+    return [
+        value_shapes[name]
+        for name in list(self.graph.inputs) + [self.graph.output]
+    ]
+
+  def gflop_count_builder(self, sizes: Mapping[str, Any]) -> float:
+    """GFlop builder function.
+
+    Given a mapping between dimension names / op attributes and their numeric
+    values, return the number of GFlops computed by all the ops.
+    """
+    return gflop_count(self.graph, sizes)
+
+  def gbyte_count_builder(self, sizes: Mapping[str, Any],
+                          types: Sequence[np.dtype]) -> float:
+    """GByte builder function.
+
+    Given a mapping between dimension names / op attributes and their numeric
+    values, and a list of data types, return the number of GBytes of the inputs
+    read and of the output written.
+    """
+    return gbyte_count(self.graph, sizes,
+                       [np.dtype(t).itemsize for t in types])
+
+  def intermediates_gbyte_count_builder(self, sizes: Mapping[str, Any],
+                                        types: Sequence[np.dtype]) -> float:
+    """Return the number of GBytes an unfused graph also reads and writes."""
+    return intermediates_gbyte_count(self.graph, sizes,
+                                     np.dtype(types[-1]).itemsize)
+
+  def tensors_np_builder(self, sizes: Mapping[str, Any],
+                         types: Sequence[np.dtype]) -> List[np.dtype]:
+    """NumPy tensors building function.
+
+    Given a mapping between dimension names / op attributes and their numeric
+    values, and a list of NumPy elemental types, return constructed NP values of
+    shapes given by `shape_builder` and specified elemental types.
+    """
+    shapes = self.shapes_builder(sizes)
+    tensors = [
+        realign(np.random.rand(*s).astype(t), byte_alignment=64)
+        for s, t in zip(shapes, types)
+    ]
+    tensors[len(tensors) - 1].fill(0.)
+    return tensors
+
+  def check_np(self, *tensors: np.dtype) -> None:
+    """NumPy checking function.
+
+    Given a list of NumPy values, check the precomputed results matches those of
+    the reference implementation of the graph.
+    """
+    res = evaluate(self.graph, dict(zip(self.graph.inputs,
+                                        tensors[:-1])))[self.graph.output]
+    if not np.allclose(tensors[-1], res, rtol=self.check_rtol):
+      delta = tensors[-1] - res
+      max_abs_delta = max(delta.max(), delta.min(), key=abs)
+      raise Exception(f"max_abs_delta: {max_abs_delta} -> FAILURE ")
+
+  def types_mlir_builder(self, sizes: Mapping[str, Any],
+                         types: Sequence[Type]) -> List[Type]:
+    """MLIR types builder.
+
+    Given a mapping between dimension names / op attributes and their numeric
+    values, and a list of elemental MLIR types, return MLIR tensor types of the
+    shape expected by the function.
+    """
+    shapes = self.shapes_builder(sizes)
+    return [RankedTensorType.get(s, t) for s, t in zip(shapes, types)]
+
+  def build_problem_under_context_manager(
+      self, name: str, types: Sequence[Type],
+      zero_at_each_iteration: bool) -> func.FuncOp:
+    """MLIR problem builder.
+
+    Given a list of MLIR shaped types, build and return the MLIR FuncOp that
+    implements the desired computation on those types.
+    """
+    global avx512
+
+    # Actual benchmarked function called under entry_point_name.
+    bench = func.FuncOp(name, (types, [types[-1]]))
+    # TODO: need something much more flexible to add function argument attributes.
+    attach_inplaceable_attributes(bench,
+                                  inplaceable=[False] * (len(types) - 1) +
+                                  [True])
+    attach_passthrough(
+        bench, [StringAttr.get(os.getenv('SANDBOX_INLINING', 'noinline'))],
+        avx512=avx512)
+
+    element_type = types[-1].element_type
+    value_shapes = shapes(
+        self.graph,
+        infer_sizes(self.graph, [ShapedType(t).shape for t in types[:-1]]))
+    with InsertionPoint(bench.add_entry_block()):
+      values = dict(zip(self.graph.inputs, bench.arguments))
+      for node in self.graph.nodes:
+        if node is self.graph.nodes[-1]:
+          output = bench.arguments[-1]
+        else:
+          output = linalg.InitTensorOp(value_shapes[node.name],
+                                       element_type).result
+        init = graph_ops[node.op].init
+        if init is not None:
+          value = 0.0 if init == "zero" else float("-inf")
+          output = linalg.fill(arith.ConstantOp(element_type, value),
+                               outs=[output])
+        values[node.name] = _build_graph_op(
+            node.op, [values[o] for o in node.operands], output)
+      func.ReturnOp([values[self.graph.output]])
+
+    return bench
+
+
+def _build_graph_op(op: str, operands: Sequence[Value], output: Value) -> Value:
+  """Build `op` of `graphs.graph_ops` accumulating into `output`."""
+  if op == "matmul":
+    return linalg.matmul(*operands, outs=[output])
+  if op == "conv_2d_nhwc_hwcf":
+    return linalg.conv_2d_nhwc_hwcf(*operands,
+                                    outs=[output],
+                                    strides=[1, 1],
+                                    dilations=[1, 1])
+  shape = ShapedType(operands[0].type).shape
+  if op in ("row_mean", "row_mean_square"):
+    # Scale the sums by 1 / N.
+    operands = list(operands) + [
+        arith.ConstantOp(ShapedType(output.type).element_type,
+                         1.0 / shape[-1]).result
+    ]
+  return ops.__dict__[f"{op}_{len(shape)}d"](*operands, outs=[output])
@@ -0,0 +1,362 @@
+"""Small graphs of linalg ops, e.g. matmul -> bias -> relu -> reduction.
+
+A graph is written as a compact spec: the inputs with their dimensions, then
+one op per line in topological order, the last op computing the output:
+
+  A[M,K] B[K,N] bias[N]
+  C = matmul(A, B)
+  D = bias_add(C, bias)
+  Y = relu(D)
+
+Dimensions are size names or sums of size names and integers, e.g. the input
+of a convolution `I[N,H+KH-1,W+KW-1,C]`. The ops of `graph_ops` define the
+dimensions of their results, their NumPy reference semantics and their flop
+counts: one flop per arithmetic operation or elementary function of their
+formula.
+
+The byte count of a graph credits fusion: only the inputs and the output move
+through memory, the intermediate tensors stay in registers or cache. Without
+fusion, every intermediate tensor is also written and then read once.
+"""
+
+import re
+
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, \
+    Sequence, Tuple
+
+import numpy as np
+
+Dims = Tuple[str, ...]
+
+# Added to the variances before taking their inverse square root.
+EPSILON = 1e-5
+
+
+class GraphOp(NamedTuple):
+  """An op of a graph.
+
+  `result_dims` returns the dimensions of the result given the dimensions of
+  the operands, `flops` the flop count given the shapes of the operands and
+  `reference` the result given the operands. An accumulating op starts from a
+  result filled with `init`, 'zero' or 'lowest'. An op of `ops` is only
+  defined for the `ranks` of its first operand, all ranks if None.
+  """
+  arity: int
+  result_dims: Callable[..., Dims]
+  flops: Callable[..., int]
+  reference: Callable[..., np.ndarray]
+  init: Optional[str] = None
+  ranks: Optional[Tuple[int, ...]] = None
+
+
+class Node(NamedTuple):
+  name: str
+  op: str
+  operands: Tuple[str, ...]
+
+
+class Graph(NamedTuple):
+  """The inputs, in order, and the ops, in topological order, of a graph.
+
+  `dims` holds the dimensions of every value.
+  """
+  inputs: Tuple[str, ...]
+  nodes: Tuple[Node, ...]
+  dims: Dict[str, Dims]
+
+  @property
+  def output(self) -> str:
+    return self.nodes[-1].name
+
+
+def _same_dims(*dims: Dims) -> Dims:
+  assert all(d == dims[0] for d in dims), f"mismatched dimensions: {dims}"
+  return dims[0]
+
+
+def _channel_dims(X: Dims, *channels: Dims) -> Dims:
+  """Return the dimensions of `X` after checking every vector of `channels`
+  spans its last dimension."""
+  for c in channels:
+    _same_dims((X[-1],), c)
+  return X
+
+
+def _row_dims(X: Dims, *rows: Dims) -> Dims:
+  """Return the dimensions of the matrix `X` after checking every vector of
+  `rows` spans its first dimension."""
+  assert len(X) == 2, f"expected a matrix, got dimensions {X}"
+  for r in rows:
+    _same_dims((X[0],), r)
+  return X
+
+
+def _matmul_dims(A: Dims, B: Dims) -> Dims:
+  assert len(A) == 2 and len(B) == 2 and A[1] == B[0], \
+      f"mismatched matmul dimensions: {A} x {B}"
+  return (A[0], B[1])
+
+
+def _output_dim(input_dim: str, kernel_dim: str) -> str:
+  """Return the output dimension of a convolution with unit strides and
+  dilations, e.g. H+KH-1, KH -> H."""
+  suffix = f"+{kernel_dim}-1"
+  if input_dim.endswith(suffix):
+    return input_dim[:-len(suffix)]
+  return f"{input_dim}-{kernel_dim}+1"
+
+
+def _conv_2d_nhwc_hwcf_dims(I: Dims, K: Dims) -> Dims:
+  assert len(I) == 4 and len(K) == 4 and I[3] == K[2], \
+      f"mismatched convolution dimensions: {I} x {K}"
+  return (I[0], _output_dim(I[1], K[0]), _output_dim(I[2], K[1]), K[3])
+
+
+def _conv_2d_nhwc_hwcf_np(I: np.ndarray, K: np.ndarray) -> np.ndarray:
+  KH, KW = K.shape[:2]
+  OH, OW = I.shape[1] - KH + 1, I.shape[2] - KW + 1
+  O = np.zeros([I.shape[0], OH, OW, K.shape[3]], dtype=I.dtype)
+  for kh in range(KH):
+    for kw in range(KW):
+      O += np.tensordot(I[:, kh:kh + OH, kw:kw + OW, :], K[kh, kw], axes=1)
+  return O
+
+
+def _rsqrt(x: np.ndarray) -> np.ndarray:
+  return 1 / np.sqrt(x + EPSILON)
+
+
+def _size(shape: Sequence[int]) -> int:
+  return int(np.prod(shape))
+
+
+graph_ops: Dict[str, GraphOp] = {
+    # Contractions.
+    "matmul":
+        GraphOp(2, _matmul_dims, lambda A, B: 2 * _size(A) * B[1], np.matmul,
+                "zero"),
+    "conv_2d_nhwc_hwcf":
+        GraphOp(
+            2, _conv_2d_nhwc_hwcf_dims, lambda I, K: 2 * I[0] *
+            (I[1] - K[0] + 1) * (I[2] - K[1] + 1) * _size(K),
+            _conv_2d_nhwc_hwcf_np, "zero"),
+    # Element-wise ops, broadcasting channel vectors along the last dimension.
+    "bias_add":
+        GraphOp(2,
+                _channel_dims,
+                lambda X, b: _size(X),
+                np.add,
+                ranks=(2, 4)),
+    "relu":
+        GraphOp(1,
+                _same_dims,
+                lambda X: _size(X),
+                lambda X: np.maximum(X, 0),
+                ranks=(2, 4)),
+    "batchnorm":
+        GraphOp(5,
+                _channel_dims,
+                lambda X, *_: 6 * _size(X),
+                lambda X, mean, var, gamma, beta:
+                (X - mean) * _rsqrt(var) * gamma + beta,
+                ranks=(2, 4)),
+    # Row reductions of matrices and element-wise ops broadcasting row
+    # vectors along the columns.
+    "row_sum":
+        GraphOp(1, lambda X: _row_dims(X)[:1], lambda X: _size(X),
+                lambda X: X.sum(axis=1), "zero"),
+    "row_max":
+        GraphOp(1, lambda X: _row_dims(X)[:1], lambda X: _size(X),
+                lambda X: X.max(axis=1), "lowest"),
+    "row_mean":
+        GraphOp(1, lambda X: _row_dims(X)[:1], lambda X: _size(X) + X[0],
+                lambda X: X.mean(axis=1), "zero"),
+    "row_mean_square":
+        GraphOp(1, lambda X: _row_dims(X)[:1], lambda X: 2 * _size(X) + X[0],
+                lambda X: (X * X).mean(axis=1), "zero"),
+    "sub_row":
+        GraphOp(2, _row_dims, lambda X, r: _size(X),
+                lambda X, r: X - r[:, None]),
+    "sub_row_exp":
+        GraphOp(2, _row_dims, lambda X, r: 2 * _size(X),
+                lambda X, r: np.exp(X - r[:, None])),
+    "div_row":
+        GraphOp(2, _row_dims, lambda X, r: _size(X),
+                lambda X, r: X / r[:, None]),
+    "normalize":
+        GraphOp(
+            4, lambda X, var, gamma, beta: _channel_dims(
+                _row_dims(X, var), gamma, beta), lambda X, *_: 5 * _size(X),
+            lambda X, var, gamma, beta: X * _rsqrt(var)[:, None] * gamma + beta
+        ),
+}
+
+
+def parse_graph(spec: str) -> Graph:
+  """Return the graph of `spec`, see the module documentation."""
+  inputs, nodes, dims = [], [], {}
+  for line in spec.splitlines():
+    line = line.split("#", 1)[0].strip()
+    if not line:
+      continue
+    match = re.fullmatch(r"(\w+)\s*=\s*(\w+)\s*\((.*)\)", line)
+    if match is None:
+      declarations = re.findall(r"(\w+)\[([^\]]*)\]", line)
+      assert declarations and re.fullmatch(
+          r"(\s*\w+\[[^\]]*\])+\s*", line), f"cannot parse `{line}`"
+      for name, value_dims in declarations:
+        assert name not in dims, f"`{name}` is defined twice"
+        inputs.append(name)
+        dims[name] = tuple(d.replace(" ", "") for d in value_dims.split(","))
+      continue
+    name, op, operands = match.groups()
+    operands = tuple(o.strip() for o in operands.split(","))
+    assert op in graph_ops, \
+        f"unknown op `{op}`, expected one of {list(graph_ops)}"
+    assert len(operands) == graph_ops[op].arity, \
+        f"`{op}` expects {graph_ops[op].arity} operands, got {operands}"
+    for operand in operands:
+      assert operand in dims, f"`{operand}` is used before it is defined"
+    ranks = graph_ops[op].ranks
+    assert ranks is None or len(dims[operands[0]]) in ranks, \
+        f"`{op}` expects an operand of rank {ranks}, got " \
+        f"`{operands[0]}` of dimensions {dims[operands[0]]}"
+    assert name not in dims, f"`{name}` is defined twice"
+    dims[name] = graph_ops[op].result_dims(*[dims[o] for o in operands])
+    nodes.append(Node(name, op, operands))
+  assert nodes, "expected at least one op"
+  return Graph(tuple(inputs), tuple(nodes), dims)
+
+
+def size_names(graph: Graph) -> List[str]:
+  """Return the names of the sizes of the inputs, in order of appearance."""
+  names = []
+  for name in graph.inputs:
+    for dim in graph.dims[name]:
+      for term in re.findall(r"[A-Za-z_]\w*", dim):
+        if term not in names:
+          names.append(term)
+  return names
+
+
+def dim_size(dim: str, sizes: Mapping[str, Any]) -> int:
+  """Return the size of the dimension `dim`, e.g. H+KH-1."""
+  size = 0
+  for sign, term in re.findall(r"([+-]?)\s*(\w+)", dim):
+    value = int(term) if term.isdigit() else sizes[term]
+    size += -value if sign == "-" else value
+  return size
+
+
+def infer_sizes(graph: Graph,
+                input_shapes: Sequence[Sequence[int]]) -> Dict[str, int]:
+  """Return the sizes of `graph` given the shapes of its inputs."""
+  sizes, equations = {}, []
+  for name, shape in zip(graph.inputs, input_shapes):
+    equations += list(zip(graph.dims[name], shape))
+  while equations:
+    # Solve the equations of a single unknown size.
+    unknowns = [[t for t in re.findall(r"[A-Za-z_]\w*", dim) if t not in sizes]
+                for dim, _ in equations]
+    solvable = [i for i, u in enumerate(unknowns) if len(u) <= 1]
+    assert solvable, f"cannot infer the sizes of {equations}"
+    for i in solvable:
+      dim, size = equations[i]
+      if unknowns[i] and unknowns[i][0] not in sizes:
+        # The dimension is linear in the unknown size.
+        unknown = unknowns[i][0]
+        base = dim_size(dim, {**sizes, unknown: 0})
+        coefficient = dim_size(dim, {**sizes, unknown: 1}) - base
+        sizes[unknown] = (size - base) // coefficient
+      assert dim_size(dim, sizes) == size, \
+          f"mismatched size of {dim}: {size}, sizes {sizes}"
+    equations = [e for i, e in enumerate(equations) if i not in solvable]
+  return sizes
+
+
+def shapes(graph: Graph, sizes: Mapping[str, Any]) -> Dict[str, List[int]]:
+  """Return the shape of every value of `graph`."""
+  return {
+      name: [dim_size(d, sizes) for d in value_dims
+            ] for name, value_dims in graph.dims.items()
+  }
+
+
+def evaluate(graph: Graph,
+             inputs: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+  """Return every value of `graph` computed by the NumPy references."""
+  values = dict(inputs)
+  for node in graph.nodes:
+    operands = [values[o] for o in node.operands]
+    values[node.name] = graph_ops[node.op].reference(*operands).astype(
+        operands[0].dtype)
+  return values
+
+
+def gflop_count(graph: Graph, sizes: Mapping[str, Any]) -> float:
+  value_shapes = shapes(graph, sizes)
+  return sum(graph_ops[node.op].flops(*[value_shapes[o]
+                                        for o in node.operands])
+             for node in graph.nodes) / 1.e9
+
+
+def gbyte_count(graph: Graph, sizes: Mapping[str, Any],
+                itemsizes: Sequence[int]) -> float:
+  """Return the GByte count of the fused graph: its inputs are read and its
+  output written once, `itemsizes` holding their element sizes in order."""
+  value_shapes = shapes(graph, sizes)
+  names = list(graph.inputs) + [graph.output]
+  return sum(_size(value_shapes[name]) * itemsize
+             for name, itemsize in zip(names, itemsizes)) / 1.e9
+
+
+def intermediates_gbyte_count(graph: Graph, sizes: Mapping[str, Any],
+                              itemsize: int) -> float:
+  """Return the GBytes fusion saves: every intermediate tensor written and
+  read once."""
+  value_shapes = shapes(graph, sizes)
+  return sum(2 * _size(value_shapes[node.name]) * itemsize
+             for node in graph.nodes[:-1]) / 1.e9
+
+
+# Graphs of the patterns that dominate the models.
+graphs: Dict[str, Graph] = {
+    "matmul_bias_add":
+        parse_graph("""
+            A[M,K] B[K,N] bias[N]
+            C = matmul(A, B)
+            Y = bias_add(C, bias)
+        """),
+    "matmul_bias_relu_row_sum":
+        parse_graph("""
+            A[M,K] B[K,N] bias[N]
+            C = matmul(A, B)
+            D = bias_add(C, bias)
+            E = relu(D)
+            Y = row_sum(E)
+        """),
+    "conv_2d_batchnorm_relu":
+        parse_graph("""
+            I[N,H+KH-1,W+KW-1,C] K[KH,KW,C,F]
+            mean[F] var[F] gamma[F] beta[F]
+            O = conv_2d_nhwc_hwcf(I, K)
+            B = batchnorm(O, mean, var, gamma, beta)
+            Y = relu(B)
+        """),
+    "softmax":
+        parse_graph("""
+            X[M,N]
+            m = row_max(X)
+            E = sub_row_exp(X, m)
+            s = row_sum(E)
+            Y = div_row(E, s)
+        """),
+    "layernorm":
+        parse_graph("""
+            X[M,N] gamma[N] beta[N]
+            mean = row_mean(X)
+            D = sub_row(X, mean)
+            var = row_mean_square(D)
+            Y = normalize(D, var, gamma, beta)
+        """),
+}
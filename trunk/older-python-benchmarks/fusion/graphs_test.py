@@ -0,0 +1,82 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# Check the parsing, the size inference, the NumPy references and the flop and
+# byte counts of the fusion graphs. This only needs NumPy.
+
+import numpy as np
+
+from .graphs import *
+
+
+def assert_fails(spec: str, message: str):
+  try:
+    parse_graph(spec)
+  except AssertionError as e:
+    assert message in str(e), f"unexpected error `{e}` for `{spec}`"
+    return
+  assert False, f"expected `{spec}` to fail"
+
+
+def main():
+  rng = np.random.default_rng(0)
+
+  # Parsing.
+  graph = graphs["matmul_bias_relu_row_sum"]
+  assert graph.inputs == ("A", "B", "bias")
+  assert [node.op for node in graph.nodes] == \
+      ["matmul", "bias_add", "relu", "row_sum"]
+  assert graph.output == "Y"
+  assert graph.dims["E"] == ("M", "N") and graph.dims["Y"] == ("M",)
+  assert size_names(graphs["conv_2d_batchnorm_relu"]) == \
+      ["N", "H", "KH", "W", "KW", "C", "F"]
+  assert_fails("X[M,N]\nY = exp(X)", "unknown op")
+  assert_fails("X[M,N]\nY = relu(Z)", "used before it is defined")
+  assert_fails("X[M,N]\nY = sub_row(X)", "expects 2 operands")
+  assert_fails("A[M,K] B[N,K]\nC = matmul(A, B)", "mismatched matmul")
+  # The element-wise ops of `ops` only exist for matrices and NHWC tensors.
+  assert_fails("X[M,N]\ns = row_sum(X)\nY = relu(s)", "expects an operand")
+  assert_fails("X[N,H,W]\nY = relu(X)", "expects an operand")
+
+  # Size inference, through the convolution input dimensions.
+  sizes = dict(N=2, H=5, W=6, C=3, KH=3, KW=2, F=4)
+  graph = graphs["conv_2d_batchnorm_relu"]
+  value_shapes = shapes(graph, sizes)
+  assert value_shapes["I"] == [2, 7, 7, 3] and value_shapes["Y"] == [2, 5, 6, 4]
+  assert infer_sizes(graph, [value_shapes[i] for i in graph.inputs]) == sizes
+
+  # NumPy references.
+  X = rng.standard_normal([5, 7])
+  Y = evaluate(graphs["softmax"], {"X": X})["Y"]
+  np.testing.assert_allclose(Y.sum(axis=1), np.ones(5), rtol=1e-12)
+  np.testing.assert_allclose(Y, np.exp(X) / np.exp(X).sum(axis=1)[:, None],
+                             rtol=1e-12)
+  Y = evaluate(graphs["layernorm"], {
+      "X": X,
+      "gamma": np.ones(7),
+      "beta": np.zeros(7)
+  })["Y"]
+  np.testing.assert_allclose(Y.mean(axis=1), np.zeros(5), atol=1e-12)
+  np.testing.assert_allclose(Y.std(axis=1), np.ones(5), rtol=1e-4)
+  A, B, bias = [rng.standard_normal(s) for s in [[4, 3], [3, 5], [5]]]
+  Y = evaluate(graphs["matmul_bias_relu_row_sum"], {
+      "A": A,
+      "B": B,
+      "bias": bias
+  })["Y"]
+  np.testing.assert_allclose(Y, np.maximum(A @ B + bias, 0).sum(axis=1),
+                             rtol=1e-12)
+
+  # Flop and byte counts.
+  sizes = dict(M=4, N=5, K=3)
+  graph = graphs["matmul_bias_add"]
+  assert gflop_count(graph, sizes) == (2 * 4 * 5 * 3 + 4 * 5) / 1.e9
+  assert gbyte_count(graph, sizes, [4] * 4) == \
+      4 * (4 * 3 + 3 * 5 + 5 + 4 * 5) / 1.e9
+  assert intermediates_gbyte_count(graph, sizes, 4) == 2 * 4 * 5 * 4 / 1.e9
+  assert gflop_count(graphs["softmax"], sizes) == 5 * 4 * 5 / 1.e9
+  assert intermediates_gbyte_count(graphs["softmax"], sizes, 4) == \
+      2 * (4 + 4 * 5 + 4) * 4 / 1.e9
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,137 @@
+# pytype: skip-file
+
+from iree.compiler.ir import *
+from iree.compiler.dialects.linalg.opdsl.lang import *
+
+from .graphs import EPSILON
+
+# The ops of `graphs.graph_ops`, suffixed by the rank of their first operand.
+# OpDSL has no division nor square root: 1 / x is exp(-log(x)) and
+# 1 / sqrt(x + EPSILON) is exp(-log(x + EPSILON) / 2).
+
+
+def _reciprocal(x):
+  return UnaryFn.exp(TypeFn.cast_signed(T, const(-1.0)) * UnaryFn.log(x))
+
+
+def _rsqrt(x):
+  return UnaryFn.exp(
+      TypeFn.cast_signed(T, const(-0.5)) *
+      UnaryFn.log(x + TypeFn.cast_signed(T, const(EPSILON))))
+
+
+@linalg_structured_op
+def bias_add_2d(X=TensorDef(T, S.M, S.N),
+                Bias=TensorDef(T, S.N),
+                O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = X[D.m, D.n] + Bias[D.n]
+
+
+@linalg_structured_op
+def bias_add_4d(X=TensorDef(T, S.N, S.H, S.W, S.C),
+                Bias=TensorDef(T, S.C),
+                O=TensorDef(T, S.N, S.H, S.W, S.C, output=True)):
+  domain(D.n, D.h, D.w, D.c)
+  O[D.n, D.h, D.w, D.c] = X[D.n, D.h, D.w, D.c] + Bias[D.c]
+
+
+@linalg_structured_op
+def relu_2d(X=TensorDef(T, S.M, S.N), O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = BinaryFn.max_signed(X[D.m, D.n],
+                                    TypeFn.cast_signed(T, const(0.0)))
+
+
+@linalg_structured_op
+def relu_4d(X=TensorDef(T, S.N, S.H, S.W, S.C),
+            O=TensorDef(T, S.N, S.H, S.W, S.C, output=True)):
+  domain(D.n, D.h, D.w, D.c)
+  O[D.n, D.h, D.w, D.c] = BinaryFn.max_signed(
+      X[D.n, D.h, D.w, D.c], TypeFn.cast_signed(T, const(0.0)))
+
+
+@linalg_structured_op
+def batchnorm_2d(X=TensorDef(T, S.M, S.N),
+                 Mean=TensorDef(T, S.N),
+                 Var=TensorDef(T, S.N),
+                 Gamma=TensorDef(T, S.N),
+                 Beta=TensorDef(T, S.N),
+                 O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = (X[D.m, D.n] - Mean[D.n]) * _rsqrt(Var[D.n]) * Gamma[D.n] + \
+      Beta[D.n]
+
+
+@linalg_structured_op
+def batchnorm_4d(X=TensorDef(T, S.N, S.H, S.W, S.C),
+                 Mean=TensorDef(T, S.C),
+                 Var=TensorDef(T, S.C),
+                 Gamma=TensorDef(T, S.C),
+                 Beta=TensorDef(T, S.C),
+                 O=TensorDef(T, S.N, S.H, S.W, S.C, output=True)):
+  domain(D.n, D.h, D.w, D.c)
+  O[D.n, D.h, D.w, D.c] = (X[D.n, D.h, D.w, D.c] - Mean[D.c]) * \
+      _rsqrt(Var[D.c]) * Gamma[D.c] + Beta[D.c]
+
+
+@linalg_structured_op
+def row_sum_2d(X=TensorDef(T, S.M, S.N), O=TensorDef(T, S.M, output=True)):
+  domain(D.m, D.n)
+  O[D.m] += X[D.m, D.n]
+
+
+@linalg_structured_op
+def row_max_2d(X=TensorDef(T, S.M, S.N), O=TensorDef(T, S.M, output=True)):
+  domain(D.m, D.n)
+  O[D.m] = ReduceFn.max_signed[D.n](X[D.m, D.n])
+
+
+@linalg_structured_op
+def row_mean_2d(X=TensorDef(T, S.M, S.N),
+                Scale=ScalarDef(T),
+                O=TensorDef(T, S.M, output=True)):
+  domain(D.m, D.n)
+  O[D.m] += X[D.m, D.n] * Scale
+
+
+@linalg_structured_op
+def row_mean_square_2d(X=TensorDef(T, S.M, S.N),
+                       Scale=ScalarDef(T),
+                       O=TensorDef(T, S.M, output=True)):
+  domain(D.m, D.n)
+  O[D.m] += X[D.m, D.n] * X[D.m, D.n] * Scale
+
+
+@linalg_structured_op
+def sub_row_2d(X=TensorDef(T, S.M, S.N),
+               R=TensorDef(T, S.M),
+               O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = X[D.m, D.n] - R[D.m]
+
+
+@linalg_structured_op
+def sub_row_exp_2d(X=TensorDef(T, S.M, S.N),
+                   R=TensorDef(T, S.M),
+                   O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = UnaryFn.exp(X[D.m, D.n] - R[D.m])
+
+
+@linalg_structured_op
+def div_row_2d(X=TensorDef(T, S.M, S.N),
+               R=TensorDef(T, S.M),
+               O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = X[D.m, D.n] * _reciprocal(R[D.m])
+
+
+@linalg_structured_op
+def normalize_2d(X=TensorDef(T, S.M, S.N),
+                 Var=TensorDef(T, S.M),
+                 Gamma=TensorDef(T, S.N),
+                 Beta=TensorDef(T, S.N),
+                 O=TensorDef(T, S.M, S.N, output=True)):
+  domain(D.m, D.n)
+  O[D.m, D.n] = X[D.m, D.n] * _rsqrt(Var[D.m]) * Gamma[D.n] + Beta[D.n]
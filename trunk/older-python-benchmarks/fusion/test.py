@@ -80,10 +80,53 @@ def fill_matmul_bias_add_fusion():
                zero_at_each_iteration=True)
 
 
+def fused_graph_fusion():
+  fun_name = 'matmul_bias_relu'
+  graph = parse_graph("""
+      A[M,K] B[K,N] bias[N]
+      C = matmul(A, B)
+      D = bias_add(C, bias)
+      Y = relu(D)
+  """)
+  # Tile the relu and fuse the bias add, the matmul and the fills into it.
+  expert = Fuse(fun_name, 'linalg.generic', tile_sizes=[8, 32])     \
+      .then(Vectorize(fun_name, ''))                                \
+      .then(LoweringOnlyExpert('', ''))
+
+  keys = ['M', 'K', 'N']
+  n_iters = 1000
+  problem_size_list = [[48, 16, 64]]
+  test_harness(lambda s, t: FusedGraphProblem(graph), [[np.float32] * 4],
+               test_sizes(keys, problem_size_list),
+               [expert],
+               n_iters=n_iters,
+               function_name=fun_name,
+               zero_at_each_iteration=True)
+
+
+def fused_graphs():
+  sizes = {
+      'M': 24, 'N': 40, 'K': 16,
+      'H': 6, 'W': 8, 'C': 8, 'KH': 3, 'KW': 3, 'F': 16
+  }
+  for name, graph in graphs.items():
+    problem = FusedGraphProblem(graph)
+    test_harness(lambda s, t: FusedGraphProblem(graph),
+                 [[np.float32] * (len(graph.inputs) + 1)],
+                 test_sizes(problem.keys,
+                            [[sizes[k] for k in problem.keys]]),
+                 [LoweringOnlyExpert('', '')],
+                 n_iters=10,
+                 function_name=name,
+                 zero_at_each_iteration=True)
+
+
 # CHECK-NOT: FAILURE
 def main():
   fill_matmul_fusion()
   fill_matmul_bias_add_fusion()
+  fused_graph_fusion()
+  fused_graphs()
 
 
 if __name__ == '__main__':
@@ -163,6 +163,7 @@ def main():
                    dump_ir_to_file='/tmp/abc.mlir',
                    dump_obj_to_file='/tmp/abc.o',
                    dump_data_to_file=args.dump_data,
+                   expert_file=args.expert_file,
                    numpy_benchmark=numpy_kernel,
                    pytorch_benchmark=pytorch_kernel)
 
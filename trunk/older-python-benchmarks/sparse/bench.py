@@ -0,0 +1,136 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# This file benchmarks sparse matrix times vector (SpMV) and sparse matrix
+# times dense matrix (SpMM) products for several storage formats, matrix
+# structures and densities.
+
+import argparse
+import sys
+
+from mlir.sandbox.experts import *
+from mlir.sandbox.harness import *
+from mlir.sandbox.transforms import *
+
+from .definitions import *
+from .matrices import structures
+
+op_name = 'linalg.generic'
+
+################################################################################
+### Compilation strategies.
+################################################################################
+
+# Note: `\` char at the end of next line prevents formatter reflows, keep it.
+all_names = [     \
+  "Loops",        \
+  "TileVectorize" \
+            ]
+
+
+def all_experts(fun_name: str):
+  """Lower the loops as is, or tile and vectorize the row updates of SpMM."""
+  return [
+      LoweringOnlyExpert('', ''),
+      Tile(fun_name, op_name, tile_sizes=[8], peel=[0])
+      .then(Vectorize(fun_name, op_name))
+      .then(LoweringOnlyExpert('', ''))
+  ]
+
+
+################################################################################
+### Problem instantiation
+################################################################################
+
+problems = {'spmv': SpMVProblem, 'spmm': SpMMProblem}
+
+
+def numpy_kernel(problem: SparseMatrixProblem,
+                 sizes_list: Sequence[Mapping[str, Any]],
+                 types: Sequence[np.dtype]):
+  """Returns the SciPy kernel of `problem`.
+
+  The SciPy matrices of the problem sizes are built once, out of the timed
+  kernel, from the same matrices as the sparse matrix buffers.
+  """
+  matrices = {}
+  for sizes in sizes_list:
+    first, columns, values = [
+        buffer.astype(t)
+        for buffer, t in zip(problem.sparse_buffers(sizes), types)
+    ]
+    matrices[sizes['M'], sizes['K']] = problem.scipy_matrix(
+        first, columns, values, [sizes['M'], sizes['K']])
+
+  def kernel(args, sizes, types):
+    operand, output = args[-2:]
+    output[...] = matrices[sizes['M'], sizes['K']] @ operand
+
+  return kernel
+
+
+# CHECK-NOT: FAILURE
+def main():
+  # Specify default configuration and parse command line.
+  parser = argparse.ArgumentParser(description='sparse benchmark')
+  add_argparser_arguments(
+      parser,
+      benchmark_name='sparse benchmark',
+      default_n_iters=100,
+      # SpMV only uses M and K.
+      #  M     N   K
+      default_problem_sizes_list=[
+          [1024, 32, 1024],
+          [4096, 64, 4096],
+      ],
+      default_expert_list=all_names,
+      default_dynamic_at_compile_time_list=[],
+      default_spec_list=list(problems))
+  parser.add_argument('--format_list',
+                      type=str,
+                      nargs='+',
+                      choices=formats,
+                      default=list(formats),
+                      help='storage formats of the sparse matrix')
+  parser.add_argument('--structure_list',
+                      type=str,
+                      nargs='+',
+                      choices=structures,
+                      default=list(structures),
+                      help='structures of the sparse matrix')
+  parser.add_argument('--density_list',
+                      type=float,
+                      nargs='+',
+                      default=[0.001, 0.01],
+                      help='densities of the sparse matrix')
+  args = parser.parse_args(sys.argv[1:])
+
+  for kernel in args.spec_list:
+    for format in args.format_list:
+      for structure in args.structure_list:
+        for density in args.density_list:
+          problem = problems[kernel](format, structure, density)
+          fun_name = f'{kernel}_{format.lower()}_{structure}'
+          # SpMV has no linalg op to tile and vectorize.
+          expert_list = [
+              name for name in args.expert_list
+              if kernel == 'spmm' or name == 'Loops'
+          ]
+          types = [np.int64] * 2 + [np.float32] * 3
+          sizes_list = test_sizes(problem.keys, [[
+              s for s, k in zip(sizes, ['M', 'N', 'K']) if k in problem.keys
+          ] for sizes in args.problem_sizes_list])
+          print(f'\n{kernel} {format} {structure} density {density}')
+          test_harness(
+              lambda s, t: problems[kernel](format, structure, density),
+              [types],
+              sizes_list,
+              test_experts(all_experts(fun_name), all_names, expert_list),
+              n_iters=args.n_iters,
+              function_name=fun_name,
+              dump_data_to_file=args.dump_data,
+              zero_at_each_iteration=True,
+              numpy_benchmark=numpy_kernel(problem, sizes_list, types))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,318 @@
+import os
+
+from typing import Any, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from iree.compiler.ir import *
+from iree.compiler.dialects import arith, func, linalg, scf, tensor
+
+from mlir.sandbox.compilation import attach_inplaceable_attributes, attach_passthrough
+from mlir.sandbox.problem_definition import *
+from mlir.sandbox.utils import *
+
+from . import ops
+from .matrices import SparseMatrix, random_sparse_matrix
+
+# TODO: Orthogonal configuration object.
+avx512 = True
+
+# Storage formats of the sparse matrices, see `SparseMatrixProblem`.
+formats = ('CSR', 'COO')
+
+
+################################################################################
+### IR building helpers.
+################################################################################
+
+
+def _extract_index(buffer: Value, position: Value) -> Value:
+  """Returns the integer of `buffer` at `position` as an index."""
+  return arith.IndexCastOp(IndexType.get(),
+                           tensor.ExtractOp(buffer, [position]).result).result
+
+
+def _i64_array(values: Sequence[int]) -> ArrayAttr:
+  i64_type = IntegerType.get_signless(64)
+  return ArrayAttr.get([IntegerAttr.get(i64_type, v) for v in values])
+
+
+def _row_slice_attributes(n: int) -> List[ArrayAttr]:
+  """Returns the static offsets, sizes and strides of the row of n elements
+  at a dynamic row offset."""
+  return [
+      _i64_array([ShapedType.get_dynamic_stride_or_offset(), 0]),
+      _i64_array([1, n]),
+      _i64_array([1, 1])
+  ]
+
+
+def _extract_row(matrix: Value, row: Value, n: int) -> Value:
+  element_type = ShapedType(matrix.type).element_type
+  return tensor.ExtractSliceOp(RankedTensorType.get([n], element_type), matrix,
+                               [row], [], [], *_row_slice_attributes(n)).result
+
+
+def _insert_row(vector: Value, matrix: Value, row: Value, n: int) -> Value:
+  return tensor.InsertSliceOp(vector, matrix, [row], [], [],
+                              *_row_slice_attributes(n)).result
+
+
+################################################################################
+### Sparse matrix times dense operand.
+################################################################################
+
+
+class SparseMatrixProblem(ProblemDefinition):
+  """Problem definition for a sparse M x K matrix times a dense operand.
+
+  The matrix is random, see `matrices.random_sparse_matrix`, and passed to the
+  function as the buffers of its storage `format`:
+    - CSR: the positions of the rows [M + 1], the columns [nnz] and the values
+      [nnz] of the nonzeros;
+    - COO: the rows [nnz], the columns [nnz] and the values [nnz] of the
+      nonzeros;
+  followed by the dense operand and the output. The function loops over the
+  rows and the nonzeros, the dense computations are linalg ops the transforms
+  may schedule.
+
+  The GByte count is the size of these buffers: the effective bandwidth
+  derives from the number of nonzeros rather than from the dense sizes. The
+  results are checked against SciPy.
+  """
+
+  def __init__(self,
+               format: str = 'CSR',
+               structure: str = 'uniform',
+               density: float = 0.01,
+               seed: int = 0):
+    assert format in formats, \
+        f'unknown format {format}, expected one of {formats}'
+    self.format = format
+    self.structure = structure
+    self.density = density
+    self.seed = seed
+    self.__matrices = {}
+
+  def matrix(self, sizes: Mapping[str, Any]) -> SparseMatrix:
+    """Returns the sparse matrix of the problem, the same for the same sizes."""
+    key = (sizes['M'], sizes['K'])
+    if key not in self.__matrices:
+      self.__matrices[key] = random_sparse_matrix(*key,
+                                                  self.density,
+                                                  self.structure,
+                                                  dtype=np.float64,
+                                                  seed=self.seed)
+    return self.__matrices[key]
+
+  def dense_shapes_builder(self,
+                           sizes: Mapping[str, Any]) -> List[List[int]]:
+    """Returns the shapes of the dense operand and of the output."""
+    pass
+
+  def nonzero_gflop_count(self, sizes: Mapping[str, Any]) -> float:
+    """Returns the GFlop count of a nonzero."""
+    pass
+
+  def shapes_builder(self, sizes: Mapping[str, Any]) -> List[List[int]]:
+    """Constructs the tensor shapes given problem parameters."""
+    nnz = self.matrix(sizes).nnz
+    first_shape = [sizes['M'] + 1] if self.format == 'CSR' else [nnz]
+    return [first_shape, [nnz], [nnz]] + self.dense_shapes_builder(sizes)
+
+  def gflop_count_builder(self, sizes: Mapping[str, Any]) -> float:
+    """Returns the GFLOp count of the nonzeros given problem parameters."""
+    return self.matrix(sizes).nnz * self.nonzero_gflop_count(sizes)
+
+  def gbyte_count_builder(self, sizes: Mapping[str, Any],
+                          types: Sequence[np.dtype]) -> float:
+    """Returns the GByte count of the sparse matrix buffers, the dense operand
+    and the output."""
+    return sum(
+        np.prod(shape) * np.dtype(t).itemsize
+        for shape, t in zip(self.shapes_builder(sizes), types)) / 1.e9
+
+  def sparse_buffers(self, sizes: Mapping[str, Any]) -> List[np.ndarray]:
+    """Returns the buffers of the sparse matrix in the storage format."""
+    A = self.matrix(sizes)
+    first = A.positions if self.format == 'CSR' else A.rows
+    return [first, A.columns, A.values]
+
+  def tensors_np_builder(self, sizes: Mapping[str, Any],
+                         types: Sequence[np.dtype]) -> List[np.dtype]:
+    """Returns the sparse matrix buffers, a random dense operand and a zero
+    output."""
+    dense_shapes = self.dense_shapes_builder(sizes)
+    tensors = self.sparse_buffers(sizes) + \
+        [np.random.rand(*s) for s in dense_shapes]
+    tensors = [
+        realign(t.astype(type), byte_alignment=64)
+        for t, type in zip(tensors, types)
+    ]
+    tensors[-1].fill(0.)
+    return tensors
+
+  def scipy_matrix(self, first: np.ndarray, columns: np.ndarray,
+                   values: np.ndarray, shape: Sequence[int]):
+    """Returns the SciPy matrix of the sparse matrix buffers."""
+    import scipy.sparse
+    if self.format == 'CSR':
+      return scipy.sparse.csr_matrix((values, columns, first), shape=shape)
+    return scipy.sparse.coo_matrix((values, (first, columns)), shape=shape)
+
+  def check_np(self, first: np.dtype, columns: np.dtype, values: np.dtype,
+               operand: np.dtype, output: np.dtype) -> None:
+    """Checks the output matches the product computed by SciPy."""
+    A = self.scipy_matrix(first, columns, values,
+                          [output.shape[0], operand.shape[0]])
+    reference_output = A @ operand
+    if not np.allclose(output, reference_output):
+      delta = output - reference_output
+      max_abs_delta = max(delta.max(), delta.min(), key=abs)
+      raise Exception(f'max_abs_delta: {max_abs_delta} -> FAILURE ')
+
+  def types_mlir_builder(self, sizes: Mapping[str, Any],
+                         types: Sequence[Type]) -> List[Type]:
+    """Returns the list of MLIR types for arguments of this computation."""
+    shapes = self.shapes_builder(sizes)
+    return [RankedTensorType.get(s, t) for s, t in zip(shapes, types)]
+
+  def build_nonzero(self, row: Value, column: Value, value: Value,
+                    operand: Value, output: Value) -> Value:
+    """Builds the update of `output` by the nonzero `value` at (`row`,
+    `column`) and returns the updated output."""
+    pass
+
+  def build_csr_row(self, row: Value, begin: Value, end: Value,
+                    columns: Value, values: Value, operand: Value,
+                    output: Value) -> Value:
+    """Builds the update of `output` by the nonzeros of `row`, at positions
+    [`begin`, `end`), and returns the updated output."""
+    nonzeros = scf.ForOp(begin, end, arith.ConstantOp.create_index(1),
+                         [output])
+    with InsertionPoint(nonzeros.body):
+      j = nonzeros.induction_variable
+      updated = self.build_nonzero(row, _extract_index(columns, j),
+                                   tensor.ExtractOp(values, [j]).result,
+                                   operand, nonzeros.inner_iter_args[0])
+      scf.YieldOp([updated])
+    return nonzeros.results[0]
+
+  def build_problem_under_context_manager(
+      self, name: str, types: Sequence[Type],
+      zero_at_each_iteration: bool) -> func.FuncOp:
+    """MLIR problem builder.
+
+    Given a list of MLIR shaped types, build and return the MLIR FuncOp that
+    implements the desired computation on those types.
+    """
+    global avx512
+
+    bench = func.FuncOp(name, (types, [types[-1]]))
+    # TODO: need something much more flexible to add function argument attributes.
+    attach_inplaceable_attributes(bench,
+                                  inplaceable=[False] * (len(types) - 1) +
+                                  [True])
+    attach_passthrough(
+        bench, [StringAttr.get(os.getenv('SANDBOX_INLINING', 'noinline'))],
+        avx512=avx512)
+
+    with InsertionPoint(bench.add_entry_block()):
+      first, columns, values, operand, output = bench.arguments
+      if zero_at_each_iteration:
+        zero = arith.ConstantOp(types[-1].element_type, 0.0)
+        output = linalg.fill(zero, outs=[output])
+      zero = arith.ConstantOp.create_index(0)
+      one = arith.ConstantOp.create_index(1)
+      if self.format == 'CSR':
+        # Loop over the rows, then over their nonzeros.
+        M = ShapedType(types[0]).shape[0] - 1
+        loop = scf.ForOp(zero, arith.ConstantOp.create_index(M), one, [output])
+        with InsertionPoint(loop.body):
+          i = loop.induction_variable
+          begin = _extract_index(first, i)
+          end = _extract_index(first, arith.AddIOp(i, one).result)
+          scf.YieldOp([
+              self.build_csr_row(i, begin, end, columns, values, operand,
+                                 loop.inner_iter_args[0])
+          ])
+      else:
+        # Loop over the nonzeros.
+        nnz = ShapedType(types[2]).shape[0]
+        loop = scf.ForOp(zero, arith.ConstantOp.create_index(nnz), one,
+                         [output])
+        with InsertionPoint(loop.body):
+          j = loop.induction_variable
+          scf.YieldOp([
+              self.build_nonzero(_extract_index(first, j),
+                                 _extract_index(columns, j),
+                                 tensor.ExtractOp(values, [j]).result, operand,
+                                 loop.inner_iter_args[0])
+          ])
+      func.ReturnOp([loop.results[0]])
+
+    return bench
+
+
+class SpMVProblem(SparseMatrixProblem):
+  """Problem definition for y[M] += A[M, K] . x[K] with a sparse A."""
+
+  @property
+  def keys(self) -> List[str]:
+    return ['M', 'K']
+
+  def dense_shapes_builder(self,
+                           sizes: Mapping[str, Any]) -> List[List[int]]:
+    return [[sizes['K']], [sizes['M']]]
+
+  def nonzero_gflop_count(self, sizes: Mapping[str, Any]) -> float:
+    return 2 / 1.e9
+
+  def build_csr_row(self, row: Value, begin: Value, end: Value,
+                    columns: Value, values: Value, operand: Value,
+                    output: Value) -> Value:
+    # Accumulate the row in a scalar.
+    nonzeros = scf.ForOp(begin, end, arith.ConstantOp.create_index(1),
+                         [tensor.ExtractOp(output, [row]).result])
+    with InsertionPoint(nonzeros.body):
+      j = nonzeros.induction_variable
+      product = arith.MulFOp(
+          tensor.ExtractOp(values, [j]).result,
+          tensor.ExtractOp(operand, [_extract_index(columns, j)]).result)
+      scf.YieldOp(
+          [arith.AddFOp(nonzeros.inner_iter_args[0], product.result).result])
+    return tensor.InsertOp(nonzeros.results[0], output, [row]).result
+
+  def build_nonzero(self, row: Value, column: Value, value: Value,
+                    operand: Value, output: Value) -> Value:
+    product = arith.MulFOp(value,
+                           tensor.ExtractOp(operand, [column]).result).result
+    sum = arith.AddFOp(tensor.ExtractOp(output, [row]).result, product).result
+    return tensor.InsertOp(sum, output, [row]).result
+
+
+class SpMMProblem(SparseMatrixProblem):
+  """Problem definition for Y[M, N] += A[M, K] . X[K, N] with a sparse A.
+
+  Every nonzero A[m, k] updates the row Y[m] by the linalg op
+  Y[m] += A[m, k] * X[k], which the transforms may tile and vectorize along N.
+  """
+
+  @property
+  def keys(self) -> List[str]:
+    return ['M', 'N', 'K']
+
+  def dense_shapes_builder(self,
+                           sizes: Mapping[str, Any]) -> List[List[int]]:
+    return [[sizes['K'], sizes['N']], [sizes['M'], sizes['N']]]
+
+  def nonzero_gflop_count(self, sizes: Mapping[str, Any]) -> float:
+    return 2 * sizes['N'] / 1.e9
+
+  def build_nonzero(self, row: Value, column: Value, value: Value,
+                    operand: Value, output: Value) -> Value:
+    N = ShapedType(output.type).shape[1]
+    output_row = ops.axpy_1d(value,
+                             _extract_row(operand, column, N),
+                             outs=[_extract_row(output, row, N)])
+    return _insert_row(output_row, output, row, N)
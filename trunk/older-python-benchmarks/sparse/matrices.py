@@ -0,0 +1,122 @@
+"""Random sparse matrices of controllable density and structure.
+
+The structures are:
+  - uniform: the nonzeros are spread uniformly over the matrix;
+  - banded: every row holds a contiguous band of nonzeros around the
+    diagonal of the rectangular matrix, the bands of the rows differing by at
+    most one nonzero;
+  - power_law: the numbers of nonzeros of the rows follow a power law, as in
+    the adjacency matrices of graphs or the interaction matrices of
+    recommendation models, with their columns spread uniformly.
+
+The banded and power law matrices hold exactly round(density * M * K)
+nonzeros, at least one, the uniform ones about as many and none is empty.
+
+A matrix is stored as its coordinates sorted by row then column, from which
+the CSR and COO buffers passed to the compiled functions derive.
+"""
+
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+structures = ('uniform', 'banded', 'power_law')
+
+# Exponent of the power law of the numbers of nonzeros of the rows.
+POWER_LAW_EXPONENT = 1.0
+
+
+class SparseMatrix(NamedTuple):
+  """A matrix of `shape` with `values` at (`rows`, `columns`), sorted by row
+  then column."""
+  shape: Tuple[int, int]
+  rows: np.ndarray
+  columns: np.ndarray
+  values: np.ndarray
+
+  @property
+  def nnz(self) -> int:
+    return len(self.values)
+
+  @property
+  def positions(self) -> np.ndarray:
+    """Return the CSR positions: the nonzeros of row i are at
+    [positions[i], positions[i + 1])."""
+    positions = np.zeros([self.shape[0] + 1], dtype=self.rows.dtype)
+    np.cumsum(np.bincount(self.rows, minlength=self.shape[0]),
+              out=positions[1:])
+    return positions
+
+  def to_dense(self) -> np.ndarray:
+    dense = np.zeros(self.shape, dtype=self.values.dtype)
+    dense[self.rows, self.columns] = self.values
+    return dense
+
+
+def _apportion(weights: np.ndarray, total: int, limit: int) -> np.ndarray:
+  """Return integer counts of sum `total`, proportional to `weights` but at
+  most `limit`, the largest remainders rounded up."""
+  assert total <= limit * len(weights), \
+      f'cannot apportion {total} over {len(weights)} counts of at most {limit}'
+  # Saturate the counts over the limit and share the rest among the others.
+  saturated = np.zeros([len(weights)], dtype=bool)
+  while True:
+    shares = np.where(
+        saturated, limit,
+        weights * (total - limit * saturated.sum()) /
+        weights[~saturated].sum())
+    over = ~saturated & (shares > limit)
+    if not over.any() or over.sum() == (~saturated).sum():
+      break
+    saturated |= over
+  shares = np.minimum(shares, limit)
+  counts = np.floor(shares).astype(np.int64)
+  remainders = np.where(counts < limit, shares - counts, -1)
+  counts[np.argsort(-remainders, kind='stable')[:total - counts.sum()]] += 1
+  return counts
+
+
+def _row_counts(M: int, K: int, density: float, structure: str,
+                rng: np.random.Generator) -> np.ndarray:
+  """Return the number of nonzeros of every row."""
+  if structure == 'uniform':
+    return rng.binomial(K, density, size=M)
+  total = min(M * K, max(1, round(density * M * K)))
+  if structure == 'banded':
+    # Spread the nonzeros evenly, also over the rows when fewer than M.
+    return np.diff(np.arange(M + 1) * total // M)
+  # Rows of decreasing weights, shuffled.
+  weights = rng.permutation(
+      np.arange(1, M + 1, dtype=np.float64)**-POWER_LAW_EXPONENT)
+  return _apportion(weights, total, K)
+
+
+def random_sparse_matrix(M: int,
+                         K: int,
+                         density: float,
+                         structure: str = 'uniform',
+                         dtype: np.dtype = np.float32,
+                         index_dtype: np.dtype = np.int64,
+                         seed: int = 0) -> SparseMatrix:
+  """Return a random M x K matrix of `structure` with about density * M * K
+  nonzeros, the same for the same arguments."""
+  assert structure in structures, \
+      f'unknown structure {structure}, expected one of {structures}'
+  assert 0 < density <= 1, f'expected a density in (0, 1], got {density}'
+  rng = np.random.default_rng(seed)
+  counts = _row_counts(M, K, density, structure, rng)
+  assert counts.sum() > 0, \
+      f'the {M} x {K} {structure} matrix of density {density} is empty'
+  columns = []
+  for i, count in enumerate(counts):
+    if structure == 'banded':
+      # Center the band on the diagonal, clamped to the matrix.
+      start = min(max(0, (i * K) // M - count // 2), K - count)
+      columns.append(np.arange(start, start + count))
+    else:
+      columns.append(np.sort(rng.choice(K, size=count, replace=False)))
+  rows = np.repeat(np.arange(M), counts).astype(index_dtype)
+  columns = np.concatenate(columns).astype(index_dtype) if columns else \
+      np.zeros([0], dtype=index_dtype)
+  values = rng.random(len(rows)).astype(dtype)
+  return SparseMatrix((M, K), rows, columns, values)
@@ -0,0 +1,71 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# Check the random sparse matrices hit their density and match their SciPy
+# CSR and COO storage. This only needs NumPy and SciPy.
+
+import numpy as np
+import scipy.sparse
+
+from .matrices import *
+
+
+def check_matrix(M: int, K: int, density: float, structure: str):
+  A = random_sparse_matrix(M, K, density, structure)
+  assert A.shape == (M, K)
+  if structure == 'uniform':
+    assert abs(A.nnz - density * M * K) <= 5 * np.sqrt(density * M * K) + 1, \
+        f'{M} x {K} {structure} matrix of density {density}: {A.nnz} nonzeros'
+  else:
+    assert A.nnz == max(1, round(density * M * K)), \
+        f'{M} x {K} {structure} matrix of density {density}: {A.nnz} nonzeros'
+  counts = np.bincount(A.rows, minlength=M)
+  assert counts.max() <= K
+  if structure == 'banded':
+    # Every row holds a contiguous band, of about the same width.
+    assert counts.max() - counts.min() <= 1
+    for i in np.nonzero(counts)[0]:
+      columns = A.columns[A.rows == i]
+      assert np.all(np.diff(columns) == 1)
+
+  # The coordinates are sorted by row then column, without duplicates, which
+  # is the canonical CSR format of SciPy.
+  B = scipy.sparse.coo_matrix((A.values, (A.rows, A.columns)),
+                              shape=(M, K)).tocsr()
+  B.sum_duplicates()
+  assert B.nnz == A.nnz
+  np.testing.assert_array_equal(B.indptr, A.positions)
+  np.testing.assert_array_equal(B.indices, A.columns)
+  np.testing.assert_array_equal(B.data, A.values)
+  np.testing.assert_array_equal(B.toarray(), A.to_dense())
+  C = scipy.sparse.csr_matrix((A.values, A.columns, A.positions),
+                              shape=(M, K))
+  np.testing.assert_array_equal(C.toarray(), A.to_dense())
+
+
+def main():
+  for structure in structures:
+    for M, K in [(37, 53), (512, 64), (256, 256)]:
+      for density in [0.001, 0.01, 0.5, 1.0]:
+        if structure == 'uniform' and density * M * K < 10:
+          continue
+        check_matrix(M, K, density, structure)
+
+  # The power law rows reach the number of columns, the clipped nonzeros go to
+  # the other rows.
+  A = random_sparse_matrix(256, 256, 0.5, 'power_law')
+  counts = np.bincount(A.rows, minlength=256)
+  assert counts.max() == 256 and A.nnz == 256 * 128
+
+  # Tiny densities still make a nonzero, except for uniform matrices.
+  assert random_sparse_matrix(10, 10, 0.001, 'power_law').nnz == 1
+  assert random_sparse_matrix(10, 10, 0.001, 'banded').nnz == 1
+  try:
+    random_sparse_matrix(10, 10, 0.001, 'uniform')
+  except AssertionError:
+    pass
+  else:
+    assert False, 'expected an empty uniform matrix to fail'
+
+
+if __name__ == '__main__':
+  main()
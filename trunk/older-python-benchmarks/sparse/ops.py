@@ -0,0 +1,12 @@
+# pytype: skip-file
+
+from iree.compiler.ir import *
+from iree.compiler.dialects.linalg.opdsl.lang import *
+
+
+@linalg_structured_op
+def axpy_1d(Alpha=ScalarDef(T),
+            X=TensorDef(T, S.N),
+            O=TensorDef(T, S.N, output=True)):
+  domain(D.n)
+  O[D.n] += Alpha * X[D.n]
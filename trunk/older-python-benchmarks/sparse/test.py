@@ -0,0 +1,48 @@
+# RUN: %PYTHON %s 2>&1 | FileCheck %s
+
+# This file contains tests of the sparse problems.
+
+from mlir.sandbox.experts import *
+from mlir.sandbox.harness import *
+from mlir.sandbox.transforms import *
+
+from .definitions import *
+from .matrices import structures
+
+
+def spmv():
+  for format in formats:
+    for structure in structures:
+      test_harness(lambda s, t: SpMVProblem(format, structure, 0.05),
+                   [[np.int64] * 2 + [np.float32] * 3],
+                   test_sizes(['M', 'K'], [[37, 53]]),
+                   [LoweringOnlyExpert('', '')],
+                   n_iters=10,
+                   function_name=f'spmv_{format.lower()}_{structure}',
+                   zero_at_each_iteration=True)
+
+
+def spmm():
+  fun_name = 'spmm'
+  expert = Tile(fun_name, 'linalg.generic', tile_sizes=[8], peel=[0])  \
+    .then(Vectorize(fun_name, 'linalg.generic'))                       \
+    .then(LoweringOnlyExpert('', ''))
+  for format in formats:
+    for structure in structures:
+      test_harness(lambda s, t: SpMMProblem(format, structure, 0.05),
+                   [[np.int64] * 2 + [np.float32] * 3],
+                   test_sizes(['M', 'N', 'K'], [[37, 19, 53]]),
+                   [expert],
+                   n_iters=10,
+                   function_name=fun_name,
+                   zero_at_each_iteration=True)
+
+
+# CHECK-NOT: FAILURE
+def main():
+  spmv()
+  spmm()
+
+
+if __name__ == '__main__':
+  main()
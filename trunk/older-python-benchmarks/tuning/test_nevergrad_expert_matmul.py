@@ -0,0 +1,99 @@
+from argparse import ArgumentParser
+import nevergrad as ng
+import numpy as np
+
+from mlir.sandbox.experts import *
+from mlir.sandbox.harness import *
+from mlir.sandbox.nevergrad_parallel_utils import *
+from mlir.sandbox.nevergrad_tuner_utils import *
+from mlir.sandbox import nevergrad_searchable_strategies as strategies
+from mlir.sandbox.transforms import *
+from mlir.sandbox.utils import *
+
+from ..contraction.definitions import EinsumProblem
+
+################################################################################
+### Problem instantiations.
+################################################################################
+
+keys = ['m', 'n', 'k']
+fun_name = 'matmul'
+op_name = 'linalg.generic'
+
+# Two-level tiling with padding and hoisting followed by the usual lowering.
+# All the variables of the pipeline, including the vector lowering choices, are
+# searched.
+SearchableExpert = Tile.then(Tile).then(Pad).then(Vectorize).then(
+    Bufferize).then(LowerVectors).then(LowerToLLVM)
+
+
+class NGScheduler(NGSchedulerInterface):
+
+  def __init__(self, pb_sizes: Sequence[int]):
+    self.problem_sizes = pb_sizes
+
+    # Padding is incompatible with peeling and target-specific lowerings are
+    # not searched.
+    fixed_values = {name: False for name in LowerToLLVM.variables}
+    fixed_values.update(peel1=[], peel2=[], print_after_all=False)
+    self.search_space = strategies.TransformationListSearchSpace(
+        SearchableExpert,
+        rank=3,
+        num_operands=3,
+        searchables={
+            'tile_sizes1':
+                strategies.IntChoice('tile_sizes1', length=3).with_values(
+                    [0, 64, 128, 256, 512]),
+            'tile_sizes2':
+                strategies.IntChoice('tile_sizes2', length=3).with_values(
+                    [1, 4, 6, 8, 12, 16, 32]),
+        },
+        fixed_values=fixed_values)
+    self.instrumentation = ng.p.Instrumentation(
+        **self.search_space.get_instrumentation())
+
+  def build_compile_time_problem_sizes(self):
+    return {k: v for k, v in zip(keys, self.problem_sizes)}
+
+  def build_transformations(self, proposal):
+    return self.search_space.build(proposal, fun_name, op_name)
+
+  def schedule(self, module, proposal, benefit: int = 1):
+    expert = self.build_transformations(proposal)
+    print(f'Problem sizes: {self.problem_sizes}')
+    print(f'Expert: {self.search_space.extract_from_proposal(proposal)}')
+    emit_schedule_dialect(module, expert)
+
+
+def make_optimizer(scheduler: NGSchedulerInterface, search_strategy: str,
+                   budget: int):
+  optimizer = ng.optimizers.registry[search_strategy](
+      parametrization=scheduler.instrumentation, budget=budget)
+  return optimizer
+
+
+def main():
+  argparser = ArgumentParser()
+  add_argparser_arguments(argparser, default_problem_sizes_list=[[256, 256, 256]])
+  add_argparser_tuning_arguments(argparser)
+  parsed_args = argparser.parse_args()
+
+  # Sanity checks before starting.
+  assert len(
+      parsed_args.problem_sizes_list) == 1, 'Single problem size supported atm'
+
+  # Init random seed for reproducibility.
+  np.random.seed(parsed_args.random_seed)
+
+  problem_definition = EinsumProblem('mk,kn', 'mnk', 2)
+  # Create a schedule builder for fixed sizes.
+  scheduler = NGScheduler(parsed_args.problem_sizes_list[0])
+
+  optimizer = make_optimizer(scheduler, parsed_args.search_strategy,
+                             parsed_args.search_budget)
+
+  async_optim_loop(problem_definition, scheduler, optimizer, parsed_args)
+
+
+if __name__ == '__main__':
+  main()
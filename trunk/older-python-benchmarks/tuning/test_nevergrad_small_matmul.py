@@ -10,6 +10,7 @@ import iree.compiler.dialects.iree_linalg_transform as transform
 
 from mlir.sandbox.experts import *
 from mlir.sandbox.harness import *
+from mlir.sandbox.nevergrad_cost_model import tiling_features
 from mlir.sandbox.nevergrad_parallel_utils import *
 from mlir.sandbox.nevergrad_tuner_utils import *
 from mlir.sandbox import nevergrad_searchable_strategies as strategies
@@ -74,6 +75,15 @@ class NGScheduler(NGSchedulerInterface):
   def build_compile_time_elemental_problem_types(self):
     return {k: v for k, v in zip(keys, self.problem_sizes)}
 
+  def extract_features(self, proposal):
+    return tiling_features(
+        problem_sizes=self.problem_sizes,
+        tile_sizes=self.register_tile_sizes.extract_from_proposal(proposal),
+        #              A: mk   B: kn   C: mn
+        operand_dims=[[0, 2], [2, 1], [0, 1]],
+        interchange=self.register_interchange.extract_from_proposal(proposal),
+        peel=self.register_peel.extract_from_proposal(proposal))
+
   # TODO: more advanced schedules, atm we just TileAndVectorize + peel.
   def schedule(self, module, proposal, benefit: int = 1):
     print(f'Problem sizes: {self.problem_sizes}')
@@ -0,0 +1,288 @@
+"""Run many benchmark configurations in a single long-lived process.
+
+The benchmark scripts are started once per configuration by the command lists
+of `tools/generate_list_of_commands.py` and `tools/extract_best_from_list.py`:
+  (${COMMAND} --expert_list Tile8x32Peel --problem_sizes_list 10,32)
+which pays the interpreter startup and the imports for every configuration.
+The batch runner reads such a list, or a sweep file, imports every benchmark
+module once and calls its `main` with the arguments of each configuration:
+  python -m mlir.sandbox.batch_runner commands.txt \\
+    --command "python -m python.examples.copy.copy_2d_bench"
+
+A sweep file is a JSON or YAML file that runs a module on the cross-product of
+argument values, arguments with a single value being shared by all the runs:
+  module: python.examples.copy.copy_2d_bench
+  args:
+    dynamic_at_compile_time_list: '[]'
+    n_iters: 1000
+    problem_sizes_list: ['10,32', '10,48']
+    expert_list: [Tile8x32Peel, Tile6x32Peel]
+
+The configurations run in a worker process forked once the modules are
+imported. The worker compiles in a shared MLIR context, keeps the runtime
+shared libraries loaded and reuses the benchmark buffers between
+configurations. A configuration that raises is reported and the worker moves on
+to the next one; only a configuration that crashes or exceeds its timeout
+costs a new worker, forked again from the runner.
+"""
+
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import shlex
+import sys
+import time
+import traceback
+import typing as tp
+
+# Placeholder for the command of the configurations in a command list.
+command_placeholders = ('${COMMAND}', '$COMMAND')
+
+
+class Configuration():
+  """A run of the `main` function of `module` with the command line `argv`."""
+
+  def __init__(self, module: str, argv: tp.Sequence[str]):
+    self.module = module
+    self.argv = list(argv)
+
+  def __str__(self):
+    return ' '.join([self.module] + [shlex.quote(a) for a in self.argv])
+
+
+def parse_command(words: tp.Sequence[str]) -> Configuration:
+  """Return the configuration of a `python -m module args...` command.
+
+  Everything before `-m`, e.g. `cset proc ... -e python --`, is ignored.
+  """
+  if '-m' not in words or words.index('-m') + 1 == len(words):
+    raise ValueError(f'expected a `python -m module` command: {words}')
+  index = words.index('-m')
+  return Configuration(words[index + 1], words[index + 2:])
+
+
+def parse_command_list(lines: tp.Iterable[str],
+                       command: str = '') -> tp.List[Configuration]:
+  """Parse a command list, one command per line, substituting `command` for
+  ${COMMAND}. Empty lines, comments and enclosing parentheses are ignored."""
+  configurations = []
+  for line in lines:
+    line = line.strip()
+    if line.startswith('(') and line.endswith(')'):
+      line = line[1:-1].strip()
+    if not line or line.startswith('#'):
+      continue
+    words = []
+    for word in shlex.split(line):
+      words.extend(shlex.split(command) if word in command_placeholders else
+                   [word])
+    configurations.append(parse_command(words))
+  return configurations
+
+
+def _argument_value(value) -> str:
+  if isinstance(value, (list, tuple)):
+    return ','.join(str(v) for v in value)
+  return str(value)
+
+
+def expand_sweep(sweep: tp.Mapping[str, tp.Any]) -> tp.List[Configuration]:
+  """Return the configurations of a sweep description, see the module
+  documentation. Arguments are swept in order, the last one varying fastest."""
+  names = list(sweep.get('args', {}).keys())
+  values = [
+      v if isinstance(v, list) else [v] for v in sweep.get('args', {}).values()
+  ]
+  configurations = []
+  for point in itertools.product(*values):
+    argv = []
+    for name, value in zip(names, point):
+      argv += [f'--{name}', _argument_value(value)]
+    configurations.append(Configuration(sweep['module'], argv))
+  return configurations
+
+
+def load_configurations(file_name: str,
+                        command: str = '') -> tp.List[Configuration]:
+  """Load the configurations of a JSON or YAML sweep file or of a command
+  list."""
+  extension = os.path.splitext(file_name)[1]
+  with open(file_name) as f:
+    if extension in ('.yaml', '.yml'):
+      import yaml
+      return expand_sweep(yaml.safe_load(f))
+    if extension == '.json':
+      return expand_sweep(json.load(f))
+    return parse_command_list(f, command)
+
+
+def share_resources_between_configurations():
+  """Reuse the MLIR context and the benchmark buffers across the
+  configurations run by this process."""
+  from mlir.sandbox.harness import share_compilation_context
+  from mlir.sandbox.utils import BufferPool, set_buffer_pool
+  share_compilation_context()
+  set_buffer_pool(BufferPool())
+
+
+def _release_buffers():
+  utils = sys.modules.get('mlir.sandbox.utils')
+  if utils is not None and utils._buffer_pool is not None:
+    utils._buffer_pool.release_all()
+
+
+def run_configuration(configuration: Configuration) -> str:
+  """Run `configuration` in this process and return its status: 'SUCCESS' or
+  'FAILURE' if it raised or exited with an error."""
+  module = importlib.import_module(configuration.module)
+  saved_argv = sys.argv
+  sys.argv = [module.__file__] + configuration.argv
+  status = 'SUCCESS'
+  try:
+    module.main()
+  except SystemExit as e:
+    if e.code not in (None, 0):
+      status = 'FAILURE'
+  except Exception:
+    traceback.print_exc()
+    status = 'FAILURE'
+  finally:
+    sys.argv = saved_argv
+    _release_buffers()
+    sys.stdout.flush()
+    sys.stderr.flush()
+  return status
+
+
+def _worker(connection, configurations: tp.Sequence[Configuration],
+            share_resources: bool):
+  if share_resources:
+    share_resources_between_configurations()
+  while True:
+    index = connection.recv()
+    if index is None:
+      return
+    connection.send(run_configuration(configurations[index]))
+
+
+class _Worker():
+
+  def __init__(self, configurations: tp.Sequence[Configuration],
+               share_resources: bool):
+    context = multiprocessing.get_context('fork')
+    self.connection, worker_connection = context.Pipe()
+    self.process = context.Process(target=_worker,
+                                   args=(worker_connection, configurations,
+                                         share_resources),
+                                   daemon=True)
+    self.process.start()
+    worker_connection.close()
+
+  def run(self, index: int, timeout_s: tp.Optional[float]) -> str:
+    """Return the status of the `index`-th configuration, 'CRASH' or 'TIMEOUT'
+    if the worker died or was killed."""
+    self.connection.send(index)
+    deadline = None if timeout_s is None else time.monotonic() + timeout_s
+    try:
+      # The connection is closed, and becomes readable, when the worker dies.
+      while not self.connection.poll(0.1):
+        if deadline is not None and time.monotonic() > deadline:
+          self.process.kill()
+          self.process.join()
+          return 'TIMEOUT'
+      return self.connection.recv()
+    except (EOFError, ConnectionResetError):
+      self.process.join()
+      return 'CRASH'
+
+  def close(self):
+    if self.process.is_alive():
+      self.connection.send(None)
+    self.process.join()
+
+
+def run_configurations(configurations: tp.Sequence[Configuration],
+                       timeout_s: tp.Optional[float] = None,
+                       share_resources: bool = True,
+                       isolate: bool = True) -> tp.List[tp.Tuple[str, float]]:
+  """Run `configurations` in order and return the status and the duration in
+  seconds of each one.
+
+  Without `isolate`, the configurations run in this process and `timeout_s` is
+  ignored.
+  """
+  # Import the modules once, before forking the workers.
+  for module in dict.fromkeys(c.module for c in configurations):
+    importlib.import_module(module)
+  if not isolate and share_resources:
+    share_resources_between_configurations()
+
+  results = []
+  worker = None
+  for index, configuration in enumerate(configurations):
+    print(f'\n[{index + 1}/{len(configurations)}] {configuration}', flush=True)
+    start = time.monotonic()
+    if not isolate:
+      status = run_configuration(configuration)
+    else:
+      if worker is None:
+        worker = _Worker(configurations, share_resources)
+      status = worker.run(index, timeout_s)
+      if status in ('CRASH', 'TIMEOUT'):
+        worker = None
+    results.append((status, time.monotonic() - start))
+    if status != 'SUCCESS':
+      print(f'[{index + 1}/{len(configurations)}] {status}', flush=True)
+  if worker is not None:
+    worker.close()
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Run benchmark configurations in a single process')
+  parser.add_argument('configurations',
+                      type=str,
+                      help='command list, or JSON or YAML sweep file')
+  parser.add_argument('--command',
+                      type=str,
+                      default='',
+                      help='command substituted for ${COMMAND} in the list '
+                      '(e.g., --command "python -m python.examples.copy.'
+                      'copy_2d_bench --dynamic_at_compile_time_list []")')
+  parser.add_argument('--timeout',
+                      type=float,
+                      default=None,
+                      help='timeout of a configuration in seconds')
+  parser.add_argument('--no-isolation',
+                      dest='isolate',
+                      action='store_false',
+                      help='run in this process, a crash ends the batch')
+  parser.add_argument('--no-sharing',
+                      dest='share_resources',
+                      action='store_false',
+                      help='use a new MLIR context and new buffers for every '
+                      'configuration')
+  args = parser.parse_args()
+
+  configurations = load_configurations(args.configurations, args.command)
+  start = time.monotonic()
+  results = run_configurations(configurations,
+                               timeout_s=args.timeout,
+                               share_resources=args.share_resources,
+                               isolate=args.isolate)
+  failures = [(c, status)
+              for c, (status, _) in zip(configurations, results)
+              if status != 'SUCCESS']
+  print(f'\n{len(configurations) - len(failures)}/{len(configurations)} '
+        f'configurations succeeded in {time.monotonic() - start:.1f} s')
+  for configuration, status in failures:
+    print(f'{status}: {configuration}')
+  sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+  main()
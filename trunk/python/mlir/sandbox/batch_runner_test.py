@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+from python.mlir.sandbox.batch_runner import load_configurations, \
+    parse_command_list, run_configurations
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+  # A fake benchmark that records its arguments and the process it runs in.
+  with open(os.path.join(tmp_dir, 'fake_bench.py'), 'w') as f:
+    f.write(f'''
+import argparse, os, sys
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--problem_sizes_list', type=str)
+  parser.add_argument('--expert_list', type=str, default='')
+  args = parser.parse_args(sys.argv[1:])
+  if args.expert_list == 'Raise':
+    raise RuntimeError('expected failure')
+  if args.expert_list == 'Crash':
+    os._exit(3)
+  if args.expert_list == 'Hang':
+    import time
+    time.sleep(60)
+  with open({os.path.join(tmp_dir, 'runs')!r}, 'a') as f:
+    f.write(f'{{os.getpid()}} {{args.expert_list}} {{args.problem_sizes_list}}\\n')
+''')
+  sys.path.insert(0, tmp_dir)
+
+  # Command lists as printed by the tools.
+  configurations = parse_command_list([
+      '# Comment.', '',
+      '(${COMMAND} --expert_list Tile8x32Peel --problem_sizes_list 10,32)',
+      'cset proc -e python -- -m fake_bench --problem_sizes_list "16,32"'
+  ], 'python -m fake_bench')
+  assert [c.module for c in configurations] == ['fake_bench', 'fake_bench']
+  assert configurations[0].argv == [
+      '--expert_list', 'Tile8x32Peel', '--problem_sizes_list', '10,32'
+  ]
+  assert configurations[1].argv == ['--problem_sizes_list', '16,32']
+
+  # Sweeps are the cross-product of the argument values.
+  sweep_file = os.path.join(tmp_dir, 'sweep.json')
+  with open(sweep_file, 'w') as f:
+    json.dump(
+        {
+            'module': 'fake_bench',
+            'args': {
+                'problem_sizes_list': [[10, 32], [16, 32]],
+                'expert_list': ['A', 'Raise', 'Crash', 'Hang', 'B']
+            }
+        }, f)
+  configurations = load_configurations(sweep_file)
+  assert len(configurations) == 10
+  assert configurations[1].argv == [
+      '--problem_sizes_list', '10,32', '--expert_list', 'Raise'
+  ]
+
+  # Failures do not stop the batch and only crashes and timeouts cost a new
+  # worker.
+  # The runner prints the statuses, which include FAILURE.
+  with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    results = run_configurations(configurations,
+                                 timeout_s=2,
+                                 share_resources=False)
+  statuses = [status for status, _ in results]
+  assert statuses == ['SUCCESS', 'FAILURE', 'CRASH', 'TIMEOUT', 'SUCCESS'] * 2
+  with open(os.path.join(tmp_dir, 'runs')) as f:
+    runs = [line.split() for line in f]
+  assert [r[1:] for r in runs] == [['A', '10,32'], ['B', '10,32'],
+                                   ['A', '16,32'], ['B', '16,32']]
+  pids = [r[0] for r in runs]
+  # The worker survives failures.
+  assert pids[0] != pids[1] and pids[1] == pids[2] and pids[2] != pids[3]
+  assert str(os.getpid()) not in pids
+
+  # In-process runs.
+  os.remove(os.path.join(tmp_dir, 'runs'))
+  with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    results = run_configurations(configurations[:2],
+                                 share_resources=False,
+                                 isolate=False)
+  assert [status for status, _ in results] == ['SUCCESS', 'FAILURE']
+  with open(os.path.join(tmp_dir, 'runs')) as f:
+    assert f.read().split()[0] == str(os.getpid())
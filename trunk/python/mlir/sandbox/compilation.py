@@ -149,12 +149,8 @@ def emit_benchmarking_function(name: str,
   return wrapper
 
 
-# JIT compile and return an execution engine that can be invoked.
-# Needs to be run under Context.
-def compile_to_execution_engine(module,
-                                transform: Callable,
-                                opt_level: int = 3):
-  transformed_module = transform(module)
+# Return the runtime libraries compiled modules are linked against.
+def get_runtime_shared_libs() -> Sequence[str]:
   shared_libs = [
       os.getenv(_MLIR_RUNNER_UTILS_LIB_ENV, _MLIR_RUNNER_UTILS_LIB_DEFAULT),
       os.getenv(_MLIR_C_RUNNER_UTILS_LIB_ENV, _MLIR_C_RUNNER_UTILS_LIB_DEFAULT)
@@ -162,7 +158,16 @@ def compile_to_execution_engine(module,
   extra_libs = os.getenv(_MLIR_RUNNER_EXTRA_LIBS_ENV)
   if extra_libs is not None:
     shared_libs.append(*(str(extra_libs).split(',')))
+  return shared_libs
+
+
+# JIT compile and return an execution engine that can be invoked.
+# Needs to be run under Context.
+def compile_to_execution_engine(module,
+                                transform: Callable,
+                                opt_level: int = 3):
+  transformed_module = transform(module)
   execution_engine = ExecutionEngine(transformed_module,
                                      opt_level,
-                                     shared_libs=shared_libs)
+                                     shared_libs=get_runtime_shared_libs())
   return transformed_module, execution_engine
@@ -0,0 +1,199 @@
+"""Pickle-able compiled problems.
+
+An ExecutionEngine cannot be pickled, so a module compiled in one process
+cannot be benchmarked in another one. A `CompiledArtifact` captures the object
+code of the lowered module together with a manifest that describes how to
+invoke it. It can be sent through multiprocessing queues, saved to disk and
+loaded in another process, which exposes the same `invoke` interface as the
+ExecutionEngine.
+
+The object code is position independent, compiled from the lowered module with
+mlir-translate and llc, which are found in the PATH or through the
+SANDBOX_MLIR_TRANSLATE and SANDBOX_LLC environment variables.
+"""
+
+import ctypes
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+def _tool(env_var: str, name: str) -> str:
+  path = os.getenv(env_var)
+  tool = shutil.which(path or name)
+  if tool is None:
+    where = f'{env_var}={path}' if path else 'the PATH'
+    raise FileNotFoundError(
+        f'{name} is required to compile artifacts but was not found in '
+        f'{where}, set {env_var} to the {name} binary')
+  return tool
+
+
+def check_tools():
+  """Raise FileNotFoundError naming the first of mlir-translate and llc that
+  cannot be found, before any artifact is compiled."""
+  _tool('SANDBOX_MLIR_TRANSLATE', 'mlir-translate')
+  _tool('SANDBOX_LLC', 'llc')
+
+
+def compile_llvm_ir_to_pic_object(llvm_ir: str, opt_level: int = 3) -> bytes:
+  """Compile LLVM IR to position independent object code for the host."""
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    object_file = os.path.join(tmp_dir, 'module.o')
+    subprocess.run([
+        _tool('SANDBOX_LLC', 'llc'), f'-O{opt_level}', '-mcpu=native',
+        '-relocation-model=pic', '-filetype=obj', '-o', object_file
+    ],
+                   input=llvm_ir.encode(),
+                   check=True,
+                   capture_output=True)
+    with open(object_file, 'rb') as f:
+      return f.read()
+
+
+def compile_llvm_dialect_to_pic_object(llvm_dialect_ir: str,
+                                       opt_level: int = 3) -> bytes:
+  """Compile a module in the LLVM dialect to position independent object code
+  for the host."""
+  llvm_ir = subprocess.run(
+      [_tool('SANDBOX_MLIR_TRANSLATE', 'mlir-translate'), '--mlir-to-llvmir'],
+      input=llvm_dialect_ir.encode(),
+      check=True,
+      capture_output=True).stdout.decode()
+  return compile_llvm_ir_to_pic_object(llvm_ir, opt_level)
+
+
+class CompiledArtifact:
+  """Object code of a compiled problem and the manifest to invoke it.
+
+  The manifest records the entry point, the element types and the compile-time
+  problem sizes of the function signature as well as the runtime libraries the
+  object code depends on. The object code is position independent and exposes
+  the `_mlir_ciface_` wrappers of the functions, see
+  `compile_llvm_dialect_to_pic_object`. The lowered module in the LLVM dialect
+  is kept as a fallback to JIT the artifact again when the object code cannot
+  be linked on the loading side.
+  """
+
+  def __init__(self, object_code: bytes, entry_point_name: str,
+               np_types: Sequence[np.dtype],
+               compile_time_problem_sizes_dict: Mapping[str, Any],
+               shared_libs: Sequence[str], llvm_dialect_ir: str,
+               opt_level: int):
+    self.object_code = object_code
+    self.entry_point_name = entry_point_name
+    self.np_type_names = [np.dtype(t).name for t in np_types]
+    self.compile_time_problem_sizes_dict = dict(
+        compile_time_problem_sizes_dict)
+    self.shared_libs = list(shared_libs)
+    self.llvm_dialect_ir = llvm_dialect_ir
+    self.opt_level = opt_level
+
+  @property
+  def np_types(self) -> Sequence[np.dtype]:
+    return [np.dtype(name).type for name in self.np_type_names]
+
+  @property
+  def manifest(self) -> Mapping[str, Any]:
+    """Return the signature manifest of the artifact."""
+    return {
+        'entry_point_name': self.entry_point_name,
+        'np_types': self.np_type_names,
+        'compile_time_problem_sizes_dict': self.compile_time_problem_sizes_dict,
+        'shared_libs': self.shared_libs,
+        'opt_level': self.opt_level,
+        'object_code_size': len(self.object_code),
+    }
+
+  def save(self, file_name: str):
+    """Save the artifact to `file_name`."""
+    with open(file_name, 'wb') as f:
+      pickle.dump(self, f)
+
+  @staticmethod
+  def load_from_file(file_name: str) -> 'CompiledArtifact':
+    """Load an artifact previously saved with `save`."""
+    with open(file_name, 'rb') as f:
+      return pickle.load(f)
+
+  def dump_to_object_file(self, file_name: str):
+    with open(file_name, 'wb') as f:
+      f.write(self.object_code)
+
+  def load(self, work_dir: Optional[str] = None):
+    """Make the artifact invocable in the current process.
+
+    The object code is linked into a shared library in `work_dir` (a temporary
+    directory by default). If linking fails, e.g. because the object code was
+    compiled for another host, the lowered module is JIT compiled again.
+    """
+    try:
+      return LinkedArtifact(self, work_dir)
+    except (OSError, subprocess.CalledProcessError):
+      return JitCompiledArtifact(self)
+
+
+class LinkedArtifact:
+  """An artifact whose object code is linked into a shared library."""
+
+  def __init__(self, artifact: CompiledArtifact, work_dir: Optional[str]):
+    self.artifact = artifact
+    self._work_dir = None
+    if work_dir is None:
+      self._work_dir = tempfile.TemporaryDirectory(prefix='sandbox_artifact_')
+      work_dir = self._work_dir.name
+    object_file = os.path.join(work_dir, 'artifact.o')
+    library_file = os.path.join(work_dir, 'artifact.so')
+    artifact.dump_to_object_file(object_file)
+
+    # Runtime libraries must be loaded globally before the artifact so that
+    # the symbols it references (e.g. nanoTime) resolve.
+    self._runtime_libraries = [
+        ctypes.CDLL(lib, mode=ctypes.RTLD_GLOBAL) for lib in artifact.shared_libs
+    ]
+    subprocess.run(
+        [os.getenv('CC', 'cc'), '-shared', '-o', library_file, object_file],
+        check=True,
+        capture_output=True)
+    self._library = ctypes.CDLL(library_file)
+
+  def lookup(self, name: str):
+    func = getattr(self._library, '_mlir_ciface_' + name)
+    func.restype = None
+    return func
+
+  def invoke(self, name: str, *ctypes_args):
+    """Invoke `name` with the arguments of ExecutionEngine.invoke, i.e. the
+    pointers to the pointers to the memref descriptors."""
+    self.lookup(name)(*[arg.contents for arg in ctypes_args])
+
+  def dump_to_object_file(self, file_name: str):
+    self.artifact.dump_to_object_file(file_name)
+
+
+class JitCompiledArtifact:
+  """An artifact JIT compiled again from its lowered LLVM dialect module."""
+
+  def __init__(self, artifact: CompiledArtifact):
+    from iree.compiler.execution_engine import ExecutionEngine
+    from iree.compiler.ir import Context, Module
+
+    self.artifact = artifact
+    # The context must outlive the execution engine.
+    self._context = Context()
+    with self._context:
+      module = Module.parse(artifact.llvm_dialect_ir)
+      self._execution_engine = ExecutionEngine(
+          module, artifact.opt_level, shared_libs=artifact.shared_libs)
+
+  def invoke(self, name: str, *ctypes_args):
+    self._execution_engine.invoke(name, *ctypes_args)
+
+  def dump_to_object_file(self, file_name: str):
+    self._execution_engine.dump_to_object_file(file_name)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import ctypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from python.mlir.sandbox.compiled_artifact import CompiledArtifact, \
+  LinkedArtifact, check_tools, compile_llvm_ir_to_pic_object
+
+# The `_mlir_ciface_` wrapper of a function filling a 1-D memref of f32.
+fill_source = '''
+struct MemRef1D {
+  float *allocated, *aligned;
+  long offset, sizes[1], strides[1];
+};
+
+void _mlir_ciface_fill(struct MemRef1D *memref) {
+  for (long i = 0; i < memref->sizes[0]; ++i)
+    memref->aligned[memref->offset + i * memref->strides[0]] = 42.0f;
+}
+'''
+
+
+class MemRef1D(ctypes.Structure):
+  _fields_ = [('allocated', ctypes.POINTER(ctypes.c_float)),
+              ('aligned', ctypes.POINTER(ctypes.c_float)),
+              ('offset', ctypes.c_long), ('sizes', ctypes.c_long * 1),
+              ('strides', ctypes.c_long * 1)]
+
+
+def make_artifact(object_code: bytes, entry_point_name: str):
+  return CompiledArtifact(object_code,
+                          entry_point_name, [np.float32], {'N': 8},
+                          shared_libs=[],
+                          llvm_dialect_ir='',
+                          opt_level=3)
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+  source_file = os.path.join(tmp_dir, 'fill.c')
+  object_file = os.path.join(tmp_dir, 'fill.o')
+  with open(source_file, 'w') as f:
+    f.write(fill_source)
+  subprocess.run([
+      os.getenv('CC', 'cc'), '-O2', '-fPIC', '-c', '-o', object_file,
+      source_file
+  ],
+                 check=True)
+  with open(object_file, 'rb') as f:
+    artifact = make_artifact(f.read(), 'fill')
+
+  # The artifact round trips through a file, e.g. to another process.
+  artifact_file = os.path.join(tmp_dir, 'fill.artifact')
+  artifact.save(artifact_file)
+  loaded = CompiledArtifact.load_from_file(artifact_file)
+  assert loaded.manifest == artifact.manifest, loaded.manifest
+  assert loaded.np_types == [np.float32]
+
+  # Invoke it like an ExecutionEngine, with pointers to pointers to the memref
+  # descriptors.
+  array = np.zeros([8], dtype=np.float32)
+  data = array.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+  descriptor = MemRef1D(data, data, 0, (ctypes.c_long * 1)(8),
+                        (ctypes.c_long * 1)(1))
+  invocable = loaded.load(tmp_dir)
+  assert isinstance(invocable, LinkedArtifact)
+  invocable.invoke('fill', ctypes.pointer(ctypes.pointer(descriptor)))
+  assert np.all(array == 42.0), array
+
+# Object code compiled by llc links into a shared library.
+if os.getenv('SANDBOX_LLC') or shutil.which('llc'):
+  object_code = compile_llvm_ir_to_pic_object(
+      'define void @_mlir_ciface_nop() {\n  ret void\n}\n')
+  invocable = make_artifact(object_code, 'nop').load()
+  assert isinstance(invocable, LinkedArtifact)
+  invocable.invoke('nop')
+
+# A missing tool is reported by name before anything is compiled.
+with tempfile.TemporaryDirectory() as tmp_dir:
+  previous = os.environ.get('SANDBOX_MLIR_TRANSLATE')
+  os.environ['SANDBOX_MLIR_TRANSLATE'] = os.path.join(tmp_dir, 'missing')
+  try:
+    check_tools()
+  except FileNotFoundError as e:
+    assert 'mlir-translate' in str(e) and 'SANDBOX_MLIR_TRANSLATE' in str(e), e
+  else:
+    assert False, 'expected a missing mlir-translate to fail'
+  finally:
+    if previous is None:
+      del os.environ['SANDBOX_MLIR_TRANSLATE']
+    else:
+      os.environ['SANDBOX_MLIR_TRANSLATE'] = previous
@@ -0,0 +1,219 @@
+"""CPU topology of the host and the placement of benchmarks on it.
+
+The topology is read from /sys/devices/system: the SMT siblings of every CPU
+and the CPUs of every NUMA node. A `CpuPlan` assigns whole physical cores of a
+single NUMA node to every benchmark: a benchmark is pinned to one hardware
+thread per core and the SMT siblings of its cores stay idle, so that
+concurrent compilations or benchmarks cannot steal the execution units or the
+memory bandwidth of another node.
+
+The CPU sets of a plan can be passed to `Supervisor` or to
+`JobScheduler(pinned_cpus=...)`. Processes can bind their memory to the node
+of their CPUs with `bind_memory_to_node` if libnuma is installed.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import typing as tp
+
+default_sysfs_root = '/sys/devices/system'
+
+
+def parse_cpu_list(cpu_list: str) -> tp.List[int]:
+  """Parse a sysfs CPU list such as `0-3,8,10-11`."""
+  cpus = []
+  for chunk in cpu_list.strip().split(','):
+    if not chunk:
+      continue
+    first, _, last = chunk.partition('-')
+    cpus.extend(range(int(first), int(last or first) + 1))
+  return cpus
+
+
+def _read(path: str) -> tp.Optional[str]:
+  try:
+    with open(path) as f:
+      return f.read()
+  except OSError:
+    return None
+
+
+class CpuTopology():
+  """The physical cores of the CPUs available to this process, by NUMA node.
+
+  `cores` maps every node to its cores, every core being the sorted list of its
+  available hardware threads (SMT siblings).
+  """
+
+  def __init__(self, cores: tp.Mapping[int, tp.Sequence[tp.Sequence[int]]]):
+    self.cores = {
+        node: sorted(sorted(core) for core in node_cores)
+        for node, node_cores in cores.items()
+        if node_cores
+    }
+
+  @staticmethod
+  def read(sysfs_root: str = default_sysfs_root,
+           allowed_cpus: tp.Optional[tp.Iterable[int]] = None):
+    """Read the topology of `allowed_cpus` (the affinity of this process by
+    default).
+
+    Without sysfs information, every CPU is considered a core of node 0.
+    """
+    allowed = set(allowed_cpus if allowed_cpus is not None else
+                  os.sched_getaffinity(0))
+    node_of_cpu = {}
+    node_dir = os.path.join(sysfs_root, 'node')
+    if os.path.isdir(node_dir):
+      for entry in os.listdir(node_dir):
+        if not entry.startswith('node') or not entry[4:].isdigit():
+          continue
+        cpu_list = _read(os.path.join(node_dir, entry, 'cpulist'))
+        for cpu in parse_cpu_list(cpu_list or ''):
+          node_of_cpu[cpu] = int(entry[4:])
+
+    cores = {}
+    seen = set()
+    for cpu in sorted(allowed):
+      if cpu in seen:
+        continue
+      siblings = _read(
+          os.path.join(sysfs_root, 'cpu', f'cpu{cpu}', 'topology',
+                       'thread_siblings_list'))
+      core = [c for c in parse_cpu_list(siblings or str(cpu)) if c in allowed]
+      if cpu not in core:
+        core = [cpu]
+      seen.update(core)
+      cores.setdefault(node_of_cpu.get(cpu, 0), []).append(core)
+    return CpuTopology(cores)
+
+  def nodes(self) -> tp.List[int]:
+    return sorted(self.cores.keys())
+
+  def num_cores(self) -> int:
+    return sum(len(c) for c in self.cores.values())
+
+  def cpus(self) -> tp.List[int]:
+    return sorted(
+        cpu for node_cores in self.cores.values() for core in node_cores
+        for cpu in core)
+
+  def plan(self,
+           num_cores_per_benchmark: int,
+           num_benchmark_cores: tp.Optional[int] = None):
+    """Plan the benchmark CPU sets and the compile CPUs.
+
+    Every benchmark gets `num_cores_per_benchmark` cores of a single node and
+    runs on the first hardware thread of each core. If `num_benchmark_cores`
+    is None, benchmarks are placed on all the nodes and compilations run on
+    the benchmark CPUs (coupled mode). Otherwise, that many cores are reserved
+    for benchmarks and all the hardware threads of the other cores are
+    reserved for compilations. Cores that cannot form a whole benchmark within
+    a node stay idle.
+    """
+    assert num_cores_per_benchmark > 0, \
+      'expected at least one core per benchmark'
+    if num_benchmark_cores is not None:
+      assert num_benchmark_cores % num_cores_per_benchmark == 0, \
+        f'num_cores_per_benchmark: {num_cores_per_benchmark} ' + \
+        f'must divide the number of benchmark cores: {num_benchmark_cores}'
+      assert num_benchmark_cores < self.num_cores(), \
+        f'num_benchmark_cores: {num_benchmark_cores} must leave cores for ' + \
+        f'compilation out of {self.num_cores()}'
+      num_benchmarks = num_benchmark_cores // num_cores_per_benchmark
+    else:
+      num_benchmarks = None
+
+    benchmark_cpu_sets, benchmark_nodes, used_cores = [], [], []
+    for node in self.nodes():
+      node_cores = self.cores[node]
+      for i in range(len(node_cores) // num_cores_per_benchmark):
+        if num_benchmarks is not None and \
+            len(benchmark_cpu_sets) == num_benchmarks:
+          break
+        cores = node_cores[i * num_cores_per_benchmark:(i + 1) *
+                           num_cores_per_benchmark]
+        benchmark_cpu_sets.append([core[0] for core in cores])
+        benchmark_nodes.append(node)
+        used_cores.extend(cores)
+    assert benchmark_cpu_sets, \
+      f'no node has {num_cores_per_benchmark} cores: {self.cores}'
+    assert num_benchmarks in (None, len(benchmark_cpu_sets)), \
+      f'could only place {len(benchmark_cpu_sets)} benchmarks of ' + \
+      f'{num_cores_per_benchmark} cores within the nodes: {self.cores}'
+
+    compile_cpus = None
+    if num_benchmarks is not None:
+      compile_cpus = sorted(
+          cpu for node_cores in self.cores.values() for core in node_cores
+          if core not in used_cores for cpu in core)
+    busy = set(cpu for s in benchmark_cpu_sets for cpu in s) | \
+      set(compile_cpus or [])
+    idle_cpus = [cpu for cpu in self.cpus() if cpu not in busy]
+    return CpuPlan(benchmark_cpu_sets, benchmark_nodes, compile_cpus,
+                   idle_cpus)
+
+
+class CpuPlan():
+  """The CPUs assigned to benchmarks and compilations.
+
+  Arguments:
+  benchmark_cpu_sets: the CPUs of every benchmark.
+  benchmark_nodes: the NUMA node of every benchmark.
+  compile_cpus: the CPUs reserved for compilations, None if compilations run
+    on the benchmark CPUs.
+  idle_cpus: the CPUs left idle, including the SMT siblings of benchmark cores.
+  """
+
+  def __init__(self, benchmark_cpu_sets: tp.Sequence[tp.Sequence[int]],
+               benchmark_nodes: tp.Sequence[int],
+               compile_cpus: tp.Optional[tp.Sequence[int]],
+               idle_cpus: tp.Sequence[int]):
+    self.benchmark_cpu_sets = [list(s) for s in benchmark_cpu_sets]
+    self.benchmark_nodes = list(benchmark_nodes)
+    self.compile_cpus = list(compile_cpus) if compile_cpus is not None \
+      else None
+    self.idle_cpus = list(idle_cpus)
+
+  def __str__(self):
+    ranges = ', '.join(f'{s}@node{n}' for s, n in zip(self.benchmark_cpu_sets,
+                                                      self.benchmark_nodes))
+    return f'benchmark cpus: [{ranges}], ' + \
+           f'compile cpus: {self.compile_cpus}, idle cpus: {self.idle_cpus}'
+
+
+_libnuma = None
+
+
+def _load_libnuma():
+  global _libnuma
+  if _libnuma is None:
+    _libnuma = False
+    name = ctypes.util.find_library('numa')
+    if name is not None:
+      lib = ctypes.CDLL(name)
+      if lib.numa_available() >= 0:
+        lib.numa_parse_nodestring.restype = ctypes.c_void_p
+        lib.numa_parse_nodestring.argtypes = [ctypes.c_char_p]
+        lib.numa_set_membind.argtypes = [ctypes.c_void_p]
+        lib.numa_bitmask_free.argtypes = [ctypes.c_void_p]
+        _libnuma = lib
+  return _libnuma
+
+
+def bind_memory_to_node(node: int) -> bool:
+  """Allocate the memory of the calling process on `node` from now on.
+
+  Return False if the binding is not supported (libnuma is not installed or
+  the kernel has no NUMA support).
+  """
+  lib = _load_libnuma()
+  if not lib:
+    return False
+  mask = lib.numa_parse_nodestring(str(node).encode())
+  if not mask:
+    return False
+  lib.numa_set_membind(mask)
+  lib.numa_bitmask_free(mask)
+  return True
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+from python.mlir.sandbox.cpu_topology import CpuTopology, parse_cpu_list
+
+
+def write(path, content):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'w') as f:
+    f.write(content)
+
+
+assert parse_cpu_list('0-3,8,10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+
+# A dual-socket host with 4 cores per node and 2 hardware threads per core:
+# cpu i and cpu i + 8 are SMT siblings, cpus 0-3 and 8-11 are on node 0.
+with tempfile.TemporaryDirectory() as sysfs_root:
+  for cpu in range(16):
+    core = cpu % 8
+    write(
+        os.path.join(sysfs_root, 'cpu', f'cpu{cpu}', 'topology',
+                     'thread_siblings_list'), f'{core},{core + 8}\n')
+  write(os.path.join(sysfs_root, 'node', 'node0', 'cpulist'), '0-3,8-11\n')
+  write(os.path.join(sysfs_root, 'node', 'node1', 'cpulist'), '4-7,12-15\n')
+  topology = CpuTopology.read(sysfs_root, allowed_cpus=range(16))
+  assert topology.num_cores() == 8, f'wrong number of cores: {topology.cores}'
+
+  # Coupled: benchmarks never span nodes nor share a core.
+  plan = topology.plan(num_cores_per_benchmark=3)
+  assert plan.benchmark_cpu_sets == [[0, 1, 2], [4, 5, 6]], str(plan)
+  assert plan.benchmark_nodes == [0, 1], str(plan)
+  assert plan.compile_cpus is None, str(plan)
+  assert plan.idle_cpus == [3, 7, 8, 9, 10, 11, 12, 13, 14, 15], str(plan)
+
+  # Decoupled: compilations get all the threads of the remaining cores.
+  plan = topology.plan(num_cores_per_benchmark=2, num_benchmark_cores=4)
+  assert plan.benchmark_cpu_sets == [[0, 1], [2, 3]], str(plan)
+  assert plan.benchmark_nodes == [0, 0], str(plan)
+  assert plan.compile_cpus == [4, 5, 6, 7, 12, 13, 14, 15], str(plan)
+  assert plan.idle_cpus == [8, 9, 10, 11], str(plan)
+
+  # Restricted affinity: only the available siblings are considered.
+  topology = CpuTopology.read(sysfs_root, allowed_cpus=[0, 8, 1, 5])
+  assert topology.cores == {0: [[0, 8], [1]], 1: [[5]]}, str(topology.cores)
@@ -0,0 +1,333 @@
+"""Local web dashboard of the benchmark result store.
+
+Serves a page showing, for the runs selected by benchmark, expert, types and
+host:
+  - the p50 throughput or time versus problem size of every benchmark and
+    expert,
+  - the distribution of the iterations of every benchmark, expert and problem
+    size,
+  - the p50 of the runs over time.
+The results are aggregated by the store and the page only receives summaries,
+as JSON from the /api/ endpoints, which it draws as SVG without external
+scripts:
+  python -m mlir.sandbox.dashboard results.sqlite --port 8000
+"""
+
+import argparse
+import functools
+import http.server
+import json
+import re
+import typing as tp
+import urllib.parse
+
+from mlir.sandbox.result_store import ResultStore, metrics
+
+# The filters of the page, see `ResultStore`.
+filters = ('benchmark', 'expert', 'np_types', 'host')
+
+
+def problem_volume(problem_sizes: str) -> int:
+  """Return the product of the integer sizes of a problem size label, e.g.
+  `m=10,n=32,strides=[1, 2]` -> 320."""
+  volume = 1
+  for size in re.findall(r"""(?:^|,)\s*[a-zA-Z]+=(\d+)(?=,|$)""",
+                         problem_sizes):
+    volume *= int(size)
+  return volume
+
+
+def _sorted_by_problem_volume(
+    rows: tp.List[tp.Dict[str, tp.Any]]) -> tp.List[tp.Dict[str, tp.Any]]:
+  return sorted(rows, key=lambda row: problem_volume(row['problem_sizes']))
+
+
+def query(store: ResultStore, endpoint: str,
+          parameters: tp.Mapping[str, tp.Sequence[str]]) -> tp.Any:
+  """Return the summary served by `endpoint` for the query `parameters`, the
+  values of every filter and the metric."""
+  if endpoint == 'filters':
+    return {name: store.distinct_values(name) for name in filters}
+  metric = parameters.get('metric', ['gflop_per_s'])[0]
+  if metric not in metrics:
+    raise ValueError(f'unknown metric: {metric}, expected {metrics}')
+  selected = {name: parameters.get(name) for name in filters}
+  if endpoint == 'p50_by_problem_size':
+    return _sorted_by_problem_volume(
+        store.p50_by_problem_size(metric, **selected))
+  if endpoint == 'distributions':
+    return _sorted_by_problem_volume(
+        store.sample_quantiles(metric, **selected))
+  if endpoint == 'time_series':
+    return store.p50_over_time(metric=metric, **selected)
+  raise KeyError(endpoint)
+
+
+class DashboardHandler(http.server.BaseHTTPRequestHandler):
+  """Serves the page and the /api/ endpoints, opening the store for every
+  request since SQLite connections are not shared between threads."""
+
+  def __init__(self, *args, store_file: str, **kwargs):
+    self.store_file = store_file
+    super().__init__(*args, **kwargs)
+
+  def _send(self, status: int, content_type: str, body: str):
+    data = body.encode()
+    self.send_response(status)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def do_GET(self):
+    url = urllib.parse.urlparse(self.path)
+    if url.path in ('/', '/index.html'):
+      self._send(200, 'text/html; charset=utf-8', _page)
+      return
+    if not url.path.startswith('/api/'):
+      self._send(404, 'text/plain', 'not found')
+      return
+    store = ResultStore(self.store_file)
+    try:
+      body = json.dumps(
+          query(store, url.path[len('/api/'):],
+                urllib.parse.parse_qs(url.query)))
+    except KeyError:
+      self._send(404, 'text/plain', 'not found')
+      return
+    except ValueError as e:
+      self._send(400, 'text/plain', str(e))
+      return
+    finally:
+      store.close()
+    self._send(200, 'application/json', body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+def make_server(store_file: str,
+                host: str = 'localhost',
+                port: int = 8000) -> http.server.ThreadingHTTPServer:
+  """Return a server of the dashboard of `store_file`, port 0 picking a free
+  port."""
+  return http.server.ThreadingHTTPServer(
+      (host, port), functools.partial(DashboardHandler, store_file=store_file))
+
+
+_page = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Benchmark dashboard</title>
+<style>
+body { font-family: sans-serif; margin: 1em; }
+#filters { display: flex; gap: 1em; align-items: flex-start; }
+select[multiple] { min-width: 12em; height: 8em; }
+h2 { font-size: 1.1em; margin-top: 1.5em; }
+svg text { font-size: 10px; }
+.axis { stroke: #888; }
+</style>
+</head>
+<body>
+<h1>Benchmark dashboard</h1>
+<div id="filters">
+  <label>metric<br><select id="metric">
+    <option>gflop_per_s</option><option>gbyte_per_s</option>
+    <option>elapsed_s</option></select></label>
+</div>
+<h2>p50 versus problem size (best run)</h2><div id="p50"></div>
+<h2>Distribution of the iterations (5%, 25%, 50%, 75%, 95%)</h2>
+<div id="distributions"></div>
+<h2>p50 over time</h2><div id="time_series"></div>
+<script>
+const filters = ['benchmark', 'expert', 'np_types', 'host'];
+const colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+const width = 960, height = 320, margin = 50;
+
+function el(name, attributes, text) {
+  const e = document.createElementNS('http://www.w3.org/2000/svg', name);
+  for (const [k, v] of Object.entries(attributes)) e.setAttribute(k, v);
+  if (text !== undefined) e.textContent = text;
+  return e;
+}
+
+function chart(id, xLabels, maximum, draw, series) {
+  const svg = el('svg', {width: width, height: height + 90});
+  svg.appendChild(el('line', {x1: margin, y1: height, x2: width, y2: height,
+                              class: 'axis'}));
+  svg.appendChild(el('line', {x1: margin, y1: 10, x2: margin, y2: height,
+                              class: 'axis'}));
+  const x = i => margin + (i + 0.5) * (width - margin) / xLabels.length;
+  const y = v => height - v / (maximum || 1) * (height - 10);
+  for (let t = 0; t <= 4; t++) {
+    svg.appendChild(el('text', {x: 2, y: y(maximum * t / 4)},
+                       (maximum * t / 4).toPrecision(3)));
+  }
+  xLabels.forEach((label, i) => {
+    if (xLabels.length > 40 && i % Math.ceil(xLabels.length / 40)) return;
+    svg.appendChild(el('text', {x: x(i), y: height + 12, 'text-anchor': 'end',
+                                transform: `rotate(-30 ${x(i)} ${height + 12})`},
+                       label));
+  });
+  draw(svg, x, y);
+  series.forEach((name, i) => svg.appendChild(
+      el('text', {x: margin + 10 + 230 * (i % 4),
+                  y: height + 60 + 12 * Math.floor(i / 4),
+                  fill: colors[i % colors.length]}, name)));
+  document.getElementById(id).replaceChildren(svg);
+}
+
+function groupBy(rows, key) {
+  const groups = new Map();
+  for (const row of rows) {
+    const k = key(row);
+    if (!groups.has(k)) groups.set(k, []);
+    groups.get(k).push(row);
+  }
+  return groups;
+}
+
+function drawP50(rows) {
+  const sizes = [...new Set(rows.map(r => r.problem_sizes))];
+  const series = groupBy(rows, r => r.benchmark + ' ' + r.expert);
+  const maximum = Math.max(0, ...rows.map(r => r.best_p50));
+  chart('p50', sizes, maximum, (svg, x, y) => {
+    [...series.values()].forEach((points, i) => {
+      const color = colors[i % colors.length];
+      const xy = points.map(p => [x(sizes.indexOf(p.problem_sizes)),
+                                  y(p.best_p50)]);
+      svg.appendChild(el('polyline', {points: xy.join(' '), fill: 'none',
+                                      stroke: color}));
+      points.forEach((p, j) => {
+        const c = el('circle', {cx: xy[j][0], cy: xy[j][1], r: 3,
+                                fill: color});
+        c.appendChild(el('title', {}, `${p.benchmark} ${p.expert} ` +
+            `${p.problem_sizes}: best ${p.best_p50.toPrecision(4)}, ` +
+            `mean ${p.mean_p50.toPrecision(4)} over ${p.n_runs} runs`));
+        svg.appendChild(c);
+      });
+    });
+  }, [...series.keys()]);
+}
+
+function drawDistributions(rows) {
+  const labels = rows.map(r => r.problem_sizes);
+  const names = [...new Set(rows.map(r => r.benchmark + ' ' + r.expert))];
+  const maximum = Math.max(0, ...rows.map(r => r.quantiles[4]));
+  chart('distributions', labels, maximum, (svg, x, y) => {
+    rows.forEach((r, i) => {
+      const [q5, q25, q50, q75, q95] = r.quantiles.map(y);
+      const color = colors[names.indexOf(r.benchmark + ' ' + r.expert) %
+                           colors.length];
+      const w = Math.max(2, 0.3 * (width - margin) / rows.length);
+      const g = el('g', {stroke: color});
+      g.appendChild(el('line', {x1: x(i), x2: x(i), y1: q5, y2: q95}));
+      g.appendChild(el('rect', {x: x(i) - w / 2, y: q75, width: w,
+                                height: Math.max(1, q25 - q75),
+                                fill: 'white'}));
+      g.appendChild(el('line', {x1: x(i) - w / 2, x2: x(i) + w / 2,
+                                y1: q50, y2: q50}));
+      g.appendChild(el('title', {}, `${r.benchmark} ${r.expert} ` +
+          `${r.problem_sizes}: ${r.quantiles.map(
+              q => q.toPrecision(4)).join(', ')} over ${r.n_iters} ` +
+          'iterations'));
+      svg.appendChild(g);
+    });
+  }, names);
+}
+
+function drawTimeSeries(rows) {
+  const dates = [...new Set(rows.map(r => r.timestamp))];
+  const series = groupBy(rows, r => `${r.benchmark} ${r.expert} ` +
+                                    r.problem_sizes);
+  const maximum = Math.max(0, ...rows.map(r => r.p50));
+  chart('time_series', dates.map(d => new Date(d * 1000).toLocaleString()),
+        maximum, (svg, x, y) => {
+    [...series.values()].forEach((points, i) => {
+      const color = colors[i % colors.length];
+      const xy = points.map(p => [x(dates.indexOf(p.timestamp)), y(p.p50)]);
+      svg.appendChild(el('polyline', {points: xy.join(' '), fill: 'none',
+                                      stroke: color}));
+      points.forEach((p, j) => {
+        const c = el('circle', {cx: xy[j][0], cy: xy[j][1], r: 2,
+                                fill: color});
+        c.appendChild(el('title', {}, `${p.host}: ${p.p50.toPrecision(4)}`));
+        svg.appendChild(c);
+      });
+    });
+  }, [...series.keys()]);
+}
+
+function queryString() {
+  const parameters = new URLSearchParams();
+  parameters.append('metric', document.getElementById('metric').value);
+  for (const name of filters) {
+    for (const option of document.getElementById(name).selectedOptions) {
+      parameters.append(name, option.value);
+    }
+  }
+  return parameters.toString();
+}
+
+async function fetchJson(endpoint) {
+  const response = await fetch(`/api/${endpoint}?${queryString()}`);
+  return response.json();
+}
+
+async function update() {
+  drawP50(await fetchJson('p50_by_problem_size'));
+  drawDistributions(await fetchJson('distributions'));
+  drawTimeSeries(await fetchJson('time_series'));
+}
+
+async function init() {
+  const values = await (await fetch('/api/filters')).json();
+  const container = document.getElementById('filters');
+  for (const name of filters) {
+    const label = document.createElement('label');
+    label.append(name, document.createElement('br'));
+    const select = document.createElement('select');
+    select.id = name;
+    select.multiple = true;
+    for (const value of values[name]) select.add(new Option(value, value));
+    select.onchange = update;
+    label.append(select);
+    container.append(label);
+  }
+  document.getElementById('metric').onchange = update;
+  update();
+}
+
+init();
+</script>
+</body>
+</html>
+'''
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Local web dashboard of a benchmark result store')
+  parser.add_argument('store',
+                      type=str,
+                      help='result store, see SANDBOX_RESULT_STORE')
+  parser.add_argument('--host',
+                      type=str,
+                      default='localhost',
+                      help='address to listen on')
+  parser.add_argument('--port', type=int, default=8000, help='port')
+  args = parser.parse_args()
+
+  server = make_server(args.store, args.host, args.port)
+  print(f'Serving {args.store} on http://{args.host}:{server.server_port}/')
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  server.server_close()
+
+
+if __name__ == '__main__':
+  main()
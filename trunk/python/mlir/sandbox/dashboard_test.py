@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+from python.mlir.sandbox.dashboard import make_server, problem_volume
+from python.mlir.sandbox.result_store import ResultStore
+
+assert problem_volume('m=10,n=32,strides=[1, 2]') == 320
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+  file_name = os.path.join(tmp_dir, 'results.sqlite')
+  store = ResultStore(file_name)
+  for timestamp, host in [(100.0, 'h0'), (200.0, 'h1')]:
+    for sizes in ['m=32,n=32', 'm=8,n=8']:
+      store.add_run('copy_2d', 'A', sizes, [1.0, 2.0, 4.0], 0.0, 2.0,
+                    np_types='float32', host=host, timestamp=timestamp)
+  store.add_run('copy_2d', 'B', 'm=8,n=8', [1.0], 0.0, 2.0,
+                np_types='float64', host='h0', timestamp=300.0)
+  store.close()
+
+  server = make_server(file_name, port=0)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  url = f'http://localhost:{server.server_port}'
+
+  def get(path):
+    with urllib.request.urlopen(url + path) as response:
+      return response.read().decode()
+
+  assert '<svg' not in get('/') and 'Benchmark dashboard' in get('/')
+  assert json.loads(get('/api/filters')) == {
+      'benchmark': ['copy_2d'],
+      'expert': ['A', 'B'],
+      'np_types': ['float32', 'float64'],
+      'host': ['h0', 'h1']
+  }
+  # The problem sizes are sorted by volume.
+  p50 = json.loads(
+      get('/api/p50_by_problem_size?metric=gbyte_per_s&np_types=float32'))
+  assert [(p['problem_sizes'], p['n_runs'], p['best_p50']) for p in p50] == [
+      ('m=8,n=8', 2, 1.0), ('m=32,n=32', 2, 1.0)
+  ]
+  distributions = json.loads(
+      get('/api/distributions?metric=elapsed_s&host=h0&expert=A'))
+  assert [(d['problem_sizes'], d['n_iters'], d['quantiles'][2])
+          for d in distributions] == [('m=8,n=8', 3, 2.0),
+                                      ('m=32,n=32', 3, 2.0)]
+  series = json.loads(
+      get('/api/time_series?metric=gbyte_per_s&expert=A&expert=B'
+          '&host=h0'))
+  assert [(s['timestamp'], s['expert']) for s in series] == [(100.0, 'A'),
+                                                            (100.0, 'A'),
+                                                            (300.0, 'B')]
+  for path, status in [('/api/time_series?metric=flops', 400),
+                       ('/api/unknown', 404), ('/unknown', 404)]:
+    try:
+      get(path)
+      assert False, path
+    except urllib.error.HTTPError as e:
+      assert e.code == status, (path, e.code)
+
+  server.shutdown()
+  server.server_close()
@@ -0,0 +1,132 @@
+"""Declarative JSON and YAML files describing lists of experts.
+
+An expert file lists named experts, each one a sequence of transforms with
+the values of their variables:
+
+  op_name: linalg.generic
+  experts:
+  - name: SingleTiling2DPeel
+    transforms:
+    - {transform: Tile, tile_sizes: [6, 32, 1], peel: [0, 1, 2]}
+    - {transform: Vectorize, op_name: ''}
+    - {transform: Bufferize}
+    - {transform: LowerVectors}
+    - {transform: LowerToLLVM}
+
+The function targeted by the transforms is bound when loading, the op is the
+file-level `op_name` unless a transform overrides it. Transforms are the
+classes of `mlir.sandbox.transforms` or fully qualified class names, whose
+module is only imported when an expert uses them. Variables that are not
+listed take their default values. Files with a .yaml or .yml extension are
+YAML files (which requires PyYAML), the other ones are JSON files.
+"""
+
+import importlib
+import json
+import os
+import typing as tp
+
+import numpy as np
+
+import mlir.sandbox.transforms as transforms
+from mlir.sandbox.transform import Transform, TransformationList
+
+
+def _to_plain_value(value):
+  if isinstance(value, np.generic):
+    return value.item()
+  if isinstance(value, (np.ndarray, range, tuple, list)):
+    return [_to_plain_value(v) for v in value]
+  return value
+
+
+def _transform_name(cls: tp.Type[Transform]) -> str:
+  if getattr(transforms, cls.__name__, None) is cls:
+    return cls.__name__
+  return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _transform_class(name: str) -> tp.Type[Transform]:
+  module_name, _, cls_name = name.rpartition('.')
+  module = importlib.import_module(module_name) if module_name else transforms
+  cls = getattr(module, cls_name, None)
+  if not isinstance(cls, type) or not issubclass(cls, Transform):
+    raise ValueError(f'Unknown transform: {name}')
+  return cls
+
+
+def transform_to_dict(transform: Transform,
+                      op_name: tp.Optional[str] = None) -> tp.Dict[str, tp.Any]:
+  """Return the description of `transform`, omitting the targeted function and
+  the op if it is `op_name`."""
+  description = {'transform': _transform_name(type(transform))}
+  for name, value in vars(transform).items():
+    if name == 'fun_name' or (name == 'op_name' and value == op_name):
+      continue
+    description[name] = _to_plain_value(value)
+  return description
+
+
+def transform_from_dict(description: tp.Mapping[str, tp.Any], fun_name: str,
+                        op_name: str) -> Transform:
+  """Instantiate the transform described by `description` on `fun_name`."""
+  description = dict(description)
+  cls = _transform_class(description.pop('transform'))
+  description.setdefault('op_name', op_name)
+  return cls(fun_name=fun_name, **description)
+
+
+def experts_to_dict(experts: tp.Mapping[str, TransformationList],
+                    op_name: tp.Optional[str] = None) -> tp.Dict[str, tp.Any]:
+  """Return the description of the named `experts`.
+
+  If `op_name` is None, the op of every transform is described.
+  """
+  description = {} if op_name is None else {'op_name': op_name}
+  description['experts'] = [{
+      'name': name,
+      'transforms': [transform_to_dict(t, op_name) for t in expert.transforms]
+  } for name, expert in experts.items()]
+  return description
+
+
+def experts_from_dict(description: tp.Mapping[str, tp.Any],
+                      fun_name: str) -> tp.Dict[str, TransformationList]:
+  """Instantiate the experts of `description` on `fun_name`, by name."""
+  op_name = description.get('op_name')
+  return {
+      expert['name']: TransformationList(transforms=[
+          transform_from_dict(t, fun_name, op_name)
+          for t in expert['transforms']
+      ]) for expert in description['experts']
+  }
+
+
+def _is_yaml(file_name: str) -> bool:
+  return os.path.splitext(file_name)[1] in ('.yaml', '.yml')
+
+
+def save_experts(file_name: str,
+                 experts: tp.Mapping[str, TransformationList],
+                 op_name: tp.Optional[str] = None):
+  """Save the named `experts` to a JSON or YAML file."""
+  description = experts_to_dict(experts, op_name)
+  with open(file_name, 'w') as f:
+    if _is_yaml(file_name):
+      import yaml
+      yaml.safe_dump(description, f, sort_keys=False)
+    else:
+      json.dump(description, f, indent=2)
+      f.write('\n')
+
+
+def load_experts(file_name: str,
+                 fun_name: str) -> tp.Dict[str, TransformationList]:
+  """Load the experts of a JSON or YAML file, instantiated on `fun_name`."""
+  with open(file_name) as f:
+    if _is_yaml(file_name):
+      import yaml
+      description = yaml.safe_load(f)
+    else:
+      description = json.load(f)
+  return experts_from_dict(description, fun_name)
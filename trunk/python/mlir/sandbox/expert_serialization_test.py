@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+from mlir.sandbox.expert_serialization import experts_from_dict, \
+  experts_to_dict, load_experts, save_experts
+from mlir.sandbox.transforms import *
+
+fun_name = 'matmul'
+op_name = 'linalg.generic'
+
+experts = {
+    'TilePadVectorize':
+        Tile(fun_name, op_name, tile_sizes=[12, 32, 8], peel=[0, 1])
+        .then(Pad(fun_name,
+                  op_name,
+                  padding_values=[0.0, 0.0, 0.0],
+                  padding_dimensions=[0, 1, 2],
+                  pack_paddings=[1, 1, 0],
+                  hoist_paddings=[2, 3, 0],
+                  transpose_paddings=[[1, 0], [0, 1], [0, 1]]))
+        .then(Vectorize(fun_name, '', vectorize_paddings=False))
+        .then(Bufferize())
+        .then(LowerVectors(stages=[0, 1, 2], transpose_lowering='shuffle'))
+        .then(LowerVectors(stages=5, split_transfers='none'))
+        .then(LowerToLLVM()),
+    'Defaults':
+        Tile(fun_name, op_name, tile_sizes=[8, 16])
+        .then(Bufferize())
+        .then(LowerVectors())
+        .then(LowerToLLVM()),
+}
+
+
+def assert_same_experts(lhs, rhs):
+  assert list(lhs) == list(rhs), (list(lhs), list(rhs))
+  for name in lhs:
+    lhs_transforms = lhs[name].transforms
+    rhs_transforms = rhs[name].transforms
+    assert len(lhs_transforms) == len(rhs_transforms), name
+    for l, r in zip(lhs_transforms, rhs_transforms):
+      assert type(l) is type(r), (type(l), type(r))
+      assert vars(l) == vars(r), (vars(l), vars(r))
+
+
+# The description is plain JSON data, with the op of the file level omitted.
+description = experts_to_dict(experts, op_name)
+assert json.loads(json.dumps(description)) == description
+assert description['experts'][0]['transforms'][0] == {
+    'transform': 'Tile',
+    'tile_sizes': [12, 32, 8],
+    'tile_interchange': [],
+    'peel': [0, 1],
+    'scalarize_dyn_dims': False
+}, description['experts'][0]['transforms'][0]
+assert_same_experts(experts_from_dict(description, fun_name), experts)
+
+# Without a file-level op, the op of every transform is described.
+description = experts_to_dict(experts)
+assert 'op_name' not in description
+assert_same_experts(experts_from_dict(description, fun_name), experts)
+
+# Experts round trip through JSON files.
+with tempfile.TemporaryDirectory() as tmp_dir:
+  file_name = os.path.join(tmp_dir, 'experts.json')
+  save_experts(file_name, experts, op_name)
+  assert_same_experts(load_experts(file_name, fun_name), experts)
@@ -1,6 +1,9 @@
 # Make dict a generic (type-subscriptable) type for Python <3.9.
 from __future__ import annotations
 import argparse
+import hashlib
+import io
+import json
 import re
 import sys
 import os
@@ -10,7 +13,6 @@ from collections import defaultdict
 from typing import AbstractSet, Any, Callable, List, Mapping, Optional, Sequence, Union
 
 import numpy
-import pandas
 
 from iree.compiler.execution_engine import *
 from iree.compiler.ir import *
@@ -19,9 +21,17 @@ from iree.compiler.dialects.builtin import ModuleOp
 import iree.compiler.dialects.transform as transform
 
 from mlir.sandbox.compilation import compile_to_execution_engine, \
-    emit_benchmarking_function, mlir_type
+    emit_benchmarking_function, get_runtime_shared_libs, mlir_type
+from mlir.sandbox.compiled_artifact import CompiledArtifact, \
+    compile_llvm_dialect_to_pic_object
+from mlir.sandbox.expert_serialization import load_experts
+from mlir.sandbox.noise_monitor import NoiseMonitor, NoiseThresholds, \
+    monitored_invoke
 from mlir.sandbox.problem_definition import *
+from mlir.sandbox.result_store import ResultStore
 from mlir.sandbox.transform import TransformationList
+from mlir.sandbox.transform_cache import TransformCache, \
+    compiler_version, default_transform_cache, hash_payload, prefix_keys
 from mlir.sandbox.transforms import ApplySchedule
 from mlir.sandbox.utils import *
 
@@ -48,7 +58,11 @@ ProblemSizes = Sequence[Union[int, Sequence[int]]]
 
 
 class Measurements:
-  """Class storing measurement configuration and results in data frame."""
+  """Class storing measurement configuration and results in data frame.
+
+  The measurements are kept as rows and the data frame is only built, and
+  pandas imported, when the data is accessed.
+  """
   config_keys = [ \
     "function_name",
     "expert",
@@ -57,64 +71,78 @@ class Measurements:
     "runtime_problem_sizes_dict",
     "total_gflops",
     "total_gbytes",
+    "discarded_noise",
                 ]
   data_keys = [ \
       "elapsed_s_per_iter",
       "gbyte_per_s_per_iter",
       "gflop_per_s_per_iter",
+      "noise",
               ]
 
   def __init__(self):
-    self.data = pandas.DataFrame(
-        dict([(col, []) for col in self.config_keys + self.data_keys]))
+    self.rows = []
+
+  @property
+  def data(self) -> 'pandas.DataFrame':
+    import pandas
+    return pandas.DataFrame(self.rows,
+                            columns=self.config_keys + self.data_keys)
 
   def append(self, function_name: str, expert_name: str,
              np_types: Sequence[np.dtype],
              dynamic_at_compile_time_sizes: AbstractSet[str],
              runtime_problem_sizes_dict: Mapping[str, ProblemSizes],
              gflops: int, gbytes: int, timing_results_dict: TimingResults):
-    """Append measurement results."""
-    config = pandas.DataFrame(
-        dict(
-            zip(self.config_keys,
-                [[function_name], [expert_name],
-                 [self._stringify_types(np_types)],
-                 [self._stringify_set(dynamic_at_compile_time_sizes)],
-                 [self._stringify_dict(runtime_problem_sizes_dict)], [gflops],
-                 [gbytes]])))
-    results = pandas.DataFrame(
-        dict([(k, timing_results_dict[k]) for k in self.data_keys]))
-    # Cross-product: add an identical fake key to both data frames,
-    # merge on that key, and delete it.
-    config['_fake_key'] = 1
-    results['_fake_key'] = 1
-    product = config.merge(results, on='_fake_key') \
-      .drop(labels='_fake_key', axis=1)
-    self.data = self.data.append(product)
+    """Append measurement results.
+
+    The `noise` of every sample lists the reasons why it may be noisy and
+    `discarded_noise` the reasons why samples were re-measured or discarded,
+    see `timed_invoke`.
+    """
+    n_iters = len(timing_results_dict['elapsed_s_per_iter'])
+    config = dict(
+        zip(self.config_keys, [
+            function_name, expert_name,
+            self._stringify_types(np_types),
+            self._stringify_set(dynamic_at_compile_time_sizes),
+            self._stringify_dict(runtime_problem_sizes_dict), gflops, gbytes,
+            ' | '.join(timing_results_dict.get('discarded_noise', []))
+        ]))
+    timing_results_dict = {'noise': [''] * n_iters, **timing_results_dict}
+    # Cross-product: one row per measured iteration.
+    for i in range(n_iters):
+      self.rows.append({
+          **config,
+          **{k: timing_results_dict[k][i] for k in self.data_keys}
+      })
 
   def to_dict(self) -> dict[str, Any]:
     """Return a dictionary containing the aggregated data."""
     return self.data.to_dict()
 
-  def to_data_frame(self) -> pandas.DataFrame:
+  def to_data_frame(self) -> 'pandas.DataFrame':
     """Return a data frame containing the aggregated data."""
     return self.data
 
   def dump_to_file(self, file_name: str):
     """Dump the measurements to a json file."""
+    import pandas
+    data = self.data
     # Load existing data.
     if os.path.exists(file_name):
       existing_data = pandas.read_json(file_name)
-      self.data = existing_data.append(self.data)
+      data = pandas.concat([existing_data, data])
     # Create the path if needed.
     directory = os.path.dirname(file_name)
     if not os.path.exists(directory):
       os.makedirs(directory)
-    self.data.reset_index(drop=True, inplace=True)
-    self.data.to_json(file_name)
+    data.reset_index(drop=True, inplace=True)
+    data.to_json(file_name)
 
   def dump_raw_to_file(self, file_name: str):
     """Dump the measurements to a raw file by appending."""
+    import pandas
     all_data = None
     value_column_names = [
         'runtime_problem_sizes_dict',
@@ -123,16 +151,18 @@ class Measurements:
         'elapsed_s_per_iter',
         'gbyte_per_s_per_iter',
         'gflop_per_s_per_iter',
+        'noise',
     ]
     # Filter the slowest to isolate the compulsory miss effects.
     # Drop the first index matching every key_value (i.e. the first measurement)
-    self.data = self.data.iloc[1:, :]
+    self.rows = self.rows[1:]
+    data = self.data
     if os.path.exists(file_name):
       all_data = pandas.read_json(file_name)
       all_data = pandas.concat(
-          [all_data, self.data[['function_name', *value_column_names]]])
+          [all_data, data[['function_name', *value_column_names]]])
     else:
-      all_data = self.data[['function_name', *value_column_names]]
+      all_data = data[['function_name', *value_column_names]]
     all_data.to_json(file_name, orient='records')
 
   def _stringify_types(self, value: Sequence[np.dtype]) -> str:
@@ -146,15 +176,38 @@ class Measurements:
     return ",".join([str.format(f"{k}={v}") for k, v in value.items()])
 
 
-def timed_invoke(run_for_n_iters: Callable, gflop_count: float,
-                 gbyte_count: float, n_iters: int) -> TimingResults:
-  elapsed_ns = run_for_n_iters(n_iters)
-  elapsed_s_per_iter = [sec for sec in np.flip(np.sort(elapsed_ns / 1.e9))]
+def timed_invoke(run_for_n_iters: Callable,
+                 gflop_count: float,
+                 gbyte_count: float,
+                 n_iters: int,
+                 monitor_noise: bool = False) -> TimingResults:
+  """Run and time `n_iters` iterations.
+
+  If `monitor_noise`, the iterations run in batches whose noise is monitored,
+  see `noise_monitor.monitored_invoke`.
+  """
+  if monitor_noise:
+    elapsed_ns, noise, discarded_noise = monitored_invoke(
+        run_for_n_iters, n_iters,
+        NoiseMonitor(thresholds=NoiseThresholds.from_environment()))
+  else:
+    elapsed_ns = run_for_n_iters(n_iters)
+    noise, discarded_noise = [''] * len(elapsed_ns), []
+  # Sort from the slowest to the fastest iteration.
+  order = np.flip(np.argsort(elapsed_ns, kind='stable'))
+  elapsed_s_per_iter = [elapsed_ns[i] / 1.e9 for i in order]
+  noise = [noise[i] for i in order]
 
   # AVX512 throttling needs a lot of iteration, chance to only report the last n
   # after throttling has had a good chance of happening.
   elapsed_s_per_iter = keep_last_n_if_specified(elapsed_s_per_iter)
+  noise = noise[len(noise) - len(elapsed_s_per_iter):]
   n_iters = len(elapsed_s_per_iter)
+  if discarded_noise:
+    print(f'Re-measured or discarded {len(discarded_noise)} noisy batches, '
+          f'first because of: {discarded_noise[0]}')
+  if any(noise):
+    print(f'Noisy iterations kept: {sum(1 for n in noise if n)}')
 
   gbyte_per_s_per_iter = [(gbyte_count / sec) for sec in elapsed_s_per_iter]
   gflop_per_s_per_iter = [(gflop_count / sec) for sec in elapsed_s_per_iter]
@@ -182,6 +235,8 @@ def timed_invoke(run_for_n_iters: Callable, gflop_count: float,
       "elapsed_s_per_iter": elapsed_s_per_iter,
       "gbyte_per_s_per_iter": gbyte_per_s_per_iter,
       "gflop_per_s_per_iter": gflop_per_s_per_iter,
+      "noise": noise,
+      "discarded_noise": discarded_noise,
   }
 
 
@@ -219,6 +274,65 @@ def emit_schedule_dialect(module: ModuleOp,
         transform.YieldOp([])
 
 
+def _serialize_module(module: Module) -> bytes:
+  """Return the bytecode of `module`, its textual IR if bytecode is not
+  supported by the bindings. Both are accepted by Module.parse."""
+  try:
+    f = io.BytesIO()
+    module.operation.write_bytecode(f)
+    return f.getvalue()
+  except AttributeError:
+    return str(module).encode()
+
+
+def apply_transformations_with_cache(module: Module,
+                                     transformations: TransformationList,
+                                     cache: TransformCache) -> Module:
+  """Apply `transformations` to `module` one transform at a time.
+
+  The IR obtained after every transform is cached, so that the application
+  restarts from the deepest prefix of `transformations` already in `cache`.
+  Must be called under the context of `module`.
+  """
+  transforms = transformations.transforms
+  keys = prefix_keys(hash_payload(str(module)), transforms, compiler_version())
+  num_applied = 0
+  for i in range(len(transforms), 0, -1):
+    data = cache.get(keys[i - 1])
+    if data is not None:
+      module = Module.parse(data)
+      num_applied = i
+      break
+  for i in range(num_applied, len(transforms)):
+    emit_schedule_dialect(module, TransformationList([transforms[i]]))
+    module = ApplySchedule()(module)
+    cache.put(keys[i], _serialize_module(module))
+  return module
+
+
+# The MLIR context of all the compilations of this process, if shared.
+_shared_context = None
+
+
+def share_compilation_context():
+  """Compile all the subsequent problems of this process in a single MLIR
+  context, which saves creating a context and registering the dialects for
+  every compilation when many configurations run in one process."""
+  global _shared_context
+  if _shared_context is None:
+    _shared_context = _compilation_context()
+
+
+def _compilation_context() -> ir.Context:
+  if _shared_context is not None:
+    return _shared_context
+  ctx = ir.Context()
+  import iree.compiler.dialects.iree_linalg_ext as linalg_ext
+  linalg_ext.register_dialect(ctx)
+  transform.register_dialect(ctx)
+  return ctx
+
+
 class ProblemInstance:
   problem_definition: ProblemDefinition
 
@@ -231,6 +345,7 @@ class ProblemInstance:
   # Result of compilation.
   mlir_context: Any  # TODO: better type
   mlir_module: Any  # TODO: better type
+  mlir_transformed_module: Any  # TODO: better type
   mlir_execution_engine: Any  # TODO: better type
 
   def __init__(self, problem_definition: ProblemDefinition,
@@ -243,6 +358,7 @@ class ProblemInstance:
     # Result of compilation.
     self.mlir_context = None
     self.mlir_module = None
+    self.mlir_transformed_module = None
     self.mlir_execution_engine = None
 
   def __assert_matching_mapping_keys(self, mapping: Mapping[str, Any]):
@@ -274,12 +390,38 @@ class ProblemInstance:
       dump_ir_to_file: str = ''):
     transformed_module, self.mlir_execution_engine = compile_to_execution_engine(
         module, transform)
+    self.mlir_transformed_module = transformed_module
     if (len(dump_ir_to_file) > 0):
       f = open(dump_ir_to_file, 'w')
       f.write(str(transformed_module))
       f.close()
     return transformed_module, self.mlir_execution_engine
 
+  def export_compiled_artifact(self,
+                               entry_point_name: str,
+                               opt_level: int = 3) -> CompiledArtifact:
+    """Return the compiled problem as a pickle-able CompiledArtifact.
+
+    Must be called after compilation. The artifact can be loaded in another
+    process with `load_compiled_artifact`.
+    """
+    llvm_dialect_ir = str(self.mlir_transformed_module)
+    return CompiledArtifact(
+        compile_llvm_dialect_to_pic_object(llvm_dialect_ir, opt_level),
+        entry_point_name,
+        self.np_types,
+        self.compile_time_problem_sizes_dict,
+        get_runtime_shared_libs(),
+        llvm_dialect_ir,
+        opt_level=opt_level)
+
+  def load_compiled_artifact(self, artifact: CompiledArtifact):
+    """Use a CompiledArtifact, possibly compiled in another process, in place
+    of compiling the problem."""
+    self.compile_time_problem_sizes_dict = \
+      artifact.compile_time_problem_sizes_dict
+    self.mlir_execution_engine = artifact.load()
+
   def compile_with_schedule_builder(
       self,
       entry_point_name: str,
@@ -289,12 +431,7 @@ class ProblemInstance:
       schedule_builder: Callable,
       dump_ir_to_file: str = '',
       zero_at_each_iteration: bool = False):
-    with ir.Context() as ctx, ir.Location.unknown() as loc:
-      import iree.compiler.dialects.iree_linalg_ext as linalg_ext
-      import iree.compiler.dialects.transform as transform
-      linalg_ext.register_dialect(ctx)
-      transform.register_dialect(ctx)
-
+    with _compilation_context() as ctx, ir.Location.unknown() as loc:
       self.mlir_module = Module.create()
       self.compile_time_problem_sizes_dict = compile_time_problem_sizes_dict
       self.build_problem_under_context_manager(entry_point_name,
@@ -305,55 +442,95 @@ class ProblemInstance:
                                                ApplySchedule(),
                                                dump_ir_to_file=dump_ir_to_file)
 
+  def compile_with_transformations(self,
+                                   entry_point_name: str,
+                                   fun_to_benchmark_name: str,
+                                   compile_time_problem_sizes_dict: dict,
+                                   transformations: TransformationList,
+                                   transform_cache: Optional[
+                                       TransformCache] = None,
+                                   dump_ir_to_file: str = '',
+                                   zero_at_each_iteration: bool = False):
+    """Compile the problem transformed by `transformations`.
+
+    With a `transform_cache`, the transforms shared with previously compiled
+    transformation lists are not applied again, see
+    `apply_transformations_with_cache`.
+    """
+    if transform_cache is None:
+      return self.compile_with_schedule_builder(
+          entry_point_name,
+          fun_to_benchmark_name,
+          compile_time_problem_sizes_dict,
+          lambda m: emit_schedule_dialect(m, transformations),
+          dump_ir_to_file=dump_ir_to_file,
+          zero_at_each_iteration=zero_at_each_iteration)
+    with _compilation_context() as ctx, ir.Location.unknown() as loc:
+      self.mlir_module = Module.create()
+      self.compile_time_problem_sizes_dict = compile_time_problem_sizes_dict
+      self.build_problem_under_context_manager(entry_point_name,
+                                               fun_to_benchmark_name,
+                                               self.mlir_module)
+      return self._compile_to_execution_engine(
+          self.mlir_module,
+          lambda m: apply_transformations_with_cache(m, transformations,
+                                                     transform_cache),
+          dump_ir_to_file=dump_ir_to_file)
+
   def run(self,
           n_iters: int,
           entry_point_name: str,
           runtime_problem_sizes_dict: dict,
           dump_obj_to_file: str = None,
-          skip_setup_and_dump_and_check: bool = False):
+          skip_setup_and_dump_and_check: bool = False,
+          monitor_noise: bool = False):
     self.__assert_matching_mapping_keys(runtime_problem_sizes_dict)
     assert_runtime_sizes_compatible_with_compile_time_sizes(
         runtime_problem_sizes_dict, self.compile_time_problem_sizes_dict)
 
-    # 1. Setup NP inputs and outputs
-    np_input_and_outputs = self.problem_definition.tensors_np_builder(
-        runtime_problem_sizes_dict, self.np_types)
-    # np_input_and_outputs needs to remain live as long as
-    # np_input_and_outputs_pointers is used
-    np_input_and_outputs_pointers = get_mlir_abi_compatible_types(
-        np_input_and_outputs)
-
-    # 2. Setup function to run, taking a np array of int64.
-    def run_for_n_iters(n_iters: int):
-      np_timers = np.zeros([n_iters], dtype=np.int64)
-      np_timers_pointer = get_mlir_abi_compatible_types([np_timers]).pop()
-      self.mlir_execution_engine.invoke(entry_point_name,
-                                        *np_input_and_outputs_pointers,
-                                        np_timers_pointer)
-      return np_timers
-
-    if not skip_setup_and_dump_and_check:
-      # 3. Pre-run to ensure JIT compilation actually happened to the end.
-      run_for_n_iters(1)
-
-      # 4. Now dump to obj file as the JIT compilation actually happened.
-      if (dump_obj_to_file is not None and len(dump_obj_to_file) > 0):
-        self.mlir_execution_engine.dump_to_object_file(dump_obj_to_file)
-
-      # 5. Check.
-      # TODO: this checks seems to be always true as `check_np` is a function
-      # defined to be just `pass` at the base class level, nobody overrides it as
-      # attribute to be None.
-      if self.problem_definition.check_np is not None:
-        self.problem_definition.check_np(*np_input_and_outputs)
-
-    # 5. Showtime.
-    return timed_invoke(run_for_n_iters=run_for_n_iters,
-                        gflop_count=self.problem_definition.gflop_count_builder(
-                            runtime_problem_sizes_dict),
-                        gbyte_count=self.problem_definition.gbyte_count_builder(
-                            runtime_problem_sizes_dict, self.np_types),
-                        n_iters=n_iters)
+    # The buffers of the inputs and outputs are reused by the next runs.
+    with buffer_scope():
+      # 1. Setup NP inputs and outputs
+      np_input_and_outputs = self.problem_definition.tensors_np_builder(
+          runtime_problem_sizes_dict, self.np_types)
+      # np_input_and_outputs needs to remain live as long as
+      # np_input_and_outputs_pointers is used
+      np_input_and_outputs_pointers = get_mlir_abi_compatible_types(
+          np_input_and_outputs)
+
+      # 2. Setup function to run, taking a np array of int64.
+      def run_for_n_iters(n_iters: int):
+        np_timers = np.zeros([n_iters], dtype=np.int64)
+        np_timers_pointer = get_mlir_abi_compatible_types([np_timers]).pop()
+        self.mlir_execution_engine.invoke(entry_point_name,
+                                          *np_input_and_outputs_pointers,
+                                          np_timers_pointer)
+        return np_timers
+
+      if not skip_setup_and_dump_and_check:
+        # 3. Pre-run to ensure JIT compilation actually happened to the end.
+        run_for_n_iters(1)
+
+        # 4. Now dump to obj file as the JIT compilation actually happened.
+        if (dump_obj_to_file is not None and len(dump_obj_to_file) > 0):
+          self.mlir_execution_engine.dump_to_object_file(dump_obj_to_file)
+
+        # 5. Check.
+        # TODO: this checks seems to be always true as `check_np` is a
+        # function defined to be just `pass` at the base class level, nobody
+        # overrides it as attribute to be None.
+        if self.problem_definition.check_np is not None:
+          self.problem_definition.check_np(*np_input_and_outputs)
+
+      # 5. Showtime.
+      return timed_invoke(
+          run_for_n_iters=run_for_n_iters,
+          gflop_count=self.problem_definition.gflop_count_builder(
+              runtime_problem_sizes_dict),
+          gbyte_count=self.problem_definition.gbyte_count_builder(
+              runtime_problem_sizes_dict, self.np_types),
+          n_iters=n_iters,
+          monitor_noise=monitor_noise)
 
 
 def _pytimed(callback: Callable[..., None], *args: Any, **kwargs: Any):
@@ -461,6 +638,12 @@ def add_argparser_arguments(
                       nargs='+',
                       help='problem specifications (e.g., -s mk,kn km,kn)',
                       default=default_spec_list)
+  parser.add_argument('--expert_file',
+                      type=str,
+                      nargs='?',
+                      help='JSON or YAML expert file replacing the default '
+                      'experts (e.g., --expert_file experts.yaml)',
+                      default='')
   parser.add_argument('--dump_data',
                       type=str,
                       nargs='?',
@@ -516,6 +699,18 @@ def test_experts(
   }
 
 
+def _object_file_for_run(directory: str, run: Mapping[str, str]) -> str:
+  """Return the object file to dump a run to in `directory`, next to a JSON
+  file describing the run for `python/tools/llvm_mca_batch.py`."""
+  os.makedirs(directory, exist_ok=True)
+  key = hashlib.sha256(json.dumps(run,
+                                  sort_keys=True).encode()).hexdigest()[:16]
+  file_name = os.path.join(directory, f'{run["benchmark"]}_{key}')
+  with open(file_name + '.json', 'w') as f:
+    json.dump(run, f)
+  return file_name + '.o'
+
+
 def test_harness(problem_factory: Callable[
     [Mapping[str, Any], Sequence[np.dtype]], ProblemDefinition],
                  np_types_list: Sequence[Sequence[np.dtype]],
@@ -557,14 +752,30 @@ def test_harness(problem_factory: Callable[
     argument is provided, it will be called `n_iters` times for the purpose of
     measuring baseline performance.
   plot_path: A path to an existing directory to dump the performance plots.
+  expert_file: A JSON or YAML expert file, see `expert_serialization`. Its
+    experts, instantiated on `function_name`, replace `experts`.
+  transform_cache: The TransformCache used to share the transformed IR of the
+    common prefixes of experts, `default_transform_cache()` by default, which
+    is None unless enabled by the environment.
+  result_store_file: The ResultStore recording the measurements, set by the
+    SANDBOX_RESULT_STORE environment variable by default.
+  dump_obj_dir: A directory to dump the object file of every run to, set by
+    the SANDBOX_DUMP_OBJ_DIR environment variable by default.
+  monitor_noise: Whether to run the iterations in batches monitored for noise,
+    see `noise_monitor`. Off unless the SANDBOX_NOISE_MONITOR environment
+    variable is 1; only meaningful when the benchmark CPUs are reserved.
 
   Returns: A dictionary of all collected benchmark results.
   """
+  if kwargs.get('expert_file'):
+    experts = load_experts(kwargs['expert_file'], function_name)
   # Generate expert names if none are provided.
   if isinstance(experts, Sequence):
     experts = {str(value): value for value in experts}
 
   measurements = Measurements()
+  monitor_noise = kwargs.get('monitor_noise',
+                             os.getenv('SANDBOX_NOISE_MONITOR', '0') == '1')
 
   for np_types in np_types_list:
     for problem_sizes_dict in problem_sizes_list:
@@ -586,11 +797,27 @@ def test_harness(problem_factory: Callable[
                                                       np_types)
 
       def run_problem_instance(instance: ProblemInstance, name: str):
+        dump_obj_to_file = kwargs.get('dump_obj_to_file', '')
+        dump_obj_dir = kwargs.get('dump_obj_dir',
+                                  os.getenv('SANDBOX_DUMP_OBJ_DIR', ''))
+        if dump_obj_dir != '':
+          dump_obj_to_file = _object_file_for_run(
+              dump_obj_dir, {
+                  'benchmark':
+                      function_name,
+                  'expert':
+                      name,
+                  'problem_sizes':
+                      measurements._stringify_dict(runtime_problem_sizes_dict),
+                  'np_types':
+                      measurements._stringify_types(np_types)
+              })
         timing_results = instance.run(
             n_iters=n_iters,
             entry_point_name='main',
             runtime_problem_sizes_dict=runtime_problem_sizes_dict,
-            dump_obj_to_file=kwargs.get('dump_obj_to_file', ''))
+            dump_obj_to_file=dump_obj_to_file,
+            monitor_noise=monitor_noise)
         print(f'Run time {time.time() - start}')
 
         measurements.append(
@@ -610,11 +837,13 @@ def test_harness(problem_factory: Callable[
         print("xxxxxxxxxx: Dialect:")
         problem_transform = ProblemInstance(problem_definition, np_types)
         start = time.time()
-        problem_transform.compile_with_schedule_builder(
+        problem_transform.compile_with_transformations(
             entry_point_name='main',
             fun_to_benchmark_name=function_name,
             compile_time_problem_sizes_dict=compile_time_problem_sizes_dict,
-            schedule_builder=lambda m: emit_schedule_dialect(m, expert),
+            transformations=expert,
+            transform_cache=kwargs.get('transform_cache',
+                                       default_transform_cache()),
             dump_ir_to_file=kwargs.get('dump_transform_ir_to_file', ''),
             zero_at_each_iteration=kwargs.get('zero_at_each_iteration', False))
         print(f'Compile time {time.time() - start}')
@@ -622,12 +851,14 @@ def test_harness(problem_factory: Callable[
 
       if 'numpy_benchmark' in kwargs and os.environ.get('BENCHMARK_NUMPY'):
         print('\nNumPy reference\n')
-        args = problem_definition.tensors_np_builder(problem_sizes_dict,
-                                                     np_types)
-        timing_results = timed_invoke(
-            lambda n: _run_benchmark_n_iters(kwargs['numpy_benchmark'], n, args,
-                                             problem_sizes_dict, np_types),
-            gflops, gbytes, n_iters)
+        with buffer_scope():
+          args = problem_definition.tensors_np_builder(problem_sizes_dict,
+                                                       np_types)
+          timing_results = timed_invoke(
+              lambda n: _run_benchmark_n_iters(kwargs['numpy_benchmark'], n,
+                                               args, problem_sizes_dict,
+                                               np_types), gflops, gbytes,
+              n_iters, monitor_noise)
 
         measurements.append(function_name, 'numpy', np_types,
                             dynamic_at_compile_time_sizes,
@@ -638,19 +869,27 @@ def test_harness(problem_factory: Callable[
         print('\nPyTorch reference\n')
         import torch
         torch.set_num_threads(1)
-        numpy_args = problem_definition.tensors_np_builder(
-            problem_sizes_dict, np_types)
-        args = list(map(torch.from_numpy, numpy_args))
-        timing_results = timed_invoke(
-            lambda n: _run_benchmark_n_iters(kwargs[
-                'pytorch_benchmark'], n, args, problem_sizes_dict, np_types),
-            gflops, gbytes, n_iters)
+        with buffer_scope():
+          numpy_args = problem_definition.tensors_np_builder(
+              problem_sizes_dict, np_types)
+          args = list(map(torch.from_numpy, numpy_args))
+          timing_results = timed_invoke(
+              lambda n: _run_benchmark_n_iters(kwargs[
+                  'pytorch_benchmark'], n, args, problem_sizes_dict, np_types),
+              gflops, gbytes, n_iters, monitor_noise)
 
         measurements.append(function_name, 'pytorch', np_types,
                             dynamic_at_compile_time_sizes,
                             runtime_problem_sizes_dict, gflops, gbytes,
                             timing_results)
 
+    store_file_name = kwargs.get('result_store_file',
+                                 os.getenv('SANDBOX_RESULT_STORE', ''))
+    if store_file_name != '':
+      store = ResultStore(store_file_name)
+      store.add_measurements(measurements)
+      store.close()
+
     file_name = kwargs.get('dump_data_to_file', '')
     if file_name != '':
       # measurements.dump_to_file(file_name)
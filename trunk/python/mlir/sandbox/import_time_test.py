@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+# Benchmark the import time of the benchmark and tuning entry points and guard
+# against regressions: modules only needed on demand must not be loaded at
+# import time.
+
+import os
+import subprocess
+import sys
+
+# Modules that must only be imported when they are used.
+lazy_modules = {'matplotlib', 'nevergrad', 'pandas', 'yaml'}
+entry_points = ['mlir.sandbox.harness', 'mlir.sandbox.nevergrad_parallel_utils']
+max_import_time_s = float(os.getenv('SANDBOX_MAX_IMPORT_TIME_S', 10))
+
+
+def import_times(module):
+  """Return the cumulative import time in seconds of every module loaded when
+  importing `module`."""
+  stderr = subprocess.run(
+      [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+      capture_output=True,
+      text=True,
+      check=True).stderr
+  times = {}
+  for line in stderr.splitlines():
+    fields = line[len('import time:'):].split('|')
+    if not line.startswith('import time:') or not fields[1].strip().isdigit():
+      continue
+    times[fields[2].strip()] = int(fields[1]) / 1e6
+  return times
+
+
+for entry_point in entry_points:
+  times = import_times(entry_point)
+  slowest = sorted(times.items(), key=lambda t: -t[1])[:10]
+  print(f'{entry_point}: {times[entry_point]:.3f} s')
+  for name, seconds in slowest:
+    print(f'  {seconds:8.3f} s  {name}')
+  loaded = lazy_modules.intersection(name.split('.')[0] for name in times)
+  assert not loaded, f'{entry_point} imports {loaded} at import time'
+  assert times[entry_point] < max_import_time_s, \
+    f'{entry_point} takes {times[entry_point]:.3f} s to import'
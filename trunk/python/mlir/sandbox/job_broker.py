@@ -0,0 +1,252 @@
+"""Distribute jobs to worker agents running on several hosts.
+
+A `Broker` runs next to the optimizer and listens on a TCP address
+(`host:port`) or a Unix socket path. Worker agents connect with `run_worker`,
+pull jobs one at a time and push back their results, tagged with the host they
+ran on. Workers send heartbeats while they process a job: the job of a worker
+that crashes, disconnects or stops sending heartbeats is re-queued and handed
+to another worker.
+"""
+
+import collections
+import itertools
+import os
+import queue
+import socket
+import threading
+import time
+import typing as tp
+
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+
+def parse_address(address: str):
+  """Return the multiprocessing.connection address of `address`.
+
+  `host:port` denotes a TCP address, anything else a Unix socket path.
+  """
+  host, separator, port = address.rpartition(':')
+  if separator and port.isdigit():
+    return (host, int(port))
+  return address
+
+
+class BrokerResult():
+  """The result of a job, tagged with the host of the worker that ran it."""
+
+  def __init__(self, job_id: int, job, result, host: str):
+    self.job_id = job_id
+    self.job = job
+    self.result = result
+    self.host = host
+
+
+class _Worker():
+  """Broker-side state of a connected worker."""
+
+  def __init__(self, conn, host: str):
+    self.conn = conn
+    self.host = host
+    self.job_id = None
+    self.last_seen = time.monotonic()
+    self.lost = False
+
+
+class Broker():
+  """Queue jobs and hand them to the connected worker agents.
+
+  Jobs and results must be picklable. A job is lost when its worker did not
+  send any message for `heartbeat_timeout` seconds, in which case it is
+  re-queued. If a lost worker reports a result later on, the first result
+  received for a job wins.
+  """
+
+  def __init__(self,
+               address: str,
+               authkey: bytes,
+               heartbeat_timeout: float = 10.0):
+    self.listener = Listener(parse_address(address), authkey=authkey)
+    self.address = self.listener.address
+    self.heartbeat_timeout = heartbeat_timeout
+
+    self.condition = threading.Condition()
+    self.job_ids = itertools.count()
+    # Jobs that were not completed yet, by job id.
+    self.jobs = {}
+    # Ids of the jobs waiting for a worker.
+    self.pending = collections.deque()
+    self.workers = set()
+    self.results = queue.Queue()
+    self.num_requeued = 0
+    self.closed = False
+
+    self.threads = [
+        threading.Thread(target=self._accept, daemon=True),
+        threading.Thread(target=self._monitor, daemon=True)
+    ]
+    for t in self.threads:
+      t.start()
+
+  def submit(self, job) -> int:
+    """Queue `job` and return its id."""
+    with self.condition:
+      job_id = next(self.job_ids)
+      self.jobs[job_id] = job
+      self.pending.append(job_id)
+      self.condition.notify_all()
+    return job_id
+
+  def get_result(self, timeout: tp.Optional[float] = None) -> BrokerResult:
+    """Return the next result, raise queue.Empty after `timeout` seconds."""
+    return self.results.get(timeout=timeout)
+
+  def num_workers(self) -> int:
+    with self.condition:
+      return len(self.workers)
+
+  def close(self):
+    """Stop accepting workers and shut down the connected ones."""
+    with self.condition:
+      self.closed = True
+      self.condition.notify_all()
+    self.listener.close()
+
+  def _accept(self):
+    while not self.closed:
+      try:
+        conn = self.listener.accept()
+      except (OSError, EOFError, AuthenticationError):
+        # Listener closed or failed authentication.
+        continue
+      threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+  def _serve(self, conn):
+    """Serve the messages of one worker until it disconnects."""
+    worker = None
+    try:
+      message, host = conn.recv()
+      assert message == 'hello', f'unexpected message: {message}'
+      worker = _Worker(conn, host)
+      with self.condition:
+        self.workers.add(worker)
+      while True:
+        message = conn.recv()
+        worker.last_seen = time.monotonic()
+        if message[0] == 'ready':
+          next_job = self._next_job(worker)
+          if next_job is None:
+            conn.send(('shutdown',))
+            break
+          conn.send(('job',) + next_job)
+        elif message[0] == 'result':
+          self._complete(worker, message[1], message[2])
+    except (EOFError, OSError):
+      pass
+    finally:
+      if worker is not None:
+        self._lose(worker)
+      conn.close()
+
+  def _next_job(self, worker: _Worker) -> tp.Optional[tp.Tuple[int, tp.Any]]:
+    """Block until a job is available for `worker` and return its (id, job),
+    None on shutdown."""
+    with self.condition:
+      while not self.closed and not worker.lost:
+        while self.pending and self.pending[0] not in self.jobs:
+          self.pending.popleft()
+        if self.pending:
+          worker.job_id = self.pending.popleft()
+          worker.last_seen = time.monotonic()
+          return worker.job_id, self.jobs[worker.job_id]
+        self.condition.wait(0.5)
+    return None
+
+  def _complete(self, worker: _Worker, job_id: int, result):
+    with self.condition:
+      if worker.job_id == job_id:
+        worker.job_id = None
+      if job_id not in self.jobs:
+        # The job was re-queued and completed by another worker.
+        return
+      job = self.jobs.pop(job_id)
+    self.results.put(BrokerResult(job_id, job, result, worker.host))
+
+  def _lose(self, worker: _Worker):
+    """Forget `worker` and re-queue its job, if any."""
+    with self.condition:
+      worker.lost = True
+      self.workers.discard(worker)
+      if worker.job_id is not None and worker.job_id in self.jobs:
+        self.pending.appendleft(worker.job_id)
+        self.num_requeued += 1
+        self.condition.notify_all()
+      worker.job_id = None
+
+  def _monitor(self):
+    """Re-queue the jobs of workers that stopped sending heartbeats."""
+    while not self.closed:
+      time.sleep(self.heartbeat_timeout / 4)
+      now = time.monotonic()
+      with self.condition:
+        silent = [
+            w for w in self.workers if w.job_id is not None and
+            now - w.last_seen > self.heartbeat_timeout
+        ]
+      for worker in silent:
+        self._lose(worker)
+        # Unblock the thread serving the worker.
+        try:
+          s = socket.socket(fileno=os.dup(worker.conn.fileno()))
+          s.shutdown(socket.SHUT_RDWR)
+          s.close()
+        except OSError:
+          pass
+
+
+def run_worker(address: str,
+               authkey: bytes,
+               process_job_fn: tp.Callable,
+               host: tp.Optional[str] = None,
+               heartbeat_interval: float = 1.0) -> int:
+  """Process jobs of the broker at `address` until it shuts down.
+
+  `process_job_fn` is called on every job and its return value is sent back to
+  the broker. Results are tagged with `host`, the host name by default. Return
+  the number of processed jobs.
+  """
+  conn = Client(parse_address(address), authkey=authkey)
+  send_lock = threading.Lock()
+
+  def send(message):
+    with send_lock:
+      conn.send(message)
+
+  stop_event = threading.Event()
+
+  def heartbeat():
+    while not stop_event.wait(heartbeat_interval):
+      try:
+        send(('heartbeat',))
+      except OSError:
+        return
+
+  num_jobs = 0
+  send(('hello', host if host is not None else socket.gethostname()))
+  heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+  heartbeat_thread.start()
+  try:
+    while True:
+      send(('ready',))
+      message = conn.recv()
+      if message[0] == 'shutdown':
+        break
+      _, job_id, job = message
+      send(('result', job_id, process_job_fn(job)))
+      num_jobs += 1
+  except (EOFError, OSError):
+    pass
+  finally:
+    stop_event.set()
+    conn.close()
+  return num_jobs
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import multiprocessing as mp
+import os
+import queue
+import signal
+import tempfile
+
+from python.mlir.sandbox.job_broker import Broker, run_worker
+
+authkey = b'job_broker_test'
+
+
+def handler(job):
+  """This function is run on the worker processes."""
+  return job * job
+
+
+def crashing_handler(job):
+  """Crash the worker in the middle of a job."""
+  os._exit(1)
+
+
+def freezing_handler(job):
+  """Freeze the worker in the middle of a job, which stops its heartbeats."""
+  os.kill(os.getpid(), signal.SIGSTOP)
+
+
+def start_worker(address, handler_fn, host):
+  p = mp.Process(target=run_worker,
+                 args=(address, authkey, handler_fn, host, 0.1))
+  p.start()
+  return p
+
+
+if __name__ == '__main__':
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    address = os.path.join(tmp_dir, 'broker.sock')
+    broker = Broker(address, authkey, heartbeat_timeout=1.0)
+    for job in range(1, 12):
+      broker.submit(job)
+
+    # Workers standing in for hosts: the faulty ones lose the first job they
+    # take, which must be re-queued and processed by the healthy worker.
+    crashing = start_worker(address, crashing_handler, 'crashing')
+    freezing = start_worker(address, freezing_handler, 'freezing')
+    crashing.join()
+    # Wait until the freezing worker stopped.
+    os.waitpid(freezing.pid, os.WUNTRACED)
+    healthy = start_worker(address, handler, 'healthy')
+
+    results = []
+    hosts = set()
+    for _ in range(11):
+      try:
+        result = broker.get_result(timeout=20)
+      except queue.Empty:
+        assert False, 'timed out waiting for results'
+      results.append(result.result)
+      hosts.add(result.host)
+    broker.close()
+    healthy.join()
+    freezing.kill()
+    freezing.join()
+
+    results.sort()
+    assert results == [1, 4, 9, 16, 25, 36, 49, 64, 81, 100, 121], \
+      "wrong result"
+    assert hosts == {'healthy'}, f'wrong hosts: {hosts}'
+    assert broker.num_requeued == 2, \
+      f'expected 2 re-queued jobs, got {broker.num_requeued}'
@@ -0,0 +1,171 @@
+"""Online surrogate cost model to screen nevergrad proposals.
+
+Every proposal that reaches the process pool pays for a full compilation and
+benchmark. The cost model is trained online from the results that are told to
+the optimizer and is used to rank a larger set of candidate proposals so that
+only the most promising ones are compiled and benchmarked.
+"""
+
+import math
+import numpy as np
+import typing as tp
+
+from typing import Optional, Sequence
+
+# Default cache sizes in bytes (L1, L2, L3) used to compute footprint features.
+default_cache_byte_sizes = (32 * 1024, 1024 * 1024, 32 * 1024 * 1024)
+
+
+def tiling_features(problem_sizes: Sequence[int],
+                    tile_sizes: Sequence[int],
+                    operand_dims: Sequence[Sequence[int]],
+                    interchange: Optional[Sequence[int]] = None,
+                    peel: Optional[Sequence[bool]] = None,
+                    element_byte_size: int = 4,
+                    vector_width: int = 16,
+                    cache_byte_sizes: Sequence[int] = default_cache_byte_sizes
+                   ) -> Sequence[float]:
+  """Return a feature vector describing a tiling proposal.
+
+  Arguments:
+  problem_sizes: sizes of the iteration domain.
+  tile_sizes: proposed tile sizes, 0 means the dimension is not tiled.
+  operand_dims: for every operand, the iteration domain dimensions indexing it
+    (e.g. [[0, 2], [2, 1], [0, 1]] for a `mk,kn->mn` matmul).
+  interchange: proposed loop interchange, identity if None.
+  peel: per-loop peeling flags, no peeling if None.
+  element_byte_size: size of one element in bytes.
+  vector_width: number of elements in a hardware vector register.
+  cache_byte_sizes: cache sizes used to compute the per-level footprint.
+  """
+  rank = len(problem_sizes)
+  tiles = [s if t == 0 else min(t, s) for s, t in zip(problem_sizes, tile_sizes)]
+  interchange = list(interchange) if interchange is not None \
+    else list(range(rank))
+  peel = list(peel) if peel is not None else []
+
+  features = []
+  # Tile volume, as log2 to keep the linear model well-conditioned.
+  features.append(math.log2(max(1, np.prod(tiles))))
+
+  # Footprint of one tile of every operand, relative to each cache level. The
+  # ratio is clamped so that tiles much larger than a cache level do not
+  # dominate the model.
+  footprint = element_byte_size * sum(
+      np.prod([tiles[d] for d in dims]) for dims in operand_dims)
+  for cache_byte_size in cache_byte_sizes:
+    features.append(min(4.0, footprint / cache_byte_size))
+
+  # Fraction of the innermost dimension, which is the one that gets
+  # vectorized, covered by full vectors.
+  innermost = tiles[-1]
+  features.append(vector_width * (innermost // vector_width) / innermost)
+
+  # Fraction of the iteration domain covered by full tiles.
+  full_tiles_fraction = 1.0
+  for size, tile in zip(problem_sizes, tiles):
+    full_tiles_fraction *= (size - size % tile) / size
+  features.append(full_tiles_fraction)
+
+  # Position of every dimension in the interchanged loop nest.
+  positions = [0.0] * rank
+  for position, dim in enumerate(interchange):
+    positions[dim] = position / max(1, rank - 1)
+  features.extend(positions)
+
+  # Fraction of peeled loops.
+  features.append(sum(1 for p in peel if p) / max(1, len(peel)))
+  return features
+
+
+class LinearCostModel:
+  """Ridge regression from proposal features to the loss told to nevergrad.
+
+  The model is refit every time a data point is added, which is cheap for the
+  small number of features and data points produced by a search.
+  """
+
+  def __init__(self, regularization: float = 1e-2):
+    self.regularization = regularization
+    self.features = []
+    self.losses = []
+    self.weights = None
+
+  def num_samples(self) -> int:
+    return len(self.losses)
+
+  def add_data_point(self, features: Sequence[float], loss: float):
+    self.features.append(list(features))
+    self.losses.append(loss)
+    self._fit()
+
+  def _design_matrix(self, features: Sequence[Sequence[float]]):
+    x = np.asarray(features, dtype=np.float64)
+    return np.hstack([x, np.ones((x.shape[0], 1))])
+
+  def _fit(self):
+    x = self._design_matrix(self.features)
+    y = np.asarray(self.losses, dtype=np.float64)
+    # Do not regularize the bias term.
+    penalty = self.regularization * np.eye(x.shape[1])
+    penalty[-1, -1] = 0.0
+    self.weights = np.linalg.solve(x.T @ x + penalty, x.T @ y)
+
+  def predict(self, features: Sequence[Sequence[float]]) -> Sequence[float]:
+    """Return the predicted loss for every feature vector (lower is better)."""
+    assert self.weights is not None, 'cost model has not been trained'
+    return list(self._design_matrix(features) @ self.weights)
+
+
+class ProposalScreener:
+  """Screen candidate proposals with a surrogate cost model.
+
+  `screening_factor` candidates are asked from the optimizer for every proposal
+  that is sent to the process pool; only the best predicted ones are kept. The
+  remaining candidates are told `screened_out_loss(predicted_loss)`, by default
+  their predicted loss, so that the optimizer does not wait for them. Until
+  `min_samples` results were told, the screener passes proposals through
+  unchanged.
+  """
+
+  def __init__(self,
+               extract_features: tp.Callable,
+               screening_factor: int = 1,
+               min_samples: int = 20,
+               cost_model: Optional[LinearCostModel] = None,
+               screened_out_loss: tp.Callable = lambda predicted: predicted):
+    self.extract_features = extract_features
+    self.screening_factor = screening_factor
+    self.min_samples = min_samples
+    self.screened_out_loss = screened_out_loss
+    self.cost_model = cost_model if cost_model is not None \
+      else LinearCostModel()
+    self.num_screened_out = 0
+
+  def is_active(self) -> bool:
+    return self.screening_factor > 1 and \
+      self.cost_model.num_samples() >= self.min_samples
+
+  def ask(self, optimizer, num_proposals: int = 1):
+    """Ask `num_proposals` proposals, screened by the cost model if active."""
+    if not self.is_active():
+      return [optimizer.ask() for _ in range(num_proposals)]
+
+    candidates = [
+        optimizer.ask() for _ in range(num_proposals * self.screening_factor)
+    ]
+    predictions = self.cost_model.predict(
+        [self.extract_features(c) for c in candidates])
+    ranked = sorted(zip(predictions, range(len(candidates))))
+    for predicted, idx in ranked[num_proposals:]:
+      optimizer.tell(candidates[idx], self.screened_out_loss(predicted))
+    self.num_screened_out += len(candidates) - num_proposals
+    return [candidates[idx] for _, idx in ranked[:num_proposals]]
+
+  def tell(self, proposal, loss: float):
+    """Record the loss told to the optimizer for the evaluated `proposal`.
+
+    Failed evaluations must not be recorded: their loss does not derive from
+    the features and would skew the fit.
+    """
+    self.cost_model.add_data_point(self.extract_features(proposal), loss)
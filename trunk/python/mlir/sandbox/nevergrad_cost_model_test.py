@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import nevergrad as ng
+import numpy as np
+
+from python.mlir.sandbox.nevergrad_cost_model import LinearCostModel, \
+  ProposalScreener, tiling_features
+
+
+def innermost_feature(innermost: int) -> float:
+  """Return the vector feature of a tile with the given innermost size."""
+  features = tiling_features(problem_sizes=[64, 64],
+                             tile_sizes=[8, innermost],
+                             operand_dims=[[0, 1], [0, 1]],
+                             vector_width=16)
+  return features[4]
+
+
+# The innermost tile sizes that waste lanes score lower than the multiples of
+# the vector width, whatever their remainder.
+assert innermost_feature(32) == 1.0
+assert innermost_feature(15) == 0.0
+assert innermost_feature(17) == 16 / 17
+assert innermost_feature(31) == 16 / 31
+
+# The model recovers a linear function of the features.
+model = LinearCostModel(regularization=1e-6)
+rng = np.random.default_rng(0)
+for _ in range(20):
+  x = rng.random(2)
+  model.add_data_point(x, 3 * x[0] - 2 * x[1] + 1)
+prediction = model.predict([[0.5, 0.25]])[0]
+assert abs(prediction - 2.0) < 1e-3, prediction
+
+class RecordingOptimizer:
+  """Forward to a nevergrad optimizer and record the told proposals."""
+
+  def __init__(self, optimizer):
+    self.optimizer = optimizer
+    self.told = []
+
+  def ask(self):
+    return self.optimizer.ask()
+
+  def tell(self, proposal, loss):
+    self.told.append((proposal, loss))
+    self.optimizer.tell(proposal, loss)
+
+
+# Once trained, the screener keeps the best predicted proposals and tells the
+# optimizer about the others, so that none of them stays pending.
+optimizer = ng.optimizers.OnePlusOne(parametrization=ng.p.Array(shape=(1,)),
+                                     budget=100)
+screener = ProposalScreener(lambda proposal: [proposal.value[0]],
+                            screening_factor=4,
+                            min_samples=5,
+                            cost_model=LinearCostModel(regularization=1e-6))
+for _ in range(5):
+  proposal = screener.ask(optimizer)[0]
+  optimizer.tell(proposal, proposal.value[0])
+  screener.tell(proposal, proposal.value[0])
+assert optimizer.num_ask == optimizer.num_tell == 5
+assert screener.is_active()
+
+recording = RecordingOptimizer(optimizer)
+proposals = screener.ask(recording, num_proposals=2)
+assert len(proposals) == 2
+assert optimizer.num_ask == 5 + 8, optimizer.num_ask
+assert optimizer.num_tell == 5 + 6, optimizer.num_tell
+assert screener.num_screened_out == 6
+# The screened out proposals are told their predicted loss, which is higher
+# than the one of the kept proposals.
+assert all(proposal not in proposals for proposal, _ in recording.told)
+for proposal, loss in recording.told:
+  assert abs(loss - proposal.value[0]) < 1e-3, (loss, proposal.value)
+assert max(p.value[0] for p in proposals) <= \
+  min(p.value[0] for p, _ in recording.told)
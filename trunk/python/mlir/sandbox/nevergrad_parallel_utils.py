@@ -1,202 +1,202 @@
-from contextlib import redirect_stdout, redirect_stderr
 from enum import Enum
-import io
 import math
+import itertools
 import multiprocessing as mp
 import numpy as np
 import os
-from prwlock import RWLock
 import queue
+import secrets
 import signal
 import sys
 import threading
 import time
-import traceback
 import typing as tp
 
+from mlir.sandbox.compiled_artifact import CompiledArtifact, check_tools
+from mlir.sandbox.cpu_topology import CpuPlan, CpuTopology
 from mlir.sandbox.harness import *
+from mlir.sandbox.job_broker import Broker, run_worker
+from mlir.sandbox.nevergrad_cost_model import ProposalScreener
+from mlir.sandbox.nevergrad_pareto import ObjectiveMetrics, ParetoArchive, \
+  failure_losses, optimizer_loss
 from mlir.sandbox.nevergrad_tuner_utils import NGSchedulerInterface
-from mlir.sandbox.plotting import Plotting
 from mlir.sandbox.problem_definition import ProblemDefinition
+from mlir.sandbox.transform_cache import default_transform_cache
 from mlir.sandbox.utils import compute_quantiles
+from mlir.sandbox.worker_supervisor import JobContext, JobStatus, Phase, \
+  Supervisor
 
 
 class SearchJobResultStatus(Enum):
   SUCCESS = 0
   TIMEOUT = 1
   FAILURE = 2
+  # Intermediate result of a compilation job whose artifact still needs to be
+  # benchmarked.
+  COMPILED = 3
 
 class SearchJobResult():
   """The result of a search job."""
 
-  def __init__(self, status, proposal, throughputs):
+  def __init__(self,
+               status,
+               proposal,
+               throughputs,
+               artifact=None,
+               compile_time=None,
+               object_size=None):
     self.proposal = proposal
     self.throughputs = throughputs
     self.status = status
-
-
-class ProcessState():
-  """State that is shared among all jobs that are scheduled to run on a pool
-  process.
-  """
-
-  def __init__(self, available_cpus_queue, parsed_args, results_queue, rw_locks,
-               shutdown_event):
-    self.available_cpus_queue = available_cpus_queue
-    self.parsed_args = parsed_args
-    self.results_queue = results_queue
-    self.rw_locks = rw_locks
-    self.shutdown_event = shutdown_event
+    self.artifact = artifact
+    # Compilation time in seconds and object code size in bytes, if measured.
+    self.compile_time = compile_time
+    self.object_size = object_size
+    # Host that evaluated the proposal in distributed mode.
+    self.host = None
 
 
 def cpu_count():
   """Return the number of CPUs on which processes can be scheduled."""
   return len(os.sched_getaffinity(0))
 
-def compile_and_run_checked_mp(problem: ProblemInstance, \
-                               proposal,
-                               scheduler: NGSchedulerInterface):
-  """Entry point to compile and run while catching and reporting exceptions.
 
-  This is run in interruptible multiprocess mode. Results are returned from this
-  process via `result_queue`.
+def plan_cpus(parsed_args) -> CpuPlan:
+  """Plan the benchmark and compile CPUs of this host.
+
+  `--num-cpus-per-benchmark` and `--num-benchmark-cpus` count physical cores:
+  every benchmark runs on whole cores of a single NUMA node and the SMT
+  siblings of these cores stay idle.
+  """
+  num_benchmark_cores = parsed_args.num_benchmark_cpus \
+    if parsed_args.num_benchmark_cpus > 0 else None
+  return CpuTopology.read().plan(parsed_args.num_cpus_per_benchmark,
+                                 num_benchmark_cores)
 
-  Before starting compilation, acquire a lock in read mode. Wait for a certain
-  amount of time and kill the process if compilation is still running. The
-  compilation is always run on a single CPU. (The process is already pinned to a
-  single CPU when entering this function.)
 
-  Before starting a benchmark, acquire a lock in write mode. Wait for a certain
-  amount of time and kill the process if the benchmark is still running. The
-  benchmark may be run on multiple CPUs.
+def _compile(problem: ProblemInstance, proposal,
+             scheduler: NGSchedulerInterface, entry_point_name: str):
+  """Compile `proposal`, return the compile time or None on failure.
 
-  Upon SIGTERM triggered by the parent, locks are simply dropped on the floor
-  and everything stops.
+  If the scheduler builds the TransformationList of proposals, the transform
+  cache shared through `--transform-cache-dir` is used.
   """
+  start = time.time()
+  try:
+    transformations = scheduler.build_transformations(proposal)
+    if transformations is not None and \
+        os.getenv('SANDBOX_TRANSFORM_CACHE_DIR'):
+      problem.compile_with_transformations(
+          entry_point_name=entry_point_name,
+          fun_to_benchmark_name='fun_to_benchmark',
+          compile_time_problem_sizes_dict=scheduler.
+          build_compile_time_problem_sizes(),
+          transformations=transformations,
+          transform_cache=default_transform_cache())
+    else:
+      problem.compile_with_schedule_builder( \
+        entry_point_name=entry_point_name,
+        fun_to_benchmark_name='fun_to_benchmark',
+        compile_time_problem_sizes_dict=scheduler.
+        build_compile_time_problem_sizes(),
+        schedule_builder=lambda module: scheduler.schedule(module, proposal))
+  except Exception as e:
+    # TODO: save to replay errors.
+    return None
+  return time.time() - start
 
-  global process_state
 
-  # During pool initialization, every process is pinned to one CPU for
-  # compilation purposes. Based on this CPU ID, we can compute the benchmark
-  # CPU range and determine which lock must be acquired.
-  assert len(os.sched_getaffinity(0)) == 1, \
-    "expected that process is pinnen to single CPU"
-  compilation_cpu = os.sched_getaffinity(0).pop()
-  num_cpus_per_benchmark = process_state.parsed_args.num_cpus_per_benchmark
+def _object_size(problem: ProblemInstance, entry_point_name: str, parsed_args):
+  """Return the object code size of the compiled `problem` if it is one of the
+  objectives.
 
-  # There is one reader-write lock per [benchmark_cpu_min; benchmark_cpu_max)
-  # CPU range. Every CPU range consists of `num_cpus_per_benchmark` consecutive
-  # CPUs.
-  lock_idx = int(compilation_cpu / num_cpus_per_benchmark)
-  benchmark_cpu_min = lock_idx * num_cpus_per_benchmark
-  benchmark_cpu_max = benchmark_cpu_min + num_cpus_per_benchmark
-  lock = process_state.rw_locks[lock_idx]
+  The benchmark runs the module JIT compiled by the execution engine, which
+  exposes no object code: the size is that of the same LLVM dialect module
+  compiled by llc, as in the decoupled mode, not of the code that ran.
+  """
+  if 'object_size' not in parsed_args.objectives:
+    return None
+  return len(problem.export_compiled_artifact(entry_point_name).object_code)
 
-  # Sanity check: ensure compilation and benchmark on the same set of CPUs.
-  assert benchmark_cpu_min <= compilation_cpu and compilation_cpu < benchmark_cpu_max, \
-    f'compilation_cpu: {compilation_cpu} is not in range [{benchmark_cpu_min}, {benchmark_cpu_max})'
 
-  entry_point_name = 'main'
-  fun_to_benchmark_name = 'fun_to_benchmark'
-  compile_error = False
+def _benchmark(job: JobContext, problem: ProblemInstance, proposal,
+               entry_point_name: str, parsed_args):
+  """Acquire a benchmark CPU range and run the compiled `problem` on it."""
+  job.acquire(Phase.BENCHMARK)
+  try:
+    # The benchmark runs on CPUs reserved by the supervisor, where the noise
+    # of other processes can be told apart.
+    throughputs = problem.run(
+        n_iters=parsed_args.n_iters,
+        entry_point_name=entry_point_name,
+        runtime_problem_sizes_dict=problem.compile_time_problem_sizes_dict,
+        monitor_noise=True)
+  except Exception as e:
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
+  return SearchJobResult(SearchJobResultStatus.SUCCESS, proposal, throughputs)
 
-  # Function called in the compilation thread.
-  def compile():
-    # Construct the schedule and save the module in case we need to replay later.
-    def schedule_and_save(module):
-      scheduler.schedule(module, proposal)
-      # TODO: save and report on error.
 
-    try:
-      problem.compile_with_schedule_builder( \
-        entry_point_name=entry_point_name,
-        fun_to_benchmark_name=fun_to_benchmark_name,
-        compile_time_problem_sizes_dict=scheduler.
-        build_compile_time_problem_sizes(),
-        schedule_builder=schedule_and_save)
-    except Exception as e:
-      nonlocal compile_error
-      compile_error = True
-
-  throughputs_placeholder = []
-  # Function called in the benchmark thread.
-  def benchmark():
-    throughputs_placeholder.append(
-        problem.run(
-            n_iters=process_state.parsed_args.n_iters,
-            entry_point_name=entry_point_name,
-            runtime_problem_sizes_dict=problem.compile_time_problem_sizes_dict))
-
-  # Function called when compilation or benchmark times out.
-  def kill_process():
-    # Put the compilation CPU back into the queue, so that a newly spawned
-    # process can pin itself to that CPU. (After this process was terminated.)
-    process_state.available_cpus_queue.put(compilation_cpu)
-    process_state.results_queue.put(
-        SearchJobResult(SearchJobResultStatus.TIMEOUT, proposal, None))
-    os.kill(os.getpid(), signal.SIGKILL)
+def compile_and_run_job(job: JobContext, problem: ProblemInstance, proposal,
+                        scheduler: NGSchedulerInterface, parsed_args):
+  """Entry point to compile and run a proposal in a supervised child process.
 
+  The compilation runs on a single CPU granted by the supervisor, the benchmark
+  on the whole CPU range of that CPU once nothing else runs there. The
+  supervisor kills the child if either phase times out.
+  """
+  entry_point_name = 'main'
+  job.acquire(Phase.COMPILE)
+  compile_time = _compile(problem, proposal, scheduler, entry_point_name)
+  if compile_time is None:
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
   try:
-    f = io.StringIO()
-    with redirect_stdout(f):
-      # Compilation: Process is already pinned to compliation_cpu.
-      print(f'compilation_cpu: {compilation_cpu}')
-
-      # Acquire a read lock for compilation. Multiple compilations may run in
-      # parallel on this CPU range.
-      lock.acquire_read()
-      # Start compilation.
-      t = threading.Thread(target=compile)
-      t.start()
-
-      # Kill process after compilation timeout.
-      t.join(process_state.parsed_args.timeout_per_compilation)
-      lock.release()
-      if t.is_alive():
-        kill_process()
-
-      if compile_error:
-        # Stop here if the compilation failed.
-        process_state.results_queue.put(
-            SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None))
-        return
-
-      # Acquire a write lock for benchmarking. No other compilation or benchmark
-      # may run on this CPU range.
-      lock.acquire_write()
-
-      # Benchmark: Pin process to the specified CPU range.
-      os.sched_setaffinity(
-          0, [x for x in range(benchmark_cpu_min, benchmark_cpu_max)])
-
-      # Start benchmark.
-      t = threading.Thread(target=benchmark)
-      t.start()
-
-      # Kill process after benchmark timeout.
-      t.join(process_state.parsed_args.timeout_per_benchmark)
-      lock.release()
-      if t.is_alive():
-        kill_process()
-
-      # Pin this process back to the compilation CPU.
-      os.sched_setaffinity(0, {compilation_cpu})
-
-    # TODO: redirect to a file if we want this information.
-    f.flush()
-    if len(throughputs_placeholder) == 0:
-      process_state.results_queue.put(
-          SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None))
-    else:
-      process_state.results_queue.put(
-          SearchJobResult(SearchJobResultStatus.SUCCESS, proposal,
-                          throughputs_placeholder[0]))
+    object_size = _object_size(problem, entry_point_name, parsed_args)
+  except Exception as e:
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
+  result = _benchmark(job, problem, proposal, entry_point_name, parsed_args)
+  result.compile_time = compile_time
+  result.object_size = object_size
+  return result
+
+
+def compile_job(job: JobContext, problem: ProblemInstance, proposal,
+                scheduler: NGSchedulerInterface):
+  """Entry point to compile a proposal into a CompiledArtifact.
 
+  The artifact is returned with the COMPILED status and must then be
+  benchmarked with `benchmark_artifact_job`.
+  """
+  entry_point_name = 'main'
+  job.acquire(Phase.COMPILE)
+  compile_time = _compile(problem, proposal, scheduler, entry_point_name)
+  if compile_time is None:
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
+  try:
+    artifact = problem.export_compiled_artifact(entry_point_name)
   except Exception as e:
-    traceback.print_exc()
-    lock.release()
-    # TODO: save to replay errors.
-    print(e)
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
+  return SearchJobResult(SearchJobResultStatus.COMPILED,
+                         proposal,
+                         None,
+                         artifact=artifact,
+                         compile_time=compile_time,
+                         object_size=len(artifact.object_code))
+
+
+def benchmark_artifact_job(job: JobContext, problem: ProblemInstance, proposal,
+                           compiled: SearchJobResult, parsed_args):
+  """Entry point to benchmark the CompiledArtifact of a COMPILED result on a
+  dedicated CPU range."""
+  artifact = compiled.artifact
+  try:
+    problem.load_compiled_artifact(artifact)
+  except Exception as e:
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
+  result = _benchmark(job, problem, proposal, artifact.entry_point_name,
+                      parsed_args)
+  result.compile_time = compiled.compile_time
+  result.object_size = compiled.object_size
+  return result
 
 
 def tell_optimizer(
@@ -205,11 +205,21 @@ def tell_optimizer(
     # TODO: extract info from final recommendation instead
     # of an auxiliary `throughputs` list.
     throughputs: tp.Sequence[float],
-    parsed_args):
-  """Tell the result for the proposal."""
+    parsed_args,
+    screener: tp.Optional[ProposalScreener] = None,
+    pareto_archive: tp.Optional[ParetoArchive] = None):
+  """Tell the result for the proposal.
+
+  If a `screener` is provided, successful results are also used to train its
+  cost model.
+  If a `pareto_archive` is provided, the losses of all its objectives are told
+  to the optimizer and the proposal is added to the archive.
+  """
 
   if result.status != SearchJobResultStatus.SUCCESS:
-    optimizer.tell(result.proposal, 1)
+    optimizer.tell(
+        result.proposal, 1 if pareto_archive is None else optimizer_loss(
+            failure_losses(pareto_archive.objectives)))
     return 0
 
   process_throughputs = result.throughputs[parsed_args.metric_to_measure]
@@ -220,7 +230,26 @@ def tell_optimizer(
   throughput = compute_quantiles(process_throughputs)[6]
   relative_error = \
     (parsed_args.machine_peak - throughput) / parsed_args.machine_peak
-  optimizer.tell(result.proposal, relative_error)
+  if pareto_archive is None:
+    optimizer.tell(result.proposal, relative_error)
+  else:
+    # The object size is measured whenever it is an objective, a failed
+    # measurement fails the job.
+    assert result.object_size is not None or \
+        'object_size' not in pareto_archive.objectives, \
+        'expected the object size of a successful result'
+    metrics = ObjectiveMetrics(
+        throughput=throughput,
+        compile_time=result.compile_time,
+        object_size=result.object_size
+        if result.object_size is not None else 0,
+        throughput_cv=np.std(process_throughputs) /
+        np.mean(process_throughputs))
+    losses = metrics.losses(pareto_archive.objectives, parsed_args)
+    optimizer.tell(result.proposal, optimizer_loss(losses))
+    pareto_archive.add(result.proposal, metrics, losses)
+  if screener is not None:
+    screener.tell(result.proposal, relative_error)
   throughputs.append(throughput)
   return throughput
 
@@ -228,8 +257,13 @@ def tell_optimizer(
 def finalize_parallel_search(scheduler: NGSchedulerInterface, \
                              optimizer,
                              throughputs: tp.Sequence[float],
-                             parsed_args):
-  """Report and save the best proposal after search finished."""
+                             parsed_args,
+                             pareto_archive: tp.Optional[ParetoArchive] = None):
+  """Report and save the best proposal after search finished.
+
+  When a Pareto archive is kept, report the Pareto front and save the trade-off
+  selected by `--objective-weights` instead.
+  """
   if len(throughputs) == 0:
     return
 
@@ -239,6 +273,22 @@ def finalize_parallel_search(scheduler: NGSchedulerInterface, \
     final_module_filename = f'{parsed_args.output_dir}/module.mlir'
   else:
     final_module_filename = '/tmp/module.mlir'
+  final_expert_filename = \
+    os.path.join(os.path.dirname(final_module_filename), 'expert.json')
+
+  if pareto_archive is not None:
+    print(f'Pareto front ({", ".join(pareto_archive.objectives)}):')
+    for losses, metrics, _ in pareto_archive.front():
+      print(f'  {metrics}')
+    _, metrics, proposal = pareto_archive.select(parsed_args.objective_weights)
+    print(f'Selected trade-off: {metrics} ' +
+          f'(peak is {parsed_args.machine_peak} GUnits/s)')
+    scheduler.save_proposal_as_module(
+        proposal=proposal,
+        module_save_filename=final_module_filename,
+        benefit=int(metrics.throughput))
+    scheduler.save_proposal_as_expert(proposal, final_expert_filename)
+    return
 
   recommendation = optimizer.recommend()
   # TODO: extract information from saved and draw some graphs
@@ -251,97 +301,267 @@ def finalize_parallel_search(scheduler: NGSchedulerInterface, \
   scheduler.save_proposal_as_module(proposal=recommendation,
                                     module_save_filename=final_module_filename,
                                     benefit=best)
+  scheduler.save_proposal_as_expert(recommendation, final_expert_filename)
 
 ################################################################################
 ### Multiprocess optimization loop.
 ################################################################################
 
+def make_supervisor(parsed_args) -> Supervisor:
+  """Create the Supervisor that evaluates proposals on the CPUs of this host.
+
+  The physical cores of every NUMA node are split into benchmark CPU ranges,
+  see `plan_cpus`. If `--num-benchmark-cpus` is set, compilations share the
+  remaining cores.
+  """
+  plan = plan_cpus(parsed_args)
+  print(f'CPU plan: {plan}')
+  return Supervisor(plan.benchmark_cpu_sets,
+                    max_compilations=parsed_args.num_parallel_tasks,
+                    timeouts={
+                        Phase.COMPILE: parsed_args.timeout_per_compilation,
+                        Phase.BENCHMARK: parsed_args.timeout_per_benchmark
+                    },
+                    compile_cpus=plan.compile_cpus,
+                    benchmark_nodes=plan.benchmark_nodes)
+
+
+class LocalEvaluator():
+  """Evaluate proposals in child processes of a Supervisor on this host."""
+
+  def __init__(self, problem_definition: ProblemDefinition,
+               scheduler: NGSchedulerInterface, parsed_args):
+    self.problem_definition = problem_definition
+    self.scheduler = scheduler
+    self.parsed_args = parsed_args
+    self.decoupled = parsed_args.num_benchmark_cpus > 0
+    # The artifacts are compiled in the children, where a missing tool would
+    # only fail every proposal.
+    if self.decoupled or 'object_size' in parsed_args.objectives:
+      check_tools()
+    self.supervisor = make_supervisor(parsed_args)
+
+  def submit(self, problem_instance: ProblemInstance, proposal):
+    # Submit the job that compiles and runs, or only compiles if benchmarks run
+    # on dedicated CPUs.
+    if self.decoupled:
+      self.supervisor.submit(proposal, compile_job,
+                             (problem_instance, proposal, self.scheduler))
+    else:
+      self.supervisor.submit(proposal, compile_and_run_job,
+                             (problem_instance, proposal, self.scheduler,
+                              self.parsed_args))
+
+  def _submit_benchmark(self, result: SearchJobResult):
+    """Submit the benchmark of a compiled artifact to the supervisor."""
+    problem_instance = ProblemInstance(self.problem_definition,
+                                       result.artifact.np_types)
+    self.supervisor.submit(result.proposal, benchmark_artifact_job,
+                           (problem_instance, result.proposal, result,
+                            self.parsed_args))
+
+  def wait(self, timeout: float) -> tp.Sequence[SearchJobResult]:
+    """Return the results that completed within `timeout` seconds."""
+    results = []
+    for proposal, status, result in self.supervisor.wait(timeout=timeout):
+      result = _result_of_job(proposal, status, result)
+      if result.status == SearchJobResultStatus.COMPILED:
+        # Compiled artifacts still need to be benchmarked.
+        self._submit_benchmark(result)
+        continue
+      results.append(result)
+    return results
+
+  def shutdown(self):
+    self.supervisor.shutdown()
+
+
+class BrokerEvaluator():
+  """Evaluate proposals on the worker agents connected to a Broker."""
+
+  def __init__(self, scheduler: NGSchedulerInterface, parsed_args):
+    self.scheduler = scheduler
+    self.parsed_args = parsed_args
+    # The broker unpickles the messages of its peers, only authenticated
+    # workers may connect. Without --broker-authkey, generate a random key the
+    # workers must be started with.
+    authkey = parsed_args.broker_authkey
+    if authkey is None:
+      authkey = secrets.token_hex(16)
+      print(f'Start the workers with --broker-authkey {authkey}')
+    self.broker = Broker(parsed_args.broker_listen, authkey.encode(),
+                         parsed_args.broker_heartbeat_timeout)
+    self.proposals = {}
+    self.num_results_per_host = {}
+    print(f'Waiting for workers on {parsed_args.broker_listen}')
+
+  def submit(self, problem_instance: ProblemInstance, proposal):
+    job_id = self.broker.submit(
+        (problem_instance, proposal, self.scheduler, self.parsed_args))
+    self.proposals[job_id] = proposal
+
+  def wait(self, timeout: float) -> tp.Sequence[SearchJobResult]:
+    try:
+      broker_result = self.broker.get_result(timeout=timeout)
+    except queue.Empty:
+      return []
+    result = broker_result.result
+    # Tell the optimizer about the proposal it asked, not a copy of it
+    # returned by the worker.
+    result.proposal = self.proposals.pop(broker_result.job_id)
+    result.host = broker_result.host
+    self.num_results_per_host[result.host] = \
+      self.num_results_per_host.get(result.host, 0) + 1
+    return [result]
+
+  def shutdown(self):
+    self.broker.close()
+    print(f'Results per host: {self.num_results_per_host}, ' +
+          f're-queued jobs: {self.broker.num_requeued}')
+
+
+def _result_of_job(proposal, status: JobStatus, result) -> SearchJobResult:
+  """Return the SearchJobResult of a job that finished with `status`."""
+  if status == JobStatus.TIMEOUT:
+    return SearchJobResult(SearchJobResultStatus.TIMEOUT, proposal, None)
+  if status == JobStatus.CRASHED:
+    return SearchJobResult(SearchJobResultStatus.FAILURE, proposal, None)
+  # Tell the optimizer about the proposal it asked, not a copy of it returned
+  # by the child.
+  result.proposal = proposal
+  return result
+
+
+def run_search_worker(parsed_args):
+  """Evaluate the proposals of the broker at `--broker-connect` on this host.
+
+  `--num-parallel-tasks` worker agents connect to the broker and share a
+  Supervisor, so that the CPUs of this host are accounted for as in local mode.
+  The agents hand their jobs to a thread that owns the Supervisor and block
+  until it routes back their results. The job parameters (iterations,
+  timeouts, objectives) are the ones of the coordinator.
+  """
+  assert parsed_args.broker_authkey is not None, \
+    '--broker-connect requires the --broker-authkey of the coordinator'
+  if parsed_args.transform_cache_dir:
+    os.environ['SANDBOX_TRANSFORM_CACHE_DIR'] = parsed_args.transform_cache_dir
+  supervisor = make_supervisor(parsed_args)
+  # Jobs of the agents with the queue their result is put in, None to stop.
+  submissions = queue.Queue()
+
+  def serve():
+    keys = itertools.count()
+    result_queues = {}
+    while True:
+      while not submissions.empty():
+        submission = submissions.get()
+        if submission is None:
+          return
+        job, result_queue = submission
+        key = next(keys)
+        result_queues[key] = result_queue
+        supervisor.submit(key, compile_and_run_job, job)
+      for key, status, result in supervisor.wait(timeout=None):
+        result_queues.pop(key).put((status, result))
+
+  def evaluate(job):
+    problem_instance, proposal, scheduler, coordinator_args = job
+    result_queue = queue.Queue()
+    submissions.put(((problem_instance, proposal, scheduler, coordinator_args),
+                     result_queue))
+    supervisor.wake()
+    status, result = result_queue.get()
+    return _result_of_job(proposal, status, result)
+
+  server = threading.Thread(target=serve)
+  server.start()
+  agents = [
+      threading.Thread(target=run_worker,
+                       args=(parsed_args.broker_connect,
+                             parsed_args.broker_authkey.encode(), evaluate,
+                             parsed_args.broker_host_tag))
+      for _ in range(parsed_args.num_parallel_tasks)
+  ]
+  for agent in agents:
+    agent.start()
+  for agent in agents:
+    agent.join()
+  submissions.put(None)
+  supervisor.wake()
+  server.join()
+  supervisor.shutdown()
+
+
 def async_optim_loop(problem_definition: ProblemDefinition, \
                      scheduler: NGSchedulerInterface,
                      optimizer,
                      parsed_args):
-  """Asynchronous NG scheduling with multi-process evaluation of proposals."""
-
-  # Helper variables.
-  num_cpus_per_benchmark = parsed_args.num_cpus_per_benchmark
+  """Asynchronous NG scheduling with multi-process evaluation of proposals.
 
-  # A benchmark may run on multiple CPUs. Must divide cpu_count evenly.
-  assert cpu_count() % parsed_args.num_cpus_per_benchmark == 0, \
-    f'num_cpus_per_benchmark: {parsed_args.num_cpus_per_benchmark} ' + \
-    f'must divide the number of cpus: {cpu_count()}'
-  num_concurrent_benchmarks = int(cpu_count() / num_cpus_per_benchmark)
+  Every proposal is evaluated in a child process of a `Supervisor`, which pins
+  the child to its CPUs and kills it if compilation or benchmark time out.
+  By default, a child compiles and benchmarks its proposal. If
+  `--num-benchmark-cpus` is set, these CPUs are reserved for benchmarking
+  CompiledArtifacts produced by compilations running unpinned on the remaining
+  CPUs.
 
-  # Reader-writer locks are used to ensure that nothing else in running on a
-  # CPU range while a benchmark is running. If no benchmark is running, multiple
-  # compilations may be running on a CPU range (even more than cores available).
-  mp_manager = mp.Manager()
-  benchmark_locks = [RWLock() for idx in range(num_concurrent_benchmarks)]
-
-  # Concurrent queue for benchmark results.
-  results_queue = mp_manager.Queue()
-
-  # Concurrent queue for available CPUs. Every mp.Pool process is pinned to one
-  # CPU from the queue. During the benchmark phase, it is pinned to a CPU range.
-  available_cpus_queue = mp_manager.Queue()
-  for i in range(parsed_args.num_parallel_tasks):
-    available_cpus_queue.put(i % cpu_count())
-
-  shutdown_event = mp_manager.Event()
-
-  def init_proccess(process_state_arg):
-    """Initialize an mp.Pool process.
-
-    Store process_state in a global variable, so that it can be shared among all
-    jobs that are run on this process and be accessed during job execution. Also
-    select a pinned compilation CPU for this process.
-    """
-
-    # Store process_state in global variable.
-    global process_state
-    process_state = process_state_arg
-
-    # Install signal handler to stop program execution on CTRL+C.
-    def signal_handler(sig, frame):
-      process_state.shutdown_event.set()
-      exit(1)
+  With `--broker-listen`, proposals are instead evaluated by the worker agents
+  of other hosts, started with the same script and `--broker-connect`.
+  """
 
-    signal.signal(signal.SIGINT, signal_handler)
+  if parsed_args.broker_connect:
+    run_search_worker(parsed_args)
+    return
 
-    # Pin this process to a single CPU (for compilation).
-    cpu_id = None
-    try:
-      cpu_id = process_state.available_cpus_queue.get(timeout=1.0)
-    except queue.Empty as e:
-      # Could not get CPU ID from queue. This indicates a crash. When a process
-      # terminates gracefully (e.g., due a timeout), the occupied CPU ID
-      # would've been put back into the queue.
-      process_state.shutdown_event.set()
-      print("\nCompilation or benchmark process crashed. Shutting down.\n")
-      exit(1)
-
-    os.sched_setaffinity(0, {cpu_id})
-
-  # Initialize the process pool. This also initializes all worker processes. If
-  # a worker process is killed during execution, a new process is spawned and
-  # initialized, so that there are always `num_parallel_tasks` many processes.
-  process_state = ProcessState(available_cpus_queue, parsed_args, results_queue,
-                               benchmark_locks, shutdown_event)
-  process_pool = mp.Pool(processes=parsed_args.num_parallel_tasks,
-                         initializer=init_proccess,
-                         initargs=(process_state,))
+  # The evaluation processes find the transform cache in their environment.
+  if parsed_args.transform_cache_dir:
+    os.environ['SANDBOX_TRANSFORM_CACHE_DIR'] = parsed_args.transform_cache_dir
+
+  # Unless only the throughput is optimized, tell the losses of the objectives
+  # and keep a Pareto front. With multiple objectives, failed proposals are
+  # told the reference point of the hypervolume.
+  pareto_archive = None
+  if parsed_args.objectives != ['throughput']:
+    pareto_archive = ParetoArchive(parsed_args.objectives)
+    if len(parsed_args.objectives) > 1:
+      import nevergrad as ng
+      optimizer.tell(ng.p.MultiobjectiveReference(),
+                     failure_losses(parsed_args.objectives))
+
+  # Screen proposals with a surrogate cost model if the scheduler can extract
+  # features from proposals. The model only predicts the throughput loss, the
+  # proposals it screens out are told the failure losses of all objectives.
+  screener = None
+  if parsed_args.cost_model_screening_factor > 1:
+    if type(scheduler).extract_features is \
+        NGSchedulerInterface.extract_features:
+      print('Scheduler does not extract proposal features, '
+            'cost model screening is disabled')
+    else:
+      screened_out_loss = (lambda predicted: predicted) \
+        if pareto_archive is None else \
+        (lambda predicted: optimizer_loss(
+            failure_losses(parsed_args.objectives)))
+      screener = ProposalScreener(
+          scheduler.extract_features,
+          screening_factor=parsed_args.cost_model_screening_factor,
+          min_samples=parsed_args.cost_model_min_samples,
+          screened_out_loss=screened_out_loss)
+
+  evaluator = BrokerEvaluator(scheduler, parsed_args) \
+    if parsed_args.broker_listen else \
+    LocalEvaluator(problem_definition, scheduler, parsed_args)
+  problem_types = [np.float32] * 3
 
   def enqueue_search_job():
-    """Ask for the next proposal and schedule a run on the pool."""
-    proposal = optimizer.ask()
+    """Ask for the next proposal and submit its evaluation."""
+    proposal = screener.ask(optimizer)[0] if screener is not None \
+      else optimizer.ask()
 
     # Create problem instance, which holds the compiled module and the
     # ExecutionEngine.
-    problem_types = [np.float32] * 3
     problem_instance = ProblemInstance(problem_definition, problem_types)
-
-    # Enqueue the job that compiles and runs.
-    process_pool.apply_async(func=compile_and_run_checked_mp,
-                             args=(problem_instance, proposal, scheduler))
+    evaluator.submit(problem_instance, proposal)
 
   # TODO: extract info from final recommendation instead of an auxiliary
   # `throughputs` list.
@@ -350,12 +570,10 @@ def async_optim_loop(problem_definition: ProblemDefinition, \
 
   def shutdown():
     print(f'Ctrl+C received from pid {os.getpid()}')
-    try:
-      process_pool.terminate()
-    except:
-      pass
+    evaluator.shutdown()
     print('Killed children processes')
-    finalize_parallel_search(scheduler, optimizer, throughputs, parsed_args)
+    finalize_parallel_search(scheduler, optimizer, throughputs, parsed_args,
+                             pareto_archive)
     exit(1)
 
   def signal_handler(sig, frame):
@@ -363,8 +581,16 @@ def async_optim_loop(problem_definition: ProblemDefinition, \
 
   signal.signal(signal.SIGINT, signal_handler)
 
-  plotting = Plotting()
+  # Record every evaluated proposal in a tuning database, which is analyzed
+  # once the search finished.
   plot_dir = parsed_args.plot_output_dir
+  database = None
+  if plot_dir:
+    # The analytics import pandas, only pay for it when they are used.
+    from mlir.sandbox.tuning_analytics import TuningDatabase, \
+      database_file_name
+    os.makedirs(plot_dir, exist_ok=True)
+    database = TuningDatabase(os.path.join(plot_dir, database_file_name))
 
   # Enqueue slightly more jobs than processes, so that another job can start
   # running immediately when a job finishes. When a job finishes, another job
@@ -379,11 +605,9 @@ def async_optim_loop(problem_definition: ProblemDefinition, \
   best = 0
   num_failed = 0
   num_timeout = 0
+  pending_results = []
   for i in range(parsed_args.search_budget):
     if i % 10 == 1:
-      if shutdown_event.is_set():
-        shutdown()
-
       sys.stdout.write(f'*******\t' +
                        f'{parsed_args.search_strategy} optimization iter ' +
                        f'{i} / {parsed_args.search_budget}, ' +
@@ -392,37 +616,40 @@ def async_optim_loop(problem_definition: ProblemDefinition, \
                        f'#timeout: {num_timeout}\r')
       sys.stdout.flush()
 
-    # Retrieve a result from the queue.
-    result = None
-    while result is None:
-      # Keep checking the shutdown event while waiting.
-      if shutdown_event.is_set():
-        shutdown()
-        return
-      try:
-        result = results_queue.get(timeout=0.5)
-      except queue.Empty as e:
-        pass
+    # Retrieve a result from the evaluator.
+    while not pending_results:
+      pending_results.extend(evaluator.wait(timeout=0.5))
+    result = pending_results.pop(0)
 
     # Process retrieved result.
     if result.status == SearchJobResultStatus.FAILURE:
       num_failed += 1
     if result.status == SearchJobResultStatus.TIMEOUT:
       num_timeout += 1
-    throughput = tell_optimizer(optimizer, result, throughputs, parsed_args)
+    throughput = tell_optimizer(optimizer, result, throughputs, parsed_args,
+                                screener, pareto_archive)
     best = throughput if throughput > best else best
-    if plot_dir:
-      plotting.add_data_point(result.proposal.kwargs, throughput)
+    if database is not None:
+      database.add(result.proposal.kwargs,
+                   throughput,
+                   status=result.status.name,
+                   compile_time=result.compile_time,
+                   host=result.host)
 
     if search_number < parsed_args.search_budget:
       search_number += 1
       enqueue_search_job()
 
-  finalize_parallel_search(scheduler, optimizer, throughputs, parsed_args)
-
-  if plot_dir:
-    print("Plotting throughput analysis: " + plot_dir)
-    for feature in plotting.get_features():
-      plotting.plot(feature, plot_dir)
+  evaluator.shutdown()
+  finalize_parallel_search(scheduler, optimizer, throughputs, parsed_args,
+                           pareto_archive)
+  if screener is not None:
+    print(f'Cost model screened out {screener.num_screened_out} proposals')
+
+  if database is not None:
+    from mlir.sandbox.tuning_analytics import write_report_from_database
+    print("Writing the tuning sensitivity report: " + plot_dir)
+    analysis = write_report_from_database(database, plot_dir)
+    print(f'Parameter importance:\n{analysis.importance.to_string()}')
 
   print('Done')
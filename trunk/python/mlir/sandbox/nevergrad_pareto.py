@@ -0,0 +1,119 @@
+"""Multi-objective tuning: losses of the objectives and their Pareto front.
+
+Besides the throughput, a search may trade off the compile time, the size of
+the generated object code and the coefficient of variation of the
+measurements. Every objective is turned into a loss in [0, 1] (lower is
+better) so that nevergrad multi-objective optimizers can use a fixed reference
+point of ones, which is also the loss of failed proposals.
+"""
+
+import numpy as np
+import typing as tp
+
+from typing import Any, Mapping, Optional, Sequence
+
+# Supported objectives, the choices of `--objectives`.
+objective_names = ('throughput', 'compile_time', 'object_size', 'throughput_cv')
+
+
+class ObjectiveMetrics:
+  """The raw metrics of a successfully evaluated proposal.
+
+  Arguments:
+  throughput: the @90% throughput in GUnits/s.
+  compile_time: the compilation time in seconds.
+  object_size: the size of the object code in bytes.
+  throughput_cv: the coefficient of variation of the measured throughputs.
+  """
+
+  def __init__(self, throughput: float, compile_time: float, object_size: int,
+               throughput_cv: float):
+    self.throughput = throughput
+    self.compile_time = compile_time
+    self.object_size = object_size
+    self.throughput_cv = throughput_cv
+
+  def losses(self, objectives: Sequence[str],
+             parsed_args) -> Sequence[float]:
+    """Return the losses of `objectives`, clamped to [0, 1]."""
+    loss_of = {
+        'throughput':
+            (parsed_args.machine_peak - self.throughput) /
+            parsed_args.machine_peak,
+        'compile_time':
+            self.compile_time / parsed_args.timeout_per_compilation,
+        'object_size':
+            self.object_size / parsed_args.max_object_size,
+        'throughput_cv':
+            self.throughput_cv,
+    }
+    return [min(1.0, max(0.0, loss_of[name])) for name in objectives]
+
+  def __str__(self):
+    return f'{self.throughput:.2f} GUnits/s, ' + \
+           f'compile {self.compile_time:.3f} s, ' + \
+           f'object {self.object_size / 1024:.1f} KiB, ' + \
+           f'cv {self.throughput_cv:.3f}'
+
+
+def failure_losses(objectives: Sequence[str]) -> Sequence[float]:
+  """Return the losses told for a failed or timed out proposal."""
+  return [1.0] * len(objectives)
+
+
+def optimizer_loss(losses: Sequence[float]) -> tp.Union[float, Sequence[float]]:
+  """Return the loss told to nevergrad for `losses`: a single objective is
+  told as a scalar, which nevergrad does not treat as multi-objective."""
+  return losses[0] if len(losses) == 1 else list(losses)
+
+
+def dominates(lhs: Sequence[float], rhs: Sequence[float]) -> bool:
+  """Return True if losses `lhs` Pareto-dominate losses `rhs`."""
+  return all(l <= r for l, r in zip(lhs, rhs)) and \
+    any(l < r for l, r in zip(lhs, rhs))
+
+
+class ParetoArchive:
+  """Keep the non-dominated proposals found during a search."""
+
+  def __init__(self, objectives: Sequence[str]):
+    self.objectives = list(objectives)
+    # List of (losses, metrics, proposal) tuples.
+    self.entries = []
+
+  def add(self, proposal, metrics: ObjectiveMetrics, losses: Sequence[float]):
+    """Add `proposal` unless it is dominated, drop the entries it dominates.
+
+    Return True if the proposal was added to the front.
+    """
+    if any(
+        dominates(other, losses) or list(other) == list(losses)
+        for other, _, _ in self.entries):
+      return False
+    self.entries = [
+        e for e in self.entries if not dominates(losses, e[0])
+    ] + [(list(losses), metrics, proposal)]
+    return True
+
+  def front(self) -> Sequence[tp.Tuple[Sequence[float], ObjectiveMetrics,
+                                       Any]]:
+    """Return the Pareto front sorted by the first objective."""
+    return sorted(self.entries, key=lambda e: e[0])
+
+  def select(self, weights: Optional[Sequence[float]] = None):
+    """Return the front entry with the smallest weighted sum of losses.
+
+    The losses are normalized to [0, 1] over the front before weighting, so
+    that the weights express the relative importance of the objectives. All
+    objectives are weighted equally by default.
+    """
+    if len(self.entries) == 0:
+      return None
+    weights = np.asarray(
+        weights if weights is not None else [1.0] * len(self.objectives))
+    assert len(weights) == len(self.objectives), \
+      f'expected {len(self.objectives)} objective weights, got {len(weights)}'
+    losses = np.asarray([e[0] for e in self.entries])
+    span = losses.max(axis=0) - losses.min(axis=0)
+    normalized = (losses - losses.min(axis=0)) / np.where(span > 0, span, 1)
+    return self.entries[int(np.argmin(normalized @ weights))]
@@ -8,6 +8,9 @@ from iree.compiler.passmanager import PassManager
 import iree.compiler.dialects.transform as transform
 from iree.compiler.dialects import builtin, pdl
 
+from mlir.sandbox.transform import TransformationList
+from mlir.sandbox.variables import *
+
 class Searchable:
   'Base class for searchable parameters.'
 
@@ -119,6 +122,23 @@ class IntChoice(Searchable):
       return ng.p.Choice(self.values, repetitions=self.length)
 
 
+class OptionChoice(Searchable):
+  'Searchable that corresponds to one of `options`, e.g. of a ChoiceVariable.'
+
+  options: tp.Sequence = None
+
+  def __init__(self, name: str, options: tp.Sequence):
+    Searchable.__init__(self, name)
+    self.options = list(options)
+
+  def instrument(self):
+    return ng.p.Choice(self.options)
+
+  # Overload to return the option itself, which may be an Iterable string.
+  def extract_from_proposal(self, proposal):
+    return proposal.kwargs[self.name]
+
+
 class Permutation(Searchable):
   'Searchable that corresponds to a single permutation of [0 .. length-1].'
   length: int = None
@@ -210,3 +230,102 @@ def lowering_transform_ir_under_insertion_point():
   for i in range(7):
     transform.LowerVectorsOp(stages=list(j + 1 for j in range(i + 1)))
   transform.LowerToLLVMOp()
+
+
+# Default values searched for tile sizes, 0 means the loop is not tiled.
+default_tile_size_values = [0, 1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class TransformationListSearchSpace:
+  """Search space over the `variables` of a TransformationList subclass.
+
+  Every variable of `transformation_list_cls` becomes a Searchable, so that
+  whole expert pipelines (e.g. `Tile.then(Pad).then(Vectorize)`) can be
+  searched with nevergrad:
+  * variables listed in `fixed_values` are not searched;
+  * variables listed in `searchables` are searched with the given Searchable,
+    whose extracted value is passed as is;
+  * otherwise, the Searchable is derived from the variable type: booleans,
+    choices, tile sizes, interchanges, peeled and padded loops, packed and
+    hoisted operands. Loop variables have `rank` entries and operand variables
+    `num_operands` entries.
+  Remaining variables (e.g. integers whose meaning depends on the transform)
+  keep their default value; variables without default must be fixed.
+  """
+
+  def __init__(self,
+               transformation_list_cls: tp.Type[TransformationList],
+               rank: int,
+               num_operands: int,
+               searchables: tp.Mapping[str, Searchable] = {},
+               fixed_values: tp.Mapping[str, tp.Any] = {},
+               tile_size_values: tp.Sequence[int] = default_tile_size_values,
+               max_hoist_depth: int = 3):
+    self.transformation_list_cls = transformation_list_cls
+    self.rank = rank
+    self.num_operands = num_operands
+    self.tile_size_values = tile_size_values
+    self.max_hoist_depth = max_hoist_depth
+    self.fixed_values = dict(fixed_values)
+    # Map from variable name to (Searchable, conversion of extracted values).
+    self.searchables = {}
+
+    for name, variable in transformation_list_cls.variables.items():
+      if name in self.fixed_values:
+        continue
+      if name in searchables:
+        self.searchables[name] = (searchables[name], lambda x: x)
+        continue
+      variable_cls = variable[0] if isinstance(variable, tuple) else variable
+      searchable = self._make_searchable(name, variable_cls)
+      if searchable is not None:
+        self.searchables[name] = searchable
+      elif issubclass(variable_cls, PaddingValueVariable):
+        self.fixed_values[name] = [0.0] * num_operands
+      elif not isinstance(variable, tuple):
+        raise ValueError(f'{name} is not searchable and has no default value, '
+                         f'it must be passed in fixed_values')
+
+  def _make_searchable(self, name: str, variable_cls: tp.Type[Variable]):
+    """Return the (Searchable, conversion) pair for a variable, if any."""
+    if issubclass(variable_cls, BoolVariable):
+      return BoolChoice(name), lambda x: x[0]
+    if issubclass(variable_cls, ChoiceVariableBase):
+      return OptionChoice(name, variable_cls.options), lambda x: x
+    if issubclass(variable_cls, TilingSizesVariable):
+      return IntChoice(name, length=self.rank).with_values(
+          self.tile_size_values), lambda x: x
+    # TransposePaddingVariable derives from InterchangeVariable but contains one
+    # interchange per operand, keep its default.
+    if issubclass(variable_cls, TransposePaddingVariable):
+      return None
+    if issubclass(variable_cls, InterchangeVariable):
+      return Permutation(name, length=self.rank), list
+    if issubclass(variable_cls, (PeelingVariable, PaddingDimensionVariable)):
+      return BoolChoice(name, length=self.rank), \
+        lambda x: [i for i, b in enumerate(x) if b]
+    if issubclass(variable_cls, PackPaddingVariable):
+      return BoolChoice(name, length=self.num_operands), \
+        lambda x: [1 if b else 0 for b in x]
+    if issubclass(variable_cls, HoistPaddingVariable):
+      return IntChoice(name, length=self.num_operands).with_range(
+          range(self.max_hoist_depth + 1)), lambda x: x
+    return None
+
+  def get_instrumentation(self):
+    d = {}
+    for searchable, _ in self.searchables.values():
+      d.update(searchable.get_instrumentation())
+    return d
+
+  def extract_from_proposal(self, proposal) -> tp.Mapping[str, tp.Any]:
+    """Return the keyword arguments of the TransformationList for `proposal`."""
+    kwargs = dict(self.fixed_values)
+    for name, (searchable, convert) in self.searchables.items():
+      kwargs[name] = convert(searchable.extract_from_proposal(proposal))
+    return kwargs
+
+  def build(self, proposal, fun_name: str, op_name: str) -> TransformationList:
+    """Instantiate the TransformationList for `proposal`."""
+    return self.transformation_list_cls(fun_name, op_name,
+                                        **self.extract_from_proposal(proposal))
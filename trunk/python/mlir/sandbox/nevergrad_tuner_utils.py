@@ -6,6 +6,8 @@ from typing import Callable, Sequence
 
 import iree.compiler.ir as ir
 
+from mlir.sandbox.nevergrad_pareto import objective_names
+
 debug_constraints = False
 
 
@@ -38,6 +40,21 @@ class NGSchedulerInterface:
     """
     pass
 
+  def build_transformations(self, proposal):
+    """Return the TransformationList that `schedule` emits for `proposal`.
+
+    Schedulers that override this method share the transformed IR of common
+    transform prefixes between proposals if `--transform-cache-dir` is set.
+    """
+    return None
+
+  def extract_features(self, proposal):
+    """Return the feature vector of `proposal` for the surrogate cost model.
+
+    Schedulers that do not override this method are not screened.
+    """
+    return None
+
   def save_proposal_as_module(self,
                               proposal,
                               module_save_filename,
@@ -54,6 +71,20 @@ class NGSchedulerInterface:
       with open(module_save_filename, 'w') as f:
         f.write(str(module))
 
+  def save_proposal_as_expert(self, proposal, expert_save_filename) -> bool:
+    """Save the TransformationList of `proposal` to an expert file that can be
+    replayed with `--expert_file`.
+
+    Return False if the scheduler does not build TransformationLists.
+    """
+    transformations = self.build_transformations(proposal)
+    if transformations is None:
+      return False
+    from mlir.sandbox.expert_serialization import save_experts
+    save_experts(expert_save_filename, {'tuned': transformations})
+    print(f'Expert saved in {expert_save_filename}')
+    return True
+
 
 ################################################################################
 ### Nevergrad constraints.
@@ -167,10 +198,16 @@ def add_argparser_tuning_arguments(parser: ArgumentParser):
       nargs='?',
   )
   parser.add_argument('--num-parallel-tasks', type=int, nargs='?', default=1)
+  # Benchmark CPUs are counted in physical cores, whose SMT siblings are left
+  # idle, see cpu_topology.
   parser.add_argument('--num-cpus-per-benchmark',
                       type=int,
                       nargs='?',
                       default=1)
+  # When > 0, reserve this many CPUs for benchmarking CompiledArtifacts on
+  # dedicated processes and compile on the remaining CPUs. By default, every
+  # process both compiles and benchmarks its proposals.
+  parser.add_argument('--num-benchmark-cpus', type=int, nargs='?', default=0)
   parser.add_argument('--random-seed', type=int, nargs='?', default=42)
   parser.add_argument('--search-budget', type=int, nargs='?', default=100)
   parser.add_argument(
@@ -183,12 +220,57 @@ def add_argparser_tuning_arguments(parser: ArgumentParser):
                       type=float,
                       nargs='?',
                       default=5)
-  # Until ExecutionEngine pickles, we are both compiling and evaluating.
+  # Unless --num-benchmark-cpus is set, we are both compiling and evaluating.
   parser.add_argument('--timeout-per-benchmark',
                       type=float,
                       nargs='?',
                       default=1)
+  # When set, record the evaluated proposals in a tuning database in this
+  # directory and write a sensitivity report of the search space there.
   parser.add_argument('--plot-output-dir',
                       type=str,
                       nargs='?',
                       default="")
+  # Ask that many candidates per proposal and only compile and benchmark the
+  # ones ranked best by the surrogate cost model (1 disables screening).
+  parser.add_argument('--cost-model-screening-factor',
+                      type=int,
+                      nargs='?',
+                      default=1)
+  parser.add_argument('--cost-model-min-samples',
+                      type=int,
+                      nargs='?',
+                      default=20)
+  # Objectives to minimize. Unless only the throughput is optimized, the search
+  # keeps a Pareto front and saves the trade-off selected by
+  # --objective-weights.
+  parser.add_argument('--objectives',
+                      type=str,
+                      nargs='+',
+                      choices=objective_names,
+                      default=['throughput'])
+  # One weight per objective, all objectives are weighted equally by default.
+  parser.add_argument('--objective-weights', type=float, nargs='+')
+  # Object size (in bytes) that corresponds to the worst object_size loss.
+  parser.add_argument('--max-object-size',
+                      type=int,
+                      nargs='?',
+                      default=1 << 20)
+  # Distributed tuning: the coordinator listens on `host:port` or a Unix socket
+  # path and keeps --num-parallel-tasks proposals in flight over all hosts.
+  # Workers run the same script with --broker-connect and evaluate proposals
+  # on --num-parallel-tasks agents each.
+  parser.add_argument('--broker-listen', type=str, nargs='?')
+  parser.add_argument('--broker-connect', type=str, nargs='?')
+  # Key authenticating the workers to the coordinator. Without it, the
+  # coordinator generates a random key and prints it.
+  parser.add_argument('--broker-authkey', type=str, nargs='?')
+  parser.add_argument('--broker-heartbeat-timeout',
+                      type=float,
+                      nargs='?',
+                      default=10)
+  # Tag results of this worker with this name instead of the host name.
+  parser.add_argument('--broker-host-tag', type=str, nargs='?')
+  # Share the IR transformed by common transform prefixes between proposals
+  # through this directory, see transform_cache.
+  parser.add_argument('--transform-cache-dir', type=str, nargs='?')
@@ -0,0 +1,186 @@
+"""Detect system noise that interferes with a benchmark run.
+
+A `NoiseMonitor` snapshots the state of the CPUs a benchmark is pinned to
+before and after a batch of iterations and reports why the batch may be noisy:
+  - the CPU frequency changed (e.g. turbo or AVX-512 frequency licenses,
+    thermal throttling), read from /sys/devices/system/cpu/cpu*/cpufreq;
+  - the benchmark thread was preempted, counted by the involuntary context
+    switches of getrusage;
+  - other processes ran on the benchmark CPUs, measured as the busy time of
+    these CPUs in /proc/stat that is not accounted to this process.
+The thresholds are set with the SANDBOX_NOISE_* environment variables.
+Monitoring is opt-in, see the `monitor_noise` argument of `test_harness`: on
+CPUs that are not reserved for the benchmark, the load of the whole machine is
+reported as noise.
+"""
+
+import os
+import resource
+import time
+import typing as tp
+
+import numpy as np
+
+# /proc/stat counts CPU time in clock ticks.
+_clock_ticks_per_s = os.sysconf('SC_CLK_TCK')
+
+
+def _read_cpu_frequencies_khz(cpus: tp.Iterable[int]) -> tp.Dict[int, int]:
+  frequencies = {}
+  for cpu in cpus:
+    try:
+      with open(f'/sys/devices/system/cpu/cpu{cpu}/cpufreq/scaling_cur_freq'
+               ) as f:
+        frequencies[cpu] = int(f.read())
+    except (OSError, ValueError):
+      pass
+  return frequencies
+
+
+def _read_cpu_busy_s(cpus: tp.Iterable[int]) -> tp.Optional[float]:
+  """Return the total non-idle time of `cpus` in seconds, None if unknown."""
+  cpus = set(cpus)
+  busy_ticks = 0
+  try:
+    with open('/proc/stat') as f:
+      for line in f:
+        fields = line.split()
+        if not fields[0].startswith('cpu') or fields[0] == 'cpu' or \
+            int(fields[0][3:]) not in cpus:
+          continue
+        # user nice system idle iowait irq softirq steal ...
+        ticks = [int(t) for t in fields[1:9]]
+        busy_ticks += sum(ticks) - ticks[3] - ticks[4]
+  except (OSError, ValueError, IndexError):
+    return None
+  return busy_ticks / _clock_ticks_per_s
+
+
+class NoiseThresholds():
+  """The noise tolerated by a batch of iterations.
+
+  Arguments:
+  max_frequency_change: the relative change of the frequency of a CPU.
+  max_involuntary_context_switches: the number of times the benchmark thread
+    may be preempted.
+  max_foreign_load: the fraction of the CPU time of the benchmark CPUs that
+    other processes may use.
+  """
+
+  def __init__(self,
+               max_frequency_change: float = 0.05,
+               max_involuntary_context_switches: int = 2,
+               max_foreign_load: float = 0.05):
+    self.max_frequency_change = max_frequency_change
+    self.max_involuntary_context_switches = max_involuntary_context_switches
+    self.max_foreign_load = max_foreign_load
+
+  @staticmethod
+  def from_environment():
+    defaults = NoiseThresholds()
+    return NoiseThresholds(
+        float(
+            os.getenv('SANDBOX_NOISE_MAX_FREQUENCY_CHANGE',
+                      defaults.max_frequency_change)),
+        int(
+            os.getenv('SANDBOX_NOISE_MAX_CONTEXT_SWITCHES',
+                      defaults.max_involuntary_context_switches)),
+        float(
+            os.getenv('SANDBOX_NOISE_MAX_FOREIGN_LOAD',
+                      defaults.max_foreign_load)))
+
+
+class _Snapshot():
+
+  def __init__(self, cpus: tp.Sequence[int]):
+    self.time = time.monotonic()
+    self.frequencies = _read_cpu_frequencies_khz(cpus)
+    self.cpu_busy_s = _read_cpu_busy_s(cpus)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    self.own_cpu_s = usage.ru_utime + usage.ru_stime
+    self.involuntary_context_switches = usage.ru_nivcsw
+
+
+class NoiseMonitor():
+  """Report the noise on `cpus` (the affinity of this process by default)
+  during the batches of iterations delimited by `start` and `stop`."""
+
+  def __init__(self,
+               cpus: tp.Optional[tp.Iterable[int]] = None,
+               thresholds: tp.Optional[NoiseThresholds] = None):
+    self.cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    self.thresholds = thresholds if thresholds is not None else \
+      NoiseThresholds()
+    self.snapshot = None
+
+  def start(self):
+    self.snapshot = _Snapshot(self.cpus)
+
+  def stop(self) -> tp.List[str]:
+    """Return the reasons why the batch since `start` is noisy, if any."""
+    start, end = self.snapshot, _Snapshot(self.cpus)
+    reasons = []
+
+    for cpu, start_khz in start.frequencies.items():
+      end_khz = end.frequencies.get(cpu)
+      if end_khz is None or start_khz == 0:
+        continue
+      change = abs(end_khz - start_khz) / start_khz
+      if change > self.thresholds.max_frequency_change:
+        reasons.append(f'cpu{cpu} frequency {start_khz / 1e6:.2f}->'
+                       f'{end_khz / 1e6:.2f} GHz')
+
+    context_switches = end.involuntary_context_switches - \
+      start.involuntary_context_switches
+    if context_switches > self.thresholds.max_involuntary_context_switches:
+      reasons.append(f'{context_switches} involuntary context switches')
+
+    if start.cpu_busy_s is not None and end.cpu_busy_s is not None:
+      elapsed_s = end.time - start.time
+      foreign_s = (end.cpu_busy_s - start.cpu_busy_s) - \
+        (end.own_cpu_s - start.own_cpu_s)
+      # Ignore the rounding of /proc/stat to clock ticks.
+      tolerated_s = max(self.thresholds.max_foreign_load * elapsed_s *
+                        len(self.cpus), 2.0 / _clock_ticks_per_s)
+      if foreign_s > tolerated_s:
+        reasons.append(f'foreign load {foreign_s / elapsed_s:.2f} cpus')
+
+    self.snapshot = None
+    return reasons
+
+
+def monitored_invoke(run_for_n_iters: tp.Callable, n_iters: int,
+                     noise_monitor: NoiseMonitor):
+  """Run `n_iters` iterations in batches monitored for noise.
+
+  A noisy batch is re-measured up to SANDBOX_NOISE_MAX_REMEASUREMENTS times.
+  Batches that stay noisy are discarded, unless all batches are noisy in which
+  case they are kept and flagged.
+
+  Returns the elapsed nanoseconds of every iteration, the noise reasons of
+  every iteration and the reasons of every re-measured or discarded batch.
+  """
+  num_batches = max(
+      1, min(n_iters, int(os.getenv('SANDBOX_NOISE_NUM_BATCHES', 10))))
+  max_remeasurements = int(os.getenv('SANDBOX_NOISE_MAX_REMEASUREMENTS', 3))
+  clean_batches, noisy_batches, discarded_noise = [], [], []
+  for batch in range(num_batches):
+    batch_n_iters = n_iters // num_batches + (batch < n_iters % num_batches)
+    for attempt in range(max_remeasurements + 1):
+      noise_monitor.start()
+      elapsed_ns = run_for_n_iters(batch_n_iters)
+      reasons = '; '.join(noise_monitor.stop())
+      if not reasons:
+        clean_batches.append(elapsed_ns)
+        break
+      if attempt < max_remeasurements:
+        discarded_noise.append(reasons)
+    else:
+      noisy_batches.append((elapsed_ns, reasons))
+
+  if clean_batches:
+    discarded_noise += [reasons for _, reasons in noisy_batches]
+    return np.concatenate(clean_batches), \
+      [''] * sum(len(b) for b in clean_batches), discarded_noise
+  return np.concatenate([b for b, _ in noisy_batches]), \
+    [reasons for b, reasons in noisy_batches for _ in b], discarded_noise
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import os
+
+import numpy as np
+
+from python.mlir.sandbox.noise_monitor import NoiseMonitor, NoiseThresholds, \
+  monitored_invoke
+
+# Nothing is considered noise with unbounded thresholds.
+monitor = NoiseMonitor(thresholds=NoiseThresholds(float('inf'), 1 << 30,
+                                                  float('inf')))
+monitor.start()
+sum(range(1 << 20))
+assert monitor.stop() == [], 'unexpected noise'
+
+
+class ScriptedMonitor():
+  """Report the noise reasons of `script` for the successive batches."""
+
+  def __init__(self, script):
+    self.script = list(script)
+
+  def start(self):
+    pass
+
+  def stop(self):
+    return self.script.pop(0)
+
+
+def run_for_n_iters(n_iters):
+  return np.arange(n_iters)
+
+
+os.environ['SANDBOX_NOISE_NUM_BATCHES'] = '2'
+os.environ['SANDBOX_NOISE_MAX_REMEASUREMENTS'] = '1'
+
+# A noisy batch is re-measured, and dropped if it stays noisy.
+monitor = ScriptedMonitor([['preempted'], [], ['throttled'], ['throttled']])
+elapsed_ns, noise, discarded_noise = monitored_invoke(run_for_n_iters, 10,
+                                                      monitor)
+assert len(elapsed_ns) == 5 and noise == [''] * 5, (elapsed_ns, noise)
+assert discarded_noise == ['preempted', 'throttled', 'throttled'], \
+  discarded_noise
+assert monitor.script == []
+
+# If all batches stay noisy, they are kept and flagged.
+monitor = ScriptedMonitor([['preempted']] * 4)
+elapsed_ns, noise, discarded_noise = monitored_invoke(run_for_n_iters, 10,
+                                                      monitor)
+assert len(elapsed_ns) == 10 and noise == ['preempted'] * 10, noise
+assert discarded_noise == ['preempted'] * 2, discarded_noise
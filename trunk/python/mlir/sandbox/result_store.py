@@ -0,0 +1,418 @@
+"""Local store of benchmark results with indexed queries.
+
+The results are kept in a SQLite database with one row per benchmark run
+(a benchmark function compiled with an expert and run on a problem size) and
+one row per measured iteration. Runs are indexed by benchmark, expert, problem
+size, host and date, so that the best expert per problem size or the evolution
+of a benchmark over time are queried without scanning logs:
+  store = ResultStore('results.sqlite')
+  store.best_experts(metric='gbyte_per_s', benchmark='copy_2d')
+  store.p50_over_time('copy_2d', expert='Tile8x32Peel_dialect')
+
+`test_harness` records its measurements in the store set by the
+SANDBOX_RESULT_STORE environment variable. The raw JSON dumps of
+`Measurements.dump_raw_to_file` can be imported with `import_raw_json`.
+
+Static analyses of the compiled benchmarks, e.g. the llvm-mca reports of
+`python/tools/llvm_mca_batch.py`, are recorded per benchmark, expert, problem
+size and target cpu and joined with the runs by `static_vs_measured`.
+
+The results are browsed with the local dashboard of `mlir.sandbox.dashboard`,
+served from the aggregates of `p50_by_problem_size`, `sample_quantiles` and
+`p50_over_time`.
+
+Metrics are `elapsed_s`, `gflop_per_s` and `gbyte_per_s`.
+"""
+
+import itertools
+import json
+import socket
+import sqlite3
+import time
+import typing as tp
+
+import numpy as np
+
+metrics = ('elapsed_s', 'gflop_per_s', 'gbyte_per_s')
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY,
+  benchmark TEXT NOT NULL,
+  expert TEXT NOT NULL,
+  problem_sizes TEXT NOT NULL,
+  np_types TEXT NOT NULL,
+  dynamic_at_compile_time TEXT NOT NULL,
+  host TEXT NOT NULL,
+  timestamp REAL NOT NULL,
+  total_gflops REAL NOT NULL,
+  total_gbytes REAL NOT NULL,
+  n_iters INTEGER NOT NULL,
+  p50_elapsed_s REAL NOT NULL,
+  p50_gflop_per_s REAL NOT NULL,
+  p50_gbyte_per_s REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS runs_by_benchmark
+  ON runs(benchmark, problem_sizes, expert);
+CREATE INDEX IF NOT EXISTS runs_by_expert ON runs(expert);
+CREATE INDEX IF NOT EXISTS runs_by_host ON runs(host, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_timestamp ON runs(timestamp);
+CREATE TABLE IF NOT EXISTS samples (
+  run_id INTEGER NOT NULL REFERENCES runs(id),
+  elapsed_s REAL NOT NULL,
+  gflop_per_s REAL NOT NULL,
+  gbyte_per_s REAL NOT NULL,
+  noise TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS samples_by_run ON samples(run_id);
+CREATE TABLE IF NOT EXISTS static_analyses (
+  benchmark TEXT NOT NULL,
+  expert TEXT NOT NULL,
+  problem_sizes TEXT NOT NULL,
+  np_types TEXT NOT NULL,
+  cpu TEXT NOT NULL,
+  iterations INTEGER NOT NULL,
+  total_cycles INTEGER NOT NULL,
+  ipc REAL NOT NULL,
+  block_rthroughput REAL NOT NULL,
+  backend_pressure REAL NOT NULL,
+  bottleneck TEXT NOT NULL,
+  bottleneck_pressure REAL NOT NULL,
+  PRIMARY KEY (benchmark, expert, problem_sizes, np_types, cpu));
+'''
+
+# Filters of the queries and the columns they apply to.
+_filter_columns = {
+    'benchmark': 'benchmark',
+    'expert': 'expert',
+    'problem_sizes': 'problem_sizes',
+    'np_types': 'np_types',
+    'host': 'host',
+}
+
+_static_analysis_columns = [
+    'cpu', 'iterations', 'total_cycles', 'ipc', 'block_rthroughput',
+    'backend_pressure', 'bottleneck', 'bottleneck_pressure'
+]
+
+_run_columns = [
+    'benchmark', 'expert', 'problem_sizes', 'np_types',
+    'dynamic_at_compile_time', 'host', 'timestamp', 'total_gflops',
+    'total_gbytes', 'n_iters', 'p50_elapsed_s', 'p50_gflop_per_s',
+    'p50_gbyte_per_s'
+]
+
+
+def _where(since: tp.Optional[float] = None,
+           until: tp.Optional[float] = None,
+           **filters) -> tp.Tuple[str, tp.List]:
+  """Return the WHERE clause and its parameters selecting the runs matching
+  `filters`, each one a value or a list of accepted values, and the runs
+  between the `since` and `until` timestamps."""
+  clauses, parameters = [], []
+  for name, value in filters.items():
+    if value is None:
+      continue
+    column = _filter_columns[name]
+    values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+    clauses.append(f'{column} IN ({", ".join("?" * len(values))})')
+    parameters += values
+  if since is not None:
+    clauses.append('timestamp >= ?')
+    parameters.append(since)
+  if until is not None:
+    clauses.append('timestamp < ?')
+    parameters.append(until)
+  return ('WHERE ' + ' AND '.join(clauses) if clauses else ''), parameters
+
+
+def _check_metric(metric: str):
+  assert metric in metrics, f'unknown metric: {metric}, expected {metrics}'
+
+
+class ResultStore():
+  """A SQLite database of benchmark runs, ':memory:' for a temporary store.
+
+  Concurrent benchmark processes may write to the same database file.
+  """
+
+  def __init__(self, file_name: str):
+    self.file_name = file_name
+    self.connection = sqlite3.connect(file_name, timeout=60)
+    self.connection.execute('PRAGMA journal_mode=WAL')
+    self.connection.executescript(_schema)
+
+  def close(self):
+    self.connection.close()
+
+  def add_run(self,
+              benchmark: str,
+              expert: str,
+              problem_sizes: str,
+              elapsed_s_per_iter: tp.Sequence[float],
+              total_gflops: float,
+              total_gbytes: float,
+              np_types: str = '',
+              dynamic_at_compile_time: str = '',
+              noise: tp.Optional[tp.Sequence[str]] = None,
+              host: tp.Optional[str] = None,
+              timestamp: tp.Optional[float] = None) -> int:
+    """Record a run and its iterations, return the id of the run."""
+    elapsed_s = np.asarray(elapsed_s_per_iter, dtype=float)
+    gflop_per_s = total_gflops / elapsed_s
+    gbyte_per_s = total_gbytes / elapsed_s
+    noise = list(noise) if noise is not None else [''] * len(elapsed_s)
+    with self.connection:
+      cursor = self.connection.execute(
+          f'INSERT INTO runs({", ".join(_run_columns)}) '
+          f'VALUES ({", ".join("?" * len(_run_columns))})',
+          (benchmark, expert, problem_sizes, np_types,
+           dynamic_at_compile_time, host if host is not None else
+           socket.gethostname(), timestamp if timestamp is not None else
+           time.time(), float(total_gflops), float(total_gbytes),
+           len(elapsed_s), float(np.median(elapsed_s)),
+           float(np.median(gflop_per_s)), float(np.median(gbyte_per_s))))
+      run_id = cursor.lastrowid
+      self.connection.executemany(
+          'INSERT INTO samples VALUES (?, ?, ?, ?, ?)',
+          zip(itertools.repeat(run_id), elapsed_s.tolist(),
+              gflop_per_s.tolist(), gbyte_per_s.tolist(), noise))
+    return run_id
+
+  def add_measurements(self,
+                       measurements,
+                       host: tp.Optional[str] = None,
+                       timestamp: tp.Optional[float] = None) -> tp.List[int]:
+    """Record the runs of a harness `Measurements`, return their ids."""
+    run_ids = []
+    config_keys = measurements.config_keys
+    for config, rows in itertools.groupby(
+        measurements.rows, key=lambda r: tuple(r[k] for k in config_keys)):
+      rows = list(rows)
+      config = dict(zip(config_keys, config))
+      run_ids.append(
+          self.add_run(config['function_name'],
+                       config['expert'],
+                       config['runtime_problem_sizes_dict'],
+                       [r['elapsed_s_per_iter'] for r in rows],
+                       config['total_gflops'],
+                       config['total_gbytes'],
+                       np_types=config['np_types'],
+                       dynamic_at_compile_time=config[
+                           'dynamic_at_compile_time'],
+                       noise=[r['noise'] for r in rows],
+                       host=host,
+                       timestamp=timestamp))
+    return run_ids
+
+  def import_raw_json(self,
+                      file_name: str,
+                      expert: str = '',
+                      host: str = '',
+                      timestamp: float = 0.0) -> tp.List[int]:
+    """Import a raw JSON dump of the harness, return the ids of the runs.
+
+    Raw dumps do not record the expert, the host and the date of the runs,
+    they are set to `expert`, `host` and `timestamp`.
+    """
+    with open(file_name) as f:
+      records = json.load(f)
+    run_ids = []
+    for (benchmark, problem_sizes, gflops, gbytes), rows in itertools.groupby(
+        records,
+        key=lambda r: (r['function_name'], r['runtime_problem_sizes_dict'],
+                       r['total_gflops'], r['total_gbytes'])):
+      rows = list(rows)
+      run_ids.append(
+          self.add_run(benchmark,
+                       expert,
+                       problem_sizes, [r['elapsed_s_per_iter'] for r in rows],
+                       gflops,
+                       gbytes,
+                       noise=[r.get('noise') or '' for r in rows],
+                       host=host,
+                       timestamp=timestamp))
+    return run_ids
+
+  def import_store(self, file_name: str) -> tp.List[int]:
+    """Import all the runs of another store, return their new ids."""
+    other = ResultStore(file_name)
+    run_ids = []
+    for run in other.runs():
+      samples = other.connection.execute(
+          'SELECT elapsed_s, noise FROM samples WHERE run_id = ?',
+          (run['id'],)).fetchall()
+      run_ids.append(
+          self.add_run(run['benchmark'],
+                       run['expert'],
+                       run['problem_sizes'], [s[0] for s in samples],
+                       run['total_gflops'],
+                       run['total_gbytes'],
+                       np_types=run['np_types'],
+                       dynamic_at_compile_time=run['dynamic_at_compile_time'],
+                       noise=[s[1] for s in samples],
+                       host=run['host'],
+                       timestamp=run['timestamp']))
+    other.close()
+    return run_ids
+
+  def add_static_analysis(self, benchmark: str, expert: str,
+                          problem_sizes: str, np_types: str,
+                          analysis: tp.Mapping[str, tp.Any]):
+    """Record the static analysis of a compiled benchmark, replacing the
+    previous analysis for the same cpu.
+
+    `analysis` has the fields of `_static_analysis_columns`.
+    """
+    columns = ['benchmark', 'expert', 'problem_sizes', 'np_types'
+              ] + _static_analysis_columns
+    with self.connection:
+      self.connection.execute(
+          f'INSERT OR REPLACE INTO static_analyses({", ".join(columns)}) '
+          f'VALUES ({", ".join("?" * len(columns))})',
+          [benchmark, expert, problem_sizes, np_types] +
+          [analysis[c] for c in _static_analysis_columns])
+
+  def static_vs_measured(self, cpu: str,
+                         **filters) -> tp.List[tp.Dict[str, tp.Any]]:
+    """Return the runs matching `filters` that have a static analysis for
+    `cpu`, with the fields of the run and of the analysis."""
+    where, parameters = _where(**filters)
+    where = (where + ' AND' if where else 'WHERE') + ' static_analyses.cpu = ?'
+    columns = [f'runs.{c}' for c in ['id'] + _run_columns] + [
+        f'static_analyses.{c}' for c in _static_analysis_columns
+    ]
+    cursor = self.connection.execute(
+        f'SELECT {", ".join(columns)} FROM runs JOIN static_analyses '
+        f'USING (benchmark, expert, problem_sizes, np_types) {where} '
+        f'ORDER BY runs.id', parameters + [cpu])
+    return [
+        dict(zip(['id'] + _run_columns + _static_analysis_columns, row))
+        for row in cursor
+    ]
+
+  def runs(self, **filters) -> tp.List[tp.Dict[str, tp.Any]]:
+    """Return the runs matching `filters`, see `_where`, in insertion
+    order."""
+    where, parameters = _where(**filters)
+    cursor = self.connection.execute(
+        f'SELECT id, {", ".join(_run_columns)} FROM runs {where} ORDER BY id',
+        parameters)
+    return [dict(zip(['id'] + _run_columns, row)) for row in cursor]
+
+  def benchmarks(self) -> tp.List[str]:
+    return self.distinct_values('benchmark')
+
+  def distinct_values(self, name: str) -> tp.List[str]:
+    """Return the values of the filter `name` in the store, sorted."""
+    column = _filter_columns[name]
+    return [
+        row[0] for row in self.connection.execute(
+            f'SELECT DISTINCT {column} FROM runs ORDER BY {column}')
+    ]
+
+  def best_experts(self,
+                   metric: str = 'gbyte_per_s',
+                   **filters) -> tp.List[tp.Dict[str, tp.Any]]:
+    """Return the expert with the best p50 `metric` for every benchmark and
+    problem size, in the order the problem sizes were first run.
+
+    The best p50 is the highest, or the lowest for `elapsed_s`.
+    """
+    _check_metric(metric)
+    where, parameters = _where(**filters)
+    order = 'ASC' if metric == 'elapsed_s' else 'DESC'
+    cursor = self.connection.execute(
+        f'''
+        SELECT benchmark, problem_sizes, expert, p50 FROM (
+          SELECT benchmark, problem_sizes, expert, p50_{metric} AS p50,
+            ROW_NUMBER() OVER (PARTITION BY benchmark, problem_sizes
+                               ORDER BY p50_{metric} {order}) AS rank,
+            MIN(id) OVER (PARTITION BY benchmark, problem_sizes) AS first_id
+          FROM runs {where})
+        WHERE rank = 1 ORDER BY first_id''', parameters)
+    return [
+        dict(zip(['benchmark', 'problem_sizes', 'expert', 'p50'], row))
+        for row in cursor
+    ]
+
+  def p50_over_time(self,
+                    benchmark: tp.Union[str, tp.Sequence[str], None],
+                    metric: str = 'gflop_per_s',
+                    **filters) -> tp.List[tp.Dict[str, tp.Any]]:
+    """Return the date, host, benchmark, expert, problem size and p50 `metric`
+    of the runs of `benchmark`, one or several, matching `filters`, by date."""
+    _check_metric(metric)
+    where, parameters = _where(benchmark=benchmark, **filters)
+    cursor = self.connection.execute(
+        f'SELECT timestamp, host, benchmark, expert, problem_sizes, '
+        f'p50_{metric} FROM runs {where} ORDER BY timestamp, id', parameters)
+    return [
+        dict(
+            zip([
+                'timestamp', 'host', 'benchmark', 'expert', 'problem_sizes',
+                'p50'
+            ], row)) for row in cursor
+    ]
+
+  def p50_by_problem_size(self,
+                          metric: str = 'gflop_per_s',
+                          **filters) -> tp.List[tp.Dict[str, tp.Any]]:
+    """Return the number of runs, the best and the mean p50 `metric` of the
+    runs matching `filters` for every benchmark, expert and problem size, in
+    the order the problem sizes were first run."""
+    _check_metric(metric)
+    where, parameters = _where(**filters)
+    best = 'MIN' if metric == 'elapsed_s' else 'MAX'
+    cursor = self.connection.execute(
+        f'SELECT benchmark, expert, problem_sizes, COUNT(*), '
+        f'{best}(p50_{metric}), AVG(p50_{metric}) FROM runs {where} '
+        f'GROUP BY benchmark, problem_sizes, expert ORDER BY MIN(id)',
+        parameters)
+    return [
+        dict(
+            zip([
+                'benchmark', 'expert', 'problem_sizes', 'n_runs', 'best_p50',
+                'mean_p50'
+            ], row)) for row in cursor
+    ]
+
+  def sample_quantiles(self,
+                       metric: str = 'gflop_per_s',
+                       quantiles: tp.Sequence[float] = (0.05, 0.25, 0.5, 0.75,
+                                                        0.95),
+                       **filters) -> tp.List[tp.Dict[str, tp.Any]]:
+    """Return the number of iterations and the `quantiles` of the `metric`
+    per iteration of the runs matching `filters`, for every benchmark, expert
+    and problem size."""
+    _check_metric(metric)
+    where, parameters = _where(**filters)
+    cursor = self.connection.execute(
+        f'SELECT benchmark, expert, problem_sizes, samples.{metric} '
+        f'FROM runs JOIN samples ON samples.run_id = runs.id {where} '
+        f'ORDER BY benchmark, problem_sizes, expert', parameters)
+    result = []
+    for (benchmark, expert, problem_sizes), rows in itertools.groupby(
+        cursor, key=lambda row: row[:3]):
+      values = np.fromiter((row[3] for row in rows), dtype=float)
+      result.append({
+          'benchmark': benchmark,
+          'expert': expert,
+          'problem_sizes': problem_sizes,
+          'n_iters': len(values),
+          'quantiles': np.quantile(values, quantiles).tolist()
+      })
+    return result
+
+  def samples(self, metric: str, **filters):
+    """Return a data frame of the iterations of the runs matching `filters`,
+    with the function_name, runtime_problem_sizes_dict and expert of their run
+    and the `metric` per iteration, e.g. gflop_per_s_per_iter, as in the data
+    frames of the harness."""
+    import pandas
+    _check_metric(metric)
+    where, parameters = _where(**filters)
+    return pandas.read_sql_query(
+        f'SELECT benchmark AS function_name, '
+        f'problem_sizes AS runtime_problem_sizes_dict, expert, '
+        f'samples.{metric} AS {metric}_per_iter '
+        f'FROM runs JOIN samples ON samples.run_id = runs.id {where} '
+        f'ORDER BY runs.id', self.connection, params=parameters)
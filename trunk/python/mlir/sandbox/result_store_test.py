@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+
+from python.mlir.sandbox.result_store import ResultStore
+
+
+class FakeMeasurements():
+  config_keys = [
+      'function_name', 'expert', 'np_types', 'dynamic_at_compile_time',
+      'runtime_problem_sizes_dict', 'total_gflops', 'total_gbytes',
+      'discarded_noise'
+  ]
+
+  def __init__(self):
+    self.rows = []
+
+  def append(self, expert, sizes, elapsed_s_per_iter):
+    for elapsed_s in elapsed_s_per_iter:
+      self.rows.append({
+          'function_name': 'copy_2d',
+          'expert': expert,
+          'np_types': 'float32,float32',
+          'dynamic_at_compile_time': '[]',
+          'runtime_problem_sizes_dict': sizes,
+          'total_gflops': 0.0,
+          'total_gbytes': 2.0,
+          'discarded_noise': '',
+          'elapsed_s_per_iter': elapsed_s,
+          'noise': ''
+      })
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+  file_name = os.path.join(tmp_dir, 'results.sqlite')
+  store = ResultStore(file_name)
+  measurements = FakeMeasurements()
+  measurements.append('A', 'm=10,n=32', [1.0, 2.0, 4.0])
+  measurements.append('B', 'm=10,n=32', [0.5, 1.0, 1.0])
+  measurements.append('A', 'm=16,n=32', [1.0, 1.0])
+  measurements.append('B', 'm=16,n=32', [2.0, 2.0])
+  run_ids = store.add_measurements(measurements, host='h0', timestamp=100.0)
+  assert len(run_ids) == 4
+  assert store.runs(expert='A')[0]['p50_gbyte_per_s'] == 1.0
+  assert store.runs(expert='A')[0]['n_iters'] == 3
+
+  # Best expert per problem size, in run order.
+  best = store.best_experts(metric='gbyte_per_s', benchmark='copy_2d')
+  assert [(b['problem_sizes'], b['expert']) for b in best] == [
+      ('m=10,n=32', 'B'), ('m=16,n=32', 'A')
+  ]
+  best = store.best_experts(metric='elapsed_s', problem_sizes='m=16,n=32')
+  assert [b['expert'] for b in best] == ['A']
+
+  # p50 over time, across hosts.
+  store.add_run('copy_2d', 'A', 'm=10,n=32', [0.25], 0.0, 2.0, host='h1',
+                timestamp=50.0)
+  history = store.p50_over_time('copy_2d', metric='gbyte_per_s', expert='A',
+                                problem_sizes='m=10,n=32')
+  assert [(h['timestamp'], h['host'], h['p50']) for h in history] == [
+      (50.0, 'h1', 8.0), (100.0, 'h0', 1.0)
+  ]
+  assert len(store.runs(host=['h0', 'h1'], since=60.0)) == 4
+  store.close()
+
+  # Per-iteration samples for plotting, from a reopened store.
+  store = ResultStore(file_name)
+  samples = store.samples('gbyte_per_s', expert='B')
+  assert list(samples.columns) == [
+      'function_name', 'runtime_problem_sizes_dict', 'expert',
+      'gbyte_per_s_per_iter'
+  ]
+  assert list(samples['gbyte_per_s_per_iter']) == [4.0, 2.0, 2.0, 1.0, 1.0]
+
+  # Aggregates per benchmark, expert and problem size.
+  p50 = store.p50_by_problem_size('gbyte_per_s', expert='A')
+  assert [(p['problem_sizes'], p['n_runs'], p['best_p50'], p['mean_p50'])
+          for p in p50] == [('m=10,n=32', 2, 8.0, 4.5), ('m=16,n=32', 1, 2.0,
+                                                          2.0)]
+  quantiles = store.sample_quantiles('elapsed_s', (0.0, 0.5, 1.0),
+                                     np_types='float32,float32')
+  assert [(q['expert'], q['problem_sizes'], q['n_iters'], q['quantiles'])
+          for q in quantiles] == [('A', 'm=10,n=32', 3, [1.0, 2.0, 4.0]),
+                                  ('B', 'm=10,n=32', 3, [0.5, 1.0, 1.0]),
+                                  ('A', 'm=16,n=32', 2, [1.0, 1.0, 1.0]),
+                                  ('B', 'm=16,n=32', 2, [2.0, 2.0, 2.0])]
+  assert store.distinct_values('host') == ['h0', 'h1']
+
+  # Raw JSON dumps and other stores are imported.
+  raw_file = os.path.join(tmp_dir, 'raw.json')
+  with open(raw_file, 'w') as f:
+    json.dump([{
+        'function_name': 'transpose_2d',
+        'runtime_problem_sizes_dict': 'm=8,n=8',
+        'total_gflops': 0.0,
+        'total_gbytes': 1.0,
+        'elapsed_s_per_iter': elapsed_s,
+        'gbyte_per_s_per_iter': 1.0 / elapsed_s,
+        'gflop_per_s_per_iter': 0.0
+    } for elapsed_s in [1.0, 0.5]], f)
+  assert len(store.import_raw_json(raw_file)) == 1
+  merged = ResultStore(':memory:')
+  assert len(merged.import_store(file_name)) == 6
+  assert merged.benchmarks() == ['copy_2d', 'transpose_2d']
+  assert merged.runs(benchmark='transpose_2d')[0]['p50_gbyte_per_s'] == 1.5
+  store.close()
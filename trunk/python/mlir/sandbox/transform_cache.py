@@ -0,0 +1,154 @@
+"""Cache of the IR obtained by applying transformation prefixes to a payload.
+
+Experts and tuning proposals often share long prefixes, e.g. the same tiling
+followed by different padding or vectorization options. The IR obtained after
+every transform of a list is cached as MLIR bytecode, keyed by the hash of the
+payload and the hash of the transform prefix. The prefix hashes are chained,
+which makes the cache a prefix tree: a new transformation list restarts from
+its deepest cached prefix and only applies the remaining transforms. The keys
+also hash the compiler build and the source of the transform classes, so that
+the entries of another version are not reused.
+
+The cache is kept in memory and, if a directory is set, on disk so that it is
+shared by the processes of a search. The default cache is opt-in: it is enabled
+by SANDBOX_TRANSFORM_CACHE=1 or by setting its directory with
+SANDBOX_TRANSFORM_CACHE_DIR.
+"""
+
+import collections
+import functools
+import hashlib
+import os
+import sys
+import tempfile
+import typing as tp
+
+# Default in-memory capacity of a cache.
+default_max_bytes = 256 << 20
+
+
+def hash_payload(payload: str) -> str:
+  """Return the hash of the textual IR of a payload."""
+  return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(file_name: tp.Optional[str]) -> str:
+  if file_name is None:
+    return ''
+  with open(file_name, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version() -> str:
+  """Return an identifier of the compiler build: the hash of the names, sizes
+  and modification times of the native libraries of the python bindings."""
+  from iree.compiler import _mlir_libs
+  directory = os.path.dirname(_mlir_libs.__file__)
+  stats = [(name, os.stat(os.path.join(directory, name)))
+           for name in sorted(os.listdir(directory))]
+  return hashlib.sha256(
+      repr([(name, st.st_size, st.st_mtime_ns) for name, st in stats
+           ]).encode()).hexdigest()
+
+
+def transform_key(transform) -> str:
+  """Return a description of `transform` that identifies its effect: its class,
+  the hash of the source file defining it and the values of its fields
+  (variables, targeted function and op)."""
+  cls = type(transform)
+  source_hash = _file_hash(
+      getattr(sys.modules.get(cls.__module__), '__file__', None))
+  fields = sorted((k, repr(v)) for k, v in vars(transform).items())
+  return f'{cls.__module__}.{cls.__qualname__}@{source_hash}{fields}'
+
+
+def prefix_keys(payload_hash: str,
+                transforms: tp.Sequence,
+                version: str = '') -> tp.List[str]:
+  """Return the cache keys of the prefixes of `transforms` applied by the
+  compiler `version`: the i-th key identifies the IR obtained after applying
+  the first i + 1 transforms."""
+  keys = []
+  prefix_hash = hashlib.sha256((version + payload_hash).encode()).hexdigest()
+  for transform in transforms:
+    prefix_hash = hashlib.sha256(
+        (prefix_hash + transform_key(transform)).encode()).hexdigest()
+    keys.append(prefix_hash)
+  return keys
+
+
+class TransformCache():
+  """A least recently used cache of serialized IR, optionally backed by
+  `directory`.
+
+  At most `max_bytes` of IR are kept in memory. The files in `directory` are
+  written atomically and are not evicted.
+  """
+
+  def __init__(self,
+               max_bytes: int = default_max_bytes,
+               directory: tp.Optional[str] = None):
+    self.max_bytes = max_bytes
+    self.directory = directory
+    if directory is not None:
+      os.makedirs(directory, exist_ok=True)
+    self.entries = collections.OrderedDict()
+    self.num_bytes = 0
+    self.num_hits = 0
+    self.num_misses = 0
+
+  def _file_name(self, key: str) -> str:
+    return os.path.join(self.directory, key + '.mlirbc')
+
+  def get(self, key: str) -> tp.Optional[bytes]:
+    data = self.entries.get(key)
+    if data is not None:
+      self.entries.move_to_end(key)
+    elif self.directory is not None:
+      try:
+        with open(self._file_name(key), 'rb') as f:
+          data = f.read()
+        self._insert(key, data)
+      except OSError:
+        pass
+    if data is None:
+      self.num_misses += 1
+    else:
+      self.num_hits += 1
+    return data
+
+  def put(self, key: str, data: bytes):
+    self._insert(key, data)
+    if self.directory is not None:
+      fd, tmp_file_name = tempfile.mkstemp(dir=self.directory)
+      with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+      os.replace(tmp_file_name, self._file_name(key))
+
+  def _insert(self, key: str, data: bytes):
+    if key in self.entries:
+      self.num_bytes -= len(self.entries.pop(key))
+    if len(data) > self.max_bytes:
+      return
+    self.entries[key] = data
+    self.num_bytes += len(data)
+    while self.num_bytes > self.max_bytes:
+      _, evicted = self.entries.popitem(last=False)
+      self.num_bytes -= len(evicted)
+
+
+_default_cache = None
+
+
+def default_transform_cache() -> tp.Optional[TransformCache]:
+  """Return the cache of this process configured by the environment, None
+  unless enabled."""
+  global _default_cache
+  directory = os.getenv('SANDBOX_TRANSFORM_CACHE_DIR')
+  if os.getenv('SANDBOX_TRANSFORM_CACHE', '0') != '1' and not directory:
+    return None
+  if _default_cache is None or _default_cache.directory != directory:
+    _default_cache = TransformCache(directory=directory)
+  return _default_cache
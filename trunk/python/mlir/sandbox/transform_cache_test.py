@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+from python.mlir.sandbox.transform_cache import TransformCache, \
+  default_transform_cache, hash_payload, prefix_keys
+
+
+class FakeTile:
+
+  def __init__(self, tile_sizes):
+    self.tile_sizes = tile_sizes
+    self.fun_name = 'matmul'
+
+
+class FakeVectorize:
+
+  def __init__(self, vectorize_padding):
+    self.vectorize_padding = vectorize_padding
+
+
+# Transformation lists sharing a prefix share the keys of that prefix only.
+payload_hash = hash_payload('func.func @matmul() { return }')
+lhs = prefix_keys(payload_hash, [FakeTile([8, 16]), FakeVectorize(True)])
+rhs = prefix_keys(payload_hash, [FakeTile([8, 16]), FakeVectorize(False)])
+assert lhs[0] == rhs[0] and lhs[1] != rhs[1], 'wrong prefix keys'
+assert prefix_keys(hash_payload('other payload'), [FakeTile([8, 16])])[0] != \
+  lhs[0], 'payload not hashed'
+assert prefix_keys(payload_hash, [FakeTile([8, 32])])[0] != lhs[0], \
+  'transform variables not hashed'
+assert prefix_keys(payload_hash, [FakeTile([8, 16])], 'other compiler')[0] != \
+  lhs[0], 'compiler version not hashed'
+
+# The least recently used entries are evicted from memory.
+cache = TransformCache(max_bytes=8)
+cache.put('a', b'1234')
+cache.put('b', b'1234')
+assert cache.get('a') == b'1234'
+cache.put('c', b'1234')
+assert cache.get('b') is None and cache.get('a') == b'1234'
+assert cache.num_hits == 2 and cache.num_misses == 1
+
+# Entries written to disk are found by other caches sharing the directory.
+with tempfile.TemporaryDirectory() as directory:
+  TransformCache(directory=directory).put(lhs[0], b'bytecode')
+  cache = TransformCache(directory=directory)
+  assert cache.get(lhs[0]) == b'bytecode'
+  assert cache.get(lhs[1]) is None
+
+# The default cache is opt-in.
+os.environ.pop('SANDBOX_TRANSFORM_CACHE', None)
+os.environ.pop('SANDBOX_TRANSFORM_CACHE_DIR', None)
+assert default_transform_cache() is None
+os.environ['SANDBOX_TRANSFORM_CACHE'] = '1'
+assert default_transform_cache() is not None
@@ -294,7 +294,8 @@ class LowerVectors(Transform):
     if isinstance(stages, int):
       stages = [stages]
 
-    self.stages = stages
+    # A list, which round trips through expert files and hashes by value.
+    self.stages = list(stages)
 
   def build_transform_ir(self, target):
     for name in ('max_transfer_rank', 'print_after_all'):
@@ -0,0 +1,298 @@
+"""Sensitivity analysis of tuning results.
+
+Every evaluated proposal is recorded in a tuning database, a JSON lines file
+with one record per proposal. The analysis decomposes the variance of the
+throughput over the parameters of the search space, in the spirit of
+fANOVA:
+  - the importance of a parameter is the fraction of the variance explained by
+    its marginal effect,
+  - the partial dependence of a parameter is the mean throughput of each of its
+    values, marginalized over all the other parameters,
+  - the interaction of two parameters is the fraction of the variance explained
+    by their joint effect on top of their marginal effects.
+Marginals are estimated from the samples themselves, which is unbiased for
+random search and an approximation for other search strategies. The fractions
+are adjusted for the number of samples per value (omega squared), so that
+parameters with many rarely sampled values are not deemed important.
+
+The report is a static HTML page with the importance, partial dependence and
+interaction plots embedded. It can be regenerated from a database with:
+  python -m mlir.sandbox.tuning_analytics tuning_results.jsonl report_dir
+"""
+
+import argparse
+import base64
+import html
+import io
+import itertools
+import json
+import os
+import typing as tp
+
+import numpy as np
+import pandas
+
+# Name of the tuning database and of the report in an output directory.
+database_file_name = 'tuning_results.jsonl'
+report_file_name = 'report.html'
+
+
+def _to_json_value(value):
+  if isinstance(value, np.generic):
+    return value.item()
+  if isinstance(value, np.ndarray):
+    return value.tolist()
+  if isinstance(value, (tuple, list)):
+    return [_to_json_value(v) for v in value]
+  if isinstance(value, dict):
+    return {str(k): _to_json_value(v) for k, v in value.items()}
+  if isinstance(value, (bool, int, float, str)) or value is None:
+    return value
+  return str(value)
+
+
+def flatten_configuration(
+    configuration: tp.Mapping[str, tp.Any]) -> tp.Dict[str, tp.Any]:
+  """Return the configuration with one parameter per element of sequences.
+
+  For example, `tile_sizes=[8, 16]` becomes `tile_sizes[0]=8, tile_sizes[1]=16`
+  so that the elements are analyzed separately.
+  """
+  flat = {}
+  for name, value in configuration.items():
+    value = _to_json_value(value)
+    if isinstance(value, list):
+      if len(value) == 0:
+        flat[name] = '[]'
+      for i, v in enumerate(value):
+        flat.update(flatten_configuration({f'{name}[{i}]': v}))
+    else:
+      flat[name] = value
+  return flat
+
+
+class TuningDatabase():
+  """Records of the proposals evaluated by a search.
+
+  Every record holds the configuration of the proposal, its status and its
+  throughput. If `file_name` is set, records are appended to that file as soon
+  as they are added, so that the database survives an interrupted search.
+  """
+
+  def __init__(self, file_name: tp.Optional[str] = None):
+    self.file_name = file_name
+    self.records = []
+
+  @staticmethod
+  def load(file_name: str):
+    database = TuningDatabase()
+    with open(file_name) as f:
+      database.records = [json.loads(line) for line in f if line.strip()]
+    return database
+
+  def add(self,
+          configuration: tp.Mapping[str, tp.Any],
+          throughput: float,
+          status: str = 'SUCCESS',
+          **extra):
+    record = {
+        'configuration': _to_json_value(dict(configuration)),
+        'status': status,
+        'throughput': float(throughput),
+        **{k: _to_json_value(v) for k, v in extra.items()}
+    }
+    self.records.append(record)
+    if self.file_name is not None:
+      with open(self.file_name, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+  def to_data_frame(self) -> pandas.DataFrame:
+    """Return one row per record, with a column per flattened parameter."""
+    if not self.records:
+      return pandas.DataFrame(columns=['_status', '_throughput'])
+    rows = [{
+        **flatten_configuration(r['configuration']), '_status': r['status'],
+        '_throughput': r['throughput']
+    } for r in self.records]
+    return pandas.DataFrame(rows)
+
+
+def _explained_variance(keys: pandas.DataFrame, y: np.ndarray) -> float:
+  """Return the fraction of the variance of `y` explained by the groups of
+  identical `keys` rows, adjusted for the number of groups (omega squared)."""
+  n = len(y)
+  groups = keys.astype(str).agg('|'.join, axis=1) if keys.shape[1] > 1 \
+    else keys.iloc[:, 0].astype(str)
+  num_groups = groups.nunique()
+  if n <= num_groups or num_groups < 2:
+    return 0.0
+  mean = y.mean()
+  ss_total = float(((y - mean)**2).sum())
+  if ss_total == 0:
+    return 0.0
+  group_means = pandas.Series(y).groupby(groups.values).transform('mean').values
+  ss_between = float(((group_means - mean)**2).sum())
+  ms_within = (ss_total - ss_between) / (n - num_groups)
+  return max(0.0, (ss_between - (num_groups - 1) * ms_within) /
+             (ss_total + ms_within))
+
+
+class SensitivityAnalysis():
+  """Importance, partial dependence and interactions of the parameters.
+
+  Only successful proposals are analyzed; `failure_rates` reports, for every
+  parameter value, the fraction of proposals that failed or timed out.
+  Parameters that take a single value are ignored.
+  """
+
+  def __init__(self, data: pandas.DataFrame):
+    parameters = [c for c in data.columns if not c.startswith('_')]
+    self.parameters = [
+        p for p in parameters if data[p].astype(str).nunique() > 1
+    ]
+    self.data = data
+    success = data[data['_status'] == 'SUCCESS']
+    self.num_samples = len(success)
+    y = success['_throughput'].values.astype(float)
+
+    self.importance = pandas.Series(
+        {p: _explained_variance(success[[p]], y) for p in self.parameters},
+        dtype=float).sort_values(ascending=False)
+
+    self.interactions = pandas.DataFrame(0.0,
+                                         index=self.parameters,
+                                         columns=self.parameters)
+    for p, q in itertools.combinations(self.parameters, 2):
+      joint = _explained_variance(success[[p, q]], y)
+      interaction = max(0.0,
+                        joint - self.importance[p] - self.importance[q])
+      self.interactions.loc[p, q] = interaction
+      self.interactions.loc[q, p] = interaction
+
+    self.partial_dependence = {}
+    self.failure_rates = {}
+    for p in self.parameters:
+      values = success[p].astype(str)
+      self.partial_dependence[p] = pandas.Series(y).groupby(
+          values.values).agg(['mean', 'std', 'count'])
+      failed = (data['_status'] != 'SUCCESS').astype(float)
+      self.failure_rates[p] = failed.groupby(data[p].astype(str).values).mean()
+
+  def top_interactions(self, n: int = 10) -> tp.List[tp.Tuple[str, str, float]]:
+    pairs = [(p, q, self.interactions.loc[p, q])
+             for p, q in itertools.combinations(self.parameters, 2)]
+    return sorted(pairs, key=lambda t: -t[2])[:n]
+
+
+def _figure_to_html(figure) -> str:
+  buffer = io.BytesIO()
+  figure.savefig(buffer, format='png', bbox_inches='tight')
+  encoded = base64.b64encode(buffer.getvalue()).decode()
+  return f'<img src="data:image/png;base64,{encoded}"/>'
+
+
+def _importance_figure(analysis: SensitivityAnalysis):
+  from matplotlib.figure import Figure
+  figure = Figure(figsize=(8, 0.3 * len(analysis.importance) + 1))
+  ax = figure.subplots()
+  names = list(reversed(analysis.importance.index))
+  ax.barh(names, [analysis.importance[n] for n in names])
+  ax.set_xlabel('fraction of throughput variance')
+  return figure
+
+
+def _partial_dependence_figure(analysis: SensitivityAnalysis, parameter: str):
+  from matplotlib.figure import Figure
+  figure = Figure(figsize=(6, 3))
+  ax = figure.subplots()
+  pd = analysis.partial_dependence[parameter]
+  labels = list(pd.index)
+  ax.errorbar(range(len(labels)),
+              pd['mean'],
+              yerr=pd['std'].fillna(0),
+              fmt='o',
+              capsize=3)
+  ax.set_xticks(range(len(labels)))
+  ax.set_xticklabels(labels, rotation=45)
+  ax.set_xlabel(parameter)
+  ax.set_ylabel('GUnits/s')
+  return figure
+
+
+def _interactions_figure(analysis: SensitivityAnalysis):
+  from matplotlib.figure import Figure
+  n = len(analysis.parameters)
+  figure = Figure(figsize=(0.4 * n + 3, 0.4 * n + 2))
+  ax = figure.subplots()
+  image = ax.imshow(analysis.interactions.values, cmap='viridis')
+  ax.set_xticks(range(n))
+  ax.set_xticklabels(analysis.parameters, rotation=90)
+  ax.set_yticks(range(n))
+  ax.set_yticklabels(analysis.parameters)
+  figure.colorbar(image, ax=ax)
+  return figure
+
+
+def write_report(analysis: SensitivityAnalysis,
+                 file_name: str,
+                 title: str = 'Tuning sensitivity report',
+                 num_partial_dependence_plots: int = 12):
+  """Write a static HTML report of `analysis` to `file_name`."""
+  sections = [
+      f'<h1>{html.escape(title)}</h1>',
+      f'<p>{analysis.num_samples} successful proposals out of '
+      f'{len(analysis.data)}.</p>'
+  ]
+  if analysis.parameters and analysis.num_samples > 0:
+    sections += [
+        '<h2>Parameter importance</h2>',
+        analysis.importance.to_frame('importance').to_html(
+            float_format='%.3f'),
+        _figure_to_html(_importance_figure(analysis)),
+        '<h2>Interactions</h2>',
+        pandas.DataFrame(analysis.top_interactions(),
+                         columns=['parameter', 'parameter',
+                                  'interaction']).to_html(index=False,
+                                                          float_format='%.3f'),
+        _figure_to_html(_interactions_figure(analysis)),
+        '<h2>Partial dependence</h2>'
+    ]
+    for parameter in analysis.importance.index[:num_partial_dependence_plots]:
+      table = analysis.partial_dependence[parameter].join(
+          analysis.failure_rates[parameter].rename('failure rate'), how='outer')
+      sections += [
+          f'<h3>{html.escape(parameter)}</h3>',
+          _figure_to_html(_partial_dependence_figure(analysis, parameter)),
+          table.to_html(float_format='%.3f')
+      ]
+  else:
+    sections.append('<p>Not enough data to analyze.</p>')
+
+  with open(file_name, 'w') as f:
+    f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+            f'<title>{html.escape(title)}</title></head><body>\n')
+    f.write('\n'.join(sections))
+    f.write('\n</body></html>\n')
+
+
+def write_report_from_database(database: TuningDatabase, output_dir: str):
+  """Analyze `database` and write the report to `output_dir`, return the
+  analysis."""
+  os.makedirs(output_dir, exist_ok=True)
+  analysis = SensitivityAnalysis(database.to_data_frame())
+  write_report(analysis, os.path.join(output_dir, report_file_name))
+  return analysis
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Tuning sensitivity report')
+  parser.add_argument('database', type=str, help='tuning results JSON lines')
+  parser.add_argument('output_dir', type=str, help='report directory')
+  args = parser.parse_args()
+  analysis = write_report_from_database(TuningDatabase.load(args.database),
+                                        args.output_dir)
+  print(analysis.importance.to_string())
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+import numpy as np
+
+from python.mlir.sandbox.tuning_analytics import TuningDatabase, \
+  database_file_name, flatten_configuration, report_file_name, \
+  write_report_from_database
+
+assert flatten_configuration({'tile': (8, np.int64(16)), 'pad': True}) == \
+  {'tile[0]': 8, 'tile[1]': 16, 'pad': True}
+
+# A random search over a space where `a` dominates, `b` and `c` only matter
+# together and `d` does not matter.
+rng = np.random.default_rng(0)
+with tempfile.TemporaryDirectory() as output_dir:
+  file_name = os.path.join(output_dir, database_file_name)
+  database = TuningDatabase(file_name)
+  for _ in range(400):
+    a, b, c, d = rng.integers(0, 4), rng.integers(0, 2), rng.integers(
+        0, 2), rng.integers(0, 4)
+    throughput = 10 * a + 4 * (b == c) + rng.normal()
+    database.add({'a': a, 'bc': [b, c], 'd': d}, throughput)
+  database.add({'a': 0, 'bc': [0, 0], 'd': 0}, 0, status='FAILURE')
+
+  analysis = write_report_from_database(TuningDatabase.load(file_name),
+                                        output_dir)
+  assert analysis.num_samples == 400
+  assert list(analysis.importance.index[:1]) == ['a'], analysis.importance
+  assert analysis.importance['d'] < 0.01, analysis.importance
+  top, second = analysis.top_interactions(2)
+  assert set(top[:2]) == {'bc[0]', 'bc[1]'}, top
+  assert top[2] > 5 * second[2], (top, second)
+  with open(os.path.join(output_dir, report_file_name)) as f:
+    assert 'data:image/png;base64' in f.read()
+
+# An empty history still makes a report.
+with tempfile.TemporaryDirectory() as output_dir:
+  analysis = write_report_from_database(TuningDatabase(), output_dir)
+  assert analysis.num_samples == 0 and analysis.parameters == []
+  with open(os.path.join(output_dir, report_file_name)) as f:
+    assert '0 successful proposals out of 0' in f.read()
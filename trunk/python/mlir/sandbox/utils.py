@@ -1,3 +1,5 @@
+import contextlib
+
 from typing import Any, Callable, List, Mapping, Optional, Sequence, Type
 
 import numpy as np
@@ -116,12 +118,80 @@ def np_type_to_mlir_type(np_type: np.dtype):
   raise Exception(f'unknown scalar type: {np_type}')
 
 
+class BufferPool():
+  """Buffers of `realign` reused across benchmark runs.
+
+  Fresh large allocations are page faulted on their first use, reusing them
+  saves that cost when many problems run in one process. A buffer is handed
+  out again once released, by `release_all` or at the end of the `scope` it was
+  handed out in, which must only happen once the arrays built on it are dead.
+  A request reuses the smallest free buffer large enough. When none is, the
+  free buffers are dropped: the pool holds the buffers of the largest problem,
+  not of every problem of a sweep.
+  """
+
+  def __init__(self):
+    self.free_buffers = []
+    self.used_buffers = []
+
+  def allocate(self, size_in_bytes: int) -> np.ndarray:
+    fitting = [
+        i for i, buf in enumerate(self.free_buffers)
+        if buf.size >= size_in_bytes
+    ]
+    if fitting:
+      buf = self.free_buffers.pop(
+          min(fitting, key=lambda i: self.free_buffers[i].size))
+    else:
+      self.free_buffers = []
+      buf = np.empty(size_in_bytes, dtype=np.byte)
+    self.used_buffers.append(buf)
+    return buf
+
+  def release_all(self):
+    self.free_buffers += self.used_buffers
+    self.used_buffers = []
+
+  @contextlib.contextmanager
+  def scope(self):
+    """Release the buffers handed out within the scope when it exits."""
+    start = len(self.used_buffers)
+    try:
+      yield
+    finally:
+      self.free_buffers += self.used_buffers[start:]
+      del self.used_buffers[start:]
+
+
+# The pool `realign` allocates from, None to allocate new buffers.
+_buffer_pool = None
+
+
+def set_buffer_pool(pool: Optional[BufferPool]):
+  global _buffer_pool
+  _buffer_pool = pool
+
+
+@contextlib.contextmanager
+def buffer_scope():
+  """Release the buffers `realign` allocates within the scope from the pool, if
+  any, when it exits. The arrays must then be dead."""
+  if _buffer_pool is None:
+    yield
+    return
+  with _buffer_pool.scope():
+    yield
+
+
 def realign(allocated_unaligned: np.ndarray, byte_alignment: int = 64):
   shape = allocated_unaligned.shape
   dt = allocated_unaligned.dtype
   effective_size_in_bytes = np.prod(shape) * np.dtype(dt).itemsize
-  total_size_in_bytes = effective_size_in_bytes + byte_alignment
-  buf = np.empty(total_size_in_bytes, dtype=np.byte)
+  total_size_in_bytes = int(effective_size_in_bytes + byte_alignment)
+  if _buffer_pool is not None:
+    buf = _buffer_pool.allocate(total_size_in_bytes)
+  else:
+    buf = np.empty(total_size_in_bytes, dtype=np.byte)
   off = (-buf.ctypes.data % byte_alignment)
   allocated_aligned = buf[off:off +
                           effective_size_in_bytes].view(dt).reshape(shape)
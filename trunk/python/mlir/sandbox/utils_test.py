@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from mlir.sandbox.utils import BufferPool, buffer_scope, realign, \
+    set_buffer_pool
+
+pool = BufferPool()
+set_buffer_pool(pool)
+
+# A run reuses the buffers released by the previous one, the smallest large
+# enough first.
+with buffer_scope():
+  big = realign(np.ones([1024], dtype=np.float32))
+  small = realign(np.ones([16], dtype=np.float32))
+  buffers = [buf.ctypes.data for buf in pool.used_buffers]
+assert not pool.used_buffers and len(pool.free_buffers) == 2
+with buffer_scope():
+  a = realign(np.full([8], 2, dtype=np.float64))
+  b = realign(np.full([512], 3, dtype=np.float32))
+  assert [buf.ctypes.data for buf in pool.used_buffers] == buffers[::-1]
+  assert np.all(a == 2) and np.all(b == 3)
+  assert a.ctypes.data % 64 == 0 and b.ctypes.data % 64 == 0
+  # Nested scopes only release their own buffers.
+  with buffer_scope():
+    c = realign(np.ones([4], dtype=np.float32))
+  assert len(pool.used_buffers) == 2 and len(pool.free_buffers) == 1
+
+# A larger problem drops the free buffers instead of keeping those of every
+# size: the pool holds the buffers of the largest problem.
+with buffer_scope():
+  large = realign(np.ones([4096], dtype=np.float32))
+  assert len(pool.used_buffers) == 1 and not pool.free_buffers
+assert len(pool.free_buffers) == 1
+
+set_buffer_pool(None)
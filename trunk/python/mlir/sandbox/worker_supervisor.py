@@ -0,0 +1,299 @@
+"""Supervised worker processes for compilation and benchmark jobs.
+
+Every job runs in its own child process, forked from a warm forkserver process
+that has already imported the compiler stack. A job runs in phases (compile,
+benchmark) and asks the supervisor for the CPUs of each phase before starting
+it. The supervisor, which runs in the parent process, owns the CPU accounting,
+pins the child to the granted CPUs and kills the child when a phase times out.
+Killing a child only loses that job: the next job is forked from the warm
+forkserver again, without re-importing anything or re-pinning a pool process.
+"""
+
+from contextlib import redirect_stdout
+from enum import Enum
+import io
+import math
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import os
+import signal
+import time
+import typing as tp
+
+from mlir.sandbox.cpu_topology import bind_memory_to_node
+
+# Modules imported once by the forkserver process, so that forked children
+# start warm.
+default_preload_modules = ('__main__', 'mlir.sandbox.harness',
+                           'mlir.sandbox.compiled_artifact')
+
+
+class Phase(Enum):
+  COMPILE = 0
+  BENCHMARK = 1
+
+
+class JobStatus(Enum):
+  # The job returned a value.
+  DONE = 0
+  # A phase of the job exceeded its timeout and the child was killed.
+  TIMEOUT = 1
+  # The child exited without returning a value.
+  CRASHED = 2
+
+
+class JobContext():
+  """Handle passed to a job running in a child process."""
+
+  def __init__(self, conn):
+    self._conn = conn
+
+  def acquire(self, phase: Phase) -> tp.Set[int]:
+    """Block until the supervisor grants the CPUs for `phase`.
+
+    The resources of the previous phase are released. When this returns, the
+    process is pinned to the granted CPUs and the timeout of `phase` started.
+    If the CPUs belong to a known NUMA node, the memory allocated from now on
+    is bound to that node.
+    """
+    self._conn.send(('acquire', phase))
+    message, cpus, node = self._conn.recv()
+    assert message == 'granted', f'unexpected message: {message}'
+    if node is not None:
+      bind_memory_to_node(node)
+    return cpus
+
+
+def _run_job(conn, fn: tp.Callable, args: tp.Sequence[tp.Any]):
+  """Entry point of a child process."""
+  # CTRL+C is handled by the supervisor, which kills all children.
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  f = io.StringIO()
+  with redirect_stdout(f):
+    value = fn(JobContext(conn), *args)
+  conn.send(('done', value))
+  conn.close()
+
+
+class _Job():
+
+  def __init__(self, key, process, conn):
+    self.key = key
+    self.process = process
+    self.conn = conn
+    self.phase = None
+    self.requested_phase = None
+    self.deadline = None
+    # CPU range index used by the job, if any.
+    self.range_idx = None
+    # CPU the job compiles on in coupled mode, if any.
+    self.compile_cpu = None
+
+
+class Supervisor():
+  """Run jobs in forked children and arbitrate the CPUs they run on.
+
+  Benchmarks run exclusively on one of `benchmark_cpu_ranges`. Two modes are
+  supported:
+    - coupled (`compile_cpus` is None): a job compiles on a single CPU of a
+      range and then benchmarks on that whole range. Compilations may share a
+      range, a benchmark waits until the compilations on its range finished and
+      no new compilation is placed on a range with a waiting benchmark.
+    - decoupled: compilations run unpinned on `compile_cpus` and benchmarks on
+      any free range.
+  At most `max_compilations` compile phases run at the same time.
+  `benchmark_nodes` optionally lists the NUMA node of every benchmark range.
+  """
+
+  def __init__(self,
+               benchmark_cpu_ranges: tp.Sequence[tp.Sequence[int]],
+               max_compilations: int,
+               timeouts: tp.Mapping[Phase, float],
+               compile_cpus: tp.Optional[tp.Sequence[int]] = None,
+               preload_modules: tp.Sequence[str] = default_preload_modules,
+               benchmark_nodes: tp.Optional[tp.Sequence[int]] = None):
+    self.benchmark_cpu_ranges = [set(r) for r in benchmark_cpu_ranges]
+    self.benchmark_nodes = list(benchmark_nodes) if benchmark_nodes \
+      is not None else [None] * len(self.benchmark_cpu_ranges)
+    self.max_compilations = max_compilations
+    self.timeouts = timeouts
+    self.compile_cpus = set(compile_cpus) if compile_cpus is not None else None
+    self.context = mp.get_context('forkserver')
+    self.context.set_forkserver_preload(list(preload_modules))
+    # Written by `wake` to interrupt `wait` from another thread.
+    self._wake_receiver, self._wake_sender = self.context.Pipe(duplex=False)
+
+    self.jobs = {}
+    self.num_compilations = 0
+    self.range_num_compilations = [0] * len(self.benchmark_cpu_ranges)
+    self.range_busy = [False] * len(self.benchmark_cpu_ranges)
+    self.cpu_num_compilations = {
+        cpu: 0 for r in self.benchmark_cpu_ranges for cpu in r
+    }
+
+  def num_jobs(self) -> int:
+    return len(self.jobs)
+
+  def submit(self, key, fn: tp.Callable, args: tp.Sequence[tp.Any]):
+    """Run `fn(job_context, *args)` in a new child process.
+
+    `fn` and `args` must be picklable. `key` identifies the job in the results
+    returned by `wait`.
+    """
+    parent_conn, child_conn = self.context.Pipe()
+    process = self.context.Process(target=_run_job,
+                                   args=(child_conn, fn, args),
+                                   daemon=True)
+    process.start()
+    child_conn.close()
+    self.jobs[parent_conn] = _Job(key, process, parent_conn)
+
+  def wake(self):
+    """Make a `wait` running in another thread return, e.g. to submit jobs."""
+    self._wake_sender.send(None)
+
+  def wait(
+      self,
+      timeout: tp.Optional[float]) -> tp.Sequence[tp.Tuple[tp.Any, JobStatus,
+                                                           tp.Any]]:
+    """Serve the children for up to `timeout` seconds, forever if None.
+
+    Return the (key, status, value) of every job that finished in the meantime,
+    returning as soon as at least one job finished or `wake` was called.
+    """
+    end = time.monotonic() + timeout if timeout is not None else math.inf
+    finished = []
+    woken = False
+    while not finished:
+      now = time.monotonic()
+      for job in list(self.jobs.values()):
+        if job.deadline is not None and job.deadline <= now:
+          self._finish(job, JobStatus.TIMEOUT, None, finished)
+      self._grant()
+      if finished or woken or now >= end:
+        break
+
+      deadlines = [j.deadline for j in self.jobs.values() if j.deadline]
+      wait_until = min([end] + deadlines)
+      for conn in wait(
+          list(self.jobs.keys()) + [self._wake_receiver],
+          max(0.0, wait_until - now) if wait_until < math.inf else None):
+        if conn is self._wake_receiver:
+          conn.recv()
+          woken = True
+          continue
+        job = self.jobs[conn]
+        try:
+          message, value = conn.recv()
+        except (EOFError, OSError):
+          self._finish(job, JobStatus.CRASHED, None, finished)
+          continue
+        if message == 'acquire':
+          self._release(job)
+          job.requested_phase = value
+        else:
+          self._finish(job, JobStatus.DONE, value, finished)
+    return finished
+
+  def shutdown(self):
+    """Kill all children."""
+    for job in list(self.jobs.values()):
+      self._finish(job, JobStatus.CRASHED, None, [])
+
+  def _finish(self, job: _Job, status: JobStatus, value, finished):
+    if status != JobStatus.DONE:
+      job.process.kill()
+    job.process.join()
+    job.conn.close()
+    self._release(job)
+    del self.jobs[job.conn]
+    finished.append((job.key, status, value))
+
+  def _release(self, job: _Job):
+    """Release the resources of the current phase of `job`."""
+    if job.phase == Phase.COMPILE:
+      self.num_compilations -= 1
+      if job.compile_cpu is not None:
+        self.range_num_compilations[job.range_idx] -= 1
+        self.cpu_num_compilations[job.compile_cpu] -= 1
+        job.compile_cpu = None
+    elif job.phase == Phase.BENCHMARK:
+      self.range_busy[job.range_idx] = False
+    job.phase = None
+    job.deadline = None
+
+  def _grant(self):
+    """Grant the requested phases for which resources are available.
+
+    Benchmark requests are served first so that compilations cannot starve
+    them.
+    """
+    waiting = [j for j in self.jobs.values() if j.requested_phase is not None]
+    reserved_ranges = set()
+    for job in waiting:
+      if job.requested_phase != Phase.BENCHMARK:
+        continue
+      range_idx = self._find_benchmark_range(job)
+      if range_idx is None:
+        if job.range_idx is not None:
+          reserved_ranges.add(job.range_idx)
+        continue
+      job.range_idx = range_idx
+      self.range_busy[range_idx] = True
+      self._start_phase(job, self.benchmark_cpu_ranges[range_idx],
+                        self.benchmark_nodes[range_idx])
+
+    for job in waiting:
+      if job.requested_phase != Phase.COMPILE or \
+          self.num_compilations >= self.max_compilations:
+        continue
+      if self.compile_cpus is not None:
+        cpus = self.compile_cpus
+      else:
+        candidates = [(self.cpu_num_compilations[cpu], cpu, idx)
+                      for idx, r in enumerate(self.benchmark_cpu_ranges)
+                      if not self.range_busy[idx] and idx not in reserved_ranges
+                      for cpu in r]
+        if not candidates:
+          continue
+        _, cpu, range_idx = min(candidates)
+        job.range_idx = range_idx
+        job.compile_cpu = cpu
+        self.range_num_compilations[range_idx] += 1
+        self.cpu_num_compilations[cpu] += 1
+        cpus = {cpu}
+      self.num_compilations += 1
+      self._start_phase(job, cpus)
+
+  def _find_benchmark_range(self, job: _Job) -> tp.Optional[int]:
+    if self.compile_cpus is None and job.range_idx is not None:
+      # Coupled mode: benchmark on the range the job compiled on, once nothing
+      # else runs there.
+      idx = job.range_idx
+      if self.range_busy[idx] or self.range_num_compilations[idx] > 0:
+        return None
+      return idx
+    # Decoupled mode, or a job that did not compile: any free range, without
+    # compilations in coupled mode.
+    for idx in range(len(self.benchmark_cpu_ranges)):
+      if not self.range_busy[idx] and (self.compile_cpus is not None or
+                                       self.range_num_compilations[idx] == 0):
+        return idx
+    return None
+
+  def _start_phase(self,
+                   job: _Job,
+                   cpus: tp.Set[int],
+                   node: tp.Optional[int] = None):
+    job.phase = job.requested_phase
+    job.requested_phase = None
+    try:
+      os.sched_setaffinity(job.process.pid, cpus)
+    except ProcessLookupError:
+      # The child died, which is detected when reading from its connection.
+      pass
+    job.deadline = time.monotonic() + self.timeouts[job.phase]
+    try:
+      job.conn.send(('granted', cpus, node))
+    except (BrokenPipeError, OSError):
+      pass
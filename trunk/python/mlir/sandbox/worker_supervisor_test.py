@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import os
+import signal
+import tempfile
+import threading
+import time
+
+from python.mlir.sandbox.worker_supervisor import JobStatus, Phase, Supervisor
+
+
+def square_job(job, x):
+  """This function is run on the child processes."""
+  job.acquire(Phase.COMPILE)
+  job.acquire(Phase.BENCHMARK)
+  return x * x
+
+
+def benchmark_only_job(job, x):
+  """Benchmark without compiling, as a precompiled artifact."""
+  job.acquire(Phase.BENCHMARK)
+  return x * x
+
+
+def crash_once_job(job, x, marker_file):
+  """Kill the child the first time the job runs, as a crashing compiler."""
+  job.acquire(Phase.COMPILE)
+  if not os.path.exists(marker_file):
+    open(marker_file, 'w').close()
+    os.kill(os.getpid(), signal.SIGKILL)
+  job.acquire(Phase.BENCHMARK)
+  return x * x
+
+
+def freezing_job(job, x):
+  """Exceed the benchmark timeout."""
+  job.acquire(Phase.COMPILE)
+  job.acquire(Phase.BENCHMARK)
+  time.sleep(60)
+  return x * x
+
+
+def wait_all(supervisor, timeout=20):
+  """Return the {key: (status, value)} of all the jobs of `supervisor`."""
+  end = time.monotonic() + timeout
+  results = {}
+  while supervisor.num_jobs() > 0:
+    assert time.monotonic() < end, 'timed out waiting for results'
+    for key, status, value in supervisor.wait(timeout=1.0):
+      results[key] = (status, value)
+  return results
+
+
+def assert_released(supervisor):
+  assert supervisor.num_compilations == 0
+  assert not any(supervisor.range_busy)
+  assert not any(supervisor.range_num_compilations)
+  assert not any(supervisor.cpu_num_compilations.values())
+
+
+if __name__ == '__main__':
+  cpus = sorted(os.sched_getaffinity(0))
+  supervisor = Supervisor([cpus[:1]],
+                          max_compilations=2,
+                          timeouts={
+                              Phase.COMPILE: 10,
+                              Phase.BENCHMARK: 1
+                          },
+                          preload_modules=['__main__'])
+
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    marker_file = os.path.join(tmp_dir, 'crashed')
+    for x in range(4):
+      supervisor.submit(('square', x), square_job, (x,))
+    supervisor.submit(('crash', 5), crash_once_job, (5, marker_file))
+    supervisor.submit(('freeze', 6), freezing_job, (6,))
+    supervisor.submit(('benchmark', 7), benchmark_only_job, (7,))
+    results = wait_all(supervisor)
+
+    assert {k: results[k] for k in results if k[0] == 'square'} == {
+        ('square', x): (JobStatus.DONE, x * x) for x in range(4)
+    }, results
+    assert results[('crash', 5)] == (JobStatus.CRASHED, None), results
+    assert results[('freeze', 6)] == (JobStatus.TIMEOUT, None), results
+    assert results[('benchmark', 7)] == (JobStatus.DONE, 49), results
+    assert_released(supervisor)
+
+    # The crashed job runs again in a new child and returns its result.
+    supervisor.submit(('crash', 5), crash_once_job, (5, marker_file))
+    assert wait_all(supervisor) == {('crash', 5): (JobStatus.DONE, 25)}
+    assert_released(supervisor)
+
+  # Waiting without timeout returns when a job finishes or `wake` is called
+  # from another thread.
+  supervisor.submit(('square', 8), square_job, (8,))
+  results = []
+  while not results:
+    results = supervisor.wait(timeout=None)
+  assert results == [(('square', 8), JobStatus.DONE, 64)], results
+  waker = threading.Timer(0.2, supervisor.wake)
+  waker.start()
+  assert supervisor.wait(timeout=None) == []
+  waker.join()
+
+  # Shutdown kills the running children.
+  supervisor.submit(('freeze', 7), freezing_job, (7,))
+  assert supervisor.wait(timeout=0.5) == []
+  processes = [job.process for job in supervisor.jobs.values()]
+  supervisor.shutdown()
+  assert supervisor.num_jobs() == 0
+  assert all(not p.is_alive() for p in processes)
+  assert_released(supervisor)
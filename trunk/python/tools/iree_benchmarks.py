@@ -1,8 +1,19 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
+import glob
+import hashlib
+import itertools
+import json
+import os
+import re
+import statistics
 import subprocess
-from typing import Sequence
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mlir.sandbox.cpu_topology import parse_cpu_list
 
 def parse_cli():
   parser = argparse.ArgumentParser(description="""
@@ -13,8 +24,21 @@ def parse_cli():
 
     Given -benchmark-output-dir=/tmp/foo, creates intermediate files for each dispatch region:
        /tmp/foo/xxx_dispatch_xxx.mlir
-       /tmp/foo/xxx_dispatch_xxx.mlir.vmfb
        /tmp/foo/xxx_dispatch_xxx.mlir.strategy.mlir
+       /tmp/foo/xxx_dispatch_xxx.mlir.benchmark.json
+    and caches the compiled modules by dispatch region and strategy in:
+       /tmp/foo/vmfb_cache/<hash>.vmfb
+
+    Dispatch regions are compiled in parallel and benchmarked one at a time,
+    as soon as they are compiled, on -benchmark-cpus. Compilations run on the
+    other cpus.
+
+    With -search-strategies, the root op of every dispatch region is classified
+    and candidate strategies, instantiated from a parametric template, are
+    benchmarked:
+       /tmp/foo/xxx_dispatch_xxx.mlir.candidate_<i>.strategy.mlir
+    The best strategy of every dispatch region is saved to -strategy-db and
+    replayed by the following runs.
 
     Usage:
     ======
@@ -62,6 +86,34 @@ def parse_cli():
     help="""benchmark min time (note: this seems similar to gbench and broken 
     for autotuning; it seens to perform a number K of runs until min time is 
     reached and seemd to report the mean)""")
+  parser.add_argument(
+    '-compile-jobs',
+    default=os.cpu_count(),
+    type=int,
+    help='number of dispatch regions compiled in parallel')
+  parser.add_argument(
+    '-benchmark-cpus',
+    default='',
+    help='cpus to pin the benchmarks to (e.g., 4 or 4-7), all cpus if empty')
+  parser.add_argument(
+    '-vmfb-cache-dir',
+    default='',
+    help='directory caching the compiled modules, '
+    '<benchmark-output-dir>/vmfb_cache by default')
+  parser.add_argument(
+    '-search-strategies',
+    default=False, action=argparse.BooleanOptionalAction,
+    help='search the best strategy of every dispatch region')
+  parser.add_argument(
+    '-max-candidates',
+    default=16,
+    type=int,
+    help='maximum number of strategies benchmarked per dispatch region')
+  parser.add_argument(
+    '-strategy-db',
+    default='',
+    help='JSON file of the best strategies, '
+    '<benchmark-output-dir>/strategies.json by default')
   parser.add_argument(
     '-debug', 
     default=False, action=argparse.BooleanOptionalAction, 
@@ -89,46 +141,114 @@ def generate_dispatch_regions(args) -> Sequence[str]:
   print(' '.join(cmd_list))
   subprocess.run(cmd_list, check=True)
 
-  benchmark_output_dir = args['benchmark_output_dir']
-  import glob
-  return set(glob.glob(benchmark_output_dir + '/*dispatch*.mlir')) - \
-         set(glob.glob(benchmark_output_dir + '/*strategy.mlir'))
-
+  return sorted(set(glob.glob(benchmark_output_dir + '/*dispatch*.mlir')) - \
+                set(glob.glob(benchmark_output_dir + '/*strategy.mlir')))
 
-def transform_dispatch_region(
-    args, 
-    dispatch_mlir_filename: str,
-    strategy_filename : str = None) -> Sequence[float]:
-  """Run iree-translate on a given dispatch region in an mlir file to produce .vmfb
-     and run iree-benchmark-module on that .vmfb file.
-     Return the list of times for the dispatch region.
-     This is where we should inject transform dialect commands."""
 
+def _compile_flags(args, strategy_filename: Optional[str]) -> Sequence[str]:
   iree_target_backends = args['iree_target_backends']
-  iree_translate_bin = args['iree_bin_dir'] + '/tools/iree-compile'
-  cmd_list = [iree_translate_bin] + \
-    [dispatch_mlir_filename] + \
-    ['-o', dispatch_mlir_filename + '.vmfb'] + \
-    ['--iree-hal-target-backends=' + iree_target_backends] + \
+  flags = ['--iree-hal-target-backends=' + iree_target_backends] + \
     ['--iree-mlir-to-vm-bytecode-module']
-  
+
   if strategy_filename is not None:
-    cmd_list = cmd_list + \
+    flags = flags + \
       ['-iree-flow-dispatch-use-transform-dialect=' + strategy_filename]
 
   debug = args['debug']
   if debug:
-    cmd_list = cmd_list + \
+    flags = flags + \
       ['-mlir-print-ir-after-all'] + \
       ['-mlir-print-ir-after-change']
+  return flags
+
+
+def vmfb_cache_key(args, dispatch_mlir_filename: str,
+                   strategy_filename: Optional[str]) -> str:
+  """Hash the dispatch region, the strategy, the compilation flags and the
+  identity of iree-compile: its resolved path, modification time and size."""
+  key = hashlib.sha256()
+  # Another or a rebuilt iree-compile invalidates the cache.
+  compiler = os.path.realpath(args['iree_bin_dir'] + '/tools/iree-compile')
+  compiler_stat = os.stat(compiler)
+  key.update(f'{compiler}\0{compiler_stat.st_mtime_ns}\0'
+             f'{compiler_stat.st_size}\0'.encode())
+  for filename in [dispatch_mlir_filename, strategy_filename]:
+    if filename is not None:
+      with open(filename, 'rb') as f:
+        key.update(f.read())
+    key.update(b'\0')
+  # The strategy is hashed by content, not by path.
+  key.update(' '.join(_compile_flags(args, None)).encode())
+  return key.hexdigest()
+
 
+def _pinned(cmd_list: List[str],
+            cpus: Optional[Sequence[int]]) -> List[str]:
+  """Prefix `cmd_list` with taskset to run it on `cpus`, if any. The commands
+  are started from worker threads, where a preexec_fn could deadlock."""
+  if not cpus:
+    return cmd_list
+  return ['taskset', '-c', ','.join(str(cpu) for cpu in cpus)] + cmd_list
+
+
+def transform_dispatch_region(
+    args,
+    dispatch_mlir_filename: str,
+    strategy_filename : str = None,
+    compile_cpus: Optional[Sequence[int]] = None) -> str:
+  """Run iree-compile on a given dispatch region in an mlir file to produce a
+     .vmfb and return its path.
+     The .vmfb is cached by dispatch region and strategy unless debugging.
+     This is where we should inject transform dialect commands."""
+
+  cache_dir = args['vmfb_cache_dir'] or os.path.join(
+    args['benchmark_output_dir'], 'vmfb_cache')
+  os.makedirs(cache_dir, exist_ok=True)
+  vmfb_filename = os.path.join(
+    cache_dir,
+    vmfb_cache_key(args, dispatch_mlir_filename, strategy_filename) + '.vmfb')
+  if os.path.exists(vmfb_filename) and not args['debug']:
+    print(f'{dispatch_mlir_filename}: cached {vmfb_filename}')
+    return vmfb_filename
+
+  # Compile to a temporary file so that concurrent compilations and
+  # interrupted ones never leave a partial .vmfb in the cache.
+  fd, tmp_filename = tempfile.mkstemp(dir=cache_dir, suffix='.vmfb.tmp')
+  os.close(fd)
+  iree_translate_bin = args['iree_bin_dir'] + '/tools/iree-compile'
+  cmd_list = [iree_translate_bin] + \
+    [dispatch_mlir_filename] + \
+    ['-o', tmp_filename] + \
+    _compile_flags(args, strategy_filename)
+
+  cmd_list = _pinned(cmd_list, compile_cpus)
   print(' '.join(cmd_list))
-  subprocess.run(cmd_list, check=True)
+  try:
+    subprocess.run(cmd_list, check=True)
+  except BaseException:
+    os.remove(tmp_filename)
+    raise
+  os.replace(tmp_filename, vmfb_filename)
+  return vmfb_filename
+
+
+def parse_benchmark_times(benchmark_json_filename: str) -> Sequence[float]:
+  """Return the real time of every repetition, without the aggregates (mean,
+  median, stddev and cv), from the JSON output of iree-benchmark-module."""
+  with open(benchmark_json_filename) as f:
+    benchmarks = json.load(f)['benchmarks']
+  return [
+    b['real_time'] for b in benchmarks
+    if b.get('run_type', 'iteration') == 'iteration'
+  ]
 
 
 def benchmark_dispatch_region(
-    args, 
-    dispatch_mlir_filename: str) -> Sequence[float]:
+    args,
+    dispatch_mlir_filename: str,
+    vmfb_filename: str,
+    benchmark_cpus: Optional[Sequence[int]] = None,
+    benchmark_json_filename: Optional[str] = None) -> Sequence[float]:
   """Run iree-benchmark-module to dump json and then parse the times."""
 
   iree_target_backends = args['iree_target_backends']
@@ -136,32 +256,224 @@ def benchmark_dispatch_region(
   benchmark_batch_size = args['benchmark_batch_size']
   benchmark_repetitions = args['benchmark_repetitions']
   benchmark_min_time = args['benchmark_min_time']
+  benchmark_json_filename = benchmark_json_filename or \
+    dispatch_mlir_filename + '.benchmark.json'
   cmd_list = [iree_benchmark_module_bin] + \
     ['--batch_size=' + str(benchmark_batch_size)] + \
-    ['--module_file=' + dispatch_mlir_filename + '.vmfb'] + \
+    ['--module_file=' + vmfb_filename] + \
     ['--driver=' + iree_target_backends] + \
     ['--benchmark_format=json'] + \
     ['--benchmark_format_out=json'] + \
-    ['--benchmark_out=/tmp/benchmarks_out'] + \
+    ['--benchmark_out=' + benchmark_json_filename] + \
     ['--benchmark_report_aggregates_only=false'] + \
     ['--benchmark_display_aggregates_only=false'] + \
     ['--benchmark_repetitions=' + str(benchmark_repetitions)] + \
     ['--benchmark_min_time=' + str(benchmark_min_time)]
+  cmd_list = _pinned(cmd_list, benchmark_cpus)
   print(' '.join(cmd_list))
-  p = subprocess.Popen(cmd_list, stdout=subprocess.PIPE)
-  p = subprocess.Popen(['grep', '\"real_time\"'], stdin=p.stdout, stdout=subprocess.PIPE)
-  
-  # Drop mean, median, stddev and cv.
-  p = subprocess.Popen(['head', '-n', '-4'], stdin=p.stdout, stdout=subprocess.PIPE)
-  output = p.communicate()[0].decode("utf-8") 
-  p.stdout.close()
-  output = output.replace('"real_time":', '').replace('\n', '').replace(',', '')
-  times = [float(x) for x in output.split()]
+  subprocess.run(cmd_list, check=True, stdout=subprocess.DEVNULL)
+  return parse_benchmark_times(benchmark_json_filename)
+
+
+def _compile_and_benchmark(
+    args, jobs: Sequence[Tuple[str, str, str]]) -> Dict[str, Sequence[float]]:
+  """Compile the (dispatch region, strategy, benchmark json) jobs in parallel
+  and benchmark each one as soon as it is compiled, one at a time. Return the
+  times by strategy file, jobs that fail to compile or to run have no times.
+  """
+  benchmark_cpus = parse_cpu_list(args['benchmark_cpus'])
+  compile_cpus = sorted(os.sched_getaffinity(0) - set(benchmark_cpus)) \
+    if benchmark_cpus else None
+  times = {}
+  with concurrent.futures.ThreadPoolExecutor(
+      max_workers=args['compile_jobs']) as pool:
+    futures = {
+      pool.submit(transform_dispatch_region, args, dispatch_mlir_filename,
+                  strategy_filename, compile_cpus):
+      (dispatch_mlir_filename, strategy_filename, benchmark_json_filename)
+      for dispatch_mlir_filename, strategy_filename, benchmark_json_filename
+      in jobs
+    }
+    for future in concurrent.futures.as_completed(futures):
+      dispatch_mlir_filename, strategy_filename, benchmark_json_filename = \
+        futures[future]
+      try:
+        times[strategy_filename] = benchmark_dispatch_region(
+          args, dispatch_mlir_filename, future.result(), benchmark_cpus,
+          benchmark_json_filename)
+      except subprocess.CalledProcessError as e:
+        print(f'{strategy_filename}: {e}\n')
+        continue
+      print(f'{strategy_filename} times: {times[strategy_filename]}\n')
   return times
 
 
-def make_strategy_as_serialized_mlir(strategy_filename : str):
-  """Create a fixed strategy with the transform dialect and save it to file."""
+def _strategy_db_filename(args) -> str:
+  return args['strategy_db'] or os.path.join(args['benchmark_output_dir'],
+                                             'strategies.json')
+
+
+def _dispatch_region_hash(dispatch_mlir_filename: str) -> str:
+  with open(dispatch_mlir_filename, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_strategy_db(args) -> Dict[str, Any]:
+  """Return the best strategies by dispatch region hash."""
+  if not os.path.exists(_strategy_db_filename(args)):
+    return {}
+  with open(_strategy_db_filename(args)) as f:
+    return json.load(f)
+
+
+def run_pipeline(args, dispatch_regions: Sequence[str],
+                 make_strategy=None) -> dict:
+  """Compile the dispatch regions in parallel and benchmark each one as soon
+  as it is compiled, one at a time. Return the times of every dispatch
+  region.
+
+  The strategy of a dispatch region is its best strategy in the strategy db,
+  if it was searched, or the default strategy.
+  `make_strategy(strategy_filename, **strategy)` writes a strategy,
+  `make_strategy_as_serialized_mlir` by default.
+  """
+  make_strategy = make_strategy or make_strategy_as_serialized_mlir
+  strategy_db = load_strategy_db(args)
+  jobs = []
+  for dispatch_mlir_filename in dispatch_regions:
+    best = strategy_db.get(_dispatch_region_hash(dispatch_mlir_filename))
+    strategy_filename = dispatch_mlir_filename + '.strategy.mlir'
+    make_strategy(strategy_filename, **(best['strategy'] if best else {}))
+    jobs.append((dispatch_mlir_filename, strategy_filename,
+                 dispatch_mlir_filename + '.benchmark.json'))
+  times = _compile_and_benchmark(args, jobs)
+  return {
+    dispatch_mlir_filename: times.get(strategy_filename)
+    for dispatch_mlir_filename, strategy_filename, _ in jobs
+  }
+
+
+# Root ops with a strategy template: the loops of the op, as (operand, dim)
+# pairs, and their iterator types.
+_root_ops = {
+  'linalg.matmul': (((0, 0), (1, 1), (0, 1)),
+                    ('parallel', 'parallel', 'reduction')),
+  'linalg.batch_matmul': (((0, 0), (0, 1), (1, 2), (0, 2)),
+                          ('parallel', 'parallel', 'parallel', 'reduction')),
+}
+_parallel_tile_sizes = (0, 4, 8, 16, 32)
+_reduction_tile_sizes = (1, 4, 8)
+_contraction_lowerings = ('outerproduct', 'dot')
+
+
+def classify_dispatch_region(
+    dispatch_mlir_filename: str) -> Optional[Dict[str, Any]]:
+  """Return the root op of a dispatch region, its loop sizes (None if dynamic)
+  and iterator types, or None if it has no op with a strategy template or if
+  the tensor types of its operands are not on the line of the op."""
+  with open(dispatch_mlir_filename) as f:
+    for line in f:
+      match = re.search(r'\b(linalg\.\w+)\b', line)
+      if match is None or match.group(1) not in _root_ops:
+        continue
+      op_name = match.group(1)
+      shapes = [[None if d == '?' else int(d)
+                 for d in dims.split('x')[:-1]]
+                for dims in re.findall(r'tensor<((?:[0-9?]+x)*)\w+>', line)]
+      loops, iterator_types = _root_ops[op_name]
+      if any(operand >= len(shapes) or dim >= len(shapes[operand])
+             for operand, dim in loops):
+        return None
+      return {
+        'op_name': op_name,
+        'sizes': [shapes[operand][dim] for operand, dim in loops],
+        'iterator_types': list(iterator_types),
+      }
+  return None
+
+
+def strategy_candidates(root: Optional[Dict[str, Any]],
+                        max_candidates: int) -> List[Dict[str, Any]]:
+  """Instantiate the strategy template for the root op of a dispatch region.
+
+  Tile sizes divide the static loop sizes and the candidates are subsampled
+  evenly down to `max_candidates`. The default strategy always comes first.
+  """
+  candidates = [{}]
+  if root is None:
+    return candidates
+  tile_sizes = []
+  for size, iterator_type in zip(root['sizes'], root['iterator_types']):
+    options = _parallel_tile_sizes if iterator_type == 'parallel' \
+      else _reduction_tile_sizes
+    tile_sizes.append([
+      t for t in options if size is None or t == 0 or
+      (t <= size and size % t == 0)
+    ] or [0])
+  template = [{
+    'op_name': root['op_name'],
+    'tile_sizes': list(sizes),
+    'contraction_lowering': lowering,
+  } for sizes in itertools.product(*tile_sizes)
+    for lowering in _contraction_lowerings]
+  step = max(1, -(-len(template) // max(1, max_candidates - 1)))
+  return (candidates + template[::step])[:max_candidates]
+
+
+def search_strategies(args, dispatch_regions: Sequence[str],
+                      make_strategy=None) -> Dict[str, Any]:
+  """Benchmark the candidate strategies of every dispatch region, save the
+  best ones, by median time, to the strategy db and return them.
+
+  All the candidates of all the dispatch regions are compiled in parallel.
+  """
+  make_strategy = make_strategy or make_strategy_as_serialized_mlir
+  jobs = []
+  candidates = {}
+  for dispatch_mlir_filename in dispatch_regions:
+    root = classify_dispatch_region(dispatch_mlir_filename)
+    print(f'{dispatch_mlir_filename}: {root}')
+    for i, strategy in enumerate(
+        strategy_candidates(root, args['max_candidates'])):
+      prefix = f'{dispatch_mlir_filename}.candidate_{i}'
+      make_strategy(prefix + '.strategy.mlir', **strategy)
+      jobs.append((dispatch_mlir_filename, prefix + '.strategy.mlir',
+                   prefix + '.benchmark.json'))
+      candidates[prefix + '.strategy.mlir'] = (dispatch_mlir_filename,
+                                               strategy)
+  times = _compile_and_benchmark(args, jobs)
+
+  strategy_db = load_strategy_db(args)
+  for dispatch_mlir_filename in dispatch_regions:
+    results = [(statistics.median(times[f]), s, times[f])
+               for f, (d, s) in candidates.items()
+               if d == dispatch_mlir_filename and times.get(f)]
+    if not results:
+      print(f'{dispatch_mlir_filename}: no strategy compiled and ran')
+      continue
+    median, strategy, best_times = min(results, key=lambda r: r[0])
+    print(f'{dispatch_mlir_filename}: best strategy {strategy} '
+          f'median time {median}')
+    strategy_db[_dispatch_region_hash(dispatch_mlir_filename)] = {
+      'dispatch_region': os.path.basename(dispatch_mlir_filename),
+      'strategy': strategy,
+      'times': best_times,
+    }
+  with open(_strategy_db_filename(args), 'w') as f:
+    json.dump(strategy_db, f, indent=2)
+  return strategy_db
+
+
+def make_strategy_as_serialized_mlir(
+    strategy_filename : str,
+    op_name: str = 'linalg.matmul',
+    tile_sizes: Sequence[int] = (0, 0, 1),
+    contraction_lowering: str = 'outerproduct'):
+  """Create a strategy with the transform dialect and save it to file.
+
+  The strategy tiles the `op_name` ops by `tile_sizes`, vectorizes, bufferizes
+  and lowers the vector contractions to `contraction_lowering`.
+  """
 
   import iree.compiler.dialects.transform as transform
   import iree.compiler.dialects.transform.structured as structured_transform
@@ -180,13 +492,13 @@ def make_strategy_as_serialized_mlir(strategy_filename : str):
     with ir.InsertionPoint(module.body):
       root = transform.WithPDLPatternsOp()
       with ir.InsertionPoint(root.body):
-        isa_matmul = pdl.PatternOp(benefit = 1, name = "isa_matmul")
-        with ir.InsertionPoint(isa_matmul.body):
+        isa_root = pdl.PatternOp(benefit = 1, name = "isa_root")
+        with ir.InsertionPoint(isa_root.body):
           args = pdl.OperandsOp()
           types = pdl.TypesOp()
           pdl_op = pdl.OperationOp(args=[args], types=[types])
-          op_name = pdl.AttributeOp(value=ir.StringAttr.get("linalg.matmul"))
-          pdl.ApplyNativeConstraintOp("isEquivalentToOp", args=[pdl_op, op_name])
+          pdl_op_name = pdl.AttributeOp(value=ir.StringAttr.get(op_name))
+          pdl.ApplyNativeConstraintOp("isEquivalentToOp", args=[pdl_op, pdl_op_name])
           pdl.RewriteOp(pdl_op, "transform.dialect")
 
         sequence = iree_structured_transform.CanonicalizedSequenceOp(root.body.arguments[0])
@@ -194,10 +506,10 @@ def make_strategy_as_serialized_mlir(strategy_filename : str):
         with ir.InsertionPoint(sequence_block):
           # iree_structured_transform.PrintOp(None, name="Initial IR")
           # ir.Operation.create(name="transform.iree.set_num_workgroups_to_one")
-          target_match = transform.PDLMatchOp(sequence_block.arguments[0], "isa_matmul")
+          target_match = transform.PDLMatchOp(sequence_block.arguments[0], "isa_root")
           # TODO: fuse...
           tiled = structured_transform.TileOp(target=target_match,
-                                              sizes=[0, 0, 1])
+                                              sizes=list(tile_sizes))
           # iree_structured_transform.PrintOp(None, name="After tiling")
 
           # TODO: peeling is disabled for now
@@ -214,7 +526,7 @@ def make_strategy_as_serialized_mlir(strategy_filename : str):
           for i in range(1, 8):
             stages.append(i)
             iree_structured_transform.LowerVectorsOp(
-                contraction_lowering="outerproduct",
+                contraction_lowering=contraction_lowering,
                 multireduction_lowering="innerparallel",
                 split_transfers="linalg-copy",
                 stages=stages,
@@ -228,11 +540,16 @@ def make_strategy_as_serialized_mlir(strategy_filename : str):
       f.write(str(module))
 
 
-args = parse_cli()
-dispatch_regions = generate_dispatch_regions(args)
-for dispatch_mlir_filename in dispatch_regions:
-  strategy_filename = dispatch_mlir_filename + '.strategy.mlir'
-  make_strategy_as_serialized_mlir(strategy_filename)
-  transform_dispatch_region(args, dispatch_mlir_filename, strategy_filename)
-  times = benchmark_dispatch_region(args, dispatch_mlir_filename)
-  print(f'times: {times}\n')
+def main():
+  args = parse_cli()
+  dispatch_regions = generate_dispatch_regions(args)
+  if args['search_strategies']:
+    search_strategies(args, dispatch_regions)
+    return
+  times = run_pipeline(args, dispatch_regions)
+  for dispatch_mlir_filename in dispatch_regions:
+    print(f'{dispatch_mlir_filename} times: {times[dispatch_mlir_filename]}')
+
+
+if __name__ == '__main__':
+  main()
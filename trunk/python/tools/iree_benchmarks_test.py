@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import stat
+import tempfile
+
+from python.tools.iree_benchmarks import (classify_dispatch_region,
+                                          run_pipeline, search_strategies,
+                                          strategy_candidates)
+
+# iree-compile concatenates its input and the strategy to its output and counts
+# its invocations, iree-benchmark-module writes two repetitions, the second one
+# being the size of the module, and their aggregates.
+fake_compile = '''#!/bin/sh
+echo x >> "$(dirname "$0")/compilations"
+cat "$1" "${6#*=}" > "$3"
+'''
+fake_benchmark = '''#!/bin/sh
+for arg in "$@"; do
+  case "$arg" in
+    --benchmark_out=*) out="${arg#--benchmark_out=}";;
+    --module_file=*) module="${arg#--module_file=}";;
+  esac
+done
+size=$(wc -c < "$module")
+cat > "$out" <<JSON
+{"benchmarks": [
+  {"name": "BM", "run_type": "iteration", "real_time": 2.0},
+  {"name": "BM", "run_type": "iteration", "real_time": $size},
+  {"name": "BM_mean", "run_type": "aggregate", "real_time": 3.0},
+  {"name": "BM_median", "run_type": "aggregate", "real_time": 3.0}
+]}
+JSON
+'''
+
+
+def make_strategy(strategy_filename, **strategy):
+  with open(strategy_filename, 'w') as f:
+    f.write(json.dumps(strategy))
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+  tools_dir = os.path.join(tmp_dir, 'tools')
+  os.makedirs(tools_dir)
+  for name, script in [('iree-compile', fake_compile),
+                       ('iree-benchmark-module', fake_benchmark)]:
+    path = os.path.join(tools_dir, name)
+    with open(path, 'w') as f:
+      f.write(script)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+  dispatch_regions = []
+  for i in range(3):
+    dispatch_regions.append(os.path.join(tmp_dir, f'm_dispatch_{i}.mlir'))
+    with open(dispatch_regions[-1], 'w') as f:
+      f.write(f'dispatch {i % 2}\n')
+
+  args = {
+      'benchmark_output_dir': tmp_dir,
+      'iree_bin_dir': tmp_dir,
+      'iree_target_backends': 'dylib',
+      'benchmark_batch_size': 100,
+      'benchmark_repetitions': 2,
+      'benchmark_min_time': 0,
+      'compile_jobs': 2,
+      'benchmark_cpus': '',
+      'vmfb_cache_dir': '',
+      'max_candidates': 8,
+      'strategy_db': '',
+      'debug': False,
+  }
+
+  def num_compilations():
+    with open(os.path.join(tools_dir, 'compilations')) as f:
+      return len(f.readlines())
+
+  times = run_pipeline(args, dispatch_regions, make_strategy)
+  # Aggregates are not repetitions.
+  assert times == {d: [2.0, 13.0] for d in dispatch_regions}
+  # The first and the last dispatch regions are identical; the second run
+  # is served from the cache.
+  assert len(os.listdir(os.path.join(tmp_dir, 'vmfb_cache'))) == 2
+  assert num_compilations() <= 3
+  compilations = num_compilations()
+  run_pipeline(args, dispatch_regions, make_strategy)
+  assert num_compilations() == compilations
+
+  # Changing the strategy invalidates the cache.
+  def make_other_strategy(strategy_filename, **strategy):
+    with open(strategy_filename, 'w') as f:
+      f.write('other strategy')
+
+  run_pipeline(args, dispatch_regions, make_other_strategy)
+  assert len(os.listdir(os.path.join(tmp_dir, 'vmfb_cache'))) == 4
+
+  # Rebuilding iree-compile invalidates the cache.
+  with open(os.path.join(tools_dir, 'iree-compile'), 'a') as f:
+    f.write('# rebuilt\n')
+  run_pipeline(args, dispatch_regions, make_other_strategy)
+  assert len(os.listdir(os.path.join(tmp_dir, 'vmfb_cache'))) == 6
+
+  # Search the strategies of a matmul dispatch region.
+  matmul = os.path.join(tmp_dir, 'm_dispatch_3.mlir')
+  with open(matmul, 'w') as f:
+    f.write('%5 = linalg.fill ins(%cst : f32) outs(%2 : tensor<8x?xf32>)\n'
+            '%6 = linalg.matmul ins(%3, %4 : tensor<8x12xf32>, '
+            'tensor<12x?xf32>) outs(%5 : tensor<8x?xf32>) -> '
+            'tensor<8x?xf32>\n')
+  root = classify_dispatch_region(matmul)
+  assert root == {
+      'op_name': 'linalg.matmul',
+      'sizes': [8, None, 12],
+      'iterator_types': ['parallel', 'parallel', 'reduction']
+  }
+  assert classify_dispatch_region(dispatch_regions[0]) is None
+  # Memref operands, or operands whose types are on another line, have no
+  # shapes and no strategy template.
+  untyped = os.path.join(tmp_dir, 'untyped.mlir')
+  for types in ['memref<8x12xf32>, memref<12x?xf32>', '\n  tensor<8x12xf32>']:
+    with open(untyped, 'w') as f:
+      f.write(f'linalg.matmul ins(%3, %4 : {types})\n')
+    assert classify_dispatch_region(untyped) is None
+  assert strategy_candidates(None, 8) == [{}]
+  candidates = strategy_candidates(root, 8)
+  assert len(candidates) == 8 and candidates[0] == {}
+  for candidate in candidates[1:]:
+    m, _, k = candidate['tile_sizes']
+    assert m in (0, 4, 8) and k in (1, 4)
+  assert len(strategy_candidates(root, 1000)) == 1 + 3 * 5 * 2 * 2
+
+  def make_slow_default_strategy(strategy_filename, **strategy):
+    with open(strategy_filename, 'w') as f:
+      f.write(json.dumps(strategy) if strategy else 'default ' * 100)
+
+  strategy_db = search_strategies(args, [matmul], make_slow_default_strategy)
+  best, = strategy_db.values()
+  # The shortest strategy makes the smallest, fastest module.
+  assert best['strategy'] == min(candidates[1:],
+                                 key=lambda c: len(json.dumps(c)))
+  assert best['times'][1] == os.path.getsize(matmul) + len(
+      json.dumps(best['strategy']))
+  # The best strategy is replayed.
+  with open(os.path.join(tmp_dir, 'strategies.json')) as f:
+    assert json.load(f) == strategy_db
+  assert run_pipeline(args, [matmul], make_strategy) == {
+      matmul: best['times']
+  }
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import argparse
+import re
 import shutil
 import subprocess
 
@@ -45,19 +46,35 @@ objdump_flags = lambda fn: [
 ]
 
 
+def disassemble(objdump: str, obj_file: str, fn: str) -> str:
+  """Return the asm of `fn` in `obj_file`, without the objdump headers and the
+  `<fn+offset>` annotations of branch targets that llvm-mca cannot parse."""
+  p = subprocess.run([objdump] + objdump_flags(fn) + [obj_file],
+                     stdout=subprocess.PIPE,
+                     check=True,
+                     text=True)
+  lines = p.stdout.splitlines(keepends=True)[6:]
+  return ''.join(re.sub(r' <[^>]*>$', '', line) for line in lines)
+
+
+def run_llvm_mca(llvm_mca: str, asm_file: str, arch: str, cpu: str) -> str:
+  """Return the llvm-mca report of `asm_file` on `cpu`."""
+  flags = llvm_mca_flags({'a': arch, 'c': cpu})
+  p = subprocess.run([llvm_mca] + flags + [asm_file],
+                     stdout=subprocess.PIPE,
+                     check=True,
+                     text=True)
+  return p.stdout
+
+
 def objdump_and_llvm_mca(args, obj_file):
   fn = args['f']
 
   # Run llvm-objdump to produce the interesting portion of asm.
   asm_file = obj_file + '.S'
-  f = open(asm_file, 'w')
   objdump = args['llvm_objdump']
-  p = subprocess.Popen([objdump] + objdump_flags(fn) + [obj_file],
-                       stdout=subprocess.PIPE)
-  print(' '.join(p.args))
-  p = subprocess.Popen(['tail', '-n', '+7'], stdin=p.stdout, stdout=f)
-  p.wait()
-  f.close()
+  with open(asm_file, 'w') as f:
+    f.write(disassemble(objdump, obj_file, fn))
 
   # Run llvm-objdump to produce the full asm for debugging.
   full_asm_file = obj_file + '-full.S'
@@ -67,13 +84,12 @@ def objdump_and_llvm_mca(args, obj_file):
 
   # Run llvm-mca on asm
   llvm_mca_out_file = obj_file + '_llvm_mca.out'
-  llvm_mca = args['llvm_mca']
-  p = subprocess.run([llvm_mca] + llvm_mca_flags(args) + [asm_file] + ['-o'] +
-                     [llvm_mca_out_file])
-  print(' '.join(p.args))
+  report = run_llvm_mca(args['llvm_mca'], asm_file, args['a'], args['c'])
+  with open(llvm_mca_out_file, 'w') as f:
+    f.write(report)
 
   # Dump 10 lines of llvm-mca to stdout.
-  subprocess.run(['head', '-n', '10', llvm_mca_out_file])
+  print(''.join(report.splitlines(keepends=True)[:10]), end='')
 
 
 # Run opt and llc to produce a .o
@@ -174,4 +190,5 @@ def main():
     objdump_and_llvm_mca(args, compile_to_object(args))
 
 
-main()
+if __name__ == '__main__':
+  main()
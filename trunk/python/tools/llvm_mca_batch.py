@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Static performance analysis of all the kernels of a sweep with llvm-mca.
+
+The harness dumps the object file of every run to SANDBOX_DUMP_OBJ_DIR, next
+to a JSON file describing the run (benchmark, expert, problem sizes and types).
+This tool disassembles every benchmark function, runs llvm-mca on it for
+several cpus in parallel and parses the reports: IPC, block reciprocal
+throughput, backend pressure and the most loaded resource. The analyses are
+printed and, with -store, recorded in the result store, where they are joined
+with the measured runs to compare the static and measured throughputs.
+
+Usage:
+======
+
+python -m python.tools.llvm_mca_batch \
+  -llvm-objdump=${LLVM_BUILD_DIR}/bin/llvm-objdump \
+  -llvm-mca=${LLVM_BUILD_DIR}/bin/llvm-mca \
+  -obj-dir=/tmp/objs \
+  -cpus=skylake-avx512,haswell \
+  [-store=results.sqlite]
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import re
+import shutil
+import typing as tp
+
+import numpy as np
+
+from mlir.sandbox.result_store import ResultStore
+from python.tools.llvm_mca import disassemble, run_llvm_mca
+
+_summary_fields = {
+    'Iterations': ('iterations', int),
+    'Instructions': ('instructions', int),
+    'Total Cycles': ('total_cycles', int),
+    'Total uOps': ('total_uops', int),
+    'Dispatch Width': ('dispatch_width', int),
+    'uOps Per Cycle': ('uops_per_cycle', float),
+    'IPC': ('ipc', float),
+    'Block RThroughput': ('block_rthroughput', float),
+}
+
+
+def parse_llvm_mca_report(report: str) -> tp.Dict[str, tp.Any]:
+  """Parse the summary, the bottleneck analysis and the resource pressure per
+  iteration of an llvm-mca report.
+
+  The bottleneck is the resource with the highest pressure per iteration, in
+  cycles, and the backend pressure the fraction of the cycles with increasing
+  backend pressure.
+  """
+  analysis = {'backend_pressure': 0.0, 'resource_pressure': {}}
+  lines = report.splitlines()
+  resources = []
+  for i, line in enumerate(lines):
+    name, _, value = line.partition(':')
+    if name in _summary_fields and value.strip():
+      field, cast = _summary_fields[name]
+      analysis[field] = cast(value.strip())
+      continue
+    match = re.match(r'Cycles with backend pressure increase \[ ([\d.]+)% \]',
+                     line)
+    if match:
+      analysis['backend_pressure'] = float(match.group(1)) / 100
+      continue
+    match = re.match(r'\[[\d.]+\]\s+-\s+(\S+)', line)
+    if match:
+      resources.append(match.group(1))
+      continue
+    # The header of the pressure table is followed by one value per resource.
+    if line.startswith('Resource pressure per iteration:') and i + 2 < len(
+        lines):
+      values = lines[i + 2].split()
+      analysis['resource_pressure'] = {
+          r: 0.0 if v == '-' else float(v) for r, v in zip(resources, values)
+      }
+  missing = [f for f, _ in _summary_fields.values() if f not in analysis]
+  assert not missing, f'not an llvm-mca report, missing: {missing}'
+  pressure = analysis['resource_pressure']
+  analysis['bottleneck'] = max(pressure, key=pressure.get) if pressure else ''
+  analysis['bottleneck_pressure'] = pressure.get(analysis['bottleneck'], 0.0)
+  return analysis
+
+
+def _analyze(obj_file: str, asm_file: str, arch: str, cpu: str,
+             llvm_mca: str) -> tp.Dict[str, tp.Any]:
+  report = run_llvm_mca(llvm_mca, asm_file, arch, cpu)
+  with open(f'{obj_file}.{cpu}_llvm_mca.out', 'w') as f:
+    f.write(report)
+  return {'cpu': cpu, **parse_llvm_mca_report(report)}
+
+
+def _disassemble(obj_file: str, fn: str, llvm_objdump: str) -> str:
+  asm_file = obj_file + '.S'
+  with open(asm_file, 'w') as f:
+    f.write(disassemble(llvm_objdump, obj_file, fn))
+  return asm_file
+
+
+def analyze_objects(
+    obj_dir: str,
+    cpus: tp.Sequence[str],
+    arch: str,
+    llvm_objdump: str,
+    llvm_mca: str,
+    num_jobs: tp.Optional[int] = None
+) -> tp.List[tp.Tuple[tp.Dict[str, str], tp.Dict[str, tp.Any]]]:
+  """Return the run description and the analysis of every object file of
+  `obj_dir`, for every cpu."""
+  runs = {}
+  for description_file in sorted(glob.glob(os.path.join(obj_dir, '*.json'))):
+    obj_file = description_file[:-len('.json')] + '.o'
+    if os.path.exists(obj_file):
+      with open(description_file) as f:
+        runs[obj_file] = json.load(f)
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=num_jobs) as pool:
+    asm_files = dict(
+        zip(
+            runs.keys(),
+            pool.map(lambda o: _disassemble(o, runs[o]['benchmark'],
+                                            llvm_objdump), runs.keys())))
+    futures = [(runs[obj_file],
+                pool.submit(_analyze, obj_file, asm_files[obj_file], arch, cpu,
+                            llvm_mca)) for obj_file in runs for cpu in cpus]
+    return [(run, future.result()) for run, future in futures]
+
+
+def _rank_correlation(x: tp.Sequence[float], y: tp.Sequence[float]) -> float:
+  """Return the Spearman rank correlation of `x` and `y`, ties aside."""
+  if len(x) < 2:
+    return float('nan')
+  rank_x = np.argsort(np.argsort(x))
+  rank_y = np.argsort(np.argsort(y))
+  return float(np.corrcoef(rank_x, rank_y)[0, 1])
+
+
+def print_static_vs_measured(store: ResultStore, cpu: str):
+  """Print, per benchmark, how well the static throughput ranks the measured
+  run times of the problem sizes and experts analyzed for `cpu`."""
+  rows = store.static_vs_measured(cpu)
+  for benchmark in sorted(set(r['benchmark'] for r in rows)):
+    runs = [r for r in rows if r['benchmark'] == benchmark]
+    print(f'{cpu} {benchmark}: rank correlation of block RThroughput and '
+          f'measured p50 time ' + '{:.2f}'.format(
+              _rank_correlation([r['block_rthroughput'] for r in runs],
+                                [r['p50_elapsed_s'] for r in runs])) +
+          f' over {len(runs)} runs')
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('-llvm-mca',
+                      default=shutil.which('llvm-mca'),
+                      help='executable name of or full path to llvm-mca')
+  parser.add_argument('-llvm-objdump',
+                      default=shutil.which('llvm-objdump'),
+                      help='executable name of or full path to llvm-objdump')
+  parser.add_argument('-obj-dir',
+                      required=True,
+                      help='directory of the object files, see '
+                      'SANDBOX_DUMP_OBJ_DIR')
+  parser.add_argument('-cpus',
+                      default='skylake-avx512',
+                      help='comma-separated cpus to analyze for')
+  parser.add_argument('-a',
+                      '-arch',
+                      default='x86-64',
+                      help='arch to analyze for')
+  parser.add_argument('-j',
+                      '-jobs',
+                      type=int,
+                      default=os.cpu_count(),
+                      help='number of parallel llvm-mca runs')
+  parser.add_argument('-store',
+                      default=None,
+                      help='result store recording the analyses')
+  args = parser.parse_args()
+
+  cpus = args.cpus.split(',')
+  analyses = analyze_objects(args.obj_dir, cpus, args.a, args.llvm_objdump,
+                             args.llvm_mca, args.j)
+  for run, analysis in analyses:
+    print(f"{run['benchmark']:>24s} {run['expert']:>24s} "
+          f"{run['problem_sizes']:>32s} {analysis['cpu']:>16s} "
+          f"IPC {analysis['ipc']:5.2f} "
+          f"RThroughput {analysis['block_rthroughput']:8.2f} "
+          f"bottleneck {analysis['bottleneck']} "
+          f"({analysis['bottleneck_pressure']:.2f} cycles)")
+
+  if args.store is not None:
+    store = ResultStore(args.store)
+    for run, analysis in analyses:
+      store.add_static_analysis(run['benchmark'], run['expert'],
+                                run['problem_sizes'], run['np_types'],
+                                analysis)
+    for cpu in cpus:
+      print_static_vs_measured(store, cpu)
+    store.close()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import stat
+import tempfile
+
+from mlir.sandbox.result_store import ResultStore
+from python.tools.llvm_mca_batch import analyze_objects, parse_llvm_mca_report
+
+report = '''Iterations:        100
+Instructions:      1500
+Total Cycles:      562
+Total uOps:        1700
+
+Dispatch Width:    6
+uOps Per Cycle:    3.02
+IPC:               2.67
+Block RThroughput: 5.0
+
+
+Cycles with backend pressure increase [ 85.41% ]
+Throughput Bottlenecks:
+  Resource Pressure       [ 85.05% ]
+  - SKXPort0  [ 85.05% ]
+  - SKXPort5  [ 85.05% ]
+  Data Dependencies:      [ 3.56% ]
+  - Register Dependencies [ 3.56% ]
+  - Memory Dependencies   [ 0.00% ]
+
+Resources:
+[0]   - SKXDivider
+[1]   - SKXFPDivider
+[2]   - SKXPort0
+[3]   - SKXPort1
+[4]   - SKXPort5
+
+
+Resource pressure per iteration:
+[0]    [1]    [2]    [3]    [4]
+ -      -     4.00   2.00   5.00
+'''
+
+analysis = parse_llvm_mca_report(report)
+assert analysis['iterations'] == 100
+assert analysis['total_cycles'] == 562
+assert analysis['ipc'] == 2.67
+assert analysis['block_rthroughput'] == 5.0
+assert analysis['backend_pressure'] == 0.8541
+assert analysis['resource_pressure'] == {
+    'SKXDivider': 0.0,
+    'SKXFPDivider': 0.0,
+    'SKXPort0': 4.0,
+    'SKXPort1': 2.0,
+    'SKXPort5': 5.0
+}
+assert analysis['bottleneck'] == 'SKXPort5'
+assert analysis['bottleneck_pressure'] == 5.0
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+  # Fake LLVM tools printing the report above.
+  tools = {}
+  for tool, output in [('llvm-objdump', '\n' * 6 + 'vaddps %zmm0, %zmm1, %zmm2\n'),
+                       ('llvm-mca', report)]:
+    tools[tool] = os.path.join(tmp_dir, tool)
+    with open(tools[tool], 'w') as f:
+      f.write(f"#!/bin/sh\ncat <<'EOF'\n{output}EOF\n")
+    os.chmod(tools[tool], stat.S_IRWXU)
+
+  # Object files dumped by the harness for two runs.
+  obj_dir = os.path.join(tmp_dir, 'objs')
+  os.makedirs(obj_dir)
+  runs = [('A', 2.0), ('B', 1.0)]
+  for expert, _ in runs:
+    open(os.path.join(obj_dir, f'copy_2d_{expert}.o'), 'w').close()
+    with open(os.path.join(obj_dir, f'copy_2d_{expert}.json'), 'w') as f:
+      json.dump(
+          {
+              'benchmark': 'copy_2d',
+              'expert': expert,
+              'problem_sizes': 'm=10,n=32',
+              'np_types': 'float32,float32'
+          }, f)
+
+  analyses = analyze_objects(obj_dir, ['skylake-avx512', 'haswell'], 'x86-64',
+                             tools['llvm-objdump'], tools['llvm-mca'])
+  assert len(analyses) == 4
+  assert [(run['expert'], a['cpu']) for run, a in analyses] == [
+      ('A', 'skylake-avx512'), ('A', 'haswell'), ('B', 'skylake-avx512'),
+      ('B', 'haswell')
+  ]
+  with open(os.path.join(obj_dir, 'copy_2d_A.o.S')) as f:
+    assert f.read() == 'vaddps %zmm0, %zmm1, %zmm2\n'
+  assert os.path.exists(
+      os.path.join(obj_dir, 'copy_2d_B.o.haswell_llvm_mca.out'))
+
+  # Static analyses are joined with the measured runs.
+  store = ResultStore(':memory:')
+  for expert, elapsed_s in runs:
+    store.add_run('copy_2d', expert, 'm=10,n=32', [elapsed_s], 0.0, 1.0,
+                  np_types='float32,float32')
+  for run, analysis in analyses:
+    store.add_static_analysis(run['benchmark'], run['expert'],
+                              run['problem_sizes'], run['np_types'], analysis)
+  rows = store.static_vs_measured('haswell', expert='B')
+  assert len(rows) == 1
+  assert rows[0]['p50_elapsed_s'] == 1.0
+  assert rows[0]['block_rthroughput'] == 5.0
+  assert rows[0]['bottleneck'] == 'SKXPort5'
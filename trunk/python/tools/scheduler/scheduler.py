@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
-import abc
-from cmath import pi
+import asyncio
+import collections
+from enum import Enum
+import heapq
+import itertools
 import multiprocessing as mp
+from multiprocessing.connection import wait
 import os
-import queue
 import threading
+import time
 
 
 class NoMoreJobsException(Exception):
@@ -13,157 +17,362 @@ class NoMoreJobsException(Exception):
   pass
 
 
-def worker(job_queue, result_queue, shutdown_event, pinned_cpus_queue,
-           pinned_cpus_semaphore, process_job_fn):
-  """A worker function to be run in a separate process.
+class JobStatus(Enum):
+  DONE = 0
+  # The job exceeded its timeout, its worker process was restarted.
+  TIMEOUT = 1
+  # The job raised an exception or its worker process died.
+  ERROR = 2
+
+
+class Job():
+  """A job payload with scheduling attributes.
+
+  Jobs with a lower priority value are dispatched first, jobs of equal priority
+  in submission order. If `timeout` (in seconds) is set, the scheduler kills
+  the worker process running the job when it expires.
+  """
+
+  def __init__(self, payload, priority=0, timeout=None):
+    self.payload = payload
+    self.priority = priority
+    self.timeout = timeout
+
 
-  This function is on every worker process. It iteratively retrieves jobs from
-  job_queue until the job queue is empty and shutdown_event was set by the
-  scheduler process. Results are enqueued in result_queue.
+class JobResult():
+  """The outcome of a job: `value` is the return value of process_job_fn if
+  the status is DONE, the error message if the status is ERROR."""
 
-  If pinned_cpus_queue is set, this function pins the executing process to a
-  CPU ID that is taken from the queue.
+  def __init__(self, job_id, payload, status, value):
+    self.job_id = job_id
+    self.payload = payload
+    self.status = status
+    self.value = value
+
+
+class CancellationToken():
+  """A handle to cancel a submitted job.
+
+  A queued job is dropped, a running job is stopped by restarting its worker
+  process. The results of cancelled jobs are never reported.
   """
-  if pinned_cpus_queue:
-    cpu_id = pinned_cpus_queue.get()
-    os.sched_setaffinity(0, {cpu_id})
-    pinned_cpus_semaphore.release()
 
-  while not (job_queue.empty() and shutdown_event.is_set()):
-    job = None
+  def __init__(self, scheduler, job_id):
+    self.scheduler = scheduler
+    self.job_id = job_id
+
+  def cancel(self):
+    self.scheduler._cancel(self.job_id)
+
+
+def worker(conn, process_job_fn):
+  """A worker function to be run in a separate process.
+
+  This function is run on every worker process. It blocks until the scheduler
+  sends a job over conn, processes it and sends back the result. It stops when
+  the scheduler sends None or closes the connection.
+  """
+  while True:
     try:
-      # Block for up to 0.1s, then start a new iteration.
-      job = job_queue.get(True, 0.1)
-    except queue.Empty:
-      continue
-    result_queue.put(process_job_fn(job))
+      message = conn.recv()
+    except EOFError:
+      return
+    if message is None:
+      return
+    job_id, payload = message
+    try:
+      result = (job_id, JobStatus.DONE, process_job_fn(payload))
+    except Exception as e:
+      result = (job_id, JobStatus.ERROR, repr(e))
+    conn.send(result)
 
 
-class JobScheduler(abc.ABC):
-  """An abstract job scheduler.
+class JobScheduler():
+  """A job scheduler.
 
   A job scheduler manages a pool of worker processes and dispatches jobs to
   them. The job scheduler cannot be accessed from worker processes.
 
-  Subclasses must provide two methods: get_next_job generates a job to be
-  dispatched to some available worker. When the job has been processed, the
-  process_result callback is invoked.
+  Jobs can be provided in two ways:
+  * Subclasses provide get_next_job, which generates a job to be dispatched to
+    some available worker. The scheduler keeps requesting new jobs until
+    get_next_job throws a NoMoreJobsException or the shutdown method is
+    called.
+  * Jobs are submitted with submit until the shutdown method is called.
+  get_next_job may return a Job to set the priority or timeout of a job.
+
+  Results can be consumed in two ways:
+  * Subclasses provide process_result, which is called with the return value
+    of every job that completed, on a thread of its own, so that slow result
+    processing does not delay the dispatch of jobs. process_failure is called
+    for jobs that timed out or failed.
+  * The results_async or iter_results methods iterate over JobResults.
+  At most `result_buffer_size` results are buffered or in flight: jobs are not
+  dispatched while the results are not consumed.
 
   When creating a job scheduler, users must specify the number of processes
   and a function for processing a job (that is executed on worker processes).
-  The scheduler keeps requesting and scheduling new jobs until get_next_job
-  throws a NoMoreJobsException or the shutdown method is called.
   """
 
-  def __init__(self, num_processes, process_job_fn, pinned_cpus=[]):
+  def __init__(self,
+               num_processes,
+               process_job_fn,
+               pinned_cpus=[],
+               result_buffer_size=None):
     """Initialize the job scheduler.
 
     num_processes is the desired number of worker processes. These can
-    optionally be pinned to a CPU. In that case, the number of CPU IDs in
-    pinned_cpus must match num_processes. process_job_fn is a callback for
-    processing a job. It is executed in a worker process and has no access
-    to the job scheduler.
+    optionally be pinned to a CPU or a set of CPUs. In that case, the number
+    of entries in pinned_cpus must match num_processes. process_job_fn is a
+    callback for processing a job. It is executed in a worker process and has
+    no access to the job scheduler. result_buffer_size defaults to twice the
+    number of processes.
     """
     assert len(pinned_cpus) == num_processes or len(
         pinned_cpus) == 0, "invalid number of pinned_cpus"
-    self.job_queue = mp.Queue()
-    self.pinned_cpus = pinned_cpus
-    self.pinned_cpus_queue = mp.Queue() if len(pinned_cpus) > 0 else None
-    self.pinned_cpus_semaphore = mp.Semaphore()
+    self.num_processes = num_processes
+    self.process_job_fn = process_job_fn
+    self.pinned_cpus = [{c} if isinstance(c, int) else set(c)
+                        for c in pinned_cpus]
+    self.result_buffer_size = result_buffer_size \
+      if result_buffer_size is not None else 2 * num_processes
+
+    self.condition = threading.Condition()
+    self.job_ids = itertools.count()
+    # Heap of (priority, job_id) of queued jobs.
+    self.job_heap = []
+    # Queued and running jobs by id.
+    self.jobs = {}
+    # Running job (job_id, deadline) by worker index.
+    self.running = {}
+    self.completed_results = collections.deque()
+    self.accepting_jobs = True
+    self.finished = False
+    self.was_started = False
+
+    self.workers = [None] * num_processes
+    self.wakeup_receiver, self.wakeup_sender = mp.Pipe(duplex=False)
+    self.wakeup_pending = False
+    self.dispatcher_thread = threading.Thread(target=self._dispatcher)
     self.result_processor_thread = threading.Thread(
         target=self._result_processor)
-    self.result_queue = mp.Queue()
-    self.shutdown_event = mp.Event()
-    self.processes = [
-        mp.Process(
-            target=worker,
-            args=(self.job_queue, self.result_queue, self.shutdown_event,
-                  self.pinned_cpus_queue, self.pinned_cpus_semaphore,
-                  process_job_fn)) for i in range(num_processes)
-    ]
-    self.num_jobs = 0
-    self.was_started = False
 
-  @abc.abstractmethod
   def get_next_job(self):
     """Generate a new job."""
-    pass
+    raise NoMoreJobsException()
 
-  @abc.abstractmethod
   def process_result(self, result):
     """Process a job result."""
     pass
 
-  def _enqueue_job(self):
-    """Generate a new job and enqueue it."""
-    if self.shutdown_event.is_set():
-      raise NoMoreJobsException()
-    job = self.get_next_job()
-    self.num_jobs += 1
-    self.job_queue.put(job)
+  def process_failure(self, job_result):
+    """Process the JobResult of a job that timed out or failed."""
+    pass
+
+  def _generates_jobs(self):
+    return type(self).get_next_job is not JobScheduler.get_next_job
+
+  def _processes_results(self):
+    return type(self).process_result is not JobScheduler.process_result or \
+      type(self).process_failure is not JobScheduler.process_failure
+
+  def submit(self, job, priority=0, timeout=None):
+    """Submit a job and return its CancellationToken."""
+    with self.condition:
+      assert self.accepting_jobs, "cannot submit jobs after shutdown"
+      job_id = self._enqueue(Job(job, priority, timeout))
+    return CancellationToken(self, job_id)
+
+  def _enqueue(self, job):
+    job_id = next(self.job_ids)
+    self.jobs[job_id] = job
+    heapq.heappush(self.job_heap, (job.priority, job_id))
+    self._wakeup()
+    return job_id
+
+  def _cancel(self, job_id):
+    with self.condition:
+      if job_id not in self.jobs:
+        return
+      del self.jobs[job_id]
+      for idx, (running_id, _) in list(self.running.items()):
+        if running_id == job_id:
+          del self.running[idx]
+          self._restart_worker(idx)
+      self._wakeup()
+
+  def _wakeup(self):
+    """Wake up the dispatcher thread waiting for worker messages."""
+    if not self.wakeup_pending:
+      self.wakeup_pending = True
+      self.wakeup_sender.send(None)
+
+  def _start_worker(self, idx):
+    parent_conn, child_conn = mp.Pipe()
+    p = mp.Process(target=worker, args=(child_conn, self.process_job_fn))
+    p.start()
+    child_conn.close()
+    # Pin before the first job is dispatched to the worker.
+    if self.pinned_cpus:
+      os.sched_setaffinity(p.pid, self.pinned_cpus[idx])
+    self.workers[idx] = (p, parent_conn)
+
+  def _restart_worker(self, idx):
+    p, conn = self.workers[idx]
+    p.kill()
+    p.join()
+    conn.close()
+    self._start_worker(idx)
+
+  def _refill(self):
+    """Request jobs from get_next_job to keep every worker busy."""
+    while self.accepting_jobs and self._generates_jobs() and \
+        len(self.job_heap) < self.num_processes:
+      try:
+        job = self.get_next_job()
+      except NoMoreJobsException:
+        self.accepting_jobs = False
+        break
+      self._enqueue(job if isinstance(job, Job) else Job(job))
+
+  def _dispatch(self):
+    """Dispatch queued jobs to idle workers, within the result buffer size."""
+    for idx in range(self.num_processes):
+      if idx in self.running:
+        continue
+      while self.job_heap and self.job_heap[0][1] not in self.jobs:
+        heapq.heappop(self.job_heap)
+      num_buffered = len(self.completed_results) + len(self.running)
+      if not self.job_heap or num_buffered >= self.result_buffer_size:
+        return
+      _, job_id = heapq.heappop(self.job_heap)
+      job = self.jobs[job_id]
+      deadline = time.monotonic() + job.timeout \
+        if job.timeout is not None else None
+      self.running[idx] = (job_id, deadline)
+      self.workers[idx][1].send((job_id, job.payload))
+
+  def _complete(self, job_id, status, value):
+    job = self.jobs.pop(job_id)
+    self.completed_results.append(JobResult(job_id, job.payload, status, value))
+    self.condition.notify_all()
+
+  def _dispatcher(self):
+    """Dispatch jobs and collect results until all jobs were processed.
+
+    This function is run in the job scheduler process, but in a separate
+    thread. It blocks on the worker connections until a result arrives, a job
+    times out or it is woken up by another thread.
+    """
+    while True:
+      with self.condition:
+        self._refill()
+        now = time.monotonic()
+        for idx, (job_id, deadline) in list(self.running.items()):
+          if deadline is not None and deadline <= now:
+            del self.running[idx]
+            self._restart_worker(idx)
+            self._complete(job_id, JobStatus.TIMEOUT, None)
+        self._dispatch()
+        if not self.accepting_jobs and not self.jobs:
+          self.finished = True
+          self.condition.notify_all()
+          return
+        deadlines = [d for _, d in self.running.values() if d is not None]
+        timeout = max(0, min(deadlines) - now) if deadlines else None
+        conns = {self.workers[idx][1]: idx for idx in self.running}
+
+      for conn in wait(list(conns.keys()) + [self.wakeup_receiver], timeout):
+        if conn is self.wakeup_receiver:
+          with self.condition:
+            self.wakeup_receiver.recv()
+            self.wakeup_pending = False
+          continue
+        idx = conns[conn]
+        with self.condition:
+          # The job may have been cancelled in the meantime.
+          if self.running.get(idx, (None,))[0] is None or \
+              self.workers[idx][1] is not conn:
+            continue
+          job_id, _ = self.running.pop(idx)
+          try:
+            _, status, value = conn.recv()
+          except (EOFError, OSError):
+            self._restart_worker(idx)
+            status, value = JobStatus.ERROR, 'worker process died'
+          self._complete(job_id, status, value)
+
+  def _next_result(self):
+    """Block until a result is available, return None when all jobs were
+    processed."""
+    with self.condition:
+      while not self.completed_results and not self.finished:
+        self.condition.wait()
+      if not self.completed_results:
+        return None
+      result = self.completed_results.popleft()
+      # Consuming a result may unblock the dispatch of another job.
+      self._wakeup()
+      return result
+
+  def iter_results(self):
+    """Iterate over the JobResults in completion order."""
+    while True:
+      result = self._next_result()
+      if result is None:
+        return
+      yield result
+
+  async def results_async(self):
+    """Asynchronously iterate over the JobResults in completion order."""
+    loop = asyncio.get_running_loop()
+    while True:
+      result = await loop.run_in_executor(None, self._next_result)
+      if result is None:
+        return
+      yield result
 
   def _result_processor(self):
-    """A function that is iteratively looking for results.
-    
+    """Pass the results to the process_result and process_failure methods.
+
     This function is run in the job scheduler process, but in a separate
-    thread. It takes results from the result queue and passes them to the
-    abstract process_result method. For every result, it tries to enqueue
-    a new job. When a result has been received for each job and no more jobs
-    are available, the worker processes are shutdown.
+    thread.
     """
-    while self.num_jobs > 0:
-      result = self.result_queue.get()
-      self.num_jobs -= 1
-      self.process_result(result)
-      try:
-        self._enqueue_job()
-      except NoMoreJobsException:
-        pass
-    self.shutdown_event.set()
+    for result in self.iter_results():
+      if result.status == JobStatus.DONE:
+        self.process_result(result.value)
+      else:
+        self.process_failure(result)
 
   def start(self):
     """Start the job scheduler.
-    
+
     This function starts the scheduler and returns immediately.
     """
     assert not self.was_started, "cannot start the scheduler multiple times"
     self.was_started = True
-    self.shutdown_event.clear()
-
-    # Enqueue pinned CPU IDs.
-    for cpu_id in self.pinned_cpus:
-      self.pinned_cpus_queue.put(cpu_id)
-
-    # Start processes.
-    for p in self.processes:
-      p.start()
-
-    # Wait until each process pinned itself to a CPU (if pinning is requested).
-    if len(self.pinned_cpus) > 0:
-      for i in range(len(self.processes)):
-        self.pinned_cpus_semaphore.acquire()
-
-    # Enqueue a few initial jobs. The number of jobs must be large enough to
-    # keep the workers busy. For every received result, a new job will be
-    # enqueued in _result_processor, so the overall number of jobs in the queue
-    # will stay more or less the same throughout the execution.
-    for i in range(2 * len(self.processes)):
-      try:
-        self._enqueue_job()
-      except NoMoreJobsException:
-        break
-
-    # Start processing results in a new thread (but in the same process).
-    self.result_processor_thread.start()
+    for idx in range(self.num_processes):
+      self._start_worker(idx)
+    self.dispatcher_thread.start()
+    if self._processes_results():
+      self.result_processor_thread.start()
 
   def join(self):
     """Block until all jobs have been processed and the workers have been
     shut down.
+
+    Without process_result, the results must be consumed concurrently.
     """
-    self.result_processor_thread.join()
-    for p in self.processes:
+    self.dispatcher_thread.join()
+    if self.result_processor_thread.is_alive():
+      self.result_processor_thread.join()
+    for p, conn in self.workers:
+      conn.send(None)
       p.join()
+      conn.close()
 
   def shutdown(self):
     """Stop enqueing new jobs."""
-    self.shutdown_event.set()
+    with self.condition:
+      self.accepting_jobs = False
+      self._wakeup()
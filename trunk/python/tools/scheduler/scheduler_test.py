@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
-from python.tools.scheduler.scheduler import JobScheduler, NoMoreJobsException
+import asyncio
+import time
+
+from python.tools.scheduler.scheduler import JobScheduler, JobStatus, NoMoreJobsException
 
 class ConcreteScheduler(JobScheduler):
   """A dummy scheduler for testing purposes."""
@@ -30,3 +33,56 @@ s.join()
 s.results.sort()
 assert s.results == [1, 4, 9, 16, 25, 36, 49, 64, 81, 100, 121], "wrong result"
 
+
+# Jobs submitted to a single worker are dispatched by priority, then in
+# submission order.
+s = JobScheduler(1, handler)
+for job, priority in [(1, 2), (2, 0), (3, 1), (4, 0)]:
+  s.submit(job, priority=priority)
+s.shutdown()
+s.start()
+results = [r.value for r in s.iter_results()]
+s.join()
+assert results == [4, 16, 9, 1], f"wrong priority order: {results}"
+
+# Cancelled jobs are not reported.
+s = JobScheduler(1, handler)
+tokens = [s.submit(job) for job in range(1, 5)]
+tokens[2].cancel()
+s.shutdown()
+s.start()
+results = sorted(r.value for r in s.iter_results())
+s.join()
+assert results == [1, 4, 16], f"cancelled job was reported: {results}"
+
+
+def sleeping_handler(job):
+  time.sleep(job)
+  return job
+
+
+# A job exceeding its timeout is reported as such and its worker is replaced.
+s = JobScheduler(1, sleeping_handler)
+s.submit(60, timeout=0.5)
+s.submit(0)
+s.shutdown()
+s.start()
+statuses = {r.payload: r.status for r in s.iter_results()}
+s.join()
+assert statuses == {60: JobStatus.TIMEOUT, 0: JobStatus.DONE}, \
+  f"wrong statuses: {statuses}"
+
+
+async def collect_results(scheduler):
+  return [r.value async for r in scheduler.results_async()]
+
+
+# Results are streamed asynchronously through a bounded buffer.
+s = JobScheduler(2, handler, result_buffer_size=1)
+for job in range(1, 12):
+  s.submit(job)
+s.shutdown()
+s.start()
+results = sorted(asyncio.run(collect_results(s)))
+s.join()
+assert results == [1, 4, 9, 16, 25, 36, 49, 64, 81, 100, 121], "wrong result"
@@ -1,11 +1,20 @@
 #!/usr/bin/env python
 # Script to run tests and benchmarks.
 import argparse
+import concurrent.futures
 import glob
+import json
 import os
 import subprocess
 import sys
-from typing import Sequence
+import time
+import zlib
+from typing import Dict, List, Sequence
+
+# Per-test durations of the previous runs, used to start the slowest tests
+# first.
+_DEFAULT_TIMING_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  ".run_tests_timings.json")
 
 
 def parse_arguments():
@@ -17,6 +26,33 @@ def parse_arguments():
       default=False,
       action=argparse.BooleanOptionalAction,
   )
+  parser.add_argument("--jobs",
+                      "-j",
+                      help="Number of tests run in parallel.",
+                      type=int,
+                      default=os.cpu_count())
+  parser.add_argument("--timeout",
+                      help="Timeout of a test in seconds.",
+                      type=float,
+                      default=20)
+  parser.add_argument("--retries",
+                      help="Number of times a timed out test is retried.",
+                      type=int,
+                      default=1)
+  parser.add_argument("--timing-db",
+                      help="File storing the durations of the tests.",
+                      dest="timing_db",
+                      default=_DEFAULT_TIMING_DB)
+  parser.add_argument("--num-shards",
+                      help="Split the tests into the given number of shards.",
+                      dest="num_shards",
+                      type=int,
+                      default=1)
+  parser.add_argument("--shard-index",
+                      help="Index of the shard to run, from 0.",
+                      dest="shard_index",
+                      type=int,
+                      default=0)
   return parser.parse_args()
 
 
@@ -45,42 +81,108 @@ def _configure_env():
   return env
 
 
-def _run_test(test_script: str, test_args: Sequence[str] = []) -> bool:
+class _TestResult:
+
+  def __init__(self, test_script: str, success: bool, duration_s: float,
+               message: str = "", timed_out: bool = False):
+    self.test_script = test_script
+    self.success = success
+    self.duration_s = duration_s
+    self.message = message
+    self.timed_out = timed_out
+    self.num_retries = 0
+
+  def __str__(self):
+    status = ("\033[32m" + "SUCCESS" + "\033[m") if self.success else (
+        "\033[31m" + "FAILED" + "\033[m")
+    result = f"- {self.test_script} ({self.duration_s:.1f}s): {status}"
+    if self.num_retries:
+      result += f" after {self.num_retries} retries"
+    return result + (f"\n{self.message}" if self.message else "")
+
+
+def _run_test(test_script: str,
+              env: Dict[str, str],
+              timeout_s: float,
+              test_args: Sequence[str] = []) -> _TestResult:
   """Run the provided test script an return failure or success.
   A test succeeds if:
   - it does not time out
   - it returns zero
   - it does not print FAILURE
   """
-  print(f"- running {test_script}: ", end="")
   module = _convert_path_to_module(test_script)
-  env = _configure_env()
+  start = time.monotonic()
   proc = subprocess.Popen(["python", "-m", module] + test_args,
                           stdout=subprocess.PIPE,
                           stderr=subprocess.PIPE,
                           env=env)
   try:
-    outs, errs = proc.communicate(timeout=20)
+    outs, errs = proc.communicate(timeout=timeout_s)
   except subprocess.TimeoutExpired:
     proc.kill()
-    print("\033[31m" + "FAILED" + "\033[m")
-    print("  -> test execution timed out")
-    return False
+    proc.communicate()
+    return _TestResult(test_script,
+                       False,
+                       time.monotonic() - start,
+                       "  -> test execution timed out",
+                       timed_out=True)
+  duration_s = time.monotonic() - start
   if proc.returncode != 0:
-    print("\033[31m" + "FAILED" + "\033[m")
-    print(f"  -> test returned code {proc.returncode}")
-    print(errs.decode("utf-8"))
-    return False
+    return _TestResult(
+        test_script, False, duration_s,
+        f"  -> test returned code {proc.returncode}\n" + errs.decode("utf-8"))
   # Check the output for numerical failures.
   outs = outs.decode("utf-8")
   errs = errs.decode("utf-8")
   for line in outs.splitlines() + errs.splitlines():
     if line.count("FAILURE") != 0:
-      print("\033[31m" + "FAILED" + "\033[m")
-      print(f"  -> test failure: {line}")
-      return False
-  print("\033[32m" + "SUCCESS" + "\033[m")
-  return True
+      return _TestResult(test_script, False, duration_s,
+                         f"  -> test failure: {line}")
+  return _TestResult(test_script, True, duration_s)
+
+
+def _run_test_with_retries(test_script: str, env: Dict[str, str],
+                           timeout_s: float, retries: int) -> _TestResult:
+  """Run the test, again if it timed out, up to `retries` more times."""
+  result = _run_test(test_script, env, timeout_s)
+  for retry in range(retries):
+    if not result.timed_out:
+      break
+    result = _run_test(test_script, env, timeout_s)
+    result.num_retries = retry + 1
+  return result
+
+
+def _load_timings(timing_db: str) -> Dict[str, float]:
+  try:
+    with open(timing_db) as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return {}
+
+
+def _save_timings(timing_db: str, timings: Dict[str, float]):
+  tmp_file = timing_db + ".tmp"
+  with open(tmp_file, "w") as f:
+    json.dump(timings, f, indent=2, sort_keys=True)
+  os.replace(tmp_file, timing_db)
+
+
+def _order_and_shard(tests: Sequence[str], timings: Dict[str, float],
+                     default_duration_s: float, num_shards: int,
+                     shard_index: int) -> List[str]:
+  """Return the tests of the shard, slowest first.
+
+  Tests without timing are assumed to be slow. Tests are assigned to shards by
+  a hash of their name, so that the shards stay disjoint when the timings
+  change between invocations.
+  """
+  shard = [
+      t for t in sorted(tests)
+      if zlib.crc32(t.encode()) % num_shards == shard_index
+  ]
+  return sorted(shard, key=lambda t: -timings.get(t, default_duration_s))
 
 
 # TODO: Reactivate once piped through IREE.
@@ -91,9 +193,27 @@ def _run_test(test_script: str, test_args: Sequence[str] = []) -> bool:
 
 
 def main(args):
+  env = _configure_env()
+  timings = _load_timings(args.timing_db)
+  tests = _order_and_shard(glob.glob("./python/**/*test.py", recursive=True),
+                           timings, args.timeout, args.num_shards,
+                           args.shard_index)
+  print(f"- running {len(tests)} tests on {args.jobs} jobs:")
   results = []
-  for f in glob.glob("./python/**/*test.py", recursive=True):
-    results.append(_run_test(f))
+  with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    futures = [
+        pool.submit(_run_test_with_retries, test, env, args.timeout,
+                    args.retries) for test in tests
+    ]
+    # Stream the results as they complete.
+    for future in concurrent.futures.as_completed(futures):
+      result = future.result()
+      print(result, flush=True)
+      results.append(result.success)
+      if not result.timed_out:
+        timings[result.test_script] = result.duration_s
+  _save_timings(args.timing_db, timings)
+
   # Tun a small search.
   # TODO: Reactivate once piped through IREE.
   # results.append(
@@ -108,10 +228,14 @@ def main(args):
   # Additionally run the lit tests.
   print(f"- running lit tests:")
   lit_args = ["lit", "-v"]
+  if args.num_shards > 1:
+    lit_args += [
+        f"--num-shards={args.num_shards}", f"--run-shard={args.shard_index + 1}"
+    ]
   if not args.gpu_integration_tests:
     lit_args.append("--filter-out=Integration/Dialect/VectorExt/GPU")
   test_dirs = ["test"]
-  returncode = subprocess.call(lit_args + test_dirs, env=_configure_env())
+  returncode = subprocess.call(lit_args + test_dirs, env=env)
   if returncode != 0:
     print(f"-> lit tests failed!")
   if returncode != 0 or errors:
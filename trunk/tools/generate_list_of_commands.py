@@ -1,3 +1,7 @@
+# Print a benchmark command per problem size. The list can be run
+# in a single process with:
+#   python -m mlir.sandbox.batch_runner commands.txt --command "python -m ..."
+
 bandwidth_bound_l1_problem_sizes = [                \
   [10, 32], [10, 48], [10, 64], [10, 96], [10, 128], \
   [16, 32], [16, 48], [16, 64], [16, 96], [16, 128], \
@@ -1,10 +1,10 @@
-import argparse, pandas, os, random, seaborn, sys, re
+import argparse, hashlib, json, pandas, os, random, sys, re
 import numpy as np
-from unicodedata import name
-from numpy import median
 
 import matplotlib.pyplot as plt
 
+from mlir.sandbox.result_store import ResultStore
+
 names_to_translate = {
     'gflop_per_s_per_iter': 'Throughput [Gflop/s]',
     'gbyte_per_s_per_iter': 'Bandwidth [GB/s]',
@@ -45,7 +45,8 @@ def _parse_arguments() -> argparse.Namespace:
       type=str,
       required=True,
       help=
-      "comma-separated list of input data filenames (e.g., --input input1,input2)\n"
+      "comma-separated list of result stores or raw JSON dumps (e.g., --input "
+      + "input1.sqlite,input2.json)\n"
       + "The data for multiple files is concatenated into a single graph.")
   parser.add_argument("--output",
                       type=str,
@@ -83,6 +84,14 @@ def _parse_arguments() -> argparse.Namespace:
                       type=bool,
                       required=False,
                       help="plot separate bars for strides and dilations")
+  parser.add_argument(
+      "--quantile_cache",
+      type=str,
+      required=False,
+      help="file caching the quantiles of the inputs, recomputed when the "
+      "inputs, the metric or the grouping change (e.g., --quantile_cache "
+      "quantiles.pkl)",
+      default=None)
 
   ###############################################################################
   # Not used atm
@@ -165,23 +174,36 @@ def compress_problem_sizes_label(labels):
   return keys, new_labels
 
 
-def get_strides_and_dilations(size):
-  match1 = re.search(r"""strides=\[([0-9, ]+)\]""", size)
-  match2 = re.search(r"""dilations=\[([0-9, ]+)\]""", size)
-  suffixes = []
-  if match1:
-    suffixes.append("".join([x.strip() for x in match1.group(1).split(",")]))
-  if match2:
-    suffixes.append("".join([x.strip() for x in match2.group(1).split(",")]))
-  if suffixes:
-    return "_" + "_".join([suffix.strip() for suffix in suffixes])
-  return ""
-
+def move_strides_and_dilations_to_benchmarks(data):
+  """Suffix the benchmark names with the strides and dilations of the problem
+  sizes and remove them from the problem sizes.
 
-def remove_strides_and_dilations(size):
-  size = re.sub(r"""[,]*strides=\[[0-9, ]+\]""", "", size)
-  size = re.sub(r"""[,]*dilations=\[[0-9, ]+\]""", "", size)
-  return size
+  Example:
+  conv_1d, "n=8,strides=[2],dilations=[1]"
+  ->
+  conv_1d_2_1, "n=8"
+  """
+  sizes = data[problem_size_key(data)].astype(str)
+  suffixes = pandas.Series('', index=data.index)
+  for name in ['strides', 'dilations']:
+    values = sizes.str.extract(name + r"""=\[([0-9, ]+)\]""", expand=False)
+    suffixes += ('_' + values.str.replace(r"""[, ]""", '', regex=True)).fillna('')
+  data[benchmark_key(data)] = (data[benchmark_key(data)].astype(str) +
+                               suffixes).astype('category')
+  data[problem_size_key(data)] = sizes.str.replace(
+      r"""[,]*(strides|dilations)=\[[0-9, ]+\]""", '',
+      regex=True).astype('category')
+  return data
+
+
+def compute_problem_volumes(sizes):
+  """Return the product of the integer problem sizes of every problem size
+  label, computed once per distinct label."""
+  labels = pandas.Series(sizes.astype('category').cat.categories)
+  values = labels.str.extractall(r"""(?:^|,)\s*[a-zA-Z]+=(\d+)(?=,|$)""")[0]
+  volumes = values.astype('int64').groupby(level=0).prod().reindex(
+      labels.index, fill_value=1)
+  return sizes.map(dict(zip(labels, volumes))).astype('int64')
 
 
 #### Tools to query benchmarks info from dataframe
@@ -190,7 +212,7 @@ def benchmark_key(data):
 
 
 def get_unique_benchmarks(data):
-  return np.unique(data[benchmark_key(data)].values)
+  return np.unique(data[benchmark_key(data)].astype(str).values)
 
 
 def print_available_benchmarks_and_exit(data, args):
@@ -219,7 +241,7 @@ def problem_size_key(data):
 
 
 def get_unique_sizes(data):
-  return np.unique(data[problem_size_key(data)].values)
+  return np.unique(data[problem_size_key(data)].astype(str).values)
 
 
 def print_available_sizes_and_exit(data, args):
@@ -227,151 +249,153 @@ def print_available_sizes_and_exit(data, args):
 
 
 def get_sizes_to_plot(data, args):
+  available_sizes = get_unique_sizes(data)
   if args.sizes_to_plot != 'all':
     specified_sizes = args.sizes_to_plot.split(';')
     print(f'Specified size filter: {specified_sizes}')
-    available_sizes = get_unique_sizes(data)
     print(f'Available sizes in the data set: {available_sizes}')
     return list(filter(lambda x: x in available_sizes, specified_sizes))
   if args.num_sizes_to_plot <= 0:
-    return get_unique_sizes(data)
+    return available_sizes
   random.seed(42)
-  return random.sample(list(get_unique_sizes(data)), args.num_sizes_to_plot)
+  return random.sample(list(available_sizes), args.num_sizes_to_plot)
+
+
+#### Tools to load and aggregate the data
+def load_result_store(files):
+  """Return the result store of the given files, result stores or raw JSON
+  dumps of the harness, merged into a temporary store if needed."""
+  if len(files) == 1 and not files[0].endswith('.json'):
+    return ResultStore(files[0])
+  store = ResultStore(':memory:')
+  for file in files:
+    print(f'Processing {file}')
+    if file.endswith('.json'):
+      store.import_raw_json(file)
+    else:
+      store.import_store(file)
+  return store
+
+
+def prepare_data(data, group_by_strides_and_dilations):
+  """Convert the benchmark, expert and problem size columns of the samples to
+  categories and optionally move the strides and dilations to the benchmark
+  names."""
+  for key in [benchmark_key(data), problem_size_key(data), 'expert']:
+    data[key] = data[key].astype('category')
+  if group_by_strides_and_dilations:
+    data = move_strides_and_dilations_to_benchmarks(data)
+  return data
+
+
+def compute_quantile_table(data, metric):
+  """Return the quartiles (p25, p50 and p75) of the metric per benchmark and
+  problem size, with the problem volume, sorted by problem volume."""
+  keys = [benchmark_key(data), problem_size_key(data)]
+  table = data.groupby(keys, observed=True,
+                       sort=False)[metric].quantile([0.25, 0.5, 0.75]).unstack()
+  table.columns = ['p25', 'p50', 'p75']
+  table = table.reset_index()
+  table['problem_volume'] = compute_problem_volumes(table[keys[1]])
+  return table.sort_values(by='problem_volume', kind='stable',
+                           ignore_index=True)
+
+
+def _quantile_cache_key(files, metric, group_by_strides_and_dilations):
+  inputs = [(os.path.abspath(file), os.stat(file).st_mtime_ns,
+             os.stat(file).st_size) for file in files]
+  return hashlib.sha256(
+      json.dumps([inputs, metric,
+                  bool(group_by_strides_and_dilations)]).encode()).hexdigest()
+
+
+def load_quantile_table(args):
+  """Return the quantile table of the inputs, from the cache if it is up to
+  date, or None if an input does not exist."""
+  files = args.inputs.split(',')
+  for file in files:
+    if not os.path.exists(file):
+      print(f'{file} does not exist')
+      return None
+  key = _quantile_cache_key(files, args.metric_to_plot,
+                            args.group_by_strides_and_dilations)
+  if args.quantile_cache and os.path.exists(args.quantile_cache):
+    cached_key, table = pandas.read_pickle(args.quantile_cache)
+    if cached_key == key:
+      print(f'Load quantiles from {args.quantile_cache}')
+      return table
+
+  store = load_result_store(files)
+  data = prepare_data(store.samples(args.metric_to_plot[:-len('_per_iter')]),
+                      args.group_by_strides_and_dilations)
+  store.close()
+  table = compute_quantile_table(data, args.metric_to_plot)
+  if args.quantile_cache:
+    pandas.to_pickle((key, table), args.quantile_cache)
+  return table
 
 
 #### Start
 def main():
   args = _parse_arguments()
 
-  data = None
-  for file in args.inputs.split(','):
-    print(f'Processing {file}')
-    if not os.path.exists(file):
-      print(f'{file} does not exist')
-      return
-    read_data = pandas.read_json(file)
-    print(read_data)
-    data = read_data if data is None else pandas.concat([data, read_data])
-
-  # Add strides and dilations to the function name.
-  if args.group_by_strides_and_dilations:
-    data[benchmark_key(data)] = data[[
-        benchmark_key(data), problem_size_key(data)
-    ]].apply(lambda x: x[0] + get_strides_and_dilations(x[1]), axis=1)
-    data[problem_size_key(data)] = data[problem_size_key(data)].apply(
-        lambda x: remove_strides_and_dilations(x))
+  table = load_quantile_table(args)
+  if table is None:
+    return
+  print(table)
 
   if args.print_available_benchmarks:
-    print_available_benchmarks_and_exit(data, args)
+    print_available_benchmarks_and_exit(table, args)
 
-  benchmarks_to_plot = get_benchmarks_to_plot(data, args)
+  benchmarks_to_plot = get_benchmarks_to_plot(table, args)
   print(f'Benchmarks to plot: {benchmarks_to_plot}')
 
-  sizes_to_plot = get_sizes_to_plot(data, args)
+  sizes_to_plot = get_sizes_to_plot(table, args)
   print(f'Sizes to plot: {sizes_to_plot}')
 
-  data_to_plot = data
-  data_to_plot = data_to_plot[data_to_plot[benchmark_key(data_to_plot)].isin(
-      benchmarks_to_plot)]
-  data_to_plot = data_to_plot[data_to_plot[problem_size_key(data_to_plot)].isin(
-      sizes_to_plot)]
-
-  # Add helper column that computes the problem volume.
-  def compute_volume(problem_size):
-    sizes = []
-    for size in problem_size.split(','):
-      try:
-        size = size.split('=')[1]
-        sizes.append(int(size))
-      except Exception:
-        pass
-    return np.prod(sizes)
-
-  def get_index(x):
-    idx = -1
-    for v in benchmarks_to_plot:
-      idx = idx + 1
-      if v == x:
-        return idx
-    assert False, f'Could not find {x} in {benchmarks_to_plot}'
-
-  data_to_plot['problem_volume'] = data_to_plot[problem_size_key(
-      data_to_plot)].apply(compute_volume)
-  # Add helper column that maps benchmark name to its index.
-  print(data_to_plot[benchmark_key(data_to_plot)])
-  data_to_plot['benchmark_index'] = data_to_plot[benchmark_key(
-      data_to_plot)].apply(get_index)
-  # Sort by problem volume and benchmark index.
-  data_to_plot = data_to_plot.sort_values(
-      by=['problem_volume', 'benchmark_index'], ascending=(True, True))
-  sizes_to_plot = list(
-      data_to_plot[problem_size_key(data_to_plot)].drop_duplicates())
-
-  # # Sort by problem volume and benchmark index.
-  # data_to_plot = data_to_plot.sort_values(by=['problem_volume'], kind='stable')
-  # print(data_to_plot)
-  # sizes_to_plot = list(
-  #     data_to_plot[problem_size_key(data_to_plot)].drop_duplicates())
-
-  # Keep only the relevant columns.
-  data_to_plot = data_to_plot[[
-      benchmark_key(data_to_plot),
-      problem_size_key(data_to_plot), args.metric_to_plot
-  ]]
-
-  # Compute the quartiles.
-  data_lower_quart = data_to_plot.groupby(
-      [benchmark_key(data_to_plot),
-       problem_size_key(data_to_plot)]).quantile(0.25)
-  data_upper_quart = data_to_plot.groupby(
-      [benchmark_key(data_to_plot),
-       problem_size_key(data_to_plot)]).quantile(0.75)
-  print(data_lower_quart)
-  print(data_upper_quart)
+  # The table is sorted by problem volume.
+  table = table[table[benchmark_key(table)].isin(benchmarks_to_plot) &
+                table[problem_size_key(table)].isin(sizes_to_plot)]
+  sizes_to_plot = list(table[problem_size_key(table)].drop_duplicates())
 
   fig = plt.figure(figsize=(9.66, 6))
-  ax = seaborn.barplot(x=problem_size_key(data_to_plot),
-                       y=args.metric_to_plot,
-                       hue=benchmark_key(data_to_plot),
-                       data=data_to_plot,
-                       estimator=median,
-                       ci=None)
-
-  maximum = 0
-  for idx, p in enumerate(ax.patches):
-    benchmark = benchmarks_to_plot[idx // len(sizes_to_plot)]
-    size = sizes_to_plot[idx % len(sizes_to_plot)]
-    lower = data_lower_quart.loc[benchmark, size][args.metric_to_plot]
-    upper = data_upper_quart.loc[benchmark, size][args.metric_to_plot]
-    maximum = max(maximum, upper)
-    ax.errorbar(p.get_x() + p.get_width() / 2, lower, upper - lower, color="k")
-    ax.annotate(format(p.get_height(), '.1f'),
-                (p.get_x() + p.get_width() / 2., upper),
-                ha='center',
-                va='bottom',
-                xytext=(0, 2),
-                textcoords='offset points',
-                rotation=90,
-                fontsize=8)
-
-  keys, new_labels = compress_problem_sizes_label(
-      [text.get_text() for text in ax.get_xticklabels()])
+  ax = fig.gca()
+  width = 0.8 / len(benchmarks_to_plot)
+  for idx, benchmark in enumerate(benchmarks_to_plot):
+    rows = table[table[benchmark_key(table)] == benchmark].set_index(
+        problem_size_key(table)).reindex(sizes_to_plot)
+    positions = np.arange(len(sizes_to_plot)) - 0.4 + width * (idx + 0.5)
+    ax.bar(positions,
+           rows['p50'],
+           width,
+           label=get_translated_name(benchmark))
+    ax.errorbar(positions,
+                rows['p50'],
+                [rows['p50'] - rows['p25'], rows['p75'] - rows['p50']],
+                fmt='none',
+                color="k")
+    for position, median, upper in zip(positions, rows['p50'], rows['p75']):
+      if np.isnan(median):
+        continue
+      ax.annotate(format(median, '.1f'), (position, upper),
+                  ha='center',
+                  va='bottom',
+                  xytext=(0, 2),
+                  textcoords='offset points',
+                  rotation=90,
+                  fontsize=8)
+
+  keys, new_labels = compress_problem_sizes_label(sizes_to_plot)
+  ax.set_xticks(np.arange(len(sizes_to_plot)))
   ax.set_xticklabels(labels=new_labels)
 
   ax.tick_params(axis="x", rotation=30)
-  ax.legend(ncol=4,
-            loc='upper right',
-            labels=[
-                names_to_translate[text.get_text()]
-                for text in ax.get_legend().get_texts()
-            ],
-            title='',
-            frameon=False)
-  ax.set_ylim(bottom=0, top=maximum * 1.15)
+  ax.legend(ncol=4, loc='upper right', title='', frameon=False)
+  ax.set_ylim(bottom=0, top=table['p75'].max() * 1.15)
   ax.margins(x=0.01)
   plt.xlabel(
       str.format(
-          f"{get_translated_name(problem_size_key(data))} [{','.join(keys)}]"))
+          f"{get_translated_name(problem_size_key(table))} [{','.join(keys)}]"))
   plt.ylabel(get_translated_name(args.metric_to_plot))
 
   fig.tight_layout()